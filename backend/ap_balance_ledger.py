@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Ledger incremental de montos vinculados AP↔PO (`ap_po_links`).
+
+En lugar de recalcular `SUM(ap_po_links.amount)` por OC / línea / factura en
+cada lectura, se mantiene la tabla `ap_balance_ledger` con los acumulados:
+
+    scope     'po' | 'po_line' | 'invoice'
+    key       po_id / po_line_id / invoice_id (texto, igual que en ap_po_links)
+    linked_amount, linked_qty, links
+
+El ledger se actualiza en la misma transacción que inserta o elimina filas de
+`ap_po_links` (`apply_links`), de modo que las lecturas de saldo son búsquedas
+puntuales por clave primaria. `verify` / `rebuild` lo reconcilian contra la
+tabla fuente:
+
+    python backend/ap_balance_ledger.py verify  [--db data/chipax_data.db]
+    python backend/ap_balance_ledger.py rebuild [--db data/chipax_data.db]
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from typing import Any, Iterable, Mapping
+
+LEDGER_TABLE = "ap_balance_ledger"
+SCOPES = (("po", "po_id"), ("po_line", "po_line_id"), ("invoice", "invoice_id"))
+TOLERANCE = 0.005
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cur = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+        (name,),
+    )
+    return cur.fetchone() is not None
+
+
+def ledger_exists(conn: sqlite3.Connection) -> bool:
+    return _table_exists(conn, LEDGER_TABLE)
+
+
+def ensure_ledger(conn: sqlite3.Connection) -> None:
+    """Crea el ledger si falta y lo siembra desde `ap_po_links` existente.
+
+    Debe llamarse antes de insertar los enlaces nuevos de la transacción,
+    para que la siembra no los cuente dos veces.
+    """
+    if ledger_exists(conn):
+        return
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ap_balance_ledger (
+          scope TEXT NOT NULL,
+          key TEXT NOT NULL,
+          linked_amount REAL NOT NULL DEFAULT 0,
+          linked_qty REAL NOT NULL DEFAULT 0,
+          links INTEGER NOT NULL DEFAULT 0,
+          updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID
+        """
+    )
+    if _table_exists(conn, "ap_po_links"):
+        _insert_source_totals(conn)
+
+
+def apply_links(
+    conn: sqlite3.Connection,
+    links: Iterable[Mapping[str, Any]],
+    sign: int = 1,
+) -> int:
+    """Suma (sign=1) o resta (sign=-1) enlaces al ledger; no hace commit.
+
+    Cada enlace necesita `invoice_id`, `po_id`, `po_line_id`, `amount` y
+    opcionalmente `qty`. Las claves se convierten con CAST(? AS TEXT), igual
+    que la afinidad TEXT de las columnas de `ap_po_links`.
+    """
+    deltas: dict[tuple[str, Any], list[float]] = {}
+    for link in links:
+        amount = float(link.get("amount") or 0) * sign
+        qty = float(link.get("qty") or 0) * sign
+        for scope, col in SCOPES:
+            key = link.get(col)
+            if key is None or key == "":
+                continue
+            acc = deltas.setdefault((scope, key), [0.0, 0.0, 0])
+            acc[0] += amount
+            acc[1] += qty
+            acc[2] += sign
+    if not deltas:
+        return 0
+    ensure_ledger(conn)
+    conn.executemany(
+        """
+        INSERT INTO ap_balance_ledger(scope, key, linked_amount, linked_qty, links, updated_at)
+        VALUES (?, CAST(? AS TEXT), ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(scope, key) DO UPDATE SET
+          linked_amount = linked_amount + excluded.linked_amount,
+          linked_qty = linked_qty + excluded.linked_qty,
+          links = links + excluded.links,
+          updated_at = excluded.updated_at
+        """,
+        [(scope, key, a, q, n) for (scope, key), (a, q, n) in deltas.items()],
+    )
+    return len(deltas)
+
+
+def linked_amount(conn: sqlite3.Connection, scope: str, key: Any) -> float:
+    """Monto acumulado para una clave (0 si no tiene enlaces)."""
+    row = conn.execute(
+        "SELECT linked_amount FROM ap_balance_ledger WHERE scope=? AND key=CAST(? AS TEXT)",
+        (scope, key),
+    ).fetchone()
+    return float(row[0]) if row else 0.0
+
+
+def _source_totals_sql(conn: sqlite3.Connection) -> str:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(ap_po_links)").fetchall()}
+    qty = "COALESCE(qty,0)" if "qty" in cols else "0"
+    parts = [
+        f"SELECT '{scope}' AS scope, CAST({col} AS TEXT) AS key, "
+        f"SUM(COALESCE(amount,0)) AS linked_amount, SUM({qty}) AS linked_qty, "
+        f"COUNT(*) AS links FROM ap_po_links WHERE {col} IS NOT NULL AND {col} <> '' "
+        f"GROUP BY CAST({col} AS TEXT)"
+        for scope, col in SCOPES
+    ]
+    return " UNION ALL ".join(parts)
+
+
+def verify(conn: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Diferencias entre el ledger y `ap_po_links` (lista vacía = consistente)."""
+    ensure_ledger(conn)
+    if _table_exists(conn, "ap_po_links"):
+        src = _source_totals_sql(conn)
+    else:
+        src = "SELECT NULL AS scope, NULL AS key, 0 AS linked_amount, 0 AS linked_qty, 0 AS links WHERE 0"
+    cur = conn.execute(
+        f"""
+        WITH src AS ({src})
+        SELECT s.scope, s.key, s.linked_amount AS expected, l.linked_amount AS actual,
+               s.links AS expected_links, l.links AS actual_links
+        FROM src s
+        LEFT JOIN ap_balance_ledger l ON l.scope = s.scope AND l.key = s.key
+        WHERE l.key IS NULL OR ABS(s.linked_amount - l.linked_amount) > ? OR s.links <> l.links
+        UNION ALL
+        SELECT l.scope, l.key, NULL, l.linked_amount, NULL, l.links
+        FROM ap_balance_ledger l
+        LEFT JOIN src s ON s.scope = l.scope AND s.key = l.key
+        WHERE s.key IS NULL AND (ABS(l.linked_amount) > ? OR l.links <> 0)
+        """,
+        (TOLERANCE, TOLERANCE),
+    )
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def _insert_source_totals(conn: sqlite3.Connection) -> int:
+    cur = conn.execute(
+        "INSERT INTO ap_balance_ledger(scope, key, linked_amount, linked_qty, links) "
+        f"SELECT scope, key, linked_amount, linked_qty, links FROM ({_source_totals_sql(conn)})"
+    )
+    return cur.rowcount
+
+
+def rebuild(conn: sqlite3.Connection) -> int:
+    """Reconstruye el ledger desde `ap_po_links`; devuelve filas escritas."""
+    ensure_ledger(conn)
+    conn.execute("DELETE FROM ap_balance_ledger")
+    written = _insert_source_totals(conn) if _table_exists(conn, "ap_po_links") else 0
+    conn.commit()
+    return written
+
+
+def main(argv: list[str] | None = None) -> int:
+    from db_utils import _resolve_db_path
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["verify", "rebuild"])
+    ap.add_argument("--db", default=_resolve_db_path())
+    args = ap.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            print(f"ap_balance_ledger reconstruido: {rebuild(conn)} claves")
+            return 0
+        diffs = verify(conn)
+        for d in diffs[:50]:
+            print(f"  {d['scope']}:{d['key']} esperado={d['expected']} ledger={d['actual']}")
+        print(f"ap_balance_ledger: {len(diffs)} diferencias")
+        return 1 if diffs else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,6 +6,7 @@ Endpoints:
     POST /api/ap-match/suggestions -> candidatos (Top-N) para una factura
     POST /api/ap-match/preview     -> valida reglas duras (3-way simplificado)
     POST /api/ap-match/confirm      -> persiste enlaces + evento de aprendizaje
+    POST /api/ap-match/revert       -> elimina enlaces de una factura
 
 Compatibilidad retro (tests existentes):
                                 - Payload antiguo {"invoice": {rut, monto}} ->
@@ -39,7 +40,9 @@ from typing import Any
 
 from flask import Blueprint, jsonify, request
 
+from ap_balance_ledger import apply_links, ensure_ledger
 from db_utils import db_conn
+from match_counters import ensure_match_counters
 
 bp = Blueprint("ap_match", __name__)
 
@@ -168,6 +171,7 @@ def _ensure_tables(conn: sqlite3.Connection) -> None:
     )
     _migrate_legacy_ap_po_links(conn)
     _ensure_events_table(conn)
+    ensure_match_counters(conn)
 
 
 def _migrate_legacy_ap_po_links(conn: sqlite3.Connection) -> None:
@@ -1233,7 +1237,9 @@ def ap_match_confirm():
                     "violations": over_alloc,
                 }), 422
 
-            # Insert links
+            # Insert links (el ledger de saldos se actualiza en la misma tx)
+            if not legacy_mode:
+                ensure_ledger(conn)
             for link in links:
                 if legacy_mode:
                     # Map to legacy columns: ap_invoice_id, line_id, user_id
@@ -1264,6 +1270,17 @@ def ap_match_confirm():
                             user_id,
                         ),
                     )
+            if not legacy_mode:
+                apply_links(conn, (
+                    {
+                        "invoice_id": int(invoice_id),
+                        "po_id": link.get("po_id"),
+                        "po_line_id": link.get("po_line_id"),
+                        "amount": link.get("amount"),
+                        "qty": link.get("qty"),
+                    }
+                    for link in links
+                ))
 
             event_payload = {
                 "invoice_id": invoice_id,
@@ -1343,6 +1360,56 @@ def ap_match_confirm():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@bp.route("/api/ap-match/revert", methods=["POST"])
+def ap_match_revert():
+    """Elimina enlaces confirmados de una factura y descuenta el ledger.
+
+    Body: {invoice_id, link_ids?}; sin link_ids se revierten todos.
+    """
+    data = request.get_json(silent=True) or {}
+    invoice_id = data.get("invoice_id") or data.get("ap_invoice_id")
+    link_ids = data.get("link_ids")
+    if not invoice_id:
+        return jsonify({"error": "invoice_id_required"}), 422
+    if link_ids is not None and not isinstance(link_ids, list):
+        return jsonify({"error": "link_ids_must_be_list"}), 422
+
+    try:
+        with db_conn() as conn:
+            if not _table_exists(conn, "ap_po_links"):
+                return jsonify({"ok": True, "invoice_id": invoice_id, "links_reverted": 0})
+            _migrate_legacy_ap_po_links(conn)
+            ensure_ledger(conn)
+            sql = (
+                "SELECT id, invoice_id, po_id, po_line_id, amount, qty "
+                "FROM ap_po_links WHERE invoice_id=?"
+            )
+            params: list[Any] = [int(invoice_id)]
+            if link_ids is not None:
+                if not link_ids:
+                    return jsonify({"ok": True, "invoice_id": invoice_id, "links_reverted": 0})
+                sql += f" AND id IN ({','.join('?' for _ in link_ids)})"
+                params.extend(int(i) for i in link_ids)
+            rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
+            if rows:
+                conn.executemany(
+                    "DELETE FROM ap_po_links WHERE id=?",
+                    [(r["id"],) for r in rows],
+                )
+                apply_links(conn, rows, sign=-1)
+            conn.commit()
+            return jsonify({
+                "ok": True,
+                "invoice_id": invoice_id,
+                "links_reverted": len(rows),
+                "link_ids": [r["id"] for r in rows],
+            })
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid_link_ids"}), 422
+    except sqlite3.Error as e:  # noqa: BLE001
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
 @bp.route("/api/ap-match/invoice/<int:invoice_id>", methods=["GET"])
 def ap_match_get_invoice(invoice_id: int):
     """Devuelve links existentes y resumen para una factura AP.
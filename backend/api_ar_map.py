@@ -7,6 +7,9 @@ from typing import Any, Dict, List
 
 from flask import Blueprint, jsonify, request
 
+from match_counters import ensure_match_counters
+from name_resolver import get_resolver
+
 
 bp = Blueprint("ar_map", __name__)
 
@@ -210,29 +213,18 @@ def _gather_suggestions(
                     )
         except (sqlite3.OperationalError, sqlite3.DatabaseError):
             pass
-    # 3) Canonicalization via recon_aliases -> map to known project
+    # 3) Canonicalization via recon_aliases (índice NameResolver) -> proyecto
     if cust_name and not items:
         try:
-            cur.execute(
-                "SELECT DISTINCT canonical FROM recon_aliases "
-                "WHERE ? LIKE '%' || alias || '%' LIMIT 3",
-                (cust_name,),
-            )
-            for (cn,) in cur.fetchall():
+            resolver = get_resolver(con)
+            aliases = resolver.resolve(cust_name, kinds=("alias",), fuzzy=False, limit=10)
+            for cn in list(dict.fromkeys(m.entry.canonical for m in aliases))[:3]:
                 pid = None
                 pname = None
-                try:
-                    cur.execute(
-                        "SELECT zoho_project_id, zoho_project_name \n"
-                        "FROM projects_analytic_map \n"
-                        "WHERE zoho_project_name = ? LIMIT 1",
-                        (cn,),
-                    )
-                    r = cur.fetchone()
-                    if r:
-                        pid, pname = r[0], r[1]
-                except (sqlite3.OperationalError, sqlite3.DatabaseError):
-                    pid = None
+                for m in resolver.resolve(cn, kinds=("project",), fuzzy=False):
+                    if m.via == "exact" and m.entry.ref:
+                        pid, pname = m.entry.ref, m.entry.canonical
+                        break
                 if not pid:
                     try:
                         cur.execute(
@@ -278,13 +270,9 @@ def _gather_suggestions(
     # 4) Name contains (analytic map)
     if not items and cust_name:
         try:
-            cur.execute(
-                "SELECT DISTINCT zoho_project_id, zoho_project_name "
-                "FROM projects_analytic_map "
-                "WHERE ? LIKE '%' || zoho_project_name || '%' LIMIT 5",
-                (cust_name,),
-            )
-            for pid, pname in cur.fetchall():
+            found = get_resolver(con).resolve(cust_name, kinds=("project",), fuzzy=False)
+            for m in found:
+                pid, pname = m.entry.ref, m.entry.canonical
                 items.append(
                     {
                         "project_id": pid,
@@ -638,6 +626,7 @@ def api_ar_map_confirm():
             );
             """
         )
+        ensure_match_counters(con)
         _ensure_alias_candidates(cur)
         cur.execute(
             "INSERT INTO ar_map_events(user_id, payload) VALUES(?,?)",
@@ -777,6 +766,7 @@ def api_ar_map_auto_assign():
                         );
                         """
                     )
+                    ensure_match_counters(con)
                     payload = {
                         "action": "auto_assign",
                         "body": body,
@@ -977,7 +967,8 @@ def api_ar_map_bulk_assign():
             );
             """
         )
-        
+        ensure_match_counters(con)
+
         assigned = 0
         failed = 0
         rules_created = 0
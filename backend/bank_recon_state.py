@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Estado de conciliación por movimiento bancario (`bank_movements`).
+
+Cada movimiento lleva `reconciled_amount` (SUM(recon_links.amount)) y
+`reconciled_state` ('confirmado' si tiene links, si no 'pendiente'), con el
+índice `ix_bank_recon_state(reconciled_state, fecha)`. Así la cartola, los
+dashboards y quien busque movimientos sin conciliar filtran con un index seek
+en vez de un EXISTS / IN sobre `recon_links` por fila.
+
+Mantenimiento (sin commit; dentro de la transacción que escribe los links):
+- `refresh_movements(con, ids)` después de insertar / borrar `recon_links`
+  de esos movimientos (lo hace `legacy_compat.insert_links` y
+  `maybe_insert_combined_row`, usados por conciliación `confirmar`).
+
+Consistencia:
+
+    python backend/bank_recon_state.py verify  [--db data/chipax_data.db]
+    python backend/bank_recon_state.py rebuild [--db data/chipax_data.db]
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from typing import Any, Iterable, Optional
+
+CONFIRMED = "confirmado"
+PENDING = "pendiente"
+TOLERANCE = 0.005
+
+_LINKS_SELECT = """
+SELECT bank_movement_id, SUM(COALESCE(amount, 0)) AS amount
+FROM recon_links WHERE bank_movement_id IS NOT NULL
+GROUP BY bank_movement_id
+"""
+
+
+def _table_exists(con: sqlite3.Connection, name: str) -> bool:
+    cur = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    )
+    return cur.fetchone() is not None
+
+
+def _has_state(con: sqlite3.Connection) -> bool:
+    cols = {r[1] for r in con.execute("PRAGMA table_info(bank_movements)")}
+    return "reconciled_state" in cols
+
+
+def ensure_recon_state(con: sqlite3.Connection) -> bool:
+    """Agrega las columnas + índice si faltan y las siembra desde `recon_links`.
+
+    Retorna False si no existe `bank_movements`.
+    """
+    if not _table_exists(con, "bank_movements"):
+        return False
+    if _has_state(con):
+        return True
+    cols = {r[1] for r in con.execute("PRAGMA table_info(bank_movements)")}
+    if "reconciled_amount" not in cols:
+        con.execute("ALTER TABLE bank_movements ADD COLUMN reconciled_amount REAL NOT NULL DEFAULT 0")
+    con.execute(
+        f"ALTER TABLE bank_movements ADD COLUMN reconciled_state TEXT NOT NULL DEFAULT '{PENDING}'"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS ix_bank_recon_state ON bank_movements(reconciled_state, fecha)"
+    )
+    if _table_exists(con, "recon_links"):
+        _apply_links(con)
+    return True
+
+
+def _apply_links(con: sqlite3.Connection) -> int:
+    cur = con.execute(
+        f"""
+        UPDATE bank_movements
+        SET reconciled_amount = s.amount, reconciled_state = '{CONFIRMED}'
+        FROM ({_LINKS_SELECT}) AS s
+        WHERE bank_movements.id = s.bank_movement_id
+        """
+    )
+    return cur.rowcount
+
+
+def refresh_movements(con: sqlite3.Connection, ids: Iterable[Any]) -> None:
+    """Recalcula monto / estado de los movimientos dados desde sus links."""
+    keys = sorted({int(i) for i in ids if i is not None})
+    if not keys or not ensure_recon_state(con):
+        return
+    if not _table_exists(con, "recon_links"):
+        return
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_links_bank ON recon_links(bank_movement_id)"
+    )
+    marks = ",".join("?" * len(keys))
+    con.execute(
+        f"""
+        UPDATE bank_movements SET
+          reconciled_amount = COALESCE(
+            (SELECT SUM(COALESCE(amount, 0)) FROM recon_links
+             WHERE bank_movement_id = bank_movements.id), 0),
+          reconciled_state = CASE WHEN EXISTS(
+            SELECT 1 FROM recon_links WHERE bank_movement_id = bank_movements.id)
+            THEN '{CONFIRMED}' ELSE '{PENDING}' END
+        WHERE id IN ({marks})
+        """,
+        keys,
+    )
+
+
+def pending_movement_ids(con: sqlite3.Connection, limit: Optional[int] = None) -> list[int]:
+    """Ids de movimientos sin conciliar, más recientes primero (usa el índice)."""
+    if not ensure_recon_state(con):
+        return []
+    sql = (
+        f"SELECT id FROM bank_movements WHERE reconciled_state = '{PENDING}' "
+        "ORDER BY fecha DESC, id DESC"
+    )
+    params: list[Any] = []
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return [r[0] for r in con.execute(sql, params).fetchall()]
+
+
+def rebuild(con: sqlite3.Connection) -> int:
+    if not ensure_recon_state(con):
+        return 0
+    con.execute(
+        f"UPDATE bank_movements SET reconciled_amount = 0, reconciled_state = '{PENDING}' "
+        f"WHERE reconciled_amount <> 0 OR reconciled_state <> '{PENDING}'"
+    )
+    n = _apply_links(con) if _table_exists(con, "recon_links") else 0
+    con.commit()
+    return n
+
+
+def verify(con: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Movimientos cuyo estado no coincide con `recon_links` (lista vacía = OK)."""
+    if not ensure_recon_state(con):
+        return []
+    links = _LINKS_SELECT if _table_exists(con, "recon_links") else (
+        "SELECT NULL AS bank_movement_id, 0 AS amount WHERE 0"
+    )
+    cur = con.execute(
+        f"""
+        SELECT bm.id, bm.reconciled_amount AS stored_amount, bm.reconciled_state AS stored_state,
+               COALESCE(s.amount, 0) AS amount,
+               CASE WHEN s.bank_movement_id IS NULL THEN '{PENDING}' ELSE '{CONFIRMED}' END AS state
+        FROM bank_movements bm
+        LEFT JOIN ({links}) AS s ON s.bank_movement_id = bm.id
+        WHERE bm.reconciled_state <> state
+           OR ABS(bm.reconciled_amount - COALESCE(s.amount, 0)) > :tol
+        """,
+        {"tol": TOLERANCE},
+    )
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    from db_utils import _resolve_db_path
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["verify", "rebuild"])
+    ap.add_argument("--db", default=_resolve_db_path())
+    args = ap.parse_args(argv)
+
+    con = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            print(f"bank_movements: {rebuild(con)} movimientos conciliados")
+            return 0
+        diffs = verify(con)
+        con.commit()  # columnas recién agregadas por ensure
+        for d in diffs[:50]:
+            print(f"  movimiento {d['id']}: {d}")
+        print(f"bank_movements estado conciliación: {len(diffs)} diferencias")
+        return 1 if diffs else 0
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Sync Chipax (`tools/import_chipax_conciliacion.run`) como job en segundo plano.
+
+`POST /api/reconciliaciones/sync_chipax` encola el import y responde de
+inmediato con un `job_id`; `GET /api/reconciliaciones/sync_chipax/<job_id>`
+entrega el estado y el progreso (filas leídas, insertadas, actualizadas y
+omitidas), que el importador reporta después de cada chunk.
+
+A lo más un sync por base de datos (ruta resuelta) por proceso: si ya hay uno
+en curso, `start_sync` devuelve ese job en vez de crear otro.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ai_jobs import JobResult, JobStatus
+
+logger = logging.getLogger(__name__)
+
+TOOLS_DIR = Path(__file__).resolve().parents[1] / "tools"
+MAX_FINISHED_JOBS = 50
+
+_lock = threading.Lock()
+_jobs: Dict[str, JobResult] = {}
+_active: Dict[str, str] = {}  # ruta de la BD -> job_id en curso
+
+
+def _load_runner() -> Callable[..., Dict[str, Any]]:
+    tools_dir = str(TOOLS_DIR)
+    if tools_dir not in sys.path:
+        sys.path.append(tools_dir)
+    from import_chipax_conciliacion import run  # type: ignore
+
+    return run
+
+
+def _db_key(db_path: str | os.PathLike[str]) -> str:
+    return os.path.realpath(os.fspath(db_path))
+
+
+def _set_progress(job_id: str, progress: Dict[str, int]) -> None:
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.metadata = {**(job.metadata or {}), "progress": dict(progress)}
+
+
+def _prune() -> None:
+    finished = [j for j in _jobs.values() if j.status != JobStatus.RUNNING]
+    finished.sort(key=lambda j: j.completed_at or 0)
+    for job in finished[: max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        _jobs.pop(job.job_id, None)
+
+
+def _execute(
+    job_id: str,
+    db_key: str,
+    raw_dir: Optional[str],
+    runner: Optional[Callable[..., Dict[str, Any]]],
+) -> None:
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    try:
+        run = runner or _load_runner()
+        result = run(
+            db_path=db_key,
+            raw_dir=raw_dir,
+            progress=lambda p: _set_progress(job_id, p),
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.error("sync_chipax %s falló: %s", job_id, e)
+        error = str(e)
+    with _lock:
+        job = _jobs[job_id]
+        job.status = JobStatus.FAILED if error else JobStatus.COMPLETED
+        job.result, job.error = result, error
+        job.progress = 1.0
+        job.completed_at = time.time()
+        if _active.get(db_key) == job_id:
+            del _active[db_key]
+        _prune()
+
+
+def start_sync(
+    db_path: str | os.PathLike[str],
+    raw_dir: Optional[str] = None,
+    *,
+    runner: Optional[Callable[..., Dict[str, Any]]] = None,
+) -> Tuple[JobResult, bool]:
+    """Encola un sync para ``db_path``; devuelve (job, creado).
+
+    ``creado`` es False cuando ya había un sync en curso para esa BD.
+    """
+    key = _db_key(db_path)
+    with _lock:
+        running = _active.get(key)
+        if running is not None:
+            return _jobs[running], False
+        job = JobResult(
+            job_id=f"chipax-sync-{uuid.uuid4().hex[:12]}",
+            status=JobStatus.RUNNING,
+            started_at=time.time(),
+            metadata={
+                "db_path": key,
+                "progress": {"rows_scanned": 0, "inserted": 0, "updated": 0, "skipped": 0, "files": 0},
+            },
+        )
+        _jobs[job.job_id] = job
+        _active[key] = job.job_id
+        threading.Thread(
+            target=_execute,
+            args=(job.job_id, key, raw_dir, runner),
+            name=job.job_id,
+            daemon=True,
+        ).start()
+    return job, True
+
+
+def sync_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """Estado público del job, o None si no existe."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {
+            "job_id": job.job_id,
+            "status": job.status.value,
+            "progress": dict((job.metadata or {}).get("progress", {})),
+            "metrics": job.result,
+            "error": job.error,
+            "started_at": job.started_at,
+            "completed_at": job.completed_at,
+        }
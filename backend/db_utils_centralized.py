@@ -6,11 +6,19 @@ OFITEC.AI - DATABASE UTILITIES
 
 Módulo centralizado para utilidades de base de datos.
 Elimina duplicación de código DB en el sistema.
+
+Toda conexión recibe el perfil de pragmas `PRAGMA_PROFILE` (WAL, synchronous,
+mmap_size, cache_size, temp_store) y un caché de sentencias preparadas de
+`STATEMENT_CACHE_SIZE` entradas. Dentro de `reuse_connections()` (o con
+DB_REUSE_CONNECTIONS=1) cada hilo reutiliza una conexión caliente por base de
+datos en vez de abrir y cerrar una por llamada.
 """
 
 from __future__ import annotations
+import os
 import sqlite3
 import logging
+import threading
 from typing import Any, Dict, List, Optional, Union, Iterator
 from contextlib import contextmanager
 from config import DB_PATH
@@ -18,6 +26,99 @@ from config import DB_PATH
 logger = logging.getLogger(__name__)
 
 
+# ----------------------------------------------------------------------------
+# Connection Profile
+# ----------------------------------------------------------------------------
+
+# Orden relevante: journal_mode primero (no cambia dentro de una transacción)
+PRAGMA_PROFILE: Dict[str, str] = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.getenv("DB_CACHE_SIZE", "-65536"),  # negativo = KiB (64 MiB)
+    "temp_store": os.getenv("DB_TEMP_STORE", "MEMORY"),
+}
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+REUSE_CONNECTIONS = os.getenv("DB_REUSE_CONNECTIONS", "0").lower() in ("1", "true", "yes")
+
+_local = threading.local()
+
+
+def apply_pragma_profile(conn: sqlite3.Connection,
+                         profile: Optional[Dict[str, str]] = None) -> None:
+    """Apply the tuned pragma profile; empty values are skipped."""
+    for name, value in (PRAGMA_PROFILE if profile is None else profile).items():
+        if value in (None, ""):
+            continue
+        try:
+            conn.execute(f"PRAGMA {name}={value}")
+        except sqlite3.OperationalError as e:
+            # p.ej. journal_mode con otra conexión escribiendo: no es fatal
+            logger.debug(f"PRAGMA {name}={value} skipped: {e}")
+
+
+def _open_connection(path: str, timeout: float) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=timeout, cached_statements=STATEMENT_CACHE_SIZE)
+    apply_pragma_profile(conn)
+    return conn
+
+
+def _conn_key(path: str) -> str:
+    if path == ":memory:" or path.startswith("file:"):
+        return path
+    return os.path.realpath(path)
+
+
+def _thread_connections() -> Dict[str, sqlite3.Connection]:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    return conns
+
+
+def _thread_depths() -> Dict[str, int]:
+    """Checkouts abiertos por conexión reutilizada (anidados = helpers)."""
+    depths = getattr(_local, "depths", None)
+    if depths is None:
+        depths = _local.depths = {}
+    return depths
+
+
+def _reuse_active() -> bool:
+    return REUSE_CONNECTIONS or getattr(_local, "reuse_depth", 0) > 0
+
+
+def close_thread_connections() -> int:
+    """Close the connections cached for the current thread; returns how many."""
+    conns = _thread_connections()
+    closed = 0
+    while conns:
+        _, conn = conns.popitem()
+        try:
+            conn.close()
+            closed += 1
+        except sqlite3.Error as e:  # pragma: no cover - defensive
+            logger.debug(f"close failed: {e}")
+    return closed
+
+
+@contextmanager
+def reuse_connections() -> Iterator[None]:
+    """
+    Reuse one warm connection per database within this thread.
+
+    Nestable; the outermost block closes the thread's cached connections
+    (unless DB_REUSE_CONNECTIONS keeps them for the thread's lifetime).
+    """
+    _local.reuse_depth = getattr(_local, "reuse_depth", 0) + 1
+    try:
+        yield
+    finally:
+        _local.reuse_depth -= 1
+        if _local.reuse_depth == 0 and not REUSE_CONNECTIONS:
+            close_thread_connections()
+
+
 # ----------------------------------------------------------------------------
 # Database Connection Management
 # ----------------------------------------------------------------------------
@@ -25,7 +126,8 @@ logger = logging.getLogger(__name__)
 @contextmanager
 def get_db_connection(db_path: Optional[str] = None,
                       timeout: float = 30.0,
-                      row_factory: bool = True) -> Iterator[sqlite3.Connection]:
+                      row_factory: bool = True,
+                      reuse: Optional[bool] = None) -> Iterator[sqlite3.Connection]:
     """
     Context manager for database connections.
     
@@ -33,25 +135,53 @@ def get_db_connection(db_path: Optional[str] = None,
         db_path: Path to database file (default: config.DB_PATH)
         timeout: Connection timeout in seconds
         row_factory: Whether to use Row factory for dict-like access
+        reuse: Reuse this thread's warm connection (default: reuse mode active)
+    
+    Nested checkouts of a reused connection (e.g. `table_exists` inside an
+    open write) share it: only the outermost one rolls back uncommitted work.
     
     Yields:
         sqlite3.Connection: Database connection
     """
-    path = db_path or DB_PATH
+    path = str(db_path or DB_PATH)
+    if reuse is None:
+        reuse = _reuse_active()
     conn = None
+    key = _conn_key(path) if reuse else None
+    depths = _thread_depths()
+    outermost = True
+    prev_factory = None
     
     try:
-        conn = sqlite3.connect(path, timeout=timeout)
-        if row_factory:
-            conn.row_factory = sqlite3.Row
+        if reuse:
+            conns = _thread_connections()
+            conn = conns.get(key)
+            if conn is None:
+                conn = conns[key] = _open_connection(path, timeout)
+            outermost = depths.get(key, 0) == 0
+            depths[key] = depths.get(key, 0) + 1
+            prev_factory = conn.row_factory
+        else:
+            conn = _open_connection(path, timeout)
+        conn.row_factory = sqlite3.Row if row_factory else None
         yield conn
+        if reuse and outermost and conn.in_transaction:
+            # Igual que al cerrar: lo no confirmado no sobrevive al bloque
+            conn.rollback()
     except Exception as e:
-        if conn:
+        # Un checkout anidado no descarta el trabajo pendiente del externo
+        if conn and outermost:
             conn.rollback()
         logger.error(f"Database error: {e}")
         raise
     finally:
-        if conn:
+        if conn and reuse:
+            depths[key] -= 1
+            if not depths[key]:
+                del depths[key]
+            if not outermost:
+                conn.row_factory = prev_factory
+        elif conn:
             conn.close()
 
 
@@ -167,6 +297,33 @@ def get_table_count(table_name: str, db_path: Optional[str] = None) -> int:
     return result['count'] if result else 0
 
 
+def scan_tables(table_names: Optional[List[str]] = None,
+                db_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Row count and columns for each table, on one warm connection.
+    
+    Args:
+        table_names: Tables to scan (default: every user table)
+        db_path: Database path (optional)
+    """
+    with reuse_connections():
+        if table_names is None:
+            rows = execute_query(
+                "SELECT name FROM sqlite_master "
+                "WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name",
+                db_path=db_path,
+            ) or []
+            table_names = [r["name"] for r in rows]
+        return [
+            {
+                "table": name,
+                "count": get_table_count(name, db_path),
+                "columns": [c["name"] for c in get_table_info(name, db_path)],
+            }
+            for name in table_names
+        ]
+
+
 def vacuum_database(db_path: Optional[str] = None) -> None:
     """VACUUM the database to reclaim space."""
     try:
@@ -196,12 +353,13 @@ def create_table_if_not_exists(table_name: str,
     Returns:
         True if table was created, False if already existed
     """
-    if table_exists(table_name, db_path):
-        return False
-    
-    query = f"CREATE TABLE {table_name} {schema}"
-    execute_update(query, db_path=db_path)
-    return True
+    with reuse_connections():
+        if table_exists(table_name, db_path):
+            return False
+        
+        query = f"CREATE TABLE {table_name} {schema}"
+        execute_update(query, db_path=db_path)
+        return True
 
 
 def drop_table_if_exists(table_name: str, db_path: Optional[str] = None) -> bool:
@@ -211,12 +369,13 @@ def drop_table_if_exists(table_name: str, db_path: Optional[str] = None) -> bool
     Returns:
         True if table was dropped, False if didn't exist
     """
-    if not table_exists(table_name, db_path):
-        return False
-    
-    query = f"DROP TABLE {table_name}"
-    execute_update(query, db_path=db_path)
-    return True
+    with reuse_connections():
+        if not table_exists(table_name, db_path):
+            return False
+        
+        query = f"DROP TABLE {table_name}"
+        execute_update(query, db_path=db_path)
+        return True
 
 
 # ----------------------------------------------------------------------------
@@ -250,7 +409,7 @@ def check_database_health(db_path: Optional[str] = None) -> Dict[str, Any]:
         Dictionary with health check results
     """
     try:
-        with get_db_connection(db_path) as conn:
+        with reuse_connections(), get_db_connection(db_path) as conn:
             # Basic connectivity test
             conn.execute("SELECT 1")
             
@@ -265,10 +424,18 @@ def check_database_health(db_path: Optional[str] = None) -> Dict[str, Any]:
             except:
                 schema_version = None
             
+            # Effective connection profile
+            pragmas = {
+                name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in PRAGMA_PROFILE
+            }
+            
             return {
                 "status": "healthy",
                 "database_info": [dict(row) for row in db_info],
                 "schema_version": schema_version,
+                "pragmas": pragmas,
+                "statement_cache_size": STATEMENT_CACHE_SIZE,
                 "check_time": __import__("time").time()
             }
             
@@ -38,10 +38,25 @@ from __future__ import annotations
 import sqlite3
 import json
 import hashlib
-from typing import Any, Optional
+import importlib
+import re
+import sys
+import tempfile
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional
 import os
 from datetime import datetime, UTC
 from db_utils import db_conn  # shared connection manager
+from ep_totals import ensure_ep_totals, get_ep_totals, refresh_ep_totals
+from sov_positions import (
+    attach_ep,
+    detach_ep,
+    ensure_sov_positions,
+    find_cap_violation,
+    load_positions,
+    set_caps,
+)
 from dataclasses import dataclass
 from flask import Blueprint, jsonify, request
 
@@ -348,6 +363,27 @@ def _ensure_schema(con: sqlite3.Connection) -> None:
                 prev_hash = curr_hash
     except sqlite3.Error:  # pragma: no cover
         pass
+    # --- Staging por filas (carga por archivo en chunks + progreso)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ep_import_staging_rows (
+          staging_id INTEGER NOT NULL,
+          row_no INTEGER NOT NULL,
+          data_json TEXT NOT NULL,
+          PRIMARY KEY (staging_id, row_no)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute("PRAGMA table_info(ep_import_staging)")
+    staging_cols = {r[1] for r in cur.fetchall()}
+    for col, ddl in (
+        ("source_name", "TEXT"),
+        ("row_count", "INTEGER"),  # NULL => staging previo en payload_json
+        ("rows_validated", "INTEGER NOT NULL DEFAULT 0"),
+        ("rows_promoted", "INTEGER NOT NULL DEFAULT 0"),
+    ):
+        if col not in staging_cols:
+            cur.execute(f"ALTER TABLE ep_import_staging ADD COLUMN {col} {ddl}")
     cur.executescript(
         """
         -- Vistas
@@ -386,6 +422,8 @@ def _ensure_schema(con: sqlite3.Connection) -> None:
         GROUP BY a.project_id, bucket_month;
         """
     )
+    ensure_ep_totals(con)
+    ensure_sov_positions(con)
     con.commit()
 
 
@@ -394,22 +432,6 @@ def _ep_exists(con: sqlite3.Connection, ep_id: int) -> bool:
     return cur.fetchone() is not None
 
 
-def _lines_subtotal(con: sqlite3.Connection, ep_id: int) -> float:
-    row = con.execute(
-        "SELECT COALESCE(SUM(amount_period),0) FROM ep_lines WHERE ep_id=?",
-        (ep_id,),
-    ).fetchone()
-    return float(row[0] or 0)
-
-
-def _deductions_total(con: sqlite3.Connection, ep_id: int) -> float:
-    row = con.execute(
-        "SELECT COALESCE(SUM(amount),0) FROM ep_deductions WHERE ep_id=?",
-        (ep_id,),
-    ).fetchone()
-    return float(row[0] or 0)
-
-
 def _ep_summary(con: sqlite3.Connection, ep_id: int) -> dict:
     """Compute EP totals: lines subtotal, deductions by type, net.
 
@@ -423,19 +445,10 @@ def _ep_summary(con: sqlite3.Connection, ep_id: int) -> dict:
             "EP inexistente",
             extra={"ep_id": ep_id},
         )
-    subtotal = _lines_subtotal(con, ep_id)
-    # Group deductions by type
-    cur = con.execute(
-        (
-            "SELECT type, COALESCE(SUM(amount),0) FROM ep_deductions "
-            "WHERE ep_id=? GROUP BY type"
-        ),
-        (ep_id,),
-    )
-    ded_by_type: dict[str, float] = {
-        str(t or "other"): float(v or 0) for t, v in cur.fetchall()
-    }
-    total_ded = sum(ded_by_type.values())
+    totals = get_ep_totals(con, ep_id)
+    subtotal = totals["lines_subtotal"]
+    ded_by_type: dict[str, float] = totals["deductions"]
+    total_ded = totals["deductions_total"]
 
     # If retention is not explicitly present, compute suggestion from header
     retention_pct = float(h["retention_pct"] or 0)
@@ -446,12 +459,8 @@ def _ep_summary(con: sqlite3.Connection, ep_id: int) -> dict:
     net = max(round(subtotal - total_ded, 2), 0.0)
 
     # Retención ledger (held vs released)
-    ret_rows = con.execute(
-        "SELECT amount, released_at FROM ep_retention_ledger WHERE ep_id=?",
-        (ep_id,),
-    ).fetchall()
-    retention_held = sum(float(r[0] or 0) for r in ret_rows if not r[1])
-    retention_released = sum(float(r[0] or 0) for r in ret_rows if r[1])
+    retention_held = totals["retention_held"]
+    retention_released = totals["retention_released"]
     return {
         "ep": dict(h),
         "lines_subtotal": round(subtotal, 2),
@@ -494,17 +503,18 @@ def list_ep(pid: int):
         rows = con.execute(
             """
             SELECT h.*,
-                   (
+                   COALESCE(t.lines_subtotal, (
                      SELECT COALESCE(SUM(l.amount_period),0)
                      FROM ep_lines l
                      WHERE l.ep_id = h.id
-                   ) AS amount_period,
-                   (
+                   )) AS amount_period,
+                   COALESCE(t.deductions_total, (
                      SELECT COALESCE(SUM(d.amount),0)
                      FROM ep_deductions d
                      WHERE d.ep_id = h.id
-                   ) AS deductions
+                   )) AS deductions
             FROM ep_headers h
+            LEFT JOIN ep_totals t ON t.ep_id = h.id
             WHERE h.project_id = ?
             ORDER BY COALESCE(h.approved_at, h.submitted_at) DESC
             """,
@@ -564,6 +574,7 @@ def create_ep_header():
             ),
         )
         ep_id = cur.lastrowid
+        refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify({"ok": True, "ep_id": ep_id}), 201
 
@@ -636,7 +647,12 @@ def update_ep_header(ep_id: int):
             return jsonify({"ok": True, "updated": 0})
         params.append(ep_id)
         sql = "UPDATE ep_headers SET " + ", ".join(sets) + " WHERE id=?"
+        moves_sov = "status" in data or "contract_id" in data
+        if moves_sov:
+            detach_ep(con, ep_id)
         con.execute(sql, params)
+        if moves_sov:
+            attach_ep(con, ep_id)
         con.commit()
         return jsonify({"ok": True, "updated": len(sets)})
 
@@ -673,33 +689,11 @@ def set_ep_lines(ep_id: int):
             (ep_id,),
         ).fetchone()
         contract_id = row[0] if row else None
-        sov_caps: dict[str, float] = {}
-        prev_approved: dict[str, float] = {}
-        if contract_id:
-            sov_caps = {
-                r[0]: float(r[1] or 0)
-                for r in cur.execute(
-                    (
-                        "SELECT item_code, COALESCE(line_total,0) "
-                        "FROM client_sov_items WHERE contract_id=?"
-                    ),
-                    (contract_id,),
-                ).fetchall()
-            }
-            prev_approved = {
-                r[0]: float(r[1] or 0)
-                for r in cur.execute(
-                    (
-                        "SELECT l.item_code, COALESCE(SUM(l.amount_period),0) "
-                        "FROM ep_lines l JOIN ep_headers h ON h.id=l.ep_id "
-                        "WHERE h.contract_id=? AND h.status IN("
-                        "'approved','invoiced','paid') GROUP BY l.item_code"
-                    ),
-                    (contract_id,),
-                ).fetchall()
-            }
+        positions = load_positions(con, contract_id) if contract_id else {}
         # Replace lines
+        detach_ep(con, ep_id)
         cur.execute("DELETE FROM ep_lines WHERE ep_id=?", (ep_id,))
+        rows = []
         for ln in lines:
             amt = ln.get("amount_period")
             if (
@@ -711,32 +705,11 @@ def set_ep_lines(ep_id: int):
                     amt = float(ln["qty_period"]) * float(ln["unit_price"])
                 except (TypeError, ValueError):
                     amt = None
-            code = ln.get("item_code")
-            if contract_id and code and code in sov_caps:
-                cap = float(sov_caps.get(code) or 0)
-                prev_amt = float(prev_approved.get(code, 0))
-                if (prev_amt + float(amt or 0)) > (cap + 1e-6):
-                    raise Unprocessable(
-                        "ep_exceeds_contract_item",
-                        f"Item {code} excede SOV",
-                        extra={
-                            "item_code": code,
-                            "cap": cap,
-                            "prev": prev_amt,
-                            "attempt": float(amt or 0),
-                        },
-                    )
-            cur.execute(
-                (
-                    "INSERT INTO ep_lines("
-                    "ep_id, sov_item_id, item_code, description, unit, "
-                    "qty_period, unit_price, amount_period, qty_cum, "
-                    "amount_cum, chapter) VALUES(?,?,?,?,?,?,?,?,?,?,?)"
-                ),
+            rows.append(
                 (
                     ep_id,
                     ln.get("sov_item_id"),
-                    code,
+                    ln.get("item_code"),
                     ln.get("description"),
                     ln.get("unit"),
                     ln.get("qty_period"),
@@ -745,8 +718,32 @@ def set_ep_lines(ep_id: int):
                     ln.get("qty_cum"),
                     ln.get("amount_cum"),
                     ln.get("chapter"),
-                ),
+                )
             )
+        violation = find_cap_violation(positions, ((r[2], r[7]) for r in rows))
+        if violation:
+            code, cap, prev_amt, amt = violation
+            raise Unprocessable(
+                "ep_exceeds_contract_item",
+                f"Item {code} excede SOV",
+                extra={
+                    "item_code": code,
+                    "cap": cap,
+                    "prev": prev_amt,
+                    "attempt": float(amt or 0),
+                },
+            )
+        cur.executemany(
+            (
+                "INSERT INTO ep_lines("
+                "ep_id, sov_item_id, item_code, description, unit, "
+                "qty_period, unit_price, amount_period, qty_cum, "
+                "amount_cum, chapter) VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+            ),
+            rows,
+        )
+        attach_ep(con, ep_id)
+        refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify({"ok": True, "count": len(lines)})
 
@@ -785,6 +782,7 @@ def set_ep_deductions(ep_id: int):
                     d.get("amount"),
                 ),
             )
+        refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify({"ok": True, "count": len(deductions)})
 
@@ -904,6 +902,7 @@ def sov_import(cid: int):
                 extra={"contract_id": cid},
             )
         inserted = 0
+        caps = []
         for ln in items:
             code = ln.get("item_code")
             if not code:
@@ -936,8 +935,10 @@ def sov_import(cid: int):
                     ),
                 )
                 inserted += 1
+                caps.append((code, total))
             except sqlite3.Error:
                 continue
+        set_caps(con, cid, caps)
         con.commit()
         return jsonify({"ok": True, "inserted": inserted})
 
@@ -1033,35 +1034,7 @@ def import_ep():
         )
         ep_id = cur.lastrowid
 
-        # Validación contra contrato/SOV si existe
-        if header.get("contract_id"):
-            sov = {
-                r["item_code"]: r
-                for r in con.execute(
-                    (
-                        "SELECT i.item_code, i.line_total "
-                        "FROM client_sov_items i WHERE i.contract_id=?"
-                    ),
-                    (header["contract_id"],),
-                )
-            }
-            prev = {
-                r["item_code"]: r["amount_cum"]
-                for r in con.execute(
-                    (
-                        "SELECT l.item_code, "
-                        "COALESCE(SUM(l.amount_period),0) AS amount_cum "
-                        "FROM ep_lines l JOIN ep_headers h ON h.id=l.ep_id "
-                        "WHERE h.contract_id=? "
-                        "AND h.status IN('approved','invoiced','paid') "
-                        "GROUP BY l.item_code"
-                    ),
-                    (header["contract_id"],),
-                )
-            }
-        else:
-            sov, prev = {}, {}
-
+        rows = []
         for ln in lines:
             amt = ln.get("amount_period")
             if (
@@ -1070,35 +1043,11 @@ def import_ep():
                 and ln.get("unit_price") is not None
             ):
                 amt = float(ln["qty_period"]) * float(ln["unit_price"])
-
-            code = ln.get("item_code")
-            if code in sov:
-                cap = float(sov[code]["line_total"])
-                prev_amt = float(prev.get(code, 0))
-                if prev_amt + float(amt or 0) > cap + 1e-6:
-                    raise Unprocessable(
-                        "ep_exceeds_contract_item",
-                        f"Item {code} excede SOV",
-                        extra={
-                            "item_code": code,
-                            "cap": cap,
-                            "prev": prev_amt,
-                            "attempt": amt,
-                        },
-                    )
-
-            cur.execute(
-                """
-                INSERT INTO ep_lines(
-                    ep_id, sov_item_id, item_code, description, unit,
-                    qty_period, unit_price, amount_period, qty_cum,
-                    amount_cum, chapter
-                ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
-                """,
+            rows.append(
                 (
                     ep_id,
                     ln.get("sov_item_id"),
-                    code,
+                    ln.get("item_code"),
                     ln.get("description"),
                     ln.get("unit"),
                     ln.get("qty_period"),
@@ -1107,9 +1056,40 @@ def import_ep():
                     ln.get("qty_cum"),
                     ln.get("amount_cum"),
                     ln.get("chapter"),
-                ),
+                )
             )
 
+        # Validación contra contrato/SOV si existe (una lectura por contrato)
+        if header.get("contract_id"):
+            violation = find_cap_violation(
+                load_positions(con, header["contract_id"]),
+                ((r[2], r[7]) for r in rows),
+            )
+            if violation:
+                code, cap, prev_amt, amt = violation
+                raise Unprocessable(
+                    "ep_exceeds_contract_item",
+                    f"Item {code} excede SOV",
+                    extra={
+                        "item_code": code,
+                        "cap": cap,
+                        "prev": prev_amt,
+                        "attempt": amt,
+                    },
+                )
+
+        cur.executemany(
+            """
+            INSERT INTO ep_lines(
+                ep_id, sov_item_id, item_code, description, unit,
+                qty_period, unit_price, amount_period, qty_cum,
+                amount_cum, chapter
+            ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
+            """,
+            rows,
+        )
+        attach_ep(con, ep_id)
+
         for d in deductions:
             cur.execute(
                 (
@@ -1120,6 +1100,7 @@ def import_ep():
                 (ep_id, d.get("type"), d.get("description"), d.get("amount")),
             )
 
+        refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify({"ok": True, "ep_id": ep_id})
 
@@ -1128,87 +1109,315 @@ def import_ep():
 # EP Import Staging Flow
 # ------------------------------
 
-@ep_bp.post("/api/ep/import/staging")
-def ep_import_staging_create():
-    """Crea un registro de staging con los datos crudos de una planilla.
-
-    Body JSON:
-      project_id (req), contract_id?, rows: [ { ... columnas.xls ... }, ... ],
-      column_map?: { logical_field: source_header },
-      infer?: bool (default True) → intenta detectar qty/unit_price/amount.
-
-    Retorna staging_id y un suggestion de mapping si no se entregó.
+STAGING_CHUNK_ROWS = 1000
+STAGING_SAMPLE_ROWS = 200
+_NUMERIC_FIELDS = ("qty_period", "unit_price", "amount_period")
+_NUMERIC_RE = re.compile(r"^\(?-?\s*\$?\s*[\d.,\s]*\d[\d.,\s]*\)?-?$")
+
+
+def _header_candidates(key: str) -> list[str]:
+    """Campos lógicos que sugiere una cabecera (heurística por substrings)."""
+    kl = str(key).strip().lower()
+    fields = []
+    if "codigo" in kl or kl in ("item", "code"):
+        fields.append("item_code")
+    if kl.startswith("desc") or "descripcion" in kl:
+        fields.append("description")
+    if kl in ("unidad", "unit"):
+        fields.append("unit")
+    if kl.startswith("cant") or kl.startswith("qty"):
+        fields.append("qty_period")
+    if "precio" in kl or "unit_price" in kl or kl == "precio unitario":
+        fields.append("unit_price")
+    if "monto" in kl or kl == "amount" or kl == "total":
+        fields.append("amount_period")
+    if "capitulo" in kl or kl == "chapter":
+        fields.append("chapter")
+    return fields
+
+
+def _looks_numeric(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    return bool(_NUMERIC_RE.match(str(value).strip()))
+
+
+def _infer_column_map(sample: list[dict[str, Any]]) -> dict[str, str]:
+    """Sugiere mapping lógico -> cabecera usando una muestra de filas.
+
+    Cabeceras por heurística; para campos numéricos se descarta una columna
+    cuyos valores no vacíos de la muestra no son mayormente numéricos.
     """
-    data = request.get_json(force=True) or {}
-    project_id = data.get("project_id")
-    rows = data.get("rows") or []
-    if not project_id or not isinstance(rows, list) or not rows:
-        raise Unprocessable("invalid_payload", "project_id y rows requeridos")
-    column_map = data.get("column_map") or {}
-    infer = bool(data.get("infer", True))
-    # Heurística simple: buscar cabeceras por lower substrings
-    
-    def _infer_map(first_row: dict[str, Any]) -> dict[str, str]:
-        mapping: dict[str, str] = {}
-        for k in first_row.keys():
-            kl = str(k).strip().lower()
-            if "codigo" in kl or kl in ("item", "code"):
-                mapping.setdefault("item_code", k)
-            if kl.startswith("desc") or "descripcion" in kl:
-                mapping.setdefault("description", k)
-            if kl in ("unidad", "unit"):
-                mapping.setdefault("unit", k)
-            if kl.startswith("cant") or kl.startswith("qty"):
-                mapping.setdefault("qty_period", k)
-            if "precio" in kl or "unit_price" in kl or kl == "precio unitario":
-                mapping.setdefault("unit_price", k)
-            if "monto" in kl or kl == "amount" or kl == "total":
-                mapping.setdefault("amount_period", k)
-            if "capitulo" in kl or kl == "chapter":
-                mapping.setdefault("chapter", k)
-        return mapping
+    keys: dict[str, None] = {}
+    for src in sample:
+        for k in src.keys():
+            keys.setdefault(k, None)
+    mapping: dict[str, str] = {}
+    for k in keys:
+        for field in _header_candidates(k):
+            if field in mapping:
+                continue
+            if field in _NUMERIC_FIELDS:
+                values = [src.get(k) for src in sample if src.get(k) not in (None, "")]
+                if values and sum(map(_looks_numeric, values)) * 2 < len(values):
+                    continue
+            mapping[field] = k
+    return mapping
+
+
+def _tools_import(module: str):
+    """Importa un módulo de tools/ (import diferido, como server.py)."""
+    tools_dir = str(Path(__file__).resolve().parents[1] / "tools")
+    if tools_dir not in sys.path:
+        sys.path.append(tools_dir)
+    return importlib.import_module(module)
+
+
+def _stage_rows(
+    cur: sqlite3.Cursor,
+    staging_id: int,
+    rows: Iterable[dict[str, Any]],
+    numeric_cols: Iterable[str] = (),
+    parse: Optional[Callable[[str], Any]] = None,
+) -> int:
+    """Escribe filas crudas en `ep_import_staging_rows` por chunks.
+
+    `numeric_cols` (columnas origen) se normalizan con `parse`; vacío queda
+    como None.
+    """
+    numeric = list(numeric_cols) if parse else []
+    n = 0
+    batch: list[tuple[int, int, str]] = []
+    for src in rows:
+        if numeric:
+            src = dict(src)
+            for c in numeric:
+                v = src.get(c)
+                if isinstance(v, str):
+                    src[c] = parse(v) if v.strip() else None
+        batch.append((staging_id, n, json.dumps(src, ensure_ascii=False)))
+        n += 1
+        if len(batch) >= STAGING_CHUNK_ROWS:
+            cur.executemany("INSERT INTO ep_import_staging_rows(staging_id, row_no, data_json) VALUES(?,?,?)", batch)
+            batch = []
+    if batch:
+        cur.executemany("INSERT INTO ep_import_staging_rows(staging_id, row_no, data_json) VALUES(?,?,?)", batch)
+    return n
+
+
+def _staging_chunks(con: sqlite3.Connection, staging: sqlite3.Row) -> Iterator[list[dict[str, Any]]]:
+    """Filas de un staging en chunks (keyset por row_no).
+
+    Stagings creados antes de la tabla por filas (row_count NULL) se leen
+    desde `payload_json`.
+    """
+    if staging["row_count"] is None:
+        payload = json.loads(staging["payload_json"] or "[]")
+        for i in range(0, len(payload), STAGING_CHUNK_ROWS):
+            yield payload[i:i + STAGING_CHUNK_ROWS]
+        return
+    last = -1
+    while True:
+        rows = con.execute(
+            "SELECT row_no, data_json FROM ep_import_staging_rows "
+            "WHERE staging_id=? AND row_no>? ORDER BY row_no LIMIT ?",
+            (staging["id"], last, STAGING_CHUNK_ROWS),
+        ).fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [json.loads(r[1]) for r in rows]
+
+
+def _map_staging_row(src: dict[str, Any], cmap: dict[str, str]) -> dict[str, Any]:
+    item = {logical: src.get(src_key) for logical, src_key in cmap.items()}
+    # try compute amount if missing
+    if (
+        item.get("amount_period") in (None, "")
+        and item.get("qty_period") not in (None, "")
+        and item.get("unit_price") not in (None, "")
+    ):
+        try:
+            item["amount_period"] = (
+                float(item["qty_period"]) * float(item["unit_price"])
+            )
+        except (ValueError, TypeError):
+            pass
+    return item
+
+
+def _create_staging(
+    project_id: Any,
+    contract_id: Any,
+    rows: Iterable[dict[str, Any]],
+    column_map: dict[str, str],
+    infer: bool,
+    *,
+    source_name: Optional[str] = None,
+    coerce_numbers: bool = False,
+):
+    """Infiere mapping sobre una muestra y persiste las filas en chunks."""
+    rows = iter(rows)
+    sample = list(islice(rows, STAGING_SAMPLE_ROWS))
+    if not sample:
+        raise Unprocessable("invalid_payload", "planilla sin filas")
     inferred_map = {}
-    if infer and rows:
+    if infer:
         try:
-            inferred_map = _infer_map(rows[0])
+            inferred_map = _infer_column_map(sample)
         except (KeyError, ValueError, TypeError):
             inferred_map = {}
     # Merge precedence: explicit column_map overrides inferred
     final_map = {**inferred_map, **column_map}
-    # usar json global ya importado
+    numeric_cols = [final_map[f] for f in _NUMERIC_FIELDS if f in final_map]
+    parse = _tools_import("etl_common").parse_number if coerce_numbers else None
     with db_conn(_db_path()) as con:
         _ensure_schema(con)
         cur = con.cursor()
         cur.execute(
             """
             INSERT INTO ep_import_staging(
-              project_id, contract_id, payload_json, column_map_json,
-              inferred_fields_json, status
-            ) VALUES(?,?,?,?,?, 'draft')
+              project_id, contract_id, column_map_json,
+              inferred_fields_json, status, source_name
+            ) VALUES(?,?,?,?, 'draft', ?)
             """,
             (
                 int(project_id),
-                data.get("contract_id"),
-                json.dumps(rows, ensure_ascii=False),
+                contract_id,
                 json.dumps(final_map, ensure_ascii=False),
                 json.dumps({"inferred": inferred_map}, ensure_ascii=False),
+                source_name,
             ),
         )
         sid = cur.lastrowid
+        count = _stage_rows(cur, sid, chain(sample, rows), numeric_cols, parse)
+        cur.execute(
+            "UPDATE ep_import_staging SET row_count=? WHERE id=?",
+            (count, sid),
+        )
         con.commit()
         return jsonify({
             "ok": True,
             "staging_id": sid,
             "column_map": final_map,
             "inferred": inferred_map,
+            "row_count": count,
         }), 201
 
 
+@ep_bp.post("/api/ep/import/staging")
+def ep_import_staging_create():
+    """Crea un registro de staging con los datos crudos de una planilla.
+
+    Body JSON:
+      project_id (req), contract_id?, rows: [ { ... columnas.xls ... }, ... ],
+      column_map?: { logical_field: source_header },
+      infer?: bool (default True) → intenta detectar qty/unit_price/amount.
+
+    Retorna staging_id y un suggestion de mapping si no se entregó. Para
+    planillas grandes usar `/api/ep/import/staging/upload`.
+    """
+    data = request.get_json(force=True) or {}
+    project_id = data.get("project_id")
+    rows = data.get("rows") or []
+    if not project_id or not isinstance(rows, list) or not rows:
+        raise Unprocessable("invalid_payload", "project_id y rows requeridos")
+    return _create_staging(
+        project_id,
+        data.get("contract_id"),
+        rows,
+        data.get("column_map") or {},
+        bool(data.get("infer", True)),
+    )
+
+
+@ep_bp.post("/api/ep/import/staging/upload")
+def ep_import_staging_upload():
+    """Staging desde archivo CSV/XLSX (multipart), leído en streaming.
+
+    Form: file (req), project_id (req), contract_id?, column_map? (JSON),
+    infer? (default true), sheet? (nombre o índice XLSX).
+    El mapping se infiere sobre las primeras STAGING_SAMPLE_ROWS filas y las
+    columnas numéricas mapeadas se normalizan (formato CLP "1.234,5").
+    """
+    upload = request.files.get("file")
+    project_id = request.form.get("project_id")
+    if upload is None or not upload.filename or not project_id:
+        raise Unprocessable("invalid_payload", "file y project_id requeridos")
+    ext = os.path.splitext(upload.filename)[1].lower()
+    if ext not in (".csv", ".xlsx", ".xlsm"):
+        raise Unprocessable(
+            "invalid_payload",
+            f"Formato no soportado: {ext}. Usa CSV o XLSX.",
+        )
+    try:
+        column_map = json.loads(request.form.get("column_map") or "{}")
+    except ValueError:
+        raise Unprocessable("invalid_payload", "column_map debe ser JSON")
+    sheet: Any = request.form.get("sheet") or None
+    if sheet is not None and str(sheet).isdigit():
+        sheet = int(sheet)
+    infer = str(request.form.get("infer", "true")).lower() not in ("0", "false", "no")
+
+    fd, tmp_path = tempfile.mkstemp(suffix=ext)
+    os.close(fd)
+    try:
+        upload.save(tmp_path)
+        try:
+            rows = _tools_import("io_utils").iter_rows(tmp_path, sheet=sheet)
+            return _create_staging(
+                project_id,
+                request.form.get("contract_id") or None,
+                rows,
+                column_map,
+                infer,
+                source_name=upload.filename,
+                coerce_numbers=True,
+            )
+        except Unprocessable:
+            raise
+        except (ValueError, KeyError, IndexError, RuntimeError) as e:
+            raise Unprocessable("invalid_payload", f"No se pudo leer archivo: {e}")
+    finally:
+        os.unlink(tmp_path)
+
+
+@ep_bp.get("/api/ep/import/staging/<int:staging_id>")
+def ep_import_staging_get(staging_id: int):
+    """Estado y progreso de un staging (filas validadas / promovidas)."""
+    with db_conn(_db_path()) as con:
+        _ensure_schema(con)
+        row = con.execute(
+            "SELECT * FROM ep_import_staging WHERE id=?",
+            (staging_id,),
+        ).fetchone()
+        if not row:
+            raise Unprocessable("not_found", "staging inexistente")
+        row_count = row["row_count"]
+        if row_count is None:
+            row_count = len(json.loads(row["payload_json"] or "[]"))
+        errors = json.loads(row["errors_json"] or "[]")
+        return jsonify({
+            "staging_id": staging_id,
+            "status": row["status"],
+            "source_name": row["source_name"],
+            "column_map": json.loads(row["column_map_json"] or "{}"),
+            "row_count": row_count,
+            "rows_validated": row["rows_validated"],
+            "rows_promoted": row["rows_promoted"],
+            "violations": len(errors),
+            "promoted_ep_id": row["promoted_ep_id"],
+        })
+
+
 @ep_bp.post("/api/ep/import/staging/<int:staging_id>/validate")
 def ep_import_staging_validate(staging_id: int):
     """Valida un staging usando el mapping guardado. Calcula montos y
     simula restricciones de contrato (si contract_id presente).
 
+    Recorre las filas por chunks y publica `rows_validated` tras cada uno.
     Devuelve totales y lista de potenciales violaciones por item.
     """
     # usar json global
@@ -1221,65 +1430,24 @@ def ep_import_staging_validate(staging_id: int):
         ).fetchone()
         if not row:
             raise Unprocessable("not_found", "staging inexistente")
-        payload = json.loads(row["payload_json"] or "[]")
         cmap = json.loads(row["column_map_json"] or "{}")
         contract_id = row["contract_id"]
         violations: list[dict] = []
-        sov_caps: dict[str, float] = {}
-        prev_approved: dict[str, float] = {}
-        if contract_id:
-            sov_caps = {
-                r[0]: float(r[1] or 0)
-                for r in cur.execute(
-                    "SELECT item_code, COALESCE(line_total,0) "
-                    "FROM client_sov_items WHERE contract_id=?",
-                    (contract_id,),
-                ).fetchall()
-            }
-            prev_approved = {
-                r[0]: float(r[1] or 0)
-                for r in cur.execute(
-                    """
-                                  SELECT l.item_code,
-                                      COALESCE(SUM(l.amount_period),0)
-                                  FROM ep_lines l
-                                  JOIN ep_headers h ON h.id=l.ep_id
-                                        WHERE h.contract_id=? AND h.status IN (
-                                            'approved','invoiced','paid'
-                                        )
-                    GROUP BY l.item_code
-                    """,
-                    (contract_id,),
-                ).fetchall()
-            }
+        positions = load_positions(con, contract_id) if contract_id else {}
         total = 0.0
+        processed = 0
         normalized: list[dict] = []
-        for src in payload:
-            item = {}
-            for logical, src_key in cmap.items():
-                item[logical] = src.get(src_key)
-            # try compute amount if missing
-            if (
-                item.get("amount_period") in (None, "")
-                and item.get("qty_period") not in (None, "")
-                and item.get("unit_price") not in (None, "")
-            ):
+        for chunk in _staging_chunks(con, row):
+            for src in chunk:
+                item = _map_staging_row(src, cmap)
                 try:
-                    item["amount_period"] = (
-                        float(item["qty_period"]) * float(item["unit_price"])
-                    )
+                    amt = float(item.get("amount_period") or 0)
                 except (ValueError, TypeError):
-                    pass
-            try:
-                amt = float(item.get("amount_period") or 0)
-            except (ValueError, TypeError):
-                amt = 0.0
-            total += amt
-            code = item.get("item_code")
-            if code and code in sov_caps:
-                cap = sov_caps[code]
-                prev_amt = prev_approved.get(code, 0.0)
-                if prev_amt + amt > cap + 1e-6:
+                    amt = 0.0
+                total += amt
+                hit = find_cap_violation(positions, [(item.get("item_code"), amt)])
+                if hit:
+                    code, cap, prev_amt, _ = hit
                     violations.append({
                         "error": "ep_exceeds_contract_item",
                         "item_code": code,
@@ -1287,7 +1455,14 @@ def ep_import_staging_validate(staging_id: int):
                         "prev": prev_amt,
                         "attempt": amt,
                     })
-            normalized.append(item)
+                if len(normalized) < 10:
+                    normalized.append(item)
+            processed += len(chunk)
+            cur.execute(
+                "UPDATE ep_import_staging SET rows_validated=? WHERE id=?",
+                (processed, staging_id),
+            )
+            con.commit()
         status = "validated"
         cur.execute(
             "UPDATE ep_import_staging SET status=?, "
@@ -1299,8 +1474,9 @@ def ep_import_staging_validate(staging_id: int):
             "ok": True,
             "staging_id": staging_id,
             "total_amount": round(total, 2),
+            "rows": processed,
             "violations": violations,
-            "sample": normalized[:10],
+            "sample": normalized,
         })
 
 
@@ -1308,6 +1484,7 @@ def ep_import_staging_validate(staging_id: int):
 def ep_import_staging_promote(staging_id: int):
     """Promueve un staging validado creando un EP real (similar a import_ep).
     Reutiliza mapping y respeta violaciones; si hay violaciones severas -> 422.
+    Las líneas se insertan por chunks en una sola transacción.
     """
     # usar json global
     body = request.get_json(silent=True) or {}
@@ -1340,7 +1517,6 @@ def ep_import_staging_promote(staging_id: int):
                 "Resolver violaciones antes de promover",
                 extra={"violations": violations},
             )
-        payload = json.loads(row["payload_json"] or "[]")
         cmap = json.loads(row["column_map_json"] or "{}")
         project_id = row["project_id"]
         contract_id = row["contract_id"]
@@ -1364,22 +1540,27 @@ def ep_import_staging_promote(staging_id: int):
         )
         ep_id = cur.lastrowid
         # Insert lines usando mapping
-        for src in payload:
-            ln = {}
-            for logical, src_key in cmap.items():
-                ln[logical] = src.get(src_key)
-            if (
-                ln.get("amount_period") in (None, "")
-                and ln.get("qty_period") not in (None, "")
-                and ln.get("unit_price") not in (None, "")
-            ):
-                try:
-                    ln["amount_period"] = (
-                        float(ln["qty_period"]) * float(ln["unit_price"])
+        promoted = 0
+        for chunk in _staging_chunks(con, row):
+            rows = []
+            for src in chunk:
+                ln = _map_staging_row(src, cmap)
+                rows.append(
+                    (
+                        ep_id,
+                        ln.get("sov_item_id"),
+                        ln.get("item_code"),
+                        ln.get("description"),
+                        ln.get("unit"),
+                        ln.get("qty_period"),
+                        ln.get("unit_price"),
+                        ln.get("amount_period"),
+                        ln.get("qty_cum"),
+                        ln.get("amount_cum"),
+                        ln.get("chapter"),
                     )
-                except (ValueError, TypeError):
-                    pass
-            cur.execute(
+                )
+            cur.executemany(
                 """
                 INSERT INTO ep_lines(
                   ep_id, sov_item_id, item_code, description, unit,
@@ -1387,27 +1568,23 @@ def ep_import_staging_promote(staging_id: int):
                   amount_cum, chapter
                 ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
                 """,
-                (
-                    ep_id,
-                    ln.get("sov_item_id"),
-                    ln.get("item_code"),
-                    ln.get("description"),
-                    ln.get("unit"),
-                    ln.get("qty_period"),
-                    ln.get("unit_price"),
-                    ln.get("amount_period"),
-                    ln.get("qty_cum"),
-                    ln.get("amount_cum"),
-                    ln.get("chapter"),
-                ),
+                rows,
             )
+            promoted += len(rows)
+        attach_ep(con, ep_id)
         cur.execute(
             "UPDATE ep_import_staging SET status='promoted', "
-            "promoted_ep_id=? WHERE id=?",
-            (ep_id, staging_id),
+            "promoted_ep_id=?, rows_promoted=? WHERE id=?",
+            (ep_id, promoted, staging_id),
         )
+        refresh_ep_totals(con, ep_id)
         con.commit()
-        return jsonify({"ok": True, "ep_id": ep_id, "staging_id": staging_id})
+        return jsonify({
+            "ok": True,
+            "ep_id": ep_id,
+            "staging_id": staging_id,
+            "lines": promoted,
+        })
 
 
 @ep_bp.post("/api/ep/<int:ep_id>/approve")
@@ -1429,6 +1606,7 @@ def approve_ep(ep_id: int):
                 "invalid_state",
                 f"No se puede aprobar desde {row['status']}",
             )
+        detach_ep(con, ep_id)
         cur.execute(
             (
                 "UPDATE ep_headers SET status='approved', "
@@ -1436,6 +1614,7 @@ def approve_ep(ep_id: int):
             ),
             (ep_id,),
         )
+        attach_ep(con, ep_id)
         con.commit()
         return jsonify({"ok": True, "ep_id": ep_id, "status": "approved"})
 
@@ -1480,21 +1659,8 @@ def ep_to_invoice(ep_id: int):
                 extra={"invoice_id": dup[0], "ep_id": ep_id},
             )
 
-        sums = cur.execute(
-            (
-                "SELECT COALESCE(SUM(l.amount_period),0) AS amt "
-                "FROM ep_lines l WHERE l.ep_id=?"
-            ),
-            (ep_id,),
-        ).fetchone()
-        ded = cur.execute(
-            (
-                "SELECT COALESCE(SUM(d.amount),0) AS ded "
-                "FROM ep_deductions d WHERE d.ep_id=?"
-            ),
-            (ep_id,),
-        ).fetchone()
-        net = float(sums["amt"] or 0) - float(ded["ded"] or 0)
+        totals = get_ep_totals(con, ep_id)
+        net = totals["lines_subtotal"] - totals["deductions_total"]
         if net < 0:
             net = 0.0
         if net == 0.0:
@@ -1550,6 +1716,7 @@ def ep_to_invoice(ep_id: int):
                 ),
                 (sn_row[0],),
             )
+        # approved/paid -> invoiced: mismo bucket en contract_sov_positions
         cur.execute(
             "UPDATE ep_headers SET status='invoiced' WHERE id=?",
             (ep_id,),
@@ -1557,22 +1724,11 @@ def ep_to_invoice(ep_id: int):
     # Registrar retención en ledger (si existe deducción retention
     # o cálculo sugerido)
         # 1. Buscar deducción explícita
-        ret_row = cur.execute(
-            "SELECT COALESCE(SUM(amount),0) FROM ep_deductions "
-            "WHERE ep_id=? AND type='retention'",
-            (ep_id,),
-        ).fetchone()
-        explicit_ret = float(ret_row[0] or 0)
+        explicit_ret = totals["retention_deduction"]
         retention_amount = explicit_ret
         if retention_amount <= 0:
             # Calcular sugerida si header.retention_pct
-            # Necesitamos subtotal líneas
-            lines_sum = cur.execute(
-                "SELECT COALESCE(SUM(amount_period),0) FROM ep_lines "
-                "WHERE ep_id=?",
-                (ep_id,),
-            ).fetchone()
-            lines_subtotal = float(lines_sum[0] or 0)
+            lines_subtotal = totals["lines_subtotal"]
             rpct = float(h["retention_pct"] or 0)
             if rpct > 0:
                 retention_amount = round(lines_subtotal * rpct, 2)
@@ -1589,6 +1745,7 @@ def ep_to_invoice(ep_id: int):
                     "VALUES(?,?,?)",
                     (ep_id, retention_amount, "auto ledger on invoice"),
                 )
+                refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify(
             {
@@ -1647,19 +1804,9 @@ def ep_generate_sales_note(ep_id: int):
                 extra={"sales_note_id": dup[0], "ep_id": ep_id},
             )
         # Calcular montos desde líneas/deducciones
-        lines_sum = cur.execute(
-            (
-                "SELECT COALESCE(SUM(amount_period),0) "
-                "FROM ep_lines WHERE ep_id=?"
-            ),
-            (ep_id,),
-        ).fetchone()
-        subtotal = float(lines_sum[0] or 0)
-        ded_sum = cur.execute(
-            "SELECT COALESCE(SUM(amount),0) FROM ep_deductions WHERE ep_id=?",
-            (ep_id,),
-        ).fetchone()
-        deductions_total = float(ded_sum[0] or 0)
+        totals = get_ep_totals(con, ep_id)
+        subtotal = totals["lines_subtotal"]
+        deductions_total = totals["deductions_total"]
         net = max(subtotal - deductions_total, 0.0)
         if net <= 0:
             raise Unprocessable(
@@ -1671,14 +1818,7 @@ def ep_generate_sales_note(ep_id: int):
         total = round(net + tax, 2)
         # Retención snapshot (deducción explícita o computada)
         retention_snapshot = 0.0
-        ret_row = cur.execute(
-            (
-                "SELECT COALESCE(SUM(amount),0) FROM ep_deductions "
-                "WHERE ep_id=? AND type='retention'"
-            ),
-            (ep_id,),
-        ).fetchone()
-        explicit_ret = float(ret_row[0] or 0)
+        explicit_ret = totals["retention_deduction"]
         if explicit_ret > 0:
             retention_snapshot = explicit_ret
         else:
@@ -1848,19 +1988,29 @@ def _append_sales_note_audit(cur: sqlite3.Cursor, sales_note_id: int, action: st
 
 
 def _next_sales_note_number(cur: sqlite3.Cursor) -> str:
-    """Devuelve siguiente correlativo formato NNN-YYYY (NNN zero padded)."""
+    """Devuelve siguiente correlativo formato NNN-YYYY (NNN zero padded).
+
+    Secuencia por año `sales_note:YYYY` en ofitec_sequences (bloques
+    reservados por proceso); al crearla parte desde el mayor número del año
+    ya emitido en sales_notes.
+    """
     year = datetime.now(UTC).year
-    row = cur.execute(
-        "SELECT note_number FROM sales_notes WHERE note_number LIKE ? ORDER BY id DESC LIMIT 1",
-        (f"%-{year}",),
-    ).fetchone()
-    if not row or not row[0]:
-        seq = 1
-    else:
-        try:
-            seq = int(row[0].split("-")[0]) + 1
-        except ValueError:  # pragma: no cover
-            seq = 1
+    numbering = _tools_import("numbering")
+
+    def _first_free(con: sqlite3.Connection) -> int:
+        row = con.execute(
+            "SELECT MAX(CAST(substr(note_number, 1, instr(note_number, '-') - 1) AS INTEGER)) "
+            "FROM sales_notes WHERE note_number LIKE ?",
+            (f"%-{year}",),
+        ).fetchone()
+        return int(row[0] or 0) + 1
+
+    seq, _, _ = numbering.allocator.next_value(
+        cur.connection,
+        numbering.year_sequence("sales_note", year),
+        start=_first_free,
+        padding=3,
+    )
     return f"{seq:03d}-{year}"
 
 
@@ -2008,19 +2158,9 @@ def sales_note_issue_invoice(sid: int):
                 extra={"invoice_id": dup[0], "ep_id": ep_id},
             )
         # Recalcular montos (no confiar ciegamente en snapshot)
-        lines_sum = cur.execute(
-            (
-                "SELECT COALESCE(SUM(amount_period),0) "
-                "FROM ep_lines WHERE ep_id=?"
-            ),
-            (ep_id,),
-        ).fetchone()
-        subtotal = float(lines_sum[0] or 0)
-        ded_sum = cur.execute(
-            "SELECT COALESCE(SUM(amount),0) FROM ep_deductions WHERE ep_id=?",
-            (ep_id,),
-        ).fetchone()
-        deductions_total = float(ded_sum[0] or 0)
+        totals = get_ep_totals(con, ep_id)
+        subtotal = totals["lines_subtotal"]
+        deductions_total = totals["deductions_total"]
         net = max(subtotal - deductions_total, 0.0)
         if net <= 0:
             raise Unprocessable(
@@ -2091,6 +2231,7 @@ def sales_note_issue_invoice(sid: int):
                     ),
                     (ep_id, retention_amount, "auto ledger on invoice"),
                 )
+                refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify(
             {
@@ -2180,6 +2321,7 @@ def ep_retention_release(ep_id: int):
             "WHERE ep_id=? AND released_at IS NULL",
             (ep_id,),
         )
+        refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify({"ok": True, "released_amount": round(outstanding, 2)})
 
@@ -2269,6 +2411,7 @@ def ep_retention_release_partial(ep_id: int):
                 )
                 remaining = 0.0
                 break
+        refresh_ep_totals(con, ep_id)
         con.commit()
         return jsonify({
             "ok": True,
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Totales denormalizados por EP (`ep_totals`).
+
+Mantiene por `ep_headers.id`: subtotal de líneas, deducciones por tipo
+(JSON), total y retención explícita, y retención retenida / liberada del
+`ep_retention_ledger`. Los endpoints que escriben líneas, deducciones o el
+ledger llaman `refresh_ep_totals(con, ep_id)` antes de su commit; las
+lecturas (listado del tab EP, resumen, factura, nota de venta) leen una fila
+por clave primaria en lugar de re-agregar.
+
+Consistencia:
+
+    python backend/ep_totals.py verify  [--db data/chipax_data.db]
+    python backend/ep_totals.py rebuild [--db data/chipax_data.db]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+from typing import Any
+
+TOLERANCE = 0.005
+
+# `:ep` filtra un solo EP; sin filtro se calculan todos (rebuild / verify).
+_TOTALS_SELECT = """
+SELECT h.id AS ep_id,
+       COALESCE(l.subtotal, 0) AS lines_subtotal,
+       COALESCE(l.n, 0) AS lines_count,
+       COALESCE(d.by_type, '{{}}') AS deductions_json,
+       COALESCE(d.total, 0) AS deductions_total,
+       COALESCE(d.retention, 0) AS retention_deduction,
+       COALESCE(r.held, 0) AS retention_held,
+       COALESCE(r.released, 0) AS retention_released
+FROM ep_headers h
+LEFT JOIN (
+    SELECT ep_id, SUM(amount_period) AS subtotal, COUNT(*) AS n
+    FROM ep_lines {where} GROUP BY ep_id
+) l ON l.ep_id = h.id
+LEFT JOIN (
+    SELECT ep_id, json_group_object(t, a) AS by_type, SUM(a) AS total,
+           SUM(CASE WHEN t = 'retention' THEN a ELSE 0 END) AS retention
+    FROM (
+        SELECT ep_id, COALESCE(type, 'other') AS t, SUM(amount) AS a
+        FROM ep_deductions {where} GROUP BY ep_id, COALESCE(type, 'other')
+    ) GROUP BY ep_id
+) d ON d.ep_id = h.id
+LEFT JOIN (
+    SELECT ep_id,
+           SUM(CASE WHEN COALESCE(released_at, '') = '' THEN amount ELSE 0 END) AS held,
+           SUM(CASE WHEN COALESCE(released_at, '') <> '' THEN amount ELSE 0 END) AS released
+    FROM ep_retention_ledger {where} GROUP BY ep_id
+) r ON r.ep_id = h.id
+{outer}
+"""
+
+_COLUMNS = (
+    "ep_id, lines_subtotal, lines_count, deductions_json, deductions_total, "
+    "retention_deduction, retention_held, retention_released"
+)
+
+
+def _totals_select(single: bool) -> str:
+    if single:
+        return _TOTALS_SELECT.format(where="WHERE ep_id = :ep", outer="WHERE h.id = :ep")
+    return _TOTALS_SELECT.format(where="", outer="")
+
+
+def _table_exists(con: sqlite3.Connection, name: str) -> bool:
+    cur = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    )
+    return cur.fetchone() is not None
+
+
+def ensure_ep_totals(con: sqlite3.Connection) -> None:
+    """Crea `ep_totals` si falta y la siembra desde las tablas EP existentes."""
+    if _table_exists(con, "ep_totals"):
+        return
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ep_totals (
+          ep_id INTEGER PRIMARY KEY,
+          lines_subtotal REAL NOT NULL DEFAULT 0,
+          lines_count INTEGER NOT NULL DEFAULT 0,
+          deductions_json TEXT NOT NULL DEFAULT '{}',
+          deductions_total REAL NOT NULL DEFAULT 0,
+          retention_deduction REAL NOT NULL DEFAULT 0,
+          retention_held REAL NOT NULL DEFAULT 0,
+          retention_released REAL NOT NULL DEFAULT 0,
+          updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    if all(_table_exists(con, t) for t in ("ep_headers", "ep_lines", "ep_deductions", "ep_retention_ledger")):
+        con.execute(f"INSERT INTO ep_totals({_COLUMNS}) {_totals_select(False)}")
+
+
+def refresh_ep_totals(con: sqlite3.Connection, ep_id: int) -> None:
+    """Recalcula la fila de un EP (consultas indexadas por ep_id); sin commit."""
+    ensure_ep_totals(con)
+    con.execute(
+        f"INSERT OR REPLACE INTO ep_totals({_COLUMNS}, updated_at) "
+        f"SELECT *, datetime('now') FROM ({_totals_select(True)})",
+        {"ep": ep_id},
+    )
+
+
+def get_ep_totals(con: sqlite3.Connection, ep_id: int) -> dict[str, Any]:
+    """Totales de un EP; recalcula la fila si aún no existe."""
+    ensure_ep_totals(con)
+    sql = f"SELECT {_COLUMNS} FROM ep_totals WHERE ep_id=?"
+    row = con.execute(sql, (ep_id,)).fetchone()
+    if row is None:
+        refresh_ep_totals(con, ep_id)
+        row = con.execute(sql, (ep_id,)).fetchone()
+    if row is None:
+        return {
+            "ep_id": ep_id, "lines_subtotal": 0.0, "lines_count": 0,
+            "deductions": {}, "deductions_total": 0.0, "retention_deduction": 0.0,
+            "retention_held": 0.0, "retention_released": 0.0,
+        }
+    data = dict(zip([c.strip() for c in _COLUMNS.split(",")], tuple(row)))
+    data["deductions"] = {k: float(v or 0) for k, v in json.loads(data.pop("deductions_json") or "{}").items()}
+    return data
+
+
+def rebuild(con: sqlite3.Connection) -> int:
+    """Recalcula todas las filas de `ep_totals`; devuelve EPs escritos."""
+    ensure_ep_totals(con)
+    con.execute("DELETE FROM ep_totals")
+    cur = con.execute(f"INSERT INTO ep_totals({_COLUMNS}) {_totals_select(False)}")
+    con.commit()
+    return cur.rowcount
+
+
+def verify(con: sqlite3.Connection) -> list[dict[str, Any]]:
+    """EPs cuya fila en `ep_totals` no coincide con las tablas fuente."""
+    ensure_ep_totals(con)
+    cur = con.execute(
+        f"""
+        WITH src AS ({_totals_select(False)})
+        SELECT s.ep_id, t.ep_id IS NULL AS missing,
+               s.lines_subtotal, t.lines_subtotal AS stored_lines_subtotal,
+               s.deductions_total, t.deductions_total AS stored_deductions_total,
+               s.retention_held, t.retention_held AS stored_retention_held
+        FROM src s LEFT JOIN ep_totals t ON t.ep_id = s.ep_id
+        WHERE t.ep_id IS NULL
+           OR ABS(s.lines_subtotal - t.lines_subtotal) > :tol
+           OR s.lines_count <> t.lines_count
+           OR ABS(s.deductions_total - t.deductions_total) > :tol
+           OR ABS(s.retention_deduction - t.retention_deduction) > :tol
+           OR ABS(s.retention_held - t.retention_held) > :tol
+           OR ABS(s.retention_released - t.retention_released) > :tol
+           OR s.deductions_json <> t.deductions_json
+        """,
+        {"tol": TOLERANCE},
+    )
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    from db_utils import _resolve_db_path
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["verify", "rebuild"])
+    ap.add_argument("--db", default=_resolve_db_path())
+    args = ap.parse_args(argv)
+
+    con = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            print(f"ep_totals reconstruido: {rebuild(con)} EPs")
+            return 0
+        diffs = verify(con)
+        for d in diffs[:50]:
+            print(f"  EP {d['ep_id']}: {d}")
+        print(f"ep_totals: {len(diffs)} diferencias")
+        return 1 if diffs else 0
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -7,6 +7,7 @@ Responsibilities:
 - Table bootstrap for recon_reconciliations, recon_links, recon_aliases and reference tables.
 - Combined link insertion when bank+sales provided separately.
 - Negative amount normalization.
+- Keeps bank_movements.reconciled_amount/state in sync with inserted links.
 - Alias truncation + violation counting callback.
 
 The public functions here are intentionally small wrappers used by the clean
@@ -15,6 +16,8 @@ blueprint. They return plain dicts or scalar IDs so they are easy to test.
 from __future__ import annotations
 from typing import Any, Dict, List, Optional, Tuple
 from db_utils import db_conn
+import bank_recon_state
+import name_resolver
 
 ALIAS_MAX_LEN = 120
 
@@ -77,6 +80,7 @@ def bootstrap_tables(include_alias: bool) -> None:
             conn.execute(ddl)
         if include_alias:
             conn.execute(RECON_DDL[2])
+        bank_recon_state.ensure_recon_state(conn)
         conn.commit()
 
 
@@ -137,6 +141,7 @@ def insert_links(recon_id: int, links: List[Dict[str, Any]]) -> int:
                 ),
             )
             inserted += 1
+        bank_recon_state.refresh_movements(conn, (l.get("bank_movement_id") for l in links))
         conn.commit()
     return inserted
 
@@ -166,6 +171,7 @@ def maybe_insert_combined_row(recon_id: int, links: List[Dict[str, Any]]) -> boo
                 ),
                 (recon_id, bank_id, sales_id, None, None, None, None, total),
             )
+            bank_recon_state.refresh_movements(conn, [bank_id])
             conn.commit()
         return True
     return False
@@ -184,3 +190,4 @@ def upsert_alias(alias: str, canonical: str) -> None:
             (alias, canonical or alias),
         )
         conn.commit()
+    name_resolver.invalidate()
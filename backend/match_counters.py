@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Contadores de eventos de matching AP / AR mantenidos al escribir.
+
+`match_event_counters(name, value)` guarda:
+- ap_events_total / ap_events_accepted (`ap_match_events`, accepted=1)
+- ar_map_events / auto_assign_success (`ar_map_events`, auto_assign=1)
+
+Triggers AFTER INSERT / DELETE / UPDATE sobre las tablas de eventos mantienen
+los valores en la misma transacción que escribe el evento, sin importar qué
+módulo inserte. `ar_map_events.auto_assign` es el flag dedicado (1 cuando el
+payload trae action='auto_assign'); lo fija el trigger de INSERT, así que el
+resumen no vuelve a recorrer el historial con LIKE.
+
+`ensure_match_counters(con)` instala tabla, flag y triggers la primera vez que
+ve cada tabla de eventos (sembrando con un COUNT) y después es una sola
+consulta a sqlite_master. `/api/metrics/matching_summary` lee los contadores
+en O(1).
+
+Consistencia:
+
+    python backend/match_counters.py verify  [--db data/chipax_data.db]
+    python backend/match_counters.py rebuild [--db data/chipax_data.db]
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from typing import Any
+
+COUNTERS = ("ap_events_total", "ap_events_accepted", "ar_map_events", "auto_assign_success")
+_TABLE_COUNTERS = {
+    "ap_match_events": ("ap_events_total", "ap_events_accepted"),
+    "ar_map_events": ("ar_map_events", "auto_assign_success"),
+}
+
+_AP_TRIGGER = "trg_ap_match_events_count_ins"
+_AR_TRIGGER = "trg_ar_map_events_count_ins"
+
+
+def _auto_assign_expr(col: str) -> str:
+    # CASE evita evaluar json_extract sobre payloads que no son JSON
+    return (
+        f"CASE WHEN json_valid({col}) "
+        f"THEN json_extract({col}, '$.action') IS 'auto_assign' ELSE 0 END"
+    )
+
+
+def _bump(name: str, delta: str) -> str:
+    return f"UPDATE match_event_counters SET value = value + ({delta}) WHERE name = '{name}';"
+
+
+def _columns(con: sqlite3.Connection, table: str) -> set[str]:
+    return {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+
+
+def _install_ap(con: sqlite3.Connection) -> None:
+    accepted = "accepted" in _columns(con, "ap_match_events")
+    new_acc = "(NEW.accepted IS 1)" if accepted else "0"
+    old_acc = "(OLD.accepted IS 1)" if accepted else "0"
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_AP_TRIGGER} AFTER INSERT ON ap_match_events
+        BEGIN
+          {_bump("ap_events_total", "1")}
+          {_bump("ap_events_accepted", new_acc)}
+        END
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ap_match_events_count_del AFTER DELETE ON ap_match_events
+        BEGIN
+          {_bump("ap_events_total", "-1")}
+          {_bump("ap_events_accepted", f"-{old_acc}")}
+        END
+        """
+    )
+    if accepted:
+        con.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_ap_match_events_count_upd
+            AFTER UPDATE OF accepted ON ap_match_events
+            BEGIN
+              {_bump("ap_events_accepted", f"{new_acc} - {old_acc}")}
+            END
+            """
+        )
+
+
+def _backfill_auto_assign(con: sqlite3.Connection) -> None:
+    con.execute(
+        "UPDATE ar_map_events SET auto_assign = 1 "
+        f"WHERE auto_assign = 0 AND payload LIKE '%auto_assign%' AND {_auto_assign_expr('payload')}"
+    )
+
+
+def _install_ar(con: sqlite3.Connection) -> None:
+    if "auto_assign" not in _columns(con, "ar_map_events"):
+        con.execute("ALTER TABLE ar_map_events ADD COLUMN auto_assign INTEGER NOT NULL DEFAULT 0")
+    _backfill_auto_assign(con)
+    # El UPDATE del trigger de INSERT dispara el de UPDATE, que suma el flag
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_AR_TRIGGER} AFTER INSERT ON ar_map_events
+        BEGIN
+          {_bump("ar_map_events", "1")}
+          {_bump("auto_assign_success", "NEW.auto_assign IS 1")}
+          UPDATE ar_map_events SET auto_assign = 1
+          WHERE id = NEW.id AND auto_assign = 0 AND {_auto_assign_expr("NEW.payload")};
+        END
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ar_map_events_count_del AFTER DELETE ON ar_map_events
+        BEGIN
+          {_bump("ar_map_events", "-1")}
+          {_bump("auto_assign_success", "-(OLD.auto_assign IS 1)")}
+        END
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ar_map_events_count_upd
+        AFTER UPDATE OF auto_assign ON ar_map_events
+        BEGIN
+          {_bump("auto_assign_success", "(NEW.auto_assign IS 1) - (OLD.auto_assign IS 1)")}
+        END
+        """
+    )
+
+
+def _actual(con: sqlite3.Connection, tables: set[str]) -> dict[str, int]:
+    """Valores recalculados desde las tablas de eventos."""
+    out = dict.fromkeys(COUNTERS, 0)
+    if "ap_match_events" in tables:
+        acc = "accepted IS 1" if "accepted" in _columns(con, "ap_match_events") else "0"
+        total, accepted = con.execute(
+            f"SELECT COUNT(*), COALESCE(SUM({acc}), 0) FROM ap_match_events"
+        ).fetchone()
+        out.update(ap_events_total=total, ap_events_accepted=accepted)
+    if "ar_map_events" in tables and "auto_assign" in _columns(con, "ar_map_events"):
+        total, auto = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(auto_assign), 0) FROM ar_map_events"
+        ).fetchone()
+        out.update(ar_map_events=total, auto_assign_success=auto)
+    return out
+
+
+def _store(con: sqlite3.Connection, values: dict[str, int]) -> None:
+    con.executemany(
+        "UPDATE match_event_counters SET value = ? WHERE name = ?",
+        [(v, k) for k, v in values.items()],
+    )
+
+
+def ensure_match_counters(con: sqlite3.Connection) -> None:
+    """Instala tabla / flag / triggers que falten (idempotente, sin commit propio).
+
+    Dentro de una transacción abierta queda en ella; si no, la instalación se
+    confirma al liberar el savepoint.
+    """
+    present = {
+        r[0]
+        for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (?,?,?,?,?)",
+            ("match_event_counters", "ap_match_events", "ar_map_events", _AP_TRIGGER, _AR_TRIGGER),
+        )
+    }
+    todo = [
+        (table, installer)
+        for table, trigger, installer in (
+            ("ap_match_events", _AP_TRIGGER, _install_ap),
+            ("ar_map_events", _AR_TRIGGER, _install_ar),
+        )
+        if table in present and trigger not in present
+    ]
+    if "match_event_counters" in present and not todo:
+        return
+    con.execute("SAVEPOINT match_counters")
+    try:
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS match_event_counters("
+            " name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)"
+        )
+        con.executemany(
+            "INSERT OR IGNORE INTO match_event_counters(name, value) VALUES(?, 0)",
+            [(n,) for n in COUNTERS],
+        )
+        for table, installer in todo:
+            installer(con)
+            seeded = _actual(con, {table})
+            _store(con, {k: seeded[k] for k in _TABLE_COUNTERS[table]})
+        con.execute("RELEASE match_counters")
+    except Exception:
+        con.execute("ROLLBACK TO match_counters")
+        con.execute("RELEASE match_counters")
+        raise
+
+
+def read_counters(con: sqlite3.Connection) -> dict[str, int]:
+    ensure_match_counters(con)
+    values = dict.fromkeys(COUNTERS, 0)
+    values.update(
+        (r[0], int(r[1])) for r in con.execute("SELECT name, value FROM match_event_counters")
+        if r[0] in values
+    )
+    return values
+
+
+def _event_tables(con: sqlite3.Connection) -> set[str]:
+    return {
+        r[0]
+        for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('ap_match_events','ar_map_events')"
+        )
+    }
+
+
+def rebuild(con: sqlite3.Connection) -> dict[str, int]:
+    ensure_match_counters(con)
+    tables = _event_tables(con)
+    if "ar_map_events" in tables:
+        _backfill_auto_assign(con)
+    values = _actual(con, tables)
+    _store(con, values)
+    con.commit()
+    return values
+
+
+def verify(con: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Contadores que no coinciden con las tablas de eventos (vacía = OK)."""
+    stored = read_counters(con)
+    actual = _actual(con, _event_tables(con))
+    return [
+        {"name": k, "stored": stored[k], "actual": actual[k]}
+        for k in COUNTERS
+        if stored[k] != actual[k]
+    ]
+
+
+def main(argv: list[str] | None = None) -> int:
+    from db_utils import _resolve_db_path
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["verify", "rebuild"])
+    ap.add_argument("--db", default=_resolve_db_path())
+    args = ap.parse_args(argv)
+
+    con = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            print(f"match_event_counters: {rebuild(con)}")
+            return 0
+        diffs = verify(con)
+        con.commit()
+        for d in diffs:
+            print(f"  {d['name']}: guardado={d['stored']} real={d['actual']}")
+        print(f"match_event_counters: {len(diffs)} diferencias")
+        return 1 if diffs else 0
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,275 @@
+"""Índice en memoria de nombres canónicos (proveedores, clientes, proyectos, alias).
+
+`NameResolver` carga `recon_aliases`, `vendors_unified`, `customers` y
+`projects_analytic_map` una vez y resuelve textos libres (glosas bancarias,
+nombres de cliente) sin escanear tablas:
+
+- RUT normalizado -> entradas con ese RUT.
+- Nombre normalizado exacto.
+- Contención: nombres indexados (3+ chars) contenidos en el texto (equivale
+  al `? LIKE '%' || alias || '%'` previo), vía índice por prefijo de 3 chars.
+- Fuzzy: candidatos por listas invertidas de tokens y trigramas, puntuados
+  con `rapidfuzz.fuzz.WRatio` solo sobre los mejores candidatos.
+
+Recarga en caliente: escritores en el mismo proceso llaman `invalidate()`
+(`legacy_compat.upsert_alias`). Para cambios de otros procesos (imports en
+`tools/`), `get_resolver(conn)` compara cada `ttl` segundos (default
+NAME_RESOLVER_TTL=60) una huella de las tablas fuente (COUNT, MAX(rowid),
+MAX(updated_at)), que recorre las tablas, y reconstruye si cambió.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from rapidfuzz import fuzz
+
+from rut_utils import normalize_rut
+
+# segundos entre chequeos de huella; 0 = en cada llamada
+DEFAULT_TTL = float(os.getenv("NAME_RESOLVER_TTL", "60"))
+FUZZY_THRESHOLD = 70
+_FUZZY_CANDIDATES = 50
+_MEMO_MAX = 4096
+_MIN_CONTAINED = 3  # nombres más cortos solo resuelven por igualdad
+
+
+@dataclass(frozen=True)
+class NameEntry:
+    kind: str  # alias | vendor | customer | project
+    key: str  # nombre normalizado indexado
+    canonical: str
+    ref: Any = None  # zoho_project_id para proyectos
+    rut: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class NameMatch:
+    entry: NameEntry
+    score: float
+    via: str  # rut | exact | contains | fuzzy
+
+
+def normalize_name(text: Any) -> str:
+    """minúsculas, sin tildes, solo alfanuméricos separados por un espacio."""
+    if not text:
+        return ""
+    s = unicodedata.normalize("NFKD", str(text))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in s).split())
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _columns(conn, table: str) -> set[str]:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _load_entries(conn) -> list[NameEntry]:
+    entries: list[NameEntry] = []
+    cols = _columns(conn, "recon_aliases")
+    if {"alias", "canonical"} <= cols:
+        for alias, canonical in conn.execute("SELECT alias, canonical FROM recon_aliases"):
+            entries.append(NameEntry("alias", normalize_name(alias), canonical or alias))
+    for kind, table in (("vendor", "vendors_unified"), ("customer", "customers")):
+        cols = _columns(conn, table)
+        if not {"rut_clean", "name_normalized"} <= cols:
+            continue
+        display = "COALESCE(zoho_vendor_name, name_normalized)" if "zoho_vendor_name" in cols else "name_normalized"
+        for rut, name, shown in conn.execute(f"SELECT rut_clean, name_normalized, {display} FROM {table}"):
+            rut_n = normalize_rut(str(rut)) if rut else None
+            for raw in {name, shown}:
+                entries.append(NameEntry(kind, normalize_name(raw), shown or name or "", rut=rut_n or None))
+    cols = _columns(conn, "projects_analytic_map")
+    if {"zoho_project_id", "zoho_project_name"} <= cols:
+        for pid, pname in conn.execute(
+            "SELECT DISTINCT zoho_project_id, zoho_project_name FROM projects_analytic_map"
+        ):
+            entries.append(NameEntry("project", normalize_name(pname), pname or "", ref=pid))
+    return [e for e in entries if e.key or e.rut]
+
+
+def source_fingerprint(conn) -> tuple:
+    """Huella de las tablas fuente (cambia con inserts/updates típicos)."""
+    out: list[Any] = []
+    for table in ("recon_aliases", "vendors_unified", "customers", "projects_analytic_map"):
+        cols = _columns(conn, table)
+        if not cols:
+            out.append(None)
+            continue
+        extra = ", MAX(updated_at)" if "updated_at" in cols else ""
+        out.append(tuple(conn.execute(f"SELECT COUNT(*), MAX(rowid){extra} FROM {table}").fetchone()))
+    return tuple(out)
+
+
+class NameResolver:
+    def __init__(self, entries: Iterable[NameEntry] = (), fingerprint: tuple = ()):
+        self.entries: list[NameEntry] = list(dict.fromkeys(entries))
+        self.fingerprint = fingerprint
+        self.checked_at = time.monotonic()
+        self._by_key: dict[str, list[int]] = defaultdict(list)
+        self._by_rut: dict[str, list[int]] = defaultdict(list)
+        self._by_prefix: dict[str, list[int]] = defaultdict(list)
+        self._by_token: dict[str, list[int]] = defaultdict(list)
+        self._by_trigram: dict[str, list[int]] = defaultdict(list)
+        self._memo: dict[tuple, list[NameMatch]] = {}
+        for i, e in enumerate(self.entries):
+            if e.rut:
+                self._by_rut[e.rut].append(i)
+            if not e.key:
+                continue
+            self._by_key[e.key].append(i)
+            if len(e.key) >= _MIN_CONTAINED:
+                self._by_prefix[e.key[:3]].append(i)
+            for tok in set(e.key.split()):
+                self._by_token[tok].append(i)
+            for tri in _trigrams(e.key):
+                self._by_trigram[tri].append(i)
+
+    @classmethod
+    def build(cls, conn) -> "NameResolver":
+        return cls(_load_entries(conn), source_fingerprint(conn))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _contained(self, norm: str) -> list[int]:
+        hits: list[int] = []
+        for i in range(len(norm) - 2):
+            for idx in self._by_prefix.get(norm[i:i + 3], ()):
+                if norm.startswith(self.entries[idx].key, i):
+                    hits.append(idx)
+        return hits
+
+    def _fuzzy(self, norm: str) -> list[tuple[int, float]]:
+        votes: dict[int, int] = defaultdict(int)
+        for tok in set(norm.split()):
+            for idx in self._by_token.get(tok, ()):
+                votes[idx] += 3
+        for tri in _trigrams(norm):
+            for idx in self._by_trigram.get(tri, ()):
+                votes[idx] += 1
+        best = sorted(votes, key=votes.__getitem__, reverse=True)[:_FUZZY_CANDIDATES]
+        out = []
+        for idx in best:
+            score = fuzz.WRatio(norm, self.entries[idx].key)
+            if score >= FUZZY_THRESHOLD:
+                out.append((idx, score / 100.0))
+        return out
+
+    def resolve(
+        self,
+        text: Any,
+        *,
+        rut: Any = None,
+        kinds: Optional[Iterable[str]] = None,
+        fuzzy: bool = True,
+        limit: int = 5,
+    ) -> list[NameMatch]:
+        """Entradas que corresponden a `text` / `rut`, mejor puntaje primero."""
+        kinds_t = tuple(sorted(kinds)) if kinds else ()
+        memo_key = (text, rut, kinds_t, fuzzy, limit)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+        norm = normalize_name(text)
+        scored: dict[int, tuple[float, str]] = {}
+
+        def _add(idx: int, score: float, via: str) -> None:
+            if kinds_t and self.entries[idx].kind not in kinds_t:
+                return
+            if idx not in scored or scored[idx][0] < score:
+                scored[idx] = (score, via)
+
+        rut_n = normalize_rut(str(rut)) if rut else ""
+        for idx in self._by_rut.get(rut_n, ()) if rut_n else ():
+            _add(idx, 1.0, "rut")
+        if norm:
+            for idx in self._by_key.get(norm, ()):
+                _add(idx, 1.0, "exact")
+            for idx in self._contained(norm):
+                _add(idx, 0.9 + 0.09 * len(self.entries[idx].key) / len(norm), "contains")
+            if fuzzy and not scored:
+                for idx, score in self._fuzzy(norm):
+                    _add(idx, score * 0.9, "fuzzy")
+        matches = [NameMatch(self.entries[idx], score, via) for idx, (score, via) in scored.items()]
+        matches.sort(key=lambda m: (-m.score, m.entry.kind, m.entry.canonical))
+        matches = matches[:limit]
+        if len(self._memo) >= _MEMO_MAX:
+            self._memo.clear()
+        self._memo[memo_key] = matches
+        return matches
+
+    def canonical(self, text: Any, **kw: Any) -> Optional[str]:
+        found = self.resolve(text, limit=1, **kw)
+        return found[0].entry.canonical if found else None
+
+    def entity_keys(self, text: Any) -> tuple[frozenset[str], frozenset[str]]:
+        """(RUTs, nombres canónicos normalizados) a los que `text` resuelve sin fuzzy."""
+        mine = self.resolve(text, fuzzy=False, limit=10)
+        ruts = frozenset(m.entry.rut for m in mine if m.entry.rut)
+        names = frozenset(normalize_name(m.entry.canonical) for m in mine) - {""}
+        return ruts, names
+
+    def same_entity(
+        self,
+        text: Any,
+        other_name: Any,
+        other_rut: Any = None,
+        *,
+        keys: Optional[tuple[frozenset[str], frozenset[str]]] = None,
+    ) -> float:
+        """1.0 si `text` resuelve (sin fuzzy) a la misma entidad que otro nombre / RUT.
+
+        `keys` (de `entity_keys(text)`) evita resolver `text` de nuevo al
+        comparar un mismo texto contra muchos candidatos.
+        """
+        ruts, names = keys if keys is not None else self.entity_keys(text)
+        if not (ruts or names):
+            return 0.0
+        rut_n = normalize_rut(str(other_rut)) if other_rut else ""
+        if rut_n and rut_n in ruts:
+            return 1.0
+        if normalize_name(other_name) in names:
+            return 1.0
+        theirs = {normalize_name(m.entry.canonical) for m in self.resolve(other_name, fuzzy=False, limit=10)}
+        return 1.0 if theirs & names else 0.0
+
+
+_lock = threading.Lock()
+_resolvers: dict[Any, NameResolver] = {}
+
+
+def _db_key(conn) -> Any:
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main" and path:
+            return path
+    return ("memory", id(conn))
+
+
+def get_resolver(conn, *, ttl: float = DEFAULT_TTL) -> NameResolver:
+    """Resolver compartido por BD; se reconstruye si cambian las tablas fuente."""
+    key = _db_key(conn)
+    with _lock:
+        current = _resolvers.get(key)
+        now = time.monotonic()
+        if current is not None and now - current.checked_at < ttl:
+            return current
+        fp = source_fingerprint(conn)
+        if current is None or fp != current.fingerprint:
+            current = _resolvers[key] = NameResolver(_load_entries(conn), fp)
+        current.checked_at = now
+        return current
+
+
+def invalidate() -> None:
+    """Descarta los índices (llamar tras escribir alias / maestros en este proceso)."""
+    with _lock:
+        _resolvers.clear()
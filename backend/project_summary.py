@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Agregado por proyecto de órdenes de compra (`projects_summary`).
+
+Cada fila de `purchase_orders_unified` guarda `project_key`: el nombre de
+proyecto resuelto (`zoho_project_name` o, si falta, el de
+`projects_analytic_map` por `zoho_project_id`) normalizado sin tildes, trim y
+minúsculas; NULL si queda vacío o es 'null'. `projects_summary` tiene una fila
+por clave con órdenes, monto, proveedores distintos, rango de fechas y el
+avance promedio de `daily_reports`, así `/api/projects` y `/api/projects_v2`
+leen el agregado en vez de agrupar todas las OC con un JOIN por CAST.
+
+Mantenimiento: triggers sobre las OC, el mapa analítico y `daily_reports`
+encolan lo que cambió en `projects_summary_dirty`; `refresh(con)` (lo llama
+`list_projects`) recalcula sólo esas claves. La normalización usa una función
+Python registrada en la conexión que refresca, no en los triggers, así que
+cualquier cliente SQLite puede seguir escribiendo las tablas.
+
+Consistencia:
+
+    python backend/project_summary.py verify  [--db data/chipax_data.db]
+    python backend/project_summary.py rebuild [--db data/chipax_data.db]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import unicodedata
+from typing import Any, Optional
+
+TOLERANCE = 0.005
+
+_PO = "purchase_orders_unified"
+_MAP = "projects_analytic_map"
+_DR = "daily_reports"
+_PO_TRIGGER = "trg_po_project_summary_ins"
+_MAP_TRIGGER = "trg_pam_project_summary_ins"
+_DR_TRIGGER = "trg_dr_project_summary_ins"
+
+_SUMMARY_DDL = (
+    """
+CREATE TABLE IF NOT EXISTS projects_summary(
+  project_key TEXT PRIMARY KEY,
+  project_name TEXT NOT NULL,
+  total_orders INTEGER NOT NULL DEFAULT 0,
+  total_amount REAL NOT NULL DEFAULT 0,
+  unique_providers INTEGER NOT NULL DEFAULT 0,
+  start_date TEXT,
+  end_date TEXT,
+  progress REAL NOT NULL DEFAULT 0
+)""",
+    "CREATE INDEX IF NOT EXISTS ix_projects_summary_amount ON projects_summary(total_amount)",
+    # po_id = rowid de la OC a re-clavear; old_key = clave a recalcular
+    """
+CREATE TABLE IF NOT EXISTS projects_summary_dirty(
+  id INTEGER PRIMARY KEY,
+  po_id INTEGER,
+  old_key TEXT,
+  progress INTEGER NOT NULL DEFAULT 0
+)""",
+)
+
+_ORDER = {"total_amount": "total_amount", "project_name": "project_name", "name": "project_name"}
+
+
+def project_key(name: Any) -> Optional[str]:
+    """Clave normalizada del proyecto (misma forma que `_norm_name` del server)."""
+    if name is None:
+        return None
+    s = unicodedata.normalize("NFKD", str(name))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).strip().lower()
+    return s if s and s != "null" else None
+
+
+def _master(con: sqlite3.Connection) -> dict[str, str]:
+    names = (_PO, _MAP, _DR, "projects_summary", _PO_TRIGGER, _MAP_TRIGGER, _DR_TRIGGER)
+    return dict(
+        con.execute(
+            f"SELECT name, type FROM sqlite_master WHERE name IN ({','.join('?' * len(names))})", names
+        ).fetchall()
+    )
+
+
+def _columns(con: sqlite3.Connection, table: str) -> set[str]:
+    return {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+
+
+def _name_expr(has_map: bool) -> str:
+    if not has_map:
+        return "p.zoho_project_name"
+    return (
+        "COALESCE(p.zoho_project_name, (SELECT MIN(pm.zoho_project_name) FROM projects_analytic_map pm"
+        " WHERE CAST(pm.zoho_project_id AS TEXT) = CAST(p.zoho_project_id AS TEXT)))"
+    )
+
+
+def _install_po(con: sqlite3.Connection) -> None:
+    if "project_key" not in _columns(con, _PO):
+        con.execute(f"ALTER TABLE {_PO} ADD COLUMN project_key TEXT")
+    con.execute(f"CREATE INDEX IF NOT EXISTS ix_po_project_key ON {_PO}(project_key)")
+    con.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_po_project_id_text ON {_PO}(CAST(zoho_project_id AS TEXT))"
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_PO_TRIGGER} AFTER INSERT ON {_PO}
+        BEGIN INSERT INTO projects_summary_dirty(po_id) VALUES (NEW.rowid); END
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_po_project_summary_upd
+        AFTER UPDATE OF zoho_project_name, zoho_project_id, total_amount, vendor_rut, po_date ON {_PO}
+        BEGIN INSERT INTO projects_summary_dirty(po_id, old_key) VALUES (NEW.rowid, OLD.project_key); END
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_po_project_summary_del AFTER DELETE ON {_PO}
+        BEGIN INSERT INTO projects_summary_dirty(old_key) VALUES (OLD.project_key); END
+        """
+    )
+    # Estado inicial: todas las OC pendientes de clave
+    con.execute(f"INSERT INTO projects_summary_dirty(po_id) SELECT rowid FROM {_PO}")
+
+
+def _install_map(con: sqlite3.Connection) -> None:
+    con.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_pam_project_id_text ON {_MAP}(CAST(zoho_project_id AS TEXT))"
+    )
+    mark = (
+        "INSERT INTO projects_summary_dirty(po_id, old_key) "
+        f"SELECT rowid, project_key FROM {_PO} "
+        "WHERE CAST(zoho_project_id AS TEXT) = CAST({row}.zoho_project_id AS TEXT);"
+    )
+    for suffix, event, rows in (
+        ("ins", "INSERT", ("NEW",)),
+        ("upd", "UPDATE OF zoho_project_id, zoho_project_name", ("OLD", "NEW")),
+        ("del", "DELETE", ("OLD",)),
+    ):
+        body = " ".join(mark.format(row=r) for r in rows)
+        con.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_pam_project_summary_{suffix} AFTER {event} ON {_MAP} "
+            f"BEGIN {body} END"
+        )
+    con.execute(
+        "INSERT INTO projects_summary_dirty(po_id, old_key) "
+        f"SELECT rowid, project_key FROM {_PO} WHERE zoho_project_name IS NULL"
+    )
+
+
+def _install_dr(con: sqlite3.Connection) -> None:
+    for suffix, event in (("ins", "INSERT"), ("upd", "UPDATE"), ("del", "DELETE")):
+        con.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_dr_project_summary_{suffix} AFTER {event} ON {_DR} "
+            "BEGIN INSERT INTO projects_summary_dirty(progress) VALUES (1); END"
+        )
+    con.execute("INSERT INTO projects_summary_dirty(progress) VALUES (1)")
+
+
+def ensure_project_summary(con: sqlite3.Connection) -> bool:
+    """Instala columna, tablas y triggers que falten (sin commit).
+
+    Retorna False si `purchase_orders_unified` no es una tabla. Con todo
+    instalado es una sola consulta a sqlite_master.
+    """
+    master = _master(con)
+    if master.get(_PO) != "table":
+        return False
+    if "projects_summary" not in master:
+        for ddl in _SUMMARY_DDL:
+            con.execute(ddl)
+    if _PO_TRIGGER not in master:
+        _install_po(con)
+    # Las OC pueden venir antes que el mapa o los partes diarios
+    if master.get(_MAP) == "table" and _MAP_TRIGGER not in master:
+        _install_map(con)
+    if master.get(_DR) == "table" and _DR_TRIGGER not in master:
+        _install_dr(con)
+    return True
+
+
+def _progress_map(con: sqlite3.Connection, master: dict[str, str]) -> dict[str, float]:
+    """Avance promedio de `daily_reports` por clave de proyecto."""
+    if master.get(_DR) not in ("table", "view"):
+        return {}
+    cols = _columns(con, _DR)
+    if "project_name" in cols:
+        sql = (
+            "SELECT project_name, SUM(COALESCE(avance_pct, 0)), COUNT(*) "
+            f"FROM {_DR} GROUP BY project_name"
+        )
+    elif "project_id" in cols and _MAP in master:
+        sql = (
+            "SELECT pm.zoho_project_name, SUM(COALESCE(dr.avance_pct, 0)), COUNT(*) "
+            f"FROM {_DR} dr JOIN {_MAP} pm "
+            "ON CAST(dr.project_id AS TEXT) = CAST(pm.zoho_project_id AS TEXT) "
+            "GROUP BY pm.zoho_project_name"
+        )
+    else:
+        return {}
+    sums: dict[str, list[float]] = {}
+    for name, total, n in con.execute(sql):
+        key = project_key(name)
+        if key:
+            acc = sums.setdefault(key, [0.0, 0])
+            acc[0] += float(total or 0)
+            acc[1] += n
+    return {k: s / n for k, (s, n) in sums.items() if n}
+
+
+def _summary_select(has_map: bool, where: str) -> str:
+    return (
+        "SELECT p.project_key, MAX(TRIM(" + _name_expr(has_map) + ")), COUNT(*), "
+        "COALESCE(SUM(p.total_amount), 0), COUNT(DISTINCT p.vendor_rut), MIN(p.po_date), MAX(p.po_date) "
+        f"FROM {_PO} p WHERE {where} GROUP BY p.project_key"
+    )
+
+
+def refresh(con: sqlite3.Connection) -> int:
+    """Aplica la cola de cambios; retorna cuántas claves se recalcularon (sin commit)."""
+    if not ensure_project_summary(con):
+        return 0
+    upto = con.execute("SELECT MAX(id) FROM projects_summary_dirty").fetchone()[0]
+    if upto is None:
+        return 0
+    master = _master(con)
+    has_map = master.get(_MAP) in ("table", "view")
+    con.create_function("ofitec_project_key", 1, project_key, deterministic=True)
+
+    keys = {
+        k for (k,) in con.execute(
+            "SELECT DISTINCT old_key FROM projects_summary_dirty WHERE id <= ? AND old_key IS NOT NULL",
+            (upto,),
+        )
+    }
+    keys.update(
+        k for (k,) in con.execute(
+            f"UPDATE {_PO} AS p SET project_key = ofitec_project_key({_name_expr(has_map)}) "
+            "WHERE p.rowid IN (SELECT po_id FROM projects_summary_dirty WHERE id <= ?) "
+            "RETURNING project_key",
+            (upto,),
+        ).fetchall()
+        if k
+    )
+    all_progress = con.execute(
+        "SELECT 1 FROM projects_summary_dirty WHERE id <= ? AND progress = 1 LIMIT 1", (upto,)
+    ).fetchone() is not None
+
+    if keys:
+        key_json = json.dumps(sorted(keys))
+        con.execute(
+            "DELETE FROM projects_summary WHERE project_key IN (SELECT value FROM json_each(?))",
+            (key_json,),
+        )
+        con.execute(
+            "INSERT INTO projects_summary(project_key, project_name, total_orders, total_amount, "
+            "unique_providers, start_date, end_date) "
+            + _summary_select(has_map, "p.project_key IN (SELECT value FROM json_each(?))"),
+            (key_json,),
+        )
+    if keys or all_progress:
+        progress = _progress_map(con, master)
+        targets = None if all_progress else keys
+        if targets is None:
+            con.execute("UPDATE projects_summary SET progress = 0 WHERE progress <> 0")
+            targets = progress.keys()
+        con.executemany(
+            "UPDATE projects_summary SET progress = ? WHERE project_key = ?",
+            [(progress[k], k) for k in targets if k in progress],
+        )
+    con.execute("DELETE FROM projects_summary_dirty WHERE id <= ?", (upto,))
+    return len(keys)
+
+
+def list_projects(
+    con: sqlite3.Connection,
+    *,
+    q: Optional[str] = None,
+    order: str = "total_amount",
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> tuple[list[dict[str, Any]], int]:
+    """Proyectos desde `projects_summary` (refresca la cola antes). Sin commit."""
+    if not ensure_project_summary(con):
+        return [], 0
+    refresh(con)
+    where, params = "", []
+    if q:
+        where = " WHERE project_name LIKE ?"
+        params.append(f"%{q}%")
+    total = con.execute(f"SELECT COUNT(*) FROM projects_summary{where}", params).fetchone()[0]
+    sql = (
+        "SELECT project_key, project_name, total_orders, total_amount, unique_providers, "
+        f"start_date, end_date, progress FROM projects_summary{where} "
+        f"ORDER BY {_ORDER.get(order, 'total_amount')} DESC, project_key"
+    )
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [int(limit), int(offset)]
+    cur = con.execute(sql, params)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()], total
+
+
+def rebuild(con: sqlite3.Connection) -> int:
+    if not ensure_project_summary(con):
+        return 0
+    con.execute("DELETE FROM projects_summary")
+    con.execute(f"INSERT INTO projects_summary_dirty(po_id) SELECT rowid FROM {_PO}")
+    con.execute("INSERT INTO projects_summary_dirty(progress) VALUES (1)")
+    n = refresh(con)
+    con.commit()
+    return n
+
+
+def verify(con: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Claves cuyo agregado no coincide con las OC (lista vacía = OK)."""
+    if not ensure_project_summary(con):
+        return []
+    refresh(con)
+    has_map = _master(con).get(_MAP) in ("table", "view")
+    con.create_function("ofitec_project_key", 1, project_key, deterministic=True)
+    expected = {
+        r[0]: r[1:]
+        for r in con.execute(
+            "SELECT k, COUNT(*), COALESCE(SUM(total_amount), 0), COUNT(DISTINCT vendor_rut) FROM ("
+            f"SELECT ofitec_project_key({_name_expr(has_map)}) AS k, p.total_amount, p.vendor_rut "
+            f"FROM {_PO} p) WHERE k IS NOT NULL GROUP BY k"
+        )
+    }
+    stored = {
+        r[0]: r[1:]
+        for r in con.execute(
+            "SELECT project_key, total_orders, total_amount, unique_providers FROM projects_summary"
+        )
+    }
+    diffs = []
+    for key in sorted(expected.keys() | stored.keys()):
+        exp, got = expected.get(key), stored.get(key)
+        if exp is None or got is None or exp[0] != got[0] or exp[2] != got[2] or abs(exp[1] - got[1]) > TOLERANCE:
+            diffs.append({"project_key": key, "expected": exp, "stored": got})
+    return diffs
+
+
+def main(argv: list[str] | None = None) -> int:
+    from db_utils import _resolve_db_path
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["verify", "rebuild"])
+    ap.add_argument("--db", default=_resolve_db_path())
+    args = ap.parse_args(argv)
+
+    con = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            print(f"projects_summary: {rebuild(con)} proyectos")
+            return 0
+        diffs = verify(con)
+        con.commit()  # instalación / cola aplicada por verify
+        for d in diffs[:50]:
+            print(f"  {d['project_key']}: {d}")
+        print(f"projects_summary: {len(diffs)} diferencias")
+        return 1 if diffs else 0
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
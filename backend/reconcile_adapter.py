@@ -53,9 +53,11 @@ def smart_suggest(  # pragma: no cover - opcional externo
         logger.info(f"✅ DEBUG - Found {len(candidates)} candidates")
         
         # Puntuar candidatos
+        resolver = reconcile_engine.get_resolver(conn)
+        keys = resolver.entity_keys(reconcile_engine._normalize_name(movement.vendor_name))
         suggestions = []
         for candidate in candidates[:10]:  # Solo procesar primeros 10
-            suggestion = reconcile_engine.score_candidate(movement, candidate)
+            suggestion = reconcile_engine.score_candidate(movement, candidate, resolver, keys)
             logger.info(f"   Candidate {candidate.id} ({candidate.kind}): confidence {suggestion.confidence:.3f}")
             
             # Convertir a formato esperado por el adaptador
@@ -10,6 +10,8 @@ from typing import Any, Iterable, List, Optional
 
 from rapidfuzz import fuzz
 
+from name_resolver import NameResolver, get_resolver
+
 
 @dataclass
 class Movement:
@@ -114,11 +116,20 @@ def _date_similarity(base: Optional[datetime], other: Optional[datetime]) -> flo
     return max(0.0, 1.0 - (days / _DATE_TOLERANCE_DAYS))
 
 
-def _vendor_score(base_name: str, candidate_name: str) -> float:
+def _vendor_score(
+    base_name: str,
+    candidate_name: str,
+    resolver: Optional[NameResolver] = None,
+    candidate_rut: Optional[str] = None,
+    entity_keys: Optional[tuple[frozenset[str], frozenset[str]]] = None,
+) -> float:
     if not base_name or not candidate_name:
         return 0.0
-    score = fuzz.WRatio(base_name, candidate_name)
-    return score / 100.0
+    if resolver is not None:
+        # alias / RUT del maestro: la glosa nombra a la misma entidad
+        if resolver.same_entity(base_name, candidate_name, candidate_rut, keys=entity_keys) == 1.0:
+            return 1.0
+    return fuzz.WRatio(base_name, candidate_name) / 100.0
 
 
 def _safe_get(row, *keys):
@@ -201,7 +212,12 @@ def fetch_candidates(
     return candidates
 
 
-def score_candidate(movement: Movement, candidate: Candidate) -> Suggestion:
+def score_candidate(
+    movement: Movement,
+    candidate: Candidate,
+    resolver: Optional[NameResolver] = None,
+    entity_keys: Optional[tuple[frozenset[str], frozenset[str]]] = None,
+) -> Suggestion:
     evidences: list[Evidence] = []
     base_name = _normalize_name(movement.vendor_name)
     candidate_name = _normalize_name(candidate.vendor_name)
@@ -218,7 +234,7 @@ def score_candidate(movement: Movement, candidate: Candidate) -> Suggestion:
         )
     )
 
-    vendor_score = _vendor_score(base_name, candidate_name)
+    vendor_score = _vendor_score(base_name, candidate_name, resolver, candidate.vendor_rut, entity_keys)
     evidences.append(Evidence("vendor", f"similarity={vendor_score:.2f}", vendor_score))
 
     confidence = (0.5 * amount_score) + (0.3 * vendor_score) + (0.2 * date_score)
@@ -266,7 +282,10 @@ def _find_individual_matches(
     candidates = fetch_candidates(conn, movement, amount_tolerance=amount_tolerance)
     if not candidates:
         return []
-    suggestions = [score_candidate(movement, cand) for cand in candidates]
+    resolver = get_resolver(conn)
+    # La glosa se resuelve una vez; cada candidato solo compara RUT / nombre canónico
+    keys = resolver.entity_keys(_normalize_name(movement.vendor_name))
+    suggestions = [score_candidate(movement, cand, resolver, keys) for cand in candidates]
     suggestions.sort(key=lambda s: s.confidence, reverse=True)
     return [s.as_dict() for s in suggestions[:top_n]]
 
@@ -16,6 +16,7 @@ from __future__ import annotations
 # pylint: disable=missing-function-docstring,wrong-import-order,ungrouped-imports,broad-exception-caught,import-outside-toplevel,redefined-outer-name
 # pylint: disable=too-many-lines,import-error,invalid-name,global-statement,too-many-arguments,too-many-positional-arguments,no-else-return,chained-comparison,reimported,consider-using-in
 
+import base64
 import json
 import time
 import logging
@@ -29,6 +30,9 @@ from typing import Any
 from flask_cors import CORS
 import unicodedata
 from db_utils import db_conn  # standardized connection manager
+from ep_totals import refresh_ep_totals
+from project_summary import list_projects
+from sov_positions import attach_ep, find_cap_violation, load_positions
 from werkzeug.wrappers import Response as WSGIResponse
 
 # ----------------------------------------------------------------------------
@@ -471,73 +475,25 @@ def get_projects():
 
         logger.info("📂 Conectando a BD: %s", DB_PATH)
         with db_conn(DB_PATH) as conn:
-            cursor = conn.cursor()
-            authorized_query = (
-                "SELECT COALESCE(p.zoho_project_name, pm.zoho_project_name) as project_name, "
-                "COUNT(*) as total_orders, SUM(p.total_amount) as total_amount, "
-                "COUNT(DISTINCT p.vendor_rut) as unique_providers, MIN(p.po_date) as start_date, "
-                "MAX(p.po_date) as end_date FROM purchase_orders_unified p "
-                "LEFT JOIN projects_analytic_map pm ON CAST(p.zoho_project_id AS TEXT) = "
-                "CAST(pm.zoho_project_id AS TEXT) WHERE COALESCE(p.zoho_project_name, pm.zoho_project_name) IS NOT NULL "
-                "AND TRIM(COALESCE(p.zoho_project_name, pm.zoho_project_name)) != '' "
-                "AND LOWER(TRIM(COALESCE(p.zoho_project_name, pm.zoho_project_name))) NOT IN ('null') "
-                "GROUP BY COALESCE(p.zoho_project_name, pm.zoho_project_name) ORDER BY total_amount DESC"
-            )
-            cursor.execute(authorized_query)
-            projects_raw = cursor.fetchall()
-
-            # Compute progress map while connection open
-            progress_map: dict[str, float] = {}
-            try:
-                if _view_or_table_exists(cursor.connection, "daily_reports"):
-                    cols = _table_columns(cursor.connection, "daily_reports")
-                    if "project_name" in cols:
-                        cur = cursor.connection.execute(
-                            "SELECT LOWER(TRIM(COALESCE(project_name,''))) "
-                            "       AS pname, "
-                            "       AVG(COALESCE(avance_pct,0)) AS avgp "
-                            "  FROM daily_reports GROUP BY pname"
-                        )
-                        for pname, avgp in cur.fetchall():
-                            if pname:
-                                progress_map[pname] = float(avgp or 0)
-                    elif "project_id" in cols and _view_or_table_exists(
-                        cursor.connection, "projects_analytic_map"
-                    ):
-                        cur = cursor.connection.execute(
-                            "SELECT LOWER(TRIM(COALESCE(pm.zoho_project_name,''))) AS pname, "
-                            "       AVG(COALESCE(dr.avance_pct,0)) AS avgp "
-                            "  FROM daily_reports dr  JOIN projects_analytic_map pm ON CAST(dr.project_id AS TEXT) = CAST(pm.zoho_project_id AS TEXT) "
-                            " GROUP BY pname"
-                        )
-                        for pname, avgp in cur.fetchall():
-                            if pname:
-                                progress_map[pname] = float(avgp or 0)
-            except Exception:
-                progress_map = {}
+            # Agregado precalculado por project_key (ver backend/project_summary.py)
+            projects_raw, _ = list_projects(conn)
+            conn.commit()  # cola de cambios aplicada por refresh
             logger.info(" %d proyectos encontrados en BD", len(projects_raw))
 
         # Formato de salida API
         api_projects = []
         for i, row in enumerate(projects_raw):
-            (
-                project_name,
-                orders,
-                total_amount,
-                providers,
-                start_date,
-                end_date,
-            ) = row
-            total_amount = float(total_amount or 0)
-            orders = int(orders or 0)
-            providers = int(providers or 0)
-            pname_norm = _norm_name(project_name)
+            project_name = row["project_name"]
+            start_date, end_date = row["start_date"], row["end_date"]
+            total_amount = float(row["total_amount"] or 0)
+            orders = int(row["total_orders"] or 0)
+            providers = int(row["unique_providers"] or 0)
             project = {
                 "id": f"PROJ-{i+1:03d}",
                 "name": project_name,
                 "client": "Cliente Externo",
                 "status": "active",
-                "progress": progress_map.get(pname_norm, 0),
+                "progress": row["progress"] or 0,
                 "startDate": start_date,
                 "endDate": end_date,
                 "budget": total_amount * 1.25,
@@ -671,78 +627,15 @@ def api_projects_v2():
         limit = max(1, min(200, args.get("limit", default=25, type=int)))
         offset = max(0, args.get("offset", default=0, type=int))
         order = (args.get("order", "total_amount") or "").lower()
-        order_map = {
-            "total_amount": "total_amount",
-            "project_name": "project_name",
-            "name": "project_name",
-        }
-        order_sql = order_map.get(order, "total_amount") + " DESC"
 
         with db_conn(DB_PATH) as conn:
-            cur = conn.cursor()
-            where = [
-                (
-                    "COALESCE(p.zoho_project_name, pm.zoho_project_name) "
-                    "IS NOT NULL"
-                ),
-                (
-                    (
-                        "TRIM(COALESCE(p.zoho_project_name, pm.zoho_project_name)) "
-                        "<> ''"
-                    )
-                ),
-                (
-                    (
-                        "LOWER(TRIM(COALESCE(p.zoho_project_name, pm.zoho_project_name))) "
-                        "NOT IN ('null')"
-                    )
-                ),
-            ]
-            params = []
-            if q:
-                where.append(
-                    (
-                        "COALESCE(p.zoho_project_name, pm.zoho_project_name) "
-                        "LIKE ?"
-                    )
-                )
-                params.append(f"%{q}%")
-            where_sql = " AND ".join(where)
-
-            count_sql = (
-                "SELECT COUNT(1) FROM ("  # subquery for distinct project names
-                "SELECT 1 FROM purchase_orders_unified p "
-                " LEFT JOIN projects_analytic_map pm ON "
-                "     CAST(p.zoho_project_id AS TEXT) = "
-                "     CAST(pm.zoho_project_id AS TEXT) "
-                f" WHERE {where_sql} GROUP BY COALESCE(p.zoho_project_name, pm.zoho_project_name)"  # noqa: E501
-                ") t"
-            )
-            cur.execute(count_sql, params)
-            total = cur.fetchone()[0]
-
-            data_sql = (
-                "SELECT COALESCE(p.zoho_project_name, pm.zoho_project_name) "
-                "       AS project_name, COUNT(*) AS total_orders, "
-                "       SUM(p.total_amount) AS total_amount, "
-                "       COUNT(DISTINCT p.vendor_rut) AS unique_providers, "
-                "       MIN(p.po_date) AS start_date, "
-                "       MAX(p.po_date) AS end_date "
-                "  FROM purchase_orders_unified p "
-                "  LEFT JOIN projects_analytic_map pm ON "
-                "       CAST(p.zoho_project_id AS TEXT) = "
-                "       CAST(pm.zoho_project_id AS TEXT) "
-                f" WHERE {where_sql} "
-                " GROUP BY COALESCE(p.zoho_project_name, "
-                "          pm.zoho_project_name) "
-                f" ORDER BY {order_sql} LIMIT ? OFFSET ?"
+            rows, total = list_projects(
+                conn, q=q, order=order, limit=limit, offset=offset
             )
-            cur.execute(data_sql, [*params, limit, offset])
-            rows = cur.fetchall()
+            conn.commit()  # cola de cambios aplicada por refresh
 
-        # Second connection for budgets & progress (reduce lock duration)
+        # Second connection for budgets (reduce lock duration)
         budgets: dict[str, float] = {}
-        progress_map: dict[str, float] = {}
         try:
             with db_conn(DB_PATH) as conn2:
                 c2 = conn2.cursor()
@@ -755,60 +648,27 @@ def api_projects_v2():
                 for pname, b in c2.fetchall():
                     if pname:
                         budgets[_norm_name(pname)] = float(b or 0)
-                if _view_or_table_exists(conn2, "daily_reports"):
-                    cols2 = _table_columns(conn2, "daily_reports")
-                    if "project_name" in cols2:
-                        c2.execute(
-                            "SELECT LOWER(TRIM(COALESCE(project_name,''))) "
-                            "       AS pname, "
-                            "       AVG(COALESCE(avance_pct,0)) AS p "
-                            "  FROM daily_reports GROUP BY pname"
-                        )
-                        for pname, p in c2.fetchall():
-                            if pname:
-                                progress_map[str(pname)] = float(p or 0)
-                    elif "project_id" in cols2 and _view_or_table_exists(
-                        conn2, "projects_analytic_map"
-                    ):
-                        c2.execute(
-                            "SELECT LOWER(TRIM(COALESCE(pm.zoho_project_name,''))) AS pname, "
-                            "       AVG(COALESCE(dr.avance_pct,0)) AS p "
-                            "  FROM daily_reports dr JOIN projects_analytic_map pm ON "
-                            "       CAST(dr.project_id AS TEXT) = CAST(pm.zoho_project_id AS TEXT) "
-                            " GROUP BY pname"
-                        )
-                        for pname, p in c2.fetchall():
-                            if pname:
-                                progress_map[str(pname)] = float(p or 0)
         except Exception:
             budgets = {}
-            progress_map = {}
         # conn closed automatically by context manager
 
         items = []
-        for i, (
-            name,
-            orders,
-            total_amount,
-            providers,
-            start_date,
-            end_date,
-        ) in enumerate(rows, start=offset + 1):
-            key = _norm_name(name)
-            budget_val = budgets.get(key)
+        for i, row in enumerate(rows, start=offset + 1):
+            total_amount = row["total_amount"]
+            budget_val = budgets.get(row["project_key"])
             if budget_val is None:
                 budget_val = (total_amount or 0) * 1.25  # fallback heurístico
             items.append(
                 {
                     "id": f"PROJ-{i:03d}",
-                    "name": name,
-                    "orders": orders,
-                    "providers": providers,
+                    "name": row["project_name"],
+                    "orders": row["total_orders"],
+                    "providers": row["unique_providers"],
                     "budget": budget_val,
                     "spent": total_amount or 0,
-                    "progress": progress_map.get(key, 0),
-                    "startDate": start_date,
-                    "endDate": end_date,
+                    "progress": row["progress"] or 0,
+                    "startDate": row["start_date"],
+                    "endDate": row["end_date"],
                 }
             )
 
@@ -1898,6 +1758,14 @@ def api_treasury_forecast():
                 rows = [dict(r) for r in cur.fetchall()]
                 return jsonify({"items": rows})
             # Fallback: weekly net by movement type
+            if "bank_movements" in _cube_sources(conn):
+                cur = conn.execute(
+                    "SELECT period_key AS semana, SUM(amount) AS neto "
+                    "FROM fact_period_totals "
+                    "WHERE period_type = 'week' AND category = 'bank_net' "
+                    "GROUP BY period_key ORDER BY period_key DESC LIMIT 12"
+                )
+                return jsonify({"items": [dict(r) for r in cur.fetchall()]})
             cur = conn.execute(
                 "SELECT strftime('%Y-W%W', fecha) AS semana, "
                 "SUM(CASE WHEN LOWER(COALESCE(tipo,''))='credit' "
@@ -2058,75 +1926,23 @@ def api_matching_summary():
       - ap_events_total: filas en ap_match_events
       - ap_events_accepted: accepted=1
       - ar_map_events: filas en ar_map_events
-      - auto_assign_success: eventos AR con reason que contenga 'auto_assign'
+      - auto_assign_success: eventos AR con auto_assign=1
 
-    Cache simple vía snapshot table (match_metrics_snapshots) para evitar
-    costo reiterado cuando se consulta desde dashboard: si el último snapshot
-    es <15 minutos se devuelve ese.
+    Los contadores se mantienen al escribir cada evento (triggers de
+    `match_counters`), así que la lectura es O(1) y siempre actual.
     """
+    from match_counters import read_counters
+
     try:
         with db_conn(DB_PATH) as conn:
-            cur = conn.cursor()
-            # Ensure snapshot table
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS match_metrics_snapshots (
-                  id INTEGER PRIMARY KEY,
-                  created_at TEXT DEFAULT (datetime('now')),
-                  ap_events_total INTEGER,
-                  ap_events_accepted INTEGER,
-                  ar_map_events INTEGER,
-                  auto_assign_success INTEGER
-                )
-                """
-            )
-            # Reuse recent snapshot (<15 min)
-            row = cur.execute(
-                "SELECT id, created_at, ap_events_total, ap_events_accepted, ar_map_events, auto_assign_success "
-                "FROM match_metrics_snapshots ORDER BY id DESC LIMIT 1"
-            ).fetchone()
-            if row:
-                try:
-                    # Compare minutes difference
-                    created = datetime.fromisoformat(row[1].replace("Z", "")) if "T" in row[1] else datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S")
-                    delta_min = (datetime.now() - created).total_seconds() / 60.0
-                except Exception:
-                    delta_min = 999
-                if delta_min < 15:
-                    return jsonify({
-                        "cached": True,
-                        "generated_at": row[1],
-                        "ap_events_total": row[2],
-                        "ap_events_accepted": row[3],
-                        "ar_map_events": row[4],
-                        "auto_assign_success": row[5],
-                        "ap_acceptance_rate": (round(row[3] / row[2], 4) if row[2] else None),
-                    })
-            # Fresh calculation (tables may not exist yet)
-            def _count(sql: str) -> int:
-                try:
-                    r = cur.execute(sql).fetchone()
-                    return int(r[0] or 0)
-                except Exception:
-                    return 0
-            ap_events_total = _count("SELECT COUNT(1) FROM ap_match_events")
-            ap_events_accepted = _count("SELECT COUNT(1) FROM ap_match_events WHERE accepted=1")
-            ar_map_events = _count("SELECT COUNT(1) FROM ar_map_events")
-            auto_assign_success = _count("SELECT COUNT(1) FROM ar_map_events WHERE reasons LIKE '%auto_assign%'")
-            cur.execute(
-                "INSERT INTO match_metrics_snapshots(ap_events_total, ap_events_accepted, ar_map_events, auto_assign_success) VALUES(?,?,?,?)",
-                (ap_events_total, ap_events_accepted, ar_map_events, auto_assign_success),
-            )
-            conn.commit()
-            return jsonify({
-                "cached": False,
-                "generated_at": datetime.now().isoformat() + "Z",
-                "ap_events_total": ap_events_total,
-                "ap_events_accepted": ap_events_accepted,
-                "ar_map_events": ar_map_events,
-                "auto_assign_success": auto_assign_success,
-                "ap_acceptance_rate": (round(ap_events_accepted / ap_events_total, 4) if ap_events_total else None),
-            })
+            counters = read_counters(conn)
+        total = counters["ap_events_total"]
+        return jsonify({
+            "cached": False,
+            "generated_at": datetime.now().isoformat() + "Z",
+            **counters,
+            "ap_acceptance_rate": (round(counters["ap_events_accepted"] / total, 4) if total else None),
+        })
     except Exception as e:  # noqa: BLE001
         logger.error("Error en matching_summary: %s", e)
         return jsonify({"error": "server_error"}), 500
@@ -2160,27 +1976,36 @@ def api_threeway_violations():
 
 @app.post("/api/reconciliaciones/sync_chipax")
 def api_sync_chipax():
-    """Ejecuta importador Chipax y devuelve métricas.
+    """Encola el importador Chipax como job y responde de inmediato.
 
-    Seguro para dev: si el importador no existe o falla, responde vacío.
+    202 con `job_id` para consultar el progreso; si ya hay un sync en curso
+    sobre la misma BD se devuelve ese job (`already_running: true`).
     """
+    from chipax_sync import start_sync
+
     try:
-        metrics: dict[str, int] = {}
-        try:
-            import sys as _sys
-            tools_dir = str((PROJECT_ROOT / "tools").resolve())
-            if tools_dir not in _sys.path:
-                _sys.path.append(tools_dir)
-            from import_chipax_conciliacion import run as _run  # type: ignore
-
-            metrics = _run() or {}
-        except Exception as _e:  # noqa: BLE001
-            logger.warning("sync_chipax importer no disponible: %s", _e)
-            metrics = {}
-        return jsonify({"ok": True, "metrics": metrics})
+        job, created = start_sync(DB_PATH)
     except Exception as e:  # noqa: BLE001
         logger.error("Error en sync_chipax: %s", e)
-        return jsonify({"ok": False, "metrics": {}}), 200
+        return jsonify({"ok": False, "error": "sync_failed"}), 500
+    return jsonify({
+        "ok": True,
+        "job_id": job.job_id,
+        "status": job.status.value,
+        "already_running": not created,
+        "status_url": f"/api/reconciliaciones/sync_chipax/{job.job_id}",
+    }), 202
+
+
+@app.get("/api/reconciliaciones/sync_chipax/<job_id>")
+def api_sync_chipax_status(job_id: str):
+    """Estado y progreso (filas leídas / insertadas / omitidas) del sync."""
+    from chipax_sync import sync_status
+
+    status = sync_status(job_id)
+    if status is None:
+        return jsonify({"error": "not_found", "job_id": job_id}), 404
+    return jsonify(status)
 
 # Utilidades locales: RUT normalize usando tools/rut_utils si está disponible
 def _rut_normalize(val: str | None) -> str | None:
@@ -2206,48 +2031,32 @@ def _norm_name(val: str | None) -> str:
         return (val or "").strip().lower()
 
 
+def _numbering():
+    """tools/numbering (import diferido)."""
+    import sys as _sys
+    tools_dir = str((PROJECT_ROOT / "tools").resolve())
+    if tools_dir not in _sys.path:
+        _sys.path.append(tools_dir)
+    import numbering  # type: ignore
+
+    return numbering
+
+
 def _po_next_number(conn: sqlite3.Connection) -> str:
     """Entrega el siguiente número correlativo de OC (Ofitec).
-    Usa ofitec_sequences; crea con defaults si no existe.
+    Usa ofitec_sequences (bloques reservados por proceso); crea con defaults
+    si no existe.
     """
-    # Ensure table
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS ofitec_sequences (
-          name TEXT PRIMARY KEY,
-          prefix TEXT,
-          padding INTEGER DEFAULT 0,
-          next_value INTEGER NOT NULL,
-          enable_manual INTEGER DEFAULT 1,
-          updated_at TEXT DEFAULT (datetime('now'))
-        );
-        """
-    )
-    cur = conn.execute(
-        "SELECT prefix, padding, next_value FROM ofitec_sequences WHERE name = ?",
-        ("po_number",),
-    )
-    row = cur.fetchone()
-    if row is None:
-        conn.execute(
-            "INSERT INTO ofitec_sequences(name, prefix, padding, next_value, enable_manual) VALUES(?,?,?,?,?)",
-            ("po_number", "PO-", 5, 1, 1),
-        )
-        prefix, padding, next_value = "PO-", 5, 1
-    else:
-        prefix = row[0] or ""
-        padding = int(row[1] or 0)
-        next_value = int(row[2] or 1)
-    num = f"{prefix}{next_value:0{padding}d}" if padding and padding > 0 else f"{prefix}{next_value}"
-    conn.execute(
-        "UPDATE ofitec_sequences SET next_value = ?, updated_at = datetime('now') WHERE name = ?",
-        (next_value + 1, "po_number"),
+    return _numbering().allocator.next_number(
+        conn, "po_number", prefix="PO-", padding=5, start=1
     )
-    return num
 
 
 def _po_peek_number(conn: sqlite3.Connection) -> str:
     """Obtiene el próximo número sin incrementar la secuencia."""
+    cached = _numbering().allocator.peek_number(conn, "po_number")
+    if cached:
+        return cached
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS ofitec_sequences (
@@ -2285,157 +2094,264 @@ def api_po_peek_number():
         return jsonify({"error": "peek_failed"}), 500
 
 
-def _query_view(
-    view_name: str,
-    filters: dict[str, str],
-    page: int = 1,
-    page_size: int = 50,
-    order_by: str | None = None,
-    order_dir: str = "DESC",
-):
-    """Generic SELECT with simple, parameterized filters and pagination."""
-    # Per-view specs to avoid referencing non-existent columns
-    view_specs = {
-        "v_facturas_compra": {
-            "columns": {
-                "documento_numero",
-                "fecha",
-                "proveedor_rut",
-                "proveedor_nombre",
-                "monto_total",
-                "moneda",
-                "estado",
-                "fuente",
-            },
-            # Columns to use for free-text search
-            "search_cols": ["proveedor_nombre", "documento_numero"],
-            # Columns to match when filtering by rut
-            "rut_cols": ["proveedor_rut"],
-            # Allowed ORDER BY fields
-            "order_fields": [
-                "fecha",
-                "monto_total",
-                "proveedor_nombre",
-                "proveedor_rut",
-                "documento_numero",
-            ],
+# Per-view specs to avoid referencing non-existent columns.
+# Índices que respaldan filtros/orden: tools/create_finance_views.py (VIEW_INDEX_PLAN).
+_VIEW_SPECS: dict[str, dict[str, Any]] = {
+    "v_facturas_compra": {
+        "columns": {
+            "id",
+            "documento_numero",
+            "fecha",
+            "proveedor_rut",
+            "proveedor_nombre",
+            "monto_total",
+            "moneda",
+            "estado",
+            "fuente",
         },
-        "v_facturas_venta": {
-            "columns": {
-                "documento_numero",
-                "fecha",
-                "cliente_rut",
-                "cliente_nombre",
-                "monto_total",
-                "moneda",
-                "estado",
-                "fuente",
-            },
-            "search_cols": ["cliente_nombre", "documento_numero"],
-            "rut_cols": ["cliente_rut"],
-            "order_fields": [
-                "fecha",
-                "monto_total",
-                "cliente_nombre",
-                "cliente_rut",
-                "documento_numero",
-            ],
+        # Columns to use for free-text search
+        "search_cols": ["proveedor_nombre", "documento_numero"],
+        # Columns to match when filtering by rut
+        "rut_cols": ["proveedor_rut"],
+        # Allowed ORDER BY fields
+        "order_fields": [
+            "fecha",
+            "monto_total",
+            "proveedor_nombre",
+            "proveedor_rut",
+            "documento_numero",
+        ],
+        # Desempate para paginación keyset (se usan las que existan en la vista);
+        # `id` (PK de la tabla base) va al final y hace el orden total
+        "tiebreak": ["documento_numero", "id"],
+    },
+    "v_facturas_venta": {
+        "columns": {
+            "id",
+            "documento_numero",
+            "fecha",
+            "cliente_rut",
+            "cliente_nombre",
+            "monto_total",
+            "moneda",
+            "estado",
+            "fuente",
         },
-        "v_cartola_bancaria": {
-            "columns": {
-                "fecha",
-                "banco",
-                "cuenta",
-                "glosa",
-                "monto",
-                "moneda",
-                "tipo",
-                "saldo",
-                "referencia",
-                "fuente",
-                # Campos adicionales de la vista (cuando existen)
-                "conciliado",
-                "n_docs",
-                "monto_conciliado",
-                # Campo virtual para filtrar por estado de conciliación
-                "estado",
-            },
-            "search_cols": ["glosa", "referencia"],
-            "rut_cols": ["referencia"],
-            "order_fields": ["fecha", "monto", "banco", "cuenta", "glosa"],
+        "search_cols": ["cliente_nombre", "documento_numero"],
+        "rut_cols": ["cliente_rut"],
+        "order_fields": [
+            "fecha",
+            "monto_total",
+            "cliente_nombre",
+            "cliente_rut",
+            "documento_numero",
+        ],
+        "tiebreak": ["documento_numero", "id"],
+    },
+    "v_cartola_bancaria": {
+        "columns": {
+            "id",
+            "fecha",
+            "banco",
+            "cuenta",
+            "glosa",
+            "monto",
+            "moneda",
+            "tipo",
+            "saldo",
+            "referencia",
+            "fuente",
+            # Campos adicionales de la vista (cuando existen)
+            "conciliado",
+            "n_docs",
+            "monto_conciliado",
+            # Campo virtual para filtrar por estado de conciliación
+            "estado",
         },
-        "v_gastos": {
-            "columns": {
-                "gasto_id",
-                "fecha",
-                "categoria",
-                "descripcion",
-                "monto",
-                "moneda",
-                "proveedor_rut",
-                "proyecto",
-                "fuente",
-            },
-            "search_cols": ["descripcion", "categoria", "proyecto"],
-            "rut_cols": ["proveedor_rut"],
-            "order_fields": ["fecha", "monto", "categoria", "proyecto"],
+        "search_cols": ["glosa", "referencia"],
+        "rut_cols": ["referencia"],
+        "order_fields": ["fecha", "monto", "banco", "cuenta", "glosa"],
+        "tiebreak": ["id"],
+    },
+    "v_gastos": {
+        "columns": {
+            "id",
+            "gasto_id",
+            "fecha",
+            "categoria",
+            "descripcion",
+            "monto",
+            "moneda",
+            "proveedor_rut",
+            "proyecto",
+            "fuente",
         },
-        "v_impuestos": {
-            "columns": {
-                "periodo",
-                "tipo",
-                "monto_debito",
-                "monto_credito",
-                "neto",
-                "estado",
-                "fecha_presentacion",
-                "fuente",
-            },
-            "search_cols": ["tipo", "estado"],
-            "rut_cols": [],
-            "order_fields": ["periodo", "neto", "monto_debito", "monto_credito"],
+        "search_cols": ["descripcion", "categoria", "proyecto"],
+        "rut_cols": ["proveedor_rut"],
+        "order_fields": ["fecha", "monto", "categoria", "proyecto"],
+        "tiebreak": ["id"],
+    },
+    "v_impuestos": {
+        "columns": {
+            "id",
+            "periodo",
+            "tipo",
+            "monto_debito",
+            "monto_credito",
+            "neto",
+            "estado",
+            "fecha_presentacion",
+            "fuente",
         },
-        "v_previred": {
-            "columns": {
-                "periodo",
-                "rut_trabajador",
-                "nombre_trabajador",
-                "rut_empresa",
-                "monto_total",
-                "estado",
-                "fecha_pago",
-                "fuente",
-            },
-            "search_cols": ["nombre_trabajador", "rut_trabajador"],
-            "rut_cols": ["rut_trabajador", "rut_empresa"],
-            "order_fields": ["periodo", "monto_total", "fecha_pago"],
+        "search_cols": ["tipo", "estado"],
+        "rut_cols": [],
+        "order_fields": ["periodo", "neto", "monto_debito", "monto_credito"],
+        "tiebreak": ["periodo", "tipo", "id"],
+    },
+    "v_previred": {
+        "columns": {
+            "id",
+            "periodo",
+            "rut_trabajador",
+            "nombre_trabajador",
+            "rut_empresa",
+            "monto_total",
+            "estado",
+            "fecha_pago",
+            "fuente",
         },
-        "v_sueldos": {
-            "columns": {
-                "periodo",
-                "rut_trabajador",
-                "nombre_trabajador",
-                "cargo",
-                "bruto",
-                "liquido",
-                "descuentos",
-                "fecha_pago",
-                "fuente",
-            },
-            "search_cols": ["nombre_trabajador", "cargo"],
-            "rut_cols": ["rut_trabajador"],
-            "order_fields": ["periodo", "bruto", "liquido", "fecha_pago"],
+        "search_cols": ["nombre_trabajador", "rut_trabajador"],
+        "rut_cols": ["rut_trabajador", "rut_empresa"],
+        "order_fields": ["periodo", "monto_total", "fecha_pago"],
+        "tiebreak": ["periodo", "rut_trabajador", "rut_empresa", "id"],
+    },
+    "v_sueldos": {
+        "columns": {
+            "id",
+            "periodo",
+            "rut_trabajador",
+            "nombre_trabajador",
+            "cargo",
+            "bruto",
+            "liquido",
+            "descuentos",
+            "fecha_pago",
+            "fuente",
         },
-    }
+        "search_cols": ["nombre_trabajador", "cargo"],
+        "rut_cols": ["rut_trabajador"],
+        "order_fields": ["periodo", "bruto", "liquido", "fecha_pago"],
+        "tiebreak": ["periodo", "rut_trabajador", "id"],
+    },
+}
+
+_VIEW_COUNT_TTL = float(os.getenv("VIEW_COUNT_CACHE_TTL", "30"))
+_view_count_cache: dict[tuple, tuple[float, int]] = {}
+_view_count_lock = threading.Lock()
 
-    allowed_order_fields = {
-        name: spec["order_fields"] for name, spec in view_specs.items()
-    }
 
+class InvalidCursorError(ValueError):
+    """Cursor keyset ilegible o emitido para otro order_by/order_dir."""
+
+
+def _invalid_cursor_response(e: InvalidCursorError):
+    return jsonify({"error": "invalid_cursor", "detail": str(e)}), 400
+
+
+def _encode_view_cursor(order_by: str, dir_sql: str, values: list) -> str:
+    raw = json.dumps({"o": order_by, "d": dir_sql, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_view_cursor(token: str, order_by: str, dir_sql: str, n_values: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("invalid cursor") from e
+    if (
+        not isinstance(data, dict)
+        or data.get("o") != order_by
+        or data.get("d") != dir_sql
+        or not isinstance(data.get("v"), list)
+        or len(data["v"]) != n_values
+    ):
+        raise InvalidCursorError("cursor does not match order_by/order_dir")
+    return data["v"]
+
+
+def _keyset_after(cols: list[str], values: list, asc: bool) -> tuple[str, list]:
+    """Condición "fila posterior a `values`" para ORDER BY cols (misma dirección).
+
+    SQLite ordena NULL como el menor valor: primero en ASC, último en DESC.
+    """
+    col, v = cols[0], values[0]
+    params: list = []
+    if v is None:
+        after = f"{col} IS NOT NULL" if asc else "0"
+        same = f"{col} IS NULL"
+    else:
+        after = f"{col} > ?" if asc else f"({col} < ? OR {col} IS NULL)"
+        params.append(v)
+        same = f"{col} = ?"
+    if len(cols) == 1:
+        return after, params
+    rest_sql, rest_params = _keyset_after(cols[1:], values[1:], asc)
+    if v is not None:
+        params.append(v)
+    return f"({after} OR ({same} AND {rest_sql}))", params + rest_params
+
+
+def _view_total(conn, view_name: str, where_sql: str, params: list, count_mode: str) -> int | None:
+    """COUNT(1) exacto, cacheado por `_VIEW_COUNT_TTL` segundos, u omitido ('none')."""
+    if count_mode == "none":
+        return None
+    key = (str(DB_PATH), view_name, where_sql, tuple(params))
+    now = time.monotonic()
+    if count_mode == "cached":
+        with _view_count_lock:
+            hit = _view_count_cache.get(key)
+        if hit and now - hit[0] < _VIEW_COUNT_TTL:
+            return hit[1]
+    total = conn.execute(f"SELECT COUNT(1) FROM {view_name} WHERE {where_sql}", params).fetchone()[0]
+    with _view_count_lock:
+        if len(_view_count_cache) > 512:
+            _view_count_cache.clear()
+        _view_count_cache[key] = (now, total)
+    return total
+
+
+def _cartola_has_recon_state() -> bool:
+    """True si v_cartola_bancaria expone `estado` (reconciled_state de bank_movements)."""
+    try:
+        with db_conn(DB_PATH) as conn:
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(v_cartola_bancaria)")}
+    except sqlite3.Error:
+        return False
+    return "estado" in cols
+
+
+def _query_view(
+    view_name: str,
+    filters: dict[str, str],
+    page: int = 1,
+    page_size: int = 50,
+    order_by: str | None = None,
+    order_dir: str = "DESC",
+    cursor: str | None = None,
+    count: str | None = None,
+):
+    """Generic SELECT with simple, parameterized filters and pagination.
+
+    - page/page_size: LIMIT/OFFSET con total exacto (contrato original).
+    - cursor: paginación keyset sobre (order_by, desempate de la vista); un
+      cursor vacío ("") pide la primera página. `meta.next_cursor` continúa.
+    - count: exact | cached | none (por defecto exact con page, cached con cursor).
+    """
     clauses = ["1=1"]
     params: list = []
 
-    spec = view_specs.get(view_name, None)
+    spec = _VIEW_SPECS.get(view_name, None)
     cols = spec["columns"] if spec else set()
 
     # Filters (applied only if relevant columns exist in the view)
@@ -2458,15 +2374,21 @@ def _query_view(
     if v := filters.get("estado"):
         if view_name == "v_cartola_bancaria":
             # Interpretar 'estado' como confirmado/pendiente en base a existencia de links de conciliación
-            # Usamos el id de la vista (bm.id AS id) para verificar en recon_links
-            if v in ("confirmado", "pendiente"):
-                cond = (
-                    "CASE WHEN EXISTS(SELECT 1 FROM recon_links rl WHERE rl.bank_movement_id = id) "
-                    "THEN 'confirmado' ELSE 'pendiente' END = ?"
-                )
-                clauses.append(cond)
+            if v in ("confirmado", "pendiente") and _cartola_has_recon_state():
+                # Columna mantenida en bank_movements (bank_recon_state.py): index seek
+                clauses.append("estado = ?")
                 params.append(v)
                 handled_estado = True
+            elif v in ("confirmado", "pendiente"):
+                # Vista sin estado: usamos su id (bm.id AS id) contra recon_links.
+                # IN/NOT IN: el subquery se materializa una vez (índice efímero)
+                # en vez de un EXISTS correlacionado por fila de la vista
+                neg = "" if v == "confirmado" else "NOT "
+                clauses.append(
+                    f"id {neg}IN (SELECT bank_movement_id FROM recon_links "
+                    "WHERE bank_movement_id IS NOT NULL)"
+                )
+                handled_estado = True
         # Camino estándar: solo si no fue manejado como especial
         if not handled_estado and "estado" in cols:
             clauses.append("COALESCE(estado, 'unknown') = ?")
@@ -2492,42 +2414,76 @@ def _query_view(
 
     where_sql = " AND ".join(clauses)
 
+    spec_fields = _VIEW_SPECS[view_name]["order_fields"] if spec else []
+    dir_sql = "ASC" if order_dir and order_dir.upper() == "ASC" else "DESC"
+    keyset = cursor is not None and bool(spec_fields)
+    if keyset and order_by not in spec_fields:
+        order_by = spec_fields[0]
+    count_mode = count if count in ("exact", "cached", "none") else ("cached" if keyset else "exact")
+
     # Order by (safelist)
     order_sql = ""
-    if order_by and view_name in allowed_order_fields:
-        if order_by in allowed_order_fields[view_name]:
-            dir_sql = (
-                "ASC" if order_dir and order_dir.upper() == "ASC" else "DESC"
-            )
-            order_sql = f" ORDER BY {order_by} {dir_sql}"
+    if order_by and order_by in spec_fields:
+        order_sql = f" ORDER BY {order_by} {dir_sql}"
 
     # Pagination
     page = max(1, int(page))
     page_size = max(1, min(200, int(page_size)))
     offset = (page - 1) * page_size
 
-    # Queries
-    data_sql = (
-        f"SELECT * FROM {view_name} WHERE {where_sql}{order_sql} "
-        "LIMIT ? OFFSET ?"
-    )
-    count_sql = f"SELECT COUNT(1) FROM {view_name} WHERE {where_sql}"
-
     with db_conn(DB_PATH) as conn:
-        # count
-        cur = conn.execute(count_sql, params)
-        total = cur.fetchone()[0]
-        # data
-        cur = conn.execute(data_sql, [*params, page_size, offset])
+        total = _view_total(conn, view_name, where_sql, params, count_mode)
+        if not keyset:
+            data_sql = (
+                f"SELECT * FROM {view_name} WHERE {where_sql}{order_sql} "
+                "LIMIT ? OFFSET ?"
+            )
+            cur = conn.execute(data_sql, [*params, page_size, offset])
+            rows = [dict(r) for r in cur.fetchall()]
+            return {
+                "items": rows,
+                "meta": {
+                    "total": total,
+                    "page": page,
+                    "page_size": page_size,
+                    "pages": (total + page_size - 1) // page_size if total is not None else None,
+                },
+            }
+
+        view_cols = {r[1] for r in conn.execute(f"PRAGMA table_info({view_name})")}
+        key_cols = [order_by] + [
+            c for c in spec["tiebreak"] if c in view_cols and c != order_by
+        ]
+        key_sql = ", ".join(f"{c} {dir_sql}" for c in key_cols)
+        key_where, key_params = where_sql, list(params)
+        if cursor:
+            values = _decode_view_cursor(cursor, order_by, dir_sql, len(key_cols))
+            cond, cond_params = _keyset_after(key_cols, values, dir_sql == "ASC")
+            key_where = f"{where_sql} AND {cond}"
+            key_params += cond_params
+        cur = conn.execute(
+            f"SELECT * FROM {view_name} WHERE {key_where} ORDER BY {key_sql} LIMIT ?",
+            [*key_params, page_size + 1],
+        )
         rows = [dict(r) for r in cur.fetchall()]
 
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = (
+        _encode_view_cursor(order_by, dir_sql, [rows[-1].get(c) for c in key_cols])
+        if has_more
+        else None
+    )
     return {
         "items": rows,
         "meta": {
             "total": total,
-            "page": page,
             "page_size": page_size,
-            "pages": (total + page_size - 1) // page_size if page_size else 1,
+            "pages": (total + page_size - 1) // page_size if total is not None else None,
+            "order_by": order_by,
+            "order_dir": dir_sql,
+            "next_cursor": next_cursor,
+            "total_cached": count_mode == "cached",
         },
     }
 
@@ -2550,8 +2506,12 @@ def api_facturas_compra():
             page_size=args.get("page_size", default=50, type=int),
             order_by=args.get("order_by", default="fecha", type=str),
             order_dir=args.get("order_dir", default="DESC", type=str),
+            cursor=args.get("cursor", type=str),
+            count=args.get("count", type=str),
         )
         return jsonify(result)
+    except InvalidCursorError as e:
+        return _invalid_cursor_response(e)
     except Exception as e:  # noqa: BLE001
         logger.error("Error en facturas_compra: %s", e)
         return jsonify(
@@ -2588,8 +2548,12 @@ def api_cartola_bancaria():
             page_size=args.get("page_size", default=50, type=int),
             order_by=args.get("order_by", default="fecha", type=str),
             order_dir=args.get("order_dir", default="DESC", type=str),
+            cursor=args.get("cursor", type=str),
+            count=args.get("count", type=str),
         )
         return jsonify(result)
+    except InvalidCursorError as e:
+        return _invalid_cursor_response(e)
     except Exception as e:  # noqa: BLE001
         logger.error("Error en cartola_bancaria: %s", e)
         return jsonify(
@@ -2625,8 +2589,12 @@ def api_facturas_venta():
             page_size=args.get("page_size", default=50, type=int),
             order_by=args.get("order_by", default="fecha", type=str),
             order_dir=args.get("order_dir", default="DESC", type=str),
+            cursor=args.get("cursor", type=str),
+            count=args.get("count", type=str),
         )
         return jsonify(result)
+    except InvalidCursorError as e:
+        return _invalid_cursor_response(e)
     except Exception as e:  # noqa: BLE001
         logger.error("Error en facturas_venta: %s", e)
         return jsonify(
@@ -2661,8 +2629,12 @@ def api_gastos():
             page_size=args.get("page_size", default=50, type=int),
             order_by=args.get("order_by", default="fecha", type=str),
             order_dir=args.get("order_dir", default="DESC", type=str),
+            cursor=args.get("cursor", type=str),
+            count=args.get("count", type=str),
         )
         return jsonify(result)
+    except InvalidCursorError as e:
+        return _invalid_cursor_response(e)
     except Exception as e:
         logger.error("Error en gastos: %s", e)
         return jsonify({"items": [], "meta": {"total": 0, "page": 1, "page_size": 50, "pages": 0}})
@@ -2684,8 +2656,12 @@ def api_impuestos():
             page_size=args.get("page_size", default=50, type=int),
             order_by=args.get("order_by", default="periodo", type=str),
             order_dir=args.get("order_dir", default="DESC", type=str),
+            cursor=args.get("cursor", type=str),
+            count=args.get("count", type=str),
         )
         return jsonify(result)
+    except InvalidCursorError as e:
+        return _invalid_cursor_response(e)
     except Exception as e:
         logger.error("Error en impuestos: %s", e)
         return jsonify({"items": [], "meta": {"total": 0, "page": 1, "page_size": 50, "pages": 0}})
@@ -2710,8 +2686,12 @@ def api_previred():
             page_size=args.get("page_size", default=50, type=int),
             order_by=args.get("order_by", default="periodo", type=str),
             order_dir=args.get("order_dir", default="DESC", type=str),
+            cursor=args.get("cursor", type=str),
+            count=args.get("count", type=str),
         )
         return jsonify(result)
+    except InvalidCursorError as e:
+        return _invalid_cursor_response(e)
     except Exception as e:
         logger.error("Error en previred: %s", e)
         return jsonify({"items": [], "meta": {"total": 0, "page": 1, "page_size": 50, "pages": 0}})
@@ -2736,8 +2716,12 @@ def api_sueldos():
             page_size=args.get("page_size", default=50, type=int),
             order_by=args.get("order_by", default="periodo", type=str),
             order_dir=args.get("order_dir", default="DESC", type=str),
+            cursor=args.get("cursor", type=str),
+            count=args.get("count", type=str),
         )
         return jsonify(result)
+    except InvalidCursorError as e:
+        return _invalid_cursor_response(e)
     except Exception as e:
         logger.error("Error en sueldos: %s", e)
         return jsonify({"items": [], "meta": {"total": 0, "page": 1, "page_size": 50, "pages": 0}})
@@ -2893,7 +2877,27 @@ def api_cashflow_semana():
         weeks = max(1, min(104, int(args.get("weeks", 12))))
         data: dict[str, dict[str, float]] = {}
         with db_conn(DB_PATH) as conn:
-            if _view_or_table_exists(conn, "cashflow_planned"):
+            cube = _cube_sources(conn)
+            planned = _view_or_table_exists(conn, "cashflow_planned")
+            if planned and "cashflow_planned" in cube:
+                cube_cats = ("plan:%",)
+            elif not planned and {"purchase_orders", "sales_invoices"} <= cube:
+                cube_cats = ("purchase", "invoice")
+            else:
+                cube_cats = ()
+            if cube_cats:
+                like = " OR ".join("category LIKE ?" for _ in cube_cats)
+                cur = conn.execute(
+                    "SELECT period_key, category, SUM(amount) FROM fact_period_totals "
+                    f"WHERE period_type = 'week' AND ({like}) "
+                    "GROUP BY period_key, category",
+                    cube_cats,
+                )
+                for wk, category, amt in cur.fetchall():
+                    cat = category[5:] if category.startswith("plan:") else category
+                    data.setdefault(wk, {}).setdefault(cat, 0.0)
+                    data[wk][cat] += float(amt or 0)
+            elif planned:
                 cur = conn.execute("SELECT fecha, category, monto FROM cashflow_planned")
                 for fecha, category, monto in cur.fetchall():
                     wk = _week_key(fecha)
@@ -3234,6 +3238,27 @@ def _view_or_table_exists(conn: sqlite3.Connection, name: str) -> bool:
     return cur.fetchone() is not None
 
 
+def _cube_sources(conn: sqlite3.Connection) -> set[str]:
+    """Fuentes ya materializadas en fact_period_totals (tools/period_cube.py)."""
+    if not _view_or_table_exists(conn, "fact_period_sources"):
+        return set()
+    return {r[0] for r in conn.execute("SELECT source FROM fact_period_sources")}
+
+
+def _cube_add(conn: sqlite3.Connection, source: str, category: str, when: Any, amount: float, **kw: Any) -> None:
+    """Mantiene fact_period_totals al día para escrituras puntuales (sin commit)."""
+    try:
+        import sys as _sys
+        tools_dir = str((PROJECT_ROOT / "tools").resolve())
+        if tools_dir not in _sys.path:
+            _sys.path.append(tools_dir)
+        from period_cube import add_amount  # type: ignore
+
+        add_amount(conn, source, category, when, amount, **kw)
+    except Exception as e:  # noqa: BLE001
+        logger.warning("period cube no actualizado (%s): %s", source, e)
+
+
 def _get_intelligent_revenue(conn: sqlite3.Connection) -> tuple[float, float]:
     """
     Get revenue for the most relevant business period using intelligent detection.
@@ -3247,6 +3272,30 @@ def _get_intelligent_revenue(conn: sqlite3.Connection) -> tuple[float, float]:
 
     cur = conn.cursor()
 
+    if "revenue" in _cube_sources(conn):
+        cur.execute("""
+            SELECT period_key, SUM(amount) AS revenue
+            FROM fact_period_totals
+            WHERE period_type = 'year' AND category = 'revenue'
+            GROUP BY period_key
+            ORDER BY revenue DESC
+            LIMIT 1
+        """)
+        best_year_row = cur.fetchone()
+        if not best_year_row:
+            return 0.0, 0.0
+        best_year, year_revenue = best_year_row
+        ytd_revenue = float(year_revenue or 0)
+        cur.execute("""
+            SELECT SUM(amount)
+            FROM fact_period_totals
+            WHERE period_type = 'month' AND category = 'revenue'
+            AND period_key BETWEEN ? AND ?
+        """, (f"{best_year}-10", f"{best_year}-12"))
+        q4_result = cur.fetchone()
+        month_revenue = float(q4_result[0] or 0) if q4_result and q4_result[0] else ytd_revenue
+        return month_revenue, ytd_revenue
+
     # Find year with highest revenue
     cur.execute("""
         SELECT strftime('%Y', fecha) as year, SUM(monto_total) as revenue
@@ -4646,12 +4695,21 @@ def api_project_ep_list(project_key: str):
             if not pids:
                 return jsonify({"items": []})
             ph = ",".join(["?"] * len(pids))
+            lines_sum = "(SELECT COALESCE(SUM(l.amount_period),0) FROM ep_lines l WHERE l.ep_id = h.id)"
+            ded_sum = "(SELECT COALESCE(SUM(d.amount),0) FROM ep_deductions d WHERE d.ep_id = h.id)"
+            if _view_or_table_exists(conn, "ep_totals"):
+                totals_join = " LEFT JOIN ep_totals t ON t.ep_id = h.id "
+                lines_sum = f"COALESCE(t.lines_subtotal, {lines_sum})"
+                ded_sum = f"COALESCE(t.deductions_total, {ded_sum})"
+            else:
+                totals_join = ""
             rows = conn.execute(
                 (
                     "SELECT h.*, "
-                    "       (SELECT COALESCE(SUM(l.amount_period),0) FROM ep_lines l WHERE l.ep_id = h.id) AS amount_period, "
-                    "       (SELECT COALESCE(SUM(d.amount),0) FROM ep_deductions d WHERE d.ep_id = h.id) AS deductions "
+                    f"       {lines_sum} AS amount_period, "
+                    f"       {ded_sum} AS deductions "
                     "  FROM ep_headers h "
+                    f"{totals_join}"
                     f" WHERE h.project_id IN ({ph}) "
                     " ORDER BY COALESCE(h.approved_at, h.submitted_at) DESC"
                 ),
@@ -4708,36 +4766,7 @@ def api_project_ep_import(project_key: str):
             )
             ep_id = cur.lastrowid
 
-            # Validación contra contrato/SOV si existe
-            sov = {}
-            prev = {}
-            if header.get("contract_id") is not None:
-                try:
-                    c_id = header.get("contract_id")
-                    # Capacidades por item
-                    sov = {
-                        r[0]: float(r[1] or 0)
-                        for r in conn.execute(
-                            "SELECT item_code, COALESCE(line_total,0) FROM client_sov_items WHERE contract_id=?",
-                            (c_id,),
-                        ).fetchall()
-                    }
-                    # Acumulado previo aprobado por item
-                    prev = {
-                        r[0]: float(r[1] or 0)
-                        for r in conn.execute(
-                            (
-                                "SELECT l.item_code, COALESCE(SUM(l.amount_period),0) AS amount_cum "
-                                "FROM ep_lines l JOIN ep_headers h ON h.id=l.ep_id "
-                                "WHERE h.contract_id=? AND h.status IN('approved','invoiced','paid') "
-                                "GROUP BY l.item_code"
-                            ),
-                            (c_id,),
-                        ).fetchall()
-                    }
-                except Exception:
-                    sov, prev = {}, {}
-
+            rows = []
             for ln in lines:
                 amt = ln.get("amount_period")
                 if (
@@ -4749,35 +4778,11 @@ def api_project_ep_import(project_key: str):
                         amt = float(ln["qty_period"]) * float(ln["unit_price"])
                     except Exception:
                         amt = None
-
-                code = ln.get("item_code")
-                if code and code in sov:
-                    cap = float(sov.get(code) or 0)
-                    prev_amt = float(prev.get(code, 0))
-                    if (prev_amt + float(amt or 0)) > (cap + 1e-6):
-                        return (
-                            jsonify({
-                                "error": "ep_exceeds_contract_item",
-                                "detail": f"Item {code} excede SOV",
-                                "item_code": code,
-                                "cap": cap,
-                                "prev": prev_amt,
-                                "attempt": float(amt or 0),
-                            }),
-                            422,
-                        )
-
-                cur.execute(
-                    (
-                        "INSERT INTO ep_lines("
-                        "ep_id, sov_item_id, item_code, description, unit, "
-                        "qty_period, unit_price, amount_period, qty_cum, amount_cum, chapter) "
-                        "VALUES(?,?,?,?,?,?,?,?,?,?,?)"
-                    ),
+                rows.append(
                     (
                         ep_id,
                         ln.get("sov_item_id"),
-                        code,
+                        ln.get("item_code"),
                         ln.get("description"),
                         ln.get("unit"),
                         ln.get("qty_period"),
@@ -4786,9 +4791,39 @@ def api_project_ep_import(project_key: str):
                         ln.get("qty_cum"),
                         ln.get("amount_cum"),
                         ln.get("chapter"),
-                    ),
+                    )
                 )
 
+            # Validación contra contrato/SOV si existe (posiciones por contrato)
+            if header.get("contract_id") is not None and _view_or_table_exists(conn, "client_sov_items"):
+                violation = find_cap_violation(
+                    load_positions(conn, header.get("contract_id")),
+                    ((r[2], r[7]) for r in rows),
+                )
+                if violation:
+                    code, cap, prev_amt, amt = violation
+                    return (
+                        jsonify({
+                            "error": "ep_exceeds_contract_item",
+                            "detail": f"Item {code} excede SOV",
+                            "item_code": code,
+                            "cap": cap,
+                            "prev": prev_amt,
+                            "attempt": float(amt or 0),
+                        }),
+                        422,
+                    )
+
+            cur.executemany(
+                (
+                    "INSERT INTO ep_lines("
+                    "ep_id, sov_item_id, item_code, description, unit, "
+                    "qty_period, unit_price, amount_period, qty_cum, amount_cum, chapter) "
+                    "VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+                ),
+                rows,
+            )
+
             for d in deductions:
                 cur.execute(
                     (
@@ -4803,6 +4838,10 @@ def api_project_ep_import(project_key: str):
                     ),
                 )
 
+            if _view_or_table_exists(conn, "ep_totals"):
+                refresh_ep_totals(conn, ep_id)
+            if _view_or_table_exists(conn, "contract_sov_positions"):
+                attach_ep(conn, ep_id)
             conn.commit()
             return jsonify({"ok": True, "ep_id": ep_id})
     except Exception as e:  # noqa: BLE001
@@ -5189,6 +5228,11 @@ def api_purchase_orders():
                 + ")"
             )
             cur = conn.execute(sql, insert_params)
+            _cube_add(
+                conn, "purchase_orders", "purchase", data.get("po_date"),
+                -abs(float(data.get("total_amount", 0) or 0)),
+                project_id=data.get("zoho_project_id"), currency=data.get("currency"),
+            )
             conn.commit()
 
             new_id = cur.lastrowid
@@ -5211,6 +5255,10 @@ def api_purchase_orders():
                             f"PO:{data.get('po_number')}",
                         ),
                     )
+                    _cube_add(
+                        conn, "cashflow_planned", "plan:purchase", data.get("po_date"), amount,
+                        project_id=data.get("zoho_project_id"), currency=data.get("currency"),
+                    )
                     conn.commit()
             except Exception:
                 pass
@@ -5391,10 +5439,9 @@ def api_ai_summary():  # noqa: D401
             except Exception:
                 ar_events = []
             try:
-                cur.execute("SELECT ap_events_total, ap_events_accepted, ar_map_events, auto_assign_success FROM match_metrics_snapshots ORDER BY id DESC LIMIT 1")
-                row = cur.fetchone()
-                if row:
-                    metrics = {"ap_events_total": row[0], "ap_events_accepted": row[1], "ar_map_events": row[2], "auto_assign_success": row[3]}
+                from match_counters import read_counters
+
+                metrics = read_counters(conn)
             except Exception:
                 metrics = {}
     except Exception as exc:  # noqa: BLE001
@@ -5797,6 +5844,59 @@ def validate_po_budget_endpoint():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/validations/batch', methods=['POST'])
+def validate_batch_endpoint():
+    """Validar muchos documentos (facturas, pagos, OCs) en una sola llamada.
+
+    Body: {"items": [{"type": "invoice"|"payment"|"po_budget", ...campos...}]}
+    Cada resultado replica el cuerpo de la ruta individual y agrega `status`.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('items') if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return jsonify({'error': 'items (lista) es requerido'}), 400
+
+        from validation_engine import FinancialValidator
+        validator = FinancialValidator(DB_PATH)
+
+        out = []
+        for result in validator.validate_many(items):
+            flags = [{
+                'type': flag.flag_type,
+                'severity': flag.severity,
+                'message': flag.message,
+                'details': flag.details
+            } for flag in result.flags]
+            if result.is_valid:
+                out.append({
+                    'status': 200,
+                    'valid': True,
+                    'remaining_amount': result.allowed_amount,
+                    'flags': flags,
+                })
+            else:
+                error_flag = next((f for f in result.flags if f.severity == 'error'), result.flags[0])
+                out.append({
+                    'status': 422,
+                    'valid': False,
+                    'error': error_flag.flag_type,
+                    'message': error_flag.message,
+                    'details': error_flag.details,
+                    'remaining_amount': result.allowed_amount,
+                    'attempted_amount': result.attempted_amount
+                })
+        valid = sum(1 for r in out if r['valid'])
+        return jsonify({
+            'results': out,
+            'summary': {'total': len(out), 'valid': valid, 'invalid': len(out) - valid}
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error en validate_batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/validations/project_risks/<project_name>')
 def get_project_risks(project_name):
     """Obtener flags de riesgo para un proyecto específico"""
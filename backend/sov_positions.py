@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Posición SOV por contrato e ítem (`contract_sov_positions`).
+
+Por (contract_id, item_code) guarda el tope del SOV (`cap`, NULL si el ítem
+no está en `client_sov_items`), lo aprobado a la fecha (EPs approved /
+invoiced / paid) y lo pendiente (EPs draft / submitted). Así la validación
+de tope de los endpoints de líneas EP es una sola lectura por contrato en vez
+de re-agregar `ep_lines` de todos los EPs del contrato en cada llamada.
+
+Mantenimiento (sin commit; dentro de la transacción del endpoint):
+- `set_caps` al cargar el SOV.
+- `detach_ep` / `attach_ep` alrededor de cualquier cambio de líneas, estado o
+  contrato de un EP: restan / suman sus montos por ítem en el bucket que
+  corresponde a su estado.
+
+Consistencia:
+
+    python backend/sov_positions.py verify  [--db data/chipax_data.db]
+    python backend/sov_positions.py rebuild [--db data/chipax_data.db]
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from typing import Any, Iterable, Optional
+
+APPROVED_STATUSES = ("approved", "invoiced", "paid")
+PENDING_STATUSES = ("draft", "submitted")
+TOLERANCE = 0.005
+
+_POSITIONS_SELECT = f"""
+SELECT contract_id, item_code, MAX(cap) AS cap,
+       SUM(approved) AS approved_to_date, SUM(pending) AS pending
+FROM (
+    SELECT contract_id, item_code, COALESCE(line_total, 0) AS cap,
+           0 AS approved, 0 AS pending
+    FROM client_sov_items WHERE item_code IS NOT NULL
+    UNION ALL
+    SELECT h.contract_id, l.item_code, NULL,
+           CASE WHEN h.status IN {APPROVED_STATUSES} THEN COALESCE(l.amount_period, 0) ELSE 0 END,
+           CASE WHEN h.status IN {PENDING_STATUSES} THEN COALESCE(l.amount_period, 0) ELSE 0 END
+    FROM ep_lines l JOIN ep_headers h ON h.id = l.ep_id
+    WHERE h.contract_id IS NOT NULL AND l.item_code IS NOT NULL
+)
+GROUP BY contract_id, item_code
+"""
+
+
+def _table_exists(con: sqlite3.Connection, name: str) -> bool:
+    cur = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    )
+    return cur.fetchone() is not None
+
+
+def ensure_sov_positions(con: sqlite3.Connection) -> None:
+    """Crea la tabla si falta y la siembra desde SOV + líneas existentes."""
+    if _table_exists(con, "contract_sov_positions"):
+        return
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS contract_sov_positions (
+          contract_id INTEGER NOT NULL,
+          item_code TEXT NOT NULL,
+          cap REAL,
+          approved_to_date REAL NOT NULL DEFAULT 0,
+          pending REAL NOT NULL DEFAULT 0,
+          updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (contract_id, item_code)
+        ) WITHOUT ROWID
+        """
+    )
+    if all(_table_exists(con, t) for t in ("client_sov_items", "ep_headers", "ep_lines")):
+        con.execute(
+            "INSERT INTO contract_sov_positions(contract_id, item_code, cap, approved_to_date, pending) "
+            + _POSITIONS_SELECT
+        )
+
+
+def _bucket(status: Optional[str]) -> Optional[str]:
+    if status in APPROVED_STATUSES:
+        return "approved_to_date"
+    if status in PENDING_STATUSES:
+        return "pending"
+    return None
+
+
+def set_caps(con: sqlite3.Connection, contract_id: int, caps: Iterable[tuple[str, Any]]) -> None:
+    """Actualiza el tope de los ítems cargados en el SOV del contrato."""
+    ensure_sov_positions(con)
+    con.executemany(
+        "INSERT INTO contract_sov_positions(contract_id, item_code, cap) VALUES(?,?,?) "
+        "ON CONFLICT(contract_id, item_code) DO UPDATE SET cap=excluded.cap, updated_at=CURRENT_TIMESTAMP",
+        [(contract_id, code, float(cap or 0)) for code, cap in caps],
+    )
+
+
+def _apply_ep(con: sqlite3.Connection, ep_id: int, sign: int) -> None:
+    ensure_sov_positions(con)
+    h = con.execute(
+        "SELECT contract_id, status FROM ep_headers WHERE id=?", (ep_id,)
+    ).fetchone()
+    if not h or h[0] is None:
+        return
+    col = _bucket(h[1])
+    if col is None:
+        return
+    rows = con.execute(
+        "SELECT item_code, SUM(COALESCE(amount_period,0)) FROM ep_lines "
+        "WHERE ep_id=? AND item_code IS NOT NULL GROUP BY item_code",
+        (ep_id,),
+    ).fetchall()
+    con.executemany(
+        f"INSERT INTO contract_sov_positions(contract_id, item_code, {col}) VALUES(?,?,?) "
+        f"ON CONFLICT(contract_id, item_code) DO UPDATE SET {col} = {col} + excluded.{col}, "
+        "updated_at=CURRENT_TIMESTAMP",
+        [(h[0], code, sign * float(amount or 0)) for code, amount in rows],
+    )
+
+
+def detach_ep(con: sqlite3.Connection, ep_id: int) -> None:
+    """Resta el aporte actual del EP (llamar antes de modificarlo)."""
+    _apply_ep(con, ep_id, -1)
+
+
+def attach_ep(con: sqlite3.Connection, ep_id: int) -> None:
+    """Suma el aporte actual del EP (llamar después de modificarlo)."""
+    _apply_ep(con, ep_id, 1)
+
+
+def load_positions(con: sqlite3.Connection, contract_id: int) -> dict[str, dict[str, Any]]:
+    """{item_code: {cap, approved_to_date, pending}} del contrato."""
+    ensure_sov_positions(con)
+    cur = con.execute(
+        "SELECT item_code, cap, approved_to_date, pending FROM contract_sov_positions WHERE contract_id=?",
+        (contract_id,),
+    )
+    return {
+        r[0]: {"cap": r[1], "approved_to_date": float(r[2] or 0), "pending": float(r[3] or 0)}
+        for r in cur.fetchall()
+    }
+
+
+def find_cap_violation(
+    positions: dict[str, dict[str, Any]],
+    items: Iterable[tuple[Any, Any]],
+) -> Optional[tuple[str, float, float, Any]]:
+    """Primer (item_code, cap, prev, amount) cuyo aprobado + monto excede el tope.
+
+    Igual que la validación línea a línea previa: cada línea se compara contra
+    lo aprobado a la fecha, solo para ítems presentes en el SOV.
+    """
+    for code, amount in items:
+        pos = positions.get(code) if code else None
+        if pos is None or pos["cap"] is None:
+            continue
+        cap = float(pos["cap"] or 0)
+        prev = pos["approved_to_date"]
+        if prev + float(amount or 0) > cap + 1e-6:
+            return code, cap, prev, amount
+    return None
+
+
+def rebuild(con: sqlite3.Connection) -> int:
+    ensure_sov_positions(con)
+    con.execute("DELETE FROM contract_sov_positions")
+    cur = con.execute(
+        "INSERT INTO contract_sov_positions(contract_id, item_code, cap, approved_to_date, pending) "
+        + _POSITIONS_SELECT
+    )
+    con.commit()
+    return cur.rowcount
+
+
+def verify(con: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Posiciones que no coinciden con SOV + líneas EP (lista vacía = OK)."""
+    ensure_sov_positions(con)
+    cur = con.execute(
+        f"""
+        WITH src AS ({_POSITIONS_SELECT})
+        SELECT s.contract_id, s.item_code,
+               s.cap, p.cap AS stored_cap,
+               s.approved_to_date, p.approved_to_date AS stored_approved_to_date,
+               s.pending, p.pending AS stored_pending
+        FROM src s
+        LEFT JOIN contract_sov_positions p
+          ON p.contract_id = s.contract_id AND p.item_code = s.item_code
+        WHERE p.item_code IS NULL
+           OR COALESCE(s.cap, -1) <> COALESCE(p.cap, -1)
+           OR ABS(s.approved_to_date - p.approved_to_date) > :tol
+           OR ABS(s.pending - p.pending) > :tol
+        UNION ALL
+        SELECT p.contract_id, p.item_code, NULL, p.cap, 0, p.approved_to_date, 0, p.pending
+        FROM contract_sov_positions p
+        LEFT JOIN src s ON s.contract_id = p.contract_id AND s.item_code = p.item_code
+        WHERE s.item_code IS NULL
+          AND (p.cap IS NOT NULL OR ABS(p.approved_to_date) > :tol OR ABS(p.pending) > :tol)
+        """,
+        {"tol": TOLERANCE},
+    )
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    from db_utils import _resolve_db_path
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["verify", "rebuild"])
+    ap.add_argument("--db", default=_resolve_db_path())
+    args = ap.parse_args(argv)
+
+    con = sqlite3.connect(args.db)
+    try:
+        if args.command == "rebuild":
+            print(f"contract_sov_positions reconstruido: {rebuild(con)} ítems")
+            return 0
+        diffs = verify(con)
+        for d in diffs[:50]:
+            print(f"  contrato {d['contract_id']} ítem {d['item_code']}: {d}")
+        print(f"contract_sov_positions: {len(diffs)} diferencias")
+        return 1 if diffs else 0
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+import sqlite3
+from dataclasses import asdict
+
+import ap_balance_ledger as ledger
+from validation_engine import FinancialValidator
+
+
+def _seed(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE purchase_order_lines (id INTEGER PRIMARY KEY, po_number TEXT, line_total REAL);
+        CREATE TABLE zoho_ordenes_final ("Purchase Order Number" TEXT, "Total" REAL);
+        CREATE TABLE ap_po_links (id INTEGER PRIMARY KEY, invoice_id INTEGER, po_id TEXT,
+                                  po_line_id TEXT, amount REAL, qty REAL);
+        CREATE TABLE ap_invoices (id INTEGER PRIMARY KEY, project_name TEXT);
+
+        INSERT INTO purchase_order_lines VALUES (1, 'OC-1', 1000), (2, 'OC-1', 500);
+        INSERT INTO zoho_ordenes_final VALUES ('OC-1', 1500);
+        INSERT INTO ap_po_links (invoice_id, po_id, po_line_id, amount, qty) VALUES
+            (10, 'OC-1', '1', 600, 2), (11, 'OC-1', '2', 100, NULL);
+        INSERT INTO ap_invoices VALUES (10, 'Obra A'), (11, 'Obra A'), (12, 'Obra A');
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def _comparable(result):
+    data = asdict(result)
+    data.pop("validated_at")
+    return data
+
+
+def test_ledger_seed_apply_and_verify(tmp_path):
+    db = str(tmp_path / "ledger.db")
+    conn = _seed(db)
+    v = FinancialValidator(db)
+    before = [
+        _comparable(v.validate_invoice_vs_po("OC-1", 300.0, "1")),
+        _comparable(v.validate_invoice_vs_po("OC-1", 900.0)),
+    ]
+    orphans_before = [f.details for f in v.get_project_risk_flags("Obra A") if f.flag_type == "orphan_invoices"]
+
+    ledger.ensure_ledger(conn)
+    conn.commit()
+    assert ledger.linked_amount(conn, "po_line", 1) == 600
+    assert ledger.linked_amount(conn, "po", "OC-1") == 700
+    assert ledger.verify(conn) == []
+
+    # La ruta con ledger produce los mismos resultados que la agregación
+    assert [
+        _comparable(v.validate_invoice_vs_po("OC-1", 300.0, "1")),
+        _comparable(v.validate_invoice_vs_po("OC-1", 900.0)),
+    ] == before
+    assert [f.details for f in v.get_project_risk_flags("Obra A")
+            if f.flag_type == "orphan_invoices"] == orphans_before
+
+    link = {"invoice_id": 12, "po_id": "OC-1", "po_line_id": 2, "amount": 50, "qty": 1}
+    conn.execute(
+        "INSERT INTO ap_po_links (invoice_id, po_id, po_line_id, amount, qty) VALUES (?,?,?,?,?)",
+        tuple(link.values()),
+    )
+    ledger.apply_links(conn, [link])
+    conn.commit()
+    assert ledger.linked_amount(conn, "po_line", "2") == 150
+    assert ledger.verify(conn) == []
+
+    # Un cambio fuera de la API queda detectado y rebuild lo corrige
+    conn.execute("DELETE FROM ap_po_links WHERE invoice_id = 12")
+    conn.commit()
+    diffs = ledger.verify(conn)
+    assert {(d["scope"], d["key"]) for d in diffs} == {("po", "OC-1"), ("po_line", "2"), ("invoice", "12")}
+    assert ledger.rebuild(conn) == 5
+    assert ledger.verify(conn) == []
+    conn.close()
+
+
+def test_confirm_and_revert_keep_ledger_in_sync(client):
+    from db_utils import db_conn
+
+    resp = client.post("/api/ap-match/confirm", json={
+        "invoice_id": 501,
+        "links": [
+            {"po_id": "PO-L1", "po_line_id": "L1", "amount": 400, "qty": 4},
+            {"po_id": "PO-L1", "po_line_id": "L2", "amount": 100},
+        ],
+    })
+    assert resp.status_code == 200, resp.get_json()
+    with db_conn() as conn:
+        assert ledger.linked_amount(conn, "po", "PO-L1") == 500
+        assert ledger.linked_amount(conn, "invoice", 501) == 500
+        assert ledger.verify(conn) == []
+        link_id = conn.execute(
+            "SELECT id FROM ap_po_links WHERE invoice_id=501 AND po_line_id='L2'"
+        ).fetchone()[0]
+
+    resp = client.post("/api/ap-match/revert", json={"invoice_id": 501, "link_ids": [link_id]})
+    assert resp.status_code == 200
+    assert resp.get_json()["links_reverted"] == 1
+    with db_conn() as conn:
+        assert ledger.linked_amount(conn, "po", "PO-L1") == 400
+        assert ledger.linked_amount(conn, "po_line", "L2") == 0
+        assert ledger.verify(conn) == []
+
+    resp = client.post("/api/ap-match/revert", json={"invoice_id": 501})
+    assert resp.get_json()["links_reverted"] == 1
+    with db_conn() as conn:
+        assert ledger.linked_amount(conn, "invoice", 501) == 0
+        assert ledger.verify(conn) == []
+
+    assert client.post("/api/ap-match/revert", json={}).status_code == 422
@@ -0,0 +1,58 @@
+import json
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import ar_rules_history  # noqa: E402
+from ar_rules_history import SeriesStats, load_history, render_all  # noqa: E402
+
+CSV = (
+    "timestamp,project_assign_rate,customer_name_rule_coverage\n"
+    "2025-01-01,0.50,0.40\n"
+    "2025-01-02,0.60,0.40\n"
+    "2025-01-03,oops,0.40\n"
+    "2025-01-04,0.70,0.35\n"
+    "2025-01-05,0.80,0.30\n"
+)
+
+
+def test_window_stats_match_badge_formulas():
+    s = SeriesStats.of([0.5, 0.6, 0.7, 0.8])
+    assert (s.rows, s.min, s.max) == (4, 0.5, 0.8)
+    assert abs(s.avg - 0.65) < 1e-12
+    assert abs(s.wma - (0.5 + 1.2 + 2.1 + 3.2) / 10) < 1e-12
+    assert abs(s.sd - 0.129099444873) < 1e-9
+    assert (s.streak_dir, s.streak_len) == (1, 4)
+    assert ar_rules_history.streak([0.3, 0.4, 0.4]) == (0, 0)
+    assert ar_rules_history.streak([0.9, 0.5, 0.6, 0.4, 0.3]) == (-1, 3)
+    assert SeriesStats.of([]).avg is None
+
+
+def test_history_parsed_once_cached_and_rendered(tmp_path):
+    hist_path = tmp_path / "ar_rules_history.csv"
+    hist_path.write_text(CSV, encoding="utf-8")
+    cache = tmp_path / "cache" / "history.bin"
+
+    hist = load_history(hist_path, cache)
+    assert len(hist) == 4  # invalid row skipped
+    assert load_history(hist_path) is hist
+    assert hist.window(2) is hist.window(2)
+
+    ar_rules_history._loaded.clear()
+    cached = load_history(hist_path, cache)
+    assert cached is not hist and cached.rows() == hist.rows() and cached.timestamps == hist.timestamps
+
+    written = render_all(hist, tmp_path / "badges", short_window=3)
+    assert sorted(written) == sorted([
+        "ar_rules_trend.svg", "ar_rules_trend_wma.svg", "ar_rules_volatility.svg",
+        "ar_rules_volatility.json", "ar_rules_weekly.json", "ar_rules_sparkline.svg", "ar_rules_streak.svg",
+    ])
+    weekly = json.loads(written["ar_rules_weekly.json"].read_text(encoding="utf-8"))
+    assert (weekly["rows"], weekly["assign_min"], weekly["coverage_max"]) == (3, 0.6, 0.4)
+    assert "assign ↑4" in written["ar_rules_streak.svg"].read_text(encoding="utf-8")
+
+    hist_path.write_text(CSV + "2025-01-06,0.75,0.30\n", encoding="utf-8")
+    assert len(load_history(hist_path, cache)) == 5
@@ -0,0 +1,84 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import bank_recon_state  # noqa: E402
+import create_finance_views  # noqa: E402
+
+
+def _seed(db_path):
+    con = sqlite3.connect(db_path)
+    con.executescript(
+        """
+        DROP TABLE IF EXISTS bank_movements;
+        CREATE TABLE bank_movements(
+          id INTEGER PRIMARY KEY, fecha TEXT, bank_name TEXT, account_number TEXT, glosa TEXT,
+          monto REAL, moneda TEXT, tipo TEXT, saldo REAL, referencia TEXT, fuente TEXT
+        );
+        DROP TABLE IF EXISTS recon_links;
+        CREATE TABLE recon_links(
+          id INTEGER PRIMARY KEY AUTOINCREMENT, reconciliation_id INTEGER, bank_movement_id INTEGER,
+          sales_invoice_id INTEGER, purchase_invoice_id INTEGER, expense_id INTEGER,
+          payroll_id INTEGER, tax_id INTEGER, amount REAL
+        );
+        """
+    )
+    con.executemany(
+        "INSERT INTO bank_movements(fecha, glosa, monto) VALUES(?,?,?)",
+        [(f"2025-03-0{i}", f"mov {i}", i * 100) for i in range(1, 5)],
+    )
+    con.executemany(
+        "INSERT INTO recon_links(bank_movement_id, amount) VALUES(?,?)", [(2, 60), (2, 40)]
+    )
+    con.commit()
+    return con
+
+
+def test_state_seeded_maintained_and_verified(client, monkeypatch):
+    import server
+
+    db = server.DB_PATH
+    monkeypatch.setenv("DB_PATH", str(db))
+    con = _seed(db)
+    assert bank_recon_state.ensure_recon_state(con) is True
+    assert con.execute(
+        "SELECT id, reconciled_amount, reconciled_state FROM bank_movements WHERE reconciled_amount > 0"
+    ).fetchall() == [(2, 100.0, "confirmado")]
+    assert bank_recon_state.pending_movement_ids(con) == [4, 3, 1]
+    create_finance_views.create_views(con)
+    con.commit()
+
+    # confirmar (camino legacy con links) actualiza el estado en la misma transacción
+    res = client.post(
+        "/api/conciliacion/confirmar",
+        json={"context": "bank", "links": [{"bank_movement_id": 3, "sales_invoice_id": 7, "amount": 300}]},
+    )
+    assert res.status_code in (200, 201)
+    assert con.execute(
+        "SELECT reconciled_state FROM bank_movements WHERE id=3"
+    ).fetchone() == ("confirmado",)
+    assert bank_recon_state.verify(con) == []
+
+    conf = client.get("/api/finanzas/cartola_bancaria?estado=confirmado&page=1").get_json()
+    assert sorted(r["id"] for r in conf["items"]) == [2, 3]
+    assert {r["estado"] for r in conf["items"]} == {"confirmado"}
+    pend = client.get("/api/finanzas/cartola_bancaria?estado=pendiente&page=1").get_json()
+    assert sorted(r["id"] for r in pend["items"]) == [1, 4] and pend["meta"]["total"] == 2
+
+    plan = con.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM v_cartola_bancaria WHERE estado = 'pendiente'"
+    ).fetchall()
+    assert any("ix_bank_recon_state" in str(r[-1]) for r in plan)
+
+    # Drift (link borrado por fuera) -> verify lo detecta, rebuild lo corrige
+    con.execute("DELETE FROM recon_links WHERE bank_movement_id=2")
+    con.commit()
+    assert [d["id"] for d in bank_recon_state.verify(con)] == [2]
+    assert bank_recon_state.main(["verify", "--db", str(db)]) == 1
+    assert bank_recon_state.main(["rebuild", "--db", str(db)]) == 0
+    assert bank_recon_state.verify(con) == []
+    con.close()
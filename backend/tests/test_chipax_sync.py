@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+def _wait(client, url, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        body = client.get(url).get_json()
+        if body["status"] in ("completed", "failed"):
+            return body
+        time.sleep(0.02)
+    raise AssertionError("el sync no terminó")
+
+
+def test_sync_chipax_runs_in_background_one_per_db(client, monkeypatch):
+    import chipax_sync
+
+    release = threading.Event()
+    calls = []
+
+    def fake_run(db_path=None, raw_dir=None, progress=None):
+        calls.append(db_path)
+        progress({"rows_scanned": 3, "inserted": 2, "updated": 0, "skipped": 1, "files": 1})
+        release.wait(5)
+        return {"ap_inserted": 2, "rows_skipped": 1}
+
+    monkeypatch.setattr(chipax_sync, "_load_runner", lambda: fake_run)
+
+    res = client.post("/api/reconciliaciones/sync_chipax")
+    assert res.status_code == 202
+    first = res.get_json()
+    assert first["already_running"] is False
+
+    again = client.post("/api/reconciliaciones/sync_chipax").get_json()
+    assert again["job_id"] == first["job_id"] and again["already_running"] is True
+
+    deadline = time.time() + 5
+    while client.get(first["status_url"]).get_json()["progress"]["rows_scanned"] == 0:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    running = client.get(first["status_url"]).get_json()
+    assert running["status"] == "running" and running["progress"]["skipped"] == 1
+
+    release.set()
+    done = _wait(client, first["status_url"])
+    assert done["status"] == "completed" and done["metrics"]["ap_inserted"] == 2
+    assert len(calls) == 1
+
+    # Terminado el anterior, un nuevo POST crea otro job
+    release.clear()
+    release.set()
+    nxt = client.post("/api/reconciliaciones/sync_chipax").get_json()
+    assert nxt["job_id"] != first["job_id"] and nxt["already_running"] is False
+    _wait(client, nxt["status_url"])
+    assert client.get("/api/reconciliaciones/sync_chipax/nope").status_code == 404
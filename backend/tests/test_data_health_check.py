@@ -0,0 +1,79 @@
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import data_health_check as dhc  # noqa: E402
+
+
+def _make_db(path):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE bank_movements(id INTEGER PRIMARY KEY, fecha TEXT, monto REAL)")
+    con.execute("CREATE TABLE expenses(id INTEGER PRIMARY KEY, fecha TEXT)")
+    con.executemany(
+        "INSERT INTO bank_movements(fecha, monto) VALUES(?, ?)",
+        [("2024-01-01", 10), ("2024-03-01", 20)],
+    )
+    con.execute("INSERT INTO expenses(fecha) VALUES('2024-02-01')")
+    con.commit()
+    con.close()
+
+
+def test_incremental_report_skips_unchanged_tables(tmp_path):
+    db = str(tmp_path / "h.db")
+    state = str(tmp_path / "h.health.json")
+    _make_db(db)
+
+    first = dhc.build_report(db, state)
+    assert first["integrity_mode"] == "full"
+    assert first["integrity_check"] == "ok"
+    assert sorted(first["tables_changed"]) == ["bank_movements", "expenses"]
+    stored = json.loads(Path(state).read_text(encoding="utf-8"))
+    assert stored["tables"]["bank_movements"]["rows"] == 2
+
+    second = dhc.build_report(db, state)
+    assert second["integrity_mode"] == "quick"
+    assert second["tables_changed"] == []
+    assert second["integrity_tables"] == {}
+    bm = next(t for t in second["tables"] if t["table"] == "bank_movements")
+    assert bm["cached"] and bm["rows"] == 2 and bm["date_max"] == "2024-03-01"
+
+    con = sqlite3.connect(db)
+    con.execute("INSERT INTO bank_movements(fecha, monto) VALUES('2024-05-01', 5)")
+    con.commit()
+    con.close()
+
+    third = dhc.build_report(db, state)
+    assert third["tables_changed"] == ["bank_movements"]
+    assert third["integrity_tables"] == {"bank_movements": "ok"}
+    bm = next(t for t in third["tables"] if t["table"] == "bank_movements")
+    assert not bm["cached"] and bm["rows"] == 3 and bm["date_max"] == "2024-05-01"
+    assert third["row_counts_total"] == 4
+
+    con = sqlite3.connect(db)
+    con.execute("DELETE FROM bank_movements WHERE fecha = '2024-03-01'")
+    con.commit()
+    con.close()
+
+    fourth = dhc.build_report(db, state)
+    assert fourth["tables_changed"] == ["bank_movements"]
+    bm = next(t for t in fourth["tables"] if t["table"] == "bank_movements")
+    assert bm["rows"] == 2
+
+    forced = dhc.build_report(db, state, full=True)
+    assert forced["integrity_mode"] == "full"
+    assert len(forced["tables_changed"]) == 2
+    assert "sin cambios" not in dhc.render_human(forced)
+
+
+def test_build_report_without_state_is_full(tmp_path):
+    db = str(tmp_path / "n.db")
+    _make_db(db)
+    report = dhc.build_report(db)
+    assert report["integrity_mode"] == "full"
+    assert not any(t["cached"] for t in report["tables"])
+    assert not (tmp_path / "n.db.health.json").exists()
@@ -0,0 +1,90 @@
+import sqlite3
+import threading
+
+import db_utils_centralized as dbc
+
+
+def _make_db(path):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE a(id INTEGER PRIMARY KEY, v TEXT)")
+    con.execute("CREATE TABLE b(id INTEGER PRIMARY KEY)")
+    con.executemany("INSERT INTO a(v) VALUES(?)", [("x",), ("y",)])
+    con.commit()
+    con.close()
+
+
+def test_reuse_connections_shares_one_warm_connection(tmp_path):
+    db = str(tmp_path / "reuse.db")
+    _make_db(db)
+    with dbc.reuse_connections():
+        with dbc.get_db_connection(db) as c1:
+            pass
+        with dbc.get_db_connection(db, row_factory=False) as c2:
+            assert c2.row_factory is None
+        assert c1 is c2
+        assert dbc.get_table_count("a", db) == 2
+        other = {}
+
+        def worker():
+            with dbc.reuse_connections(), dbc.get_db_connection(db) as c:
+                other["conn"] = c
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        assert other["conn"] is not c1
+    # Al salir del bloque externo la conexión se cierra
+    assert dbc._thread_connections() == {}
+    # Sin modo reuse cada llamada abre una conexión nueva
+    with dbc.get_db_connection(db) as c3:
+        pass
+    assert c3 is not c1
+
+
+def test_pragma_profile_and_uncommitted_work_discarded(tmp_path):
+    db = str(tmp_path / "profile.db")
+    _make_db(db)
+    with dbc.reuse_connections():
+        with dbc.get_db_connection(db) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+            conn.execute("INSERT INTO a(v) VALUES('sin commit')")
+        assert dbc.get_table_count("a", db) == 2
+        assert dbc.execute_update("INSERT INTO a(v) VALUES('z')", db_path=db) == 1
+        assert dbc.get_table_count("a", db) == 3
+
+
+def test_scan_tables_and_health(tmp_path):
+    db = str(tmp_path / "scan.db")
+    _make_db(db)
+    scan = dbc.scan_tables(db_path=db)
+    assert [(s["table"], s["count"]) for s in scan] == [("a", 2), ("b", 0)]
+    assert scan[0]["columns"] == ["id", "v"]
+    assert dbc.create_table_if_not_exists("c", "(id INTEGER)", db) is True
+    assert dbc.drop_table_if_exists("c", db) is True
+    health = dbc.check_database_health(db)
+    assert health["status"] == "healthy"
+    assert health["pragmas"]["journal_mode"] == "wal"
+    assert health["statement_cache_size"] == dbc.STATEMENT_CACHE_SIZE
+
+
+def test_nested_helper_keeps_outer_uncommitted_write(tmp_path):
+    db = str(tmp_path / "nested.db")
+    _make_db(db)
+    with dbc.reuse_connections():
+        with dbc.get_db_connection(db) as c:
+            c.execute("INSERT INTO b(id) VALUES(1)")
+            assert dbc.table_exists("b", db)
+            assert c.row_factory is sqlite3.Row
+            c.commit()
+        assert dbc.get_table_count("b", db) == 1
+        try:
+            with dbc.get_db_connection(db) as c:
+                c.execute("INSERT INTO b(id) VALUES(2)")
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        assert dbc.get_table_count("b", db) == 1
+        assert dbc._thread_depths() == {}
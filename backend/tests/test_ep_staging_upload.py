@@ -0,0 +1,72 @@
+import io
+import json
+
+from db_utils import db_conn
+
+CSV = (
+    "Codigo;Descripcion;Cantidad;Precio Unitario;Monto;Obs\n"
+    "IT-1;Excavación;2;1000;;x\n"
+    "IT-2;Hormigón;;;\"2.500,5\";y\n"
+    "IT-1;Excavación;1;500;;z\n"
+    "IT-3;Moldaje;3;100;;w\n"
+    "IT-3;Moldaje;1;100;;v\n"
+).encode("utf-8")
+
+
+def _upload(client, data, expected=201):
+    r = client.post("/api/ep/import/staging/upload", data=data, content_type="multipart/form-data")
+    assert r.status_code == expected, r.get_data(as_text=True)
+    return r.get_json()
+
+
+def test_upload_streams_rows_in_chunks_and_promotes(client, monkeypatch):
+    import ep_api
+
+    monkeypatch.setattr(ep_api, "STAGING_CHUNK_ROWS", 2)
+    staged = _upload(client, {"file": (io.BytesIO(CSV), "ep.csv"), "project_id": "55"})
+    assert staged["row_count"] == 5
+    assert staged["column_map"] == {
+        "item_code": "Codigo", "description": "Descripcion", "qty_period": "Cantidad",
+        "unit_price": "Precio Unitario", "amount_period": "Monto",
+    }
+    sid = staged["staging_id"]
+
+    validated = client.post(f"/api/ep/import/staging/{sid}/validate").get_json()
+    assert validated["rows"] == 5
+    assert validated["total_amount"] == 2000 + 2500.5 + 500 + 300 + 100
+
+    promoted = client.post(f"/api/ep/import/staging/{sid}/promote", json={}).get_json()
+    assert promoted["lines"] == 5
+    progress = client.get(f"/api/ep/import/staging/{sid}").get_json()
+    assert (progress["status"], progress["rows_validated"], progress["rows_promoted"]) == ("promoted", 5, 5)
+    assert progress["source_name"] == "ep.csv"
+
+    summary = client.get(f"/api/ep/{promoted['ep_id']}/summary").get_json()
+    assert summary["lines_subtotal"] == 5400.5
+
+
+def test_inference_uses_sample_values_and_legacy_payload_still_validates(client):
+    import ep_api
+
+    staged = client.post("/api/ep/import/staging", json={"project_id": 56, "rows": [
+        {"Codigo": "A", "Cantidad total": "n/a", "Monto": 10},
+        {"Codigo": "B", "Cantidad total": "ver anexo", "Monto": 20},
+    ]}).get_json()
+    # "Cantidad total" parece qty/amount por cabecera, pero sus valores no son numéricos
+    assert staged["column_map"] == {"item_code": "Codigo", "amount_period": "Monto"}
+
+    bad = _upload(client, {"file": (io.BytesIO(b"a,b\n"), "vacio.csv"), "project_id": "56"}, expected=422)
+    assert bad["error"] == "invalid_payload"
+
+    # Staging previo a la tabla por filas: row_count NULL y filas en payload_json
+    with db_conn(ep_api._db_path()) as con:
+        cur = con.execute(
+            "INSERT INTO ep_import_staging(project_id, payload_json, column_map_json, status) "
+            "VALUES(56, ?, ?, 'draft')",
+            (json.dumps([{"Codigo": "A", "Monto": 7}]), json.dumps({"item_code": "Codigo", "amount_period": "Monto"})),
+        )
+        legacy_id = cur.lastrowid
+        con.commit()
+    validated = client.post(f"/api/ep/import/staging/{legacy_id}/validate").get_json()
+    assert (validated["rows"], validated["total_amount"]) == (1, 7)
+    assert client.get(f"/api/ep/import/staging/{legacy_id}").get_json()["row_count"] == 1
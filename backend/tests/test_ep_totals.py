@@ -0,0 +1,52 @@
+import ep_api
+import ep_totals
+from db_utils import db_conn
+
+
+def _post(client, path, payload, expected=200):
+    r = client.post(path, json=payload)
+    assert r.status_code == expected, r.get_data(as_text=True)
+    return r.get_json()
+
+
+def test_ep_totals_follow_writes_and_match_rebuild(client):
+    ep_id = _post(client, "/api/ep", {"project_id": 77, "ep_number": "EP-T1", "retention_pct": 0.05},
+                  expected=201)["ep_id"]
+    _post(client, f"/api/ep/{ep_id}/lines/bulk", {"lines": [
+        {"item_code": "A", "amount_period": 1000},
+        {"item_code": "B", "qty_period": 2, "unit_price": 250},
+    ]})
+    _post(client, f"/api/ep/{ep_id}/deductions/bulk", {"deductions": [
+        {"type": "penalty", "amount": 100},
+        {"type": "advance_amortization", "amount": 50},
+    ]})
+
+    summary = client.get(f"/api/ep/{ep_id}/summary").get_json()
+    assert summary["lines_subtotal"] == 1500
+    assert summary["deductions"] == {"advance_amortization": 50, "penalty": 100}
+    assert summary["deductions_total"] == 150
+    assert summary["retention_computed"] == 75
+    assert summary["amount_net"] == 1350
+
+    items = client.get("/api/projects/77/ep").get_json()["items"]
+    row = next(i for i in items if i["id"] == ep_id)
+    assert (row["amount_period"], row["deductions"]) == (1500, 150)
+
+    _post(client, f"/api/ep/{ep_id}/approve", {})
+    inv = _post(client, f"/api/ep/{ep_id}/generate-invoice", {})
+    assert inv["amount_net"] == 1350
+    assert inv["retention_recorded"] == 75
+    _post(client, f"/api/ep/{ep_id}/retention/release-partial", {"amount": 25})
+
+    with db_conn(ep_api._db_path()) as con:
+        totals = ep_totals.get_ep_totals(con, ep_id)
+        assert (totals["retention_held"], totals["retention_released"]) == (50, 25)
+        assert ep_totals.verify(con) == []
+
+        # Escritura directa fuera de la API: verify la detecta y rebuild corrige
+        con.execute("INSERT INTO ep_lines(ep_id, item_code, amount_period) VALUES(?, 'C', 10)", (ep_id,))
+        con.commit()
+        assert [d["ep_id"] for d in ep_totals.verify(con)] == [ep_id]
+        ep_totals.rebuild(con)
+        assert ep_totals.verify(con) == []
+        assert ep_totals.get_ep_totals(con, ep_id)["lines_subtotal"] == 1510
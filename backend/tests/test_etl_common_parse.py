@@ -7,7 +7,17 @@ TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
 if str(TOOLS_DIR) not in sys.path:
     sys.path.append(str(TOOLS_DIR))
 
-from etl_common import parse_number  # noqa: E402
+from etl_common import (  # noqa: E402
+    infer_decimal,
+    norm_cache_clear,
+    norm_cache_stats,
+    norm_colname,
+    norm_colnames,
+    norm_text,
+    norm_texts,
+    parse_number,
+    parse_numbers,
+)
 
 
 def test_parse_number_locale_variants():
@@ -30,3 +40,36 @@ def test_parse_number_locale_variants():
 def test_parse_number_returns_zero_on_bad_input():
     assert parse_number(None) == 0.0
     assert parse_number("not-a-number") == 0.0
+
+
+def test_parse_numbers_matches_scalar_and_infers_decimal_per_column():
+    column = ["1.000", "2.500,75", None, 7, "", "USD 3,5", "(1.000)", "1.000", "abc", "12"]
+    for decimal in (",", "."):
+        assert parse_numbers(column, decimal) == [parse_number(v, decimal) for v in column]
+    # "1.000" alone is ambiguous (scalar: 1.0); the column says "," is decimal
+    assert parse_number("1.000") == 1.0
+    assert infer_decimal(["1.000", "2.500,75", "3,5"]) == ","
+    assert parse_numbers(column) == [parse_number(v, ",") for v in column]
+    assert parse_numbers(column)[0] == 1000.0
+    # Sin evidencia en la columna: inferencia por celda, igual que el escalar
+    plain = ["1.000", "1,000", "42"]
+    assert infer_decimal(plain) is None
+    assert parse_numbers(plain) == [parse_number(v) for v in plain]
+
+
+def test_norm_text_memoized_with_counters():
+    norm_cache_clear()
+    names = ["Constructora Ñandú\u00a0", "  Café  ", "Constructora Ñandú\u00a0", None, 12]
+    assert norm_texts(names) == ["Constructora Nandu", "Cafe", "Constructora Nandu", "", "12"]
+    assert norm_text("Constructora Ñandú\u00a0") == "Constructora Nandu"
+    stats = norm_cache_stats()["norm_text"]
+    # norm_texts deduplica en el lote; la llamada suelta es un hit del LRU
+    assert (stats["misses"], stats["hits"]) == (4, 1) and stats["size"] == 4
+    assert norm_text(["no", "hashable"]) == "['no', 'hashable']"
+    assert norm_texts([1, 1.0, True, 1]) == ["1", "1.0", "True", "1"]
+
+    assert norm_colnames(["Precio Unitario ($)", "Descripción"]) == ["precio_unitario_$", "descripcion"]
+    assert norm_colname("Precio Unitario ($)") == "precio_unitario_$"
+    assert norm_cache_stats()["norm_colname"]["hits"] == 1
+    norm_cache_clear()
+    assert norm_cache_stats()["norm_text"]["size"] == 0
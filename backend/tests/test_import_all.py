@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import import_all  # noqa: E402
+
+
+def _manifest(tmp_path: Path) -> Path:
+    (tmp_path / "vendors.csv").write_text(
+        "RUT,Vendor Name\n76.086.428-5,Proveedor Uno\n,Sin rut\n", encoding="utf-8"
+    )
+    (tmp_path / "bank.csv").write_text(
+        "Fecha,Glosa,Monto,ID\n2025-01-02,Pago,-1000,B1\n2025-01-03,Abono,2500,B2\n", encoding="utf-8"
+    )
+    manifest = tmp_path / "imports.json"
+    # Orden inverso a propósito: el orquestador debe reordenar por etapa
+    manifest.write_text(
+        json.dumps(
+            {
+                "sources": [
+                    {"kind": "bank_movements", "path": "bank.csv", "options": {"source": "TEST"}},
+                    {"kind": "zoho_vendors", "path": "vendors.csv"},
+                ]
+            }
+        ),
+        encoding="utf-8",
+    )
+    return manifest
+
+
+def test_import_all_applies_in_stage_order_and_skips_unchanged(tmp_path):
+    db = tmp_path / "all.db"
+    sqlite3.connect(str(db)).close()
+    sources = import_all.load_manifest(str(_manifest(tmp_path)))
+
+    first = import_all.run(sources, str(db), workers=2)
+    assert [s["kind"] for s in first["sources"]] == ["zoho_vendors", "bank_movements"]
+    assert all(s["status"] == "imported" for s in first["sources"])
+    assert first["sources"][0]["counters"] == {"inserted": 1, "updated": 0, "skipped": 1}
+    assert list(first["stages"]) == ["zoho_vendors", "bank_movements"]
+    assert first["stages"]["bank_movements"]["rows"] == 2
+
+    con = sqlite3.connect(str(db))
+    assert con.execute("SELECT COUNT(*) FROM bank_movements WHERE fuente='TEST'").fetchone()[0] == 2
+    assert con.execute("SELECT COUNT(*) FROM import_file_log").fetchone()[0] == 2
+
+    second = import_all.run(sources, str(db), workers=0)
+    assert {s["status"] for s in second["sources"]} == {"skipped"}
+    assert second["stages"]["zoho_vendors"]["skipped"] == 1
+
+    forced = import_all.run(sources, str(db), force=True)
+    assert {s["status"] for s in forced["sources"]} == {"imported"}
+    assert con.execute("SELECT COUNT(*) FROM bank_movements").fetchone()[0] == 2
+
+
+def test_import_all_reports_errors_per_source(tmp_path):
+    db = tmp_path / "all.db"
+    sqlite3.connect(str(db)).close()
+    src = import_all.Source(kind="taxes", path=str(tmp_path / "nope.csv"))
+    report = import_all.run([src], str(db))
+    assert report["sources"][0]["status"] == "error"
+    assert report["stages"]["taxes"]["errors"] == 1
+
+
+def test_import_all_bounds_files_parsed_ahead_of_writer(tmp_path, monkeypatch):
+    db = tmp_path / "all.db"
+    sqlite3.connect(str(db)).close()
+    sources = []
+    for i in range(4):
+        p = tmp_path / f"bank{i}.csv"
+        p.write_text(f"Fecha,Glosa,Monto,ID\n2025-01-0{i + 1},Mov,100,B{i}\n", encoding="utf-8")
+        sources.append(import_all.Source(kind="bank_movements", path=str(p)))
+
+    # Archivos enviados a parsear y aún no aplicados por el escritor
+    live, peak = [0], [0]
+    apply = import_all.STAGE_BY_KIND["bank_movements"].apply
+
+    class CountingFuture(import_all._InlineFuture):
+        def __init__(self, fn, *args):
+            super().__init__(fn, *args)
+            live[0] += 1
+            peak[0] = max(peak[0], live[0])
+
+    def counting_apply(conn, src, rows, db_path):
+        live[0] -= 1
+        return apply(conn, src, rows, db_path)
+
+    monkeypatch.setattr(import_all, "_InlineFuture", CountingFuture)
+    monkeypatch.setitem(
+        import_all.STAGE_BY_KIND, "bank_movements", import_all.Stage("bank_movements", counting_apply)
+    )
+    report = import_all.run(sources, str(db), max_in_flight=2)
+    assert [s["status"] for s in report["sources"]] == ["imported"] * 4
+    assert peak[0] == 2
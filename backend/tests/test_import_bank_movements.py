@@ -0,0 +1,49 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import import_bank_movements  # noqa: E402
+
+ROWS = [
+    {"Fecha": "2025-02-03", "Glosa": "Abono", "Monto": "$2500000", "ID": "B1"},
+    {"Fecha": "2025-02-01", "Glosa": "Pago", "Monto": "(1.000,50)", "Saldo": "10.000,00", "ID": "B2"},
+    {"Fecha": "2025-02-02", "Glosa": "Repetido", "Monto": "9", "ID": "B1"},
+    {"Fecha": "2025-02-04", "Glosa": "Sin id", "Monto": "7"},
+]
+
+
+def _rows(con):
+    return con.execute(
+        "SELECT external_id, glosa, monto, tipo, saldo, fuente FROM bank_movements ORDER BY id"
+    ).fetchall()
+
+
+def test_set_based_import_keeps_first_external_id_and_is_idempotent(tmp_path):
+    con = sqlite3.connect(tmp_path / "bank.db")
+    result, min_fecha = import_bank_movements.load_movements(con, ROWS, "CHIPAX", chunk_size=2)
+    assert (result.rows, result.inserted, result.chunks, min_fecha) == (4, 3, 2, "2025-02-01")
+    assert _rows(con) == [
+        ("B1", "Abono", 2500000.0, "credit", 0.0, "CHIPAX"),
+        ("B2", "Pago", -1000.5, "debit", 10000.0, "CHIPAX"),
+        (None, "Sin id", 7.0, "credit", 0.0, "CHIPAX"),
+    ]
+
+    # Re-import: external_id ya cargados se respetan; las filas sin id se agregan como antes
+    assert import_bank_movements.import_rows(con, ROWS[:2], "OTRO") == 2
+    assert len(_rows(con)) == 3 and _rows(con)[0][-1] == "CHIPAX"
+    con.close()
+
+
+def test_legacy_table_without_optional_columns(tmp_path):
+    con = sqlite3.connect(tmp_path / "legacy.db")
+    con.execute(
+        "CREATE TABLE bank_movements(id INTEGER PRIMARY KEY, fecha TEXT, glosa TEXT, monto REAL, external_id TEXT)"
+    )
+    result, _ = import_bank_movements.load_movements(con, ROWS, "X")
+    assert result.inserted == 3
+    assert con.execute("SELECT SUM(monto) FROM bank_movements").fetchone()[0] == 2499006.5
+    con.close()
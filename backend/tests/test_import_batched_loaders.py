@@ -0,0 +1,78 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+
+def _import_tools(*names):
+    # backend/rut_utils.py sombrea al de tools/: los importadores usan el de tools
+    import importlib
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location("rut_utils", TOOLS_DIR / "rut_utils.py")
+    tools_rut = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tools_rut)
+    previous = sys.modules.get("rut_utils")
+    sys.modules["rut_utils"] = tools_rut
+    try:
+        return [importlib.import_module(n) for n in names]
+    finally:
+        if previous is not None:
+            sys.modules["rut_utils"] = previous
+        else:
+            sys.modules.pop("rut_utils", None)
+
+
+import_expenses, import_payroll, import_previred = _import_tools(
+    "import_expenses", "import_payroll", "import_previred"
+)
+
+RUT = "76086428-5"
+
+
+def test_payroll_and_previred_dedupe_across_chunks_and_runs(tmp_path):
+    con = sqlite3.connect(tmp_path / "rrhh.db")
+    import_payroll.ensure_table(con)
+    slip = {"Periodo": "2025-01", "RUT": RUT, "Bruto": "1.000", "Liquido": "800", "FechaPago": "2025-01-31"}
+    rows = [slip, dict(slip, Nombre="otra fila igual"), dict(slip, Periodo="2025-02"), {"Periodo": "2025-01", "RUT": "1-1"}]
+    rows += [{"Periodo": None, "Bruto": "5"}] * 2  # sin periodo: nunca se consideran duplicados
+
+    counters = import_payroll.import_rows(con, rows, "RRHH", chunk_size=2)
+    assert counters == {"inserted": 4, "duplicates": 1, "invalid_rut": 1}
+    assert con.execute("SELECT bruto, fuente FROM payroll_slips WHERE id=1").fetchone() == (1000.0, "RRHH")
+
+    again: dict = {}
+    import_payroll.upsert_row(con, slip, "RRHH", allow_invalid_rut=False, counters=again)
+    assert again == {"duplicates": 1, "inserted": 0}
+
+    import_previred.ensure_table(con)
+    con.commit()
+    contrib = {"Periodo": "2025-01", "RUT": RUT, "RUT_Empresa": RUT, "Monto": "50.000"}
+    out = import_previred.import_rows(con, [contrib, contrib, dict(contrib, Monto="1")], None, commit_every=0)
+    assert out == {"inserted": 2, "duplicates": 1}
+    con.rollback()  # commit_every=0: la transacción es del llamador
+    assert con.execute("SELECT COUNT(*) FROM previred_contributions").fetchone()[0] == 0
+    con.close()
+
+
+def test_expenses_match_by_comprobante_or_non_empty_combination(tmp_path):
+    con = sqlite3.connect(tmp_path / "gastos.db")
+    import_expenses.ensure_table(con)
+    base = {"Fecha": "2025-03-01", "Monto": "1.500", "Descripcion": "Arriendo", "RUT": RUT}
+    rows = [
+        dict(base, Comprobante="C-1"),
+        {"Fecha": "2025-04-01", "Monto": "9", "Comprobante": "C-1"},  # mismo comprobante
+        dict(base, Descripcion=None),  # campos vacíos no participan de la combinación
+        dict(base, Monto="2.000"),
+        {"Fecha": "2025-03-02", "Monto": "10", "RUT": "11111111-2"},  # RUT inválido
+    ]
+    counters = import_expenses.import_rows(con, rows, "CHIPAX", None)
+    assert counters == {"inserted": 2, "duplicates": 2, "invalid_rut": 1}
+    assert con.execute("SELECT monto, status, comprobante FROM expenses ORDER BY id").fetchall() == [
+        (1500.0, "emitido", "C-1"),
+        (2000.0, "emitido", None),
+    ]
+    con.close()
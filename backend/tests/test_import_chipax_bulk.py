@@ -0,0 +1,107 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+from bulk_load import bulk_upsert  # noqa: E402
+import import_chipax_conciliacion as chipax  # noqa: E402
+
+
+def test_bulk_upsert_counts_inserts_and_updates_across_chunks(tmp_path):
+    con = sqlite3.connect(str(tmp_path / "bulk.db"))
+    con.execute("CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, k TEXT, v REAL)")
+    con.execute("CREATE UNIQUE INDEX ux_t_k ON t(k)")
+    con.execute("INSERT INTO t (k, v) VALUES ('a', 1)")
+    con.commit()
+
+    rows = [("a", 10.0), ("b", 2.0), ("c", 3.0), ("b", 20.0), ("d", 4.0)]
+    res = bulk_upsert(con, "t", ("k", "v"), iter(rows), conflict=("k",), chunk_size=2)
+
+    assert (res.rows, res.inserted, res.updated, res.chunks) == (5, 3, 2, 3)
+    assert dict(con.execute("SELECT k, v FROM t")) == {"a": 10.0, "b": 20.0, "c": 3.0, "d": 4.0}
+    # Staging table is dropped after the load
+    assert con.execute("SELECT COUNT(*) FROM temp.sqlite_master").fetchone()[0] == 0
+
+
+def _write(path: Path, text: str) -> None:
+    path.write_text(text, encoding="utf-8")
+
+
+def test_chipax_run_is_idempotent_and_reports_throughput(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    db = tmp_path / "chipax.db"
+    sqlite3.connect(str(db)).close()
+    _write(
+        raw / "2025_Facturas compra_conciliacion.csv",
+        "RUT,Folio,Fecha Emision,Razon Social,Monto Total (CLP),Proyecto\n"
+        "76.123.456-7,10,2025-01-02,Prov A,\"1.190,00\",Obra 1\n"
+        "76.123.456-7,11,2025-01-03,Prov A,500,\n"
+        "76.123.456-7,,2025-01-03,Sin folio,1,\n",
+    )
+    _write(
+        raw / "2025_Facturas venta_conciliacion.csv",
+        "RUT,Folio,Fecha Emision,Razon Social,Monto Total (CLP)\n"
+        "77.000.000-1,1,2025-02-01,Cliente,1000\n",
+    )
+    _write(
+        raw / "Cartola banco de chile conciliacion.csv",
+        "Fecha,Glosa,Cargo,Abono,Cuenta\n"
+        "2025-01-05,Pago Prov A,1190,0,123\n"
+        "2025-01-06,Abono cliente,0,1000,123\n",
+    )
+    _write(
+        raw / "Gastos 2025.csv",
+        "Fecha,Descripcion,Monto,Comprobante,Categoria\n"
+        "2025-01-07,Combustible,25000,C-1,Vehiculos\n",
+    )
+
+    seen = []
+    first = chipax.run(db_path=str(db), raw_dir=raw, chunk_size=1, progress=seen.append)
+    assert (first["ap_inserted"], first["ap_updated"]) == (2, 0)
+    assert (first["ar_inserted"], first["bank_inserted"], first["expenses_inserted"]) == (1, 2, 1)
+    assert {f["kind"] for f in first["files"]} == {"ap", "ar", "bank", "expenses"}
+    assert all("rows_per_sec" in f for f in first["files"])
+    # Progreso por chunk; la fila sin folio cuenta como omitida
+    assert len(seen) == 6 and seen[-1]["rows_scanned"] == 7
+    assert (seen[-1]["inserted"], seen[-1]["skipped"]) == (6, 1) and first["rows_skipped"] == 1
+
+    _write(
+        raw / "Gastos 2025.csv",
+        "Fecha,Descripcion,Monto,Comprobante,Categoria\n"
+        "2025-01-07,Combustible,25000,C-1,Transporte\n",
+    )
+    second = chipax.run(db_path=str(db), raw_dir=raw)
+    assert (second["ap_inserted"], second["ap_updated"]) == (0, 2)
+    assert (second["bank_inserted"], second["bank_updated"]) == (0, 2)
+    assert (second["expenses_inserted"], second["expenses_updated"]) == (0, 1)
+
+    con = sqlite3.connect(str(db))
+    assert con.execute("SELECT COUNT(*) FROM ap_invoices").fetchone()[0] == 2
+    assert con.execute("SELECT total_amount FROM ap_invoices WHERE invoice_number='10'").fetchone()[0] == 1190.0
+    assert con.execute("SELECT categoria FROM expenses").fetchone()[0] == "Transporte"
+    assert con.execute("PRAGMA synchronous").fetchone()[0] == 2
+
+
+def test_chipax_run_refreshes_cube_from_min_loaded_date(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    db = tmp_path / "cube.db"
+    sqlite3.connect(str(db)).close()
+    _write(
+        raw / "2025_Facturas venta_conciliacion.csv",
+        "RUT,Folio,Fecha Emision,Razon Social,Monto Total (CLP)\n"
+        "77.000.000-1,2,2025-03-04,Cliente,1000\n"
+        "77.000.000-1,1,2025-02-01,Cliente,500\n",
+    )
+    calls = []
+    monkeypatch.setattr(
+        chipax, "refresh_period_cube", lambda con, sources, since=None: calls.append((sources, since))
+    )
+    out = chipax.run(db_path=str(db), raw_dir=raw)
+    # Sin cartola no se recalcula bank_movements; `since` no se filtra al resultado
+    assert calls == [(["sales_invoices", "revenue"], "2025-02-01")]
+    assert "min_dates" not in out
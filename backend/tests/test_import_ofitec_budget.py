@@ -0,0 +1,52 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import import_ofitec_budget as budget  # noqa: E402
+
+TEMPLATE = {
+    "excel_sheet": "Presupuesto",
+    "column_map": {"codigo_partida": "Ítem", "descripcion": "Descripción"},
+    "suggestions": {"precio_unitario": [{"excel_col_name": "P. Unitario"}]},
+}
+HEADERS = ["Item", "Descripción", "Unidad", "Cantidad", "Precio Unitario", "Total"]
+
+
+def test_header_matcher_matches_plain_best_match():
+    matcher = budget.HeaderMatcher()
+    for target in budget.TARGETS + ["P. Unitario"]:
+        assert matcher.best_match(target, HEADERS) == budget.best_match(target, HEADERS)
+    mapping = budget.resolve_mapping(HEADERS, TEMPLATE["column_map"], TEMPLATE["suggestions"], assume_yes=True)
+    assert mapping["codigo_partida"] == "Item" and mapping["precio_unitario"] == "Precio Unitario"
+
+
+def test_mapping_cached_per_layout_and_partidas_bulk_inserted(tmp_path, monkeypatch):
+    conn = sqlite3.connect(tmp_path / "budget.db")
+    conn.execute(
+        "CREATE TABLE partidas(id INTEGER PRIMARY KEY, capitulo_id INTEGER, codigo_partida TEXT, descripcion TEXT,"
+        " unidad TEXT, cantidad REAL, precio_unitario REAL, total REAL)"
+    )
+    first, hit = budget.cached_mapping(conn, HEADERS, TEMPLATE, assume_yes=True)
+    assert hit is False
+
+    def _fail(*a, **k):
+        raise AssertionError("el layout ya estaba en caché")
+
+    monkeypatch.setattr(budget, "resolve_mapping", _fail)
+    again, hit = budget.cached_mapping(conn, HEADERS, TEMPLATE, assume_yes=True)
+    assert hit is True and again == first
+    assert conn.execute("SELECT hits FROM budget_import_mappings").fetchone() == (1,)
+
+    rows = [
+        {"Item": "1.1", "Descripción": " Excavación ", "Unidad": "m3", "Cantidad": "10", "Precio Unitario": "2,5", "Total": ""},
+        {"Item": "", "Descripción": "Sin código", "Unidad": "gl", "Cantidad": "1", "Precio Unitario": "100", "Total": "90"},
+    ]
+    assert budget.insert_partidas(conn, 1, rows, first) == 2
+    assert conn.execute(
+        "SELECT capitulo_id, codigo_partida, descripcion, cantidad, precio_unitario, total FROM partidas ORDER BY id"
+    ).fetchall() == [(None, "1.1", "Excavacion", 10.0, 2.5, 25.0), (None, None, "Sin codigo", 1.0, 100.0, 90.0)]
+    conn.close()
@@ -0,0 +1,64 @@
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+from io_utils import iter_rows, load_rows  # noqa: E402
+
+
+def _write_csv(tmp_path, text, name="rows.csv"):
+    p = tmp_path / name
+    p.write_text(text, encoding="utf-8")
+    return str(p)
+
+
+def test_iter_rows_is_lazy_and_matches_load_rows(tmp_path):
+    path = _write_csv(tmp_path, "Fecha;Glosa;Monto\n2025-01-02;Pago A;1.234,50\n2025-01-03;;\n")
+    it = iter_rows(path)
+    assert isinstance(it, types.GeneratorType)
+    rows = list(it)
+    assert rows == load_rows(path)
+    assert rows[0] == {"Fecha": "2025-01-02", "Glosa": "Pago A", "Monto": "1.234,50"}
+    assert rows[1] == {"Fecha": "2025-01-03", "Glosa": "", "Monto": ""}
+
+
+def test_iter_rows_skips_blank_csv_lines(tmp_path):
+    path = _write_csv(tmp_path, "a,b\n1,2\n\n3,4\n\n")
+    assert list(iter_rows(path)) == [{"a": "1", "b": "2"}, {"a": "3", "b": "4"}]
+
+
+def test_iter_rows_projection_and_number_types(tmp_path):
+    path = _write_csv(tmp_path, "a,b,c\n1,\"1,234.5\",x\n2,(10),y\n")
+    rows = list(iter_rows(path, columns=["b", "missing", "a"], types={"b": "number"}))
+    assert rows == [
+        {"b": pytest.approx(1234.5), "missing": "", "a": "1"},
+        {"b": pytest.approx(-10.0), "missing": "", "a": "2"},
+    ]
+
+
+def test_iter_rows_xlsx_read_only(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Codigo", "Cantidad", None])
+    ws.append(["P-1", 2.5, "extra"])
+    ws.append(["P-2", None])
+    path = str(tmp_path / "rows.xlsx")
+    wb.save(path)
+
+    rows = list(iter_rows(path, types={"Cantidad": "number"}))
+    assert rows[0] == {"Codigo": "P-1", "Cantidad": 2.5, "col_3": "extra"}
+    assert rows[1] == {"Codigo": "P-2", "Cantidad": 0.0, "col_3": ""}
+
+
+def test_iter_rows_rejects_unknown_format_and_type(tmp_path):
+    with pytest.raises(ValueError):
+        iter_rows(str(tmp_path / "rows.txt"))
+    path = _write_csv(tmp_path, "a\n1\n")
+    with pytest.raises(ValueError):
+        list(iter_rows(path, types={"a": "date"}))
@@ -0,0 +1,75 @@
+import json
+import sqlite3
+
+import match_counters
+
+AR_DDL = (
+    "CREATE TABLE ar_map_events(id INTEGER PRIMARY KEY, created_at TEXT DEFAULT CURRENT_TIMESTAMP,"
+    " user_id TEXT, payload TEXT)"
+)
+
+
+def _ap(con, accepted):
+    con.execute(
+        "INSERT INTO ap_match_events(invoice_id, source_json, candidates_json, accepted) VALUES(1,'{}','[]',?)",
+        (accepted,),
+    )
+
+
+def _ar(con, payload):
+    con.execute("INSERT INTO ar_map_events(user_id, payload) VALUES('u', ?)", (payload,))
+
+
+def test_counters_seeded_then_maintained_by_triggers(tmp_path):
+    import api_ap_match
+
+    con = sqlite3.connect(tmp_path / "m.db")
+    con.execute(AR_DDL)
+    _ar(con, json.dumps({"action": "auto_assign", "chosen": None}))
+    _ar(con, "no es json")
+    con.commit()
+    api_ap_match._ensure_tables(con)  # crea ap_match_events e instala contadores
+    assert match_counters.read_counters(con) == {
+        "ap_events_total": 0, "ap_events_accepted": 0, "ar_map_events": 2, "auto_assign_success": 1
+    }
+
+    _ap(con, 1)
+    _ap(con, 0)
+    _ap(con, None)
+    con.execute("UPDATE ap_match_events SET accepted=1 WHERE accepted IS NULL")
+    con.execute("DELETE FROM ap_match_events WHERE accepted=0")
+    _ar(con, json.dumps({"action": "auto_assign"}))
+    _ar(con, json.dumps({"action": "bulk_assign", "note": "auto_assign"}))
+    con.execute("DELETE FROM ar_map_events WHERE id=1")
+    con.commit()
+    assert match_counters.read_counters(con) == {
+        "ap_events_total": 2, "ap_events_accepted": 2, "ar_map_events": 3, "auto_assign_success": 1
+    }
+    assert con.execute("SELECT id FROM ar_map_events WHERE auto_assign=1").fetchall() == [(3,)]
+    assert match_counters.verify(con) == []
+
+    con.execute("UPDATE match_event_counters SET value=99 WHERE name='ar_map_events'")
+    con.commit()
+    assert [d["name"] for d in match_counters.verify(con)] == ["ar_map_events"]
+    assert match_counters.rebuild(con)["ar_map_events"] == 3
+    assert match_counters.verify(con) == []
+    con.close()
+
+
+def test_matching_summary_reads_counters(client):
+    import server
+
+    con = sqlite3.connect(server.DB_PATH)
+    con.execute("DROP TABLE IF EXISTS ar_map_events")
+    con.execute("DROP TABLE IF EXISTS match_event_counters")
+    con.execute(AR_DDL)
+    _ar(con, json.dumps({"action": "auto_assign"}))
+    con.commit()
+    first = client.get("/api/metrics/matching_summary").get_json()
+    assert (first["ar_map_events"], first["auto_assign_success"]) == (1, 1)
+
+    _ar(con, json.dumps({"action": "manual"}))
+    con.commit()
+    con.close()
+    again = client.get("/api/metrics/matching_summary").get_json()
+    assert (again["ar_map_events"], again["auto_assign_success"]) == (2, 1)
@@ -0,0 +1,109 @@
+import sqlite3
+
+import name_resolver
+import reconcile_engine
+from name_resolver import NameResolver, get_resolver, normalize_name
+
+
+def _seed(path):
+    con = sqlite3.connect(path)
+    con.executescript(
+        """
+        CREATE TABLE recon_aliases(id INTEGER PRIMARY KEY, alias TEXT UNIQUE, canonical TEXT,
+                                   updated_at TEXT DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE vendors_unified(rut_clean TEXT PRIMARY KEY, name_normalized TEXT,
+                                     zoho_vendor_name TEXT);
+        CREATE TABLE projects_analytic_map(zoho_project_id TEXT, zoho_project_name TEXT);
+        INSERT INTO recon_aliases(alias, canonical) VALUES ('CONSTR. ÑUÑOA', 'Obra Ñuñoa');
+        INSERT INTO vendors_unified VALUES ('76123456-7', 'ferreteria el sol', 'Ferretería El Sol SpA');
+        INSERT INTO projects_analytic_map VALUES ('P-1', 'Obra Ñuñoa'), ('P-2', 'Edificio Mar');
+        """
+    )
+    con.commit()
+    return con
+
+
+def test_resolves_exact_contained_rut_and_fuzzy(tmp_path):
+    con = _seed(tmp_path / "names.db")
+    r = NameResolver.build(con)
+
+    assert normalize_name("  Constr. ÑUÑOA ") == "constr nunoa"
+    assert r.canonical("constr nuñoa", kinds={"alias"}) == "Obra Ñuñoa"
+
+    hit = r.resolve("TRASPASO EDIFICIO MAR 2024", kinds={"project"}, fuzzy=False)
+    assert [(m.entry.ref, m.via) for m in hit] == [("P-2", "contains")]
+
+    by_rut = r.resolve("pago", rut="76.123.456-7")
+    assert by_rut and by_rut[0].via == "rut" and by_rut[0].entry.canonical == "Ferretería El Sol SpA"
+
+    fuzzy = r.resolve("ferreteria del sol", kinds={"vendor"})
+    assert fuzzy and fuzzy[0].via == "fuzzy" and fuzzy[0].score < 1.0
+    assert r.resolve("ferreteria del sol", kinds={"vendor"}, fuzzy=False) == []
+
+    assert r.same_entity("transferencia ferreteria el sol", "Ferretería El Sol SpA") == 1.0
+    assert r.same_entity("pago xyz", "Otro", other_rut="76123456-7") == 0.0
+    con.close()
+
+
+def test_get_resolver_reloads_when_sources_change(tmp_path):
+    con = _seed(tmp_path / "reload.db")
+    first = get_resolver(con, ttl=0)
+    assert get_resolver(con, ttl=0) is first
+    assert first.canonical("bodega central") is None
+
+    con.execute("INSERT INTO recon_aliases(alias, canonical) VALUES ('BODEGA CENTRAL', 'Edificio Mar')")
+    con.commit()
+    second = get_resolver(con, ttl=0)
+    assert second is not first
+    assert second.canonical("bodega central") == "Edificio Mar"
+
+    name_resolver.invalidate()
+    assert get_resolver(con, ttl=0) is not second
+    con.close()
+
+
+def test_get_resolver_default_ttl_skips_fingerprint(tmp_path, monkeypatch):
+    con = _seed(tmp_path / "ttl.db")
+    name_resolver.invalidate()
+    first = get_resolver(con)
+    calls = []
+    monkeypatch.setattr(name_resolver, "source_fingerprint", lambda c: calls.append(1) or ())
+    con.execute("INSERT INTO recon_aliases(alias, canonical) VALUES ('BODEGA NORTE', 'Edificio Mar')")
+    con.commit()
+    assert get_resolver(con) is first
+    assert calls == []
+    monkeypatch.undo()
+    name_resolver.invalidate()
+    assert get_resolver(con).canonical("bodega norte") == "Edificio Mar"
+    con.close()
+
+
+def test_vendor_score_uses_resolver_aliases(tmp_path):
+    con = _seed(tmp_path / "score.db")
+    r = NameResolver.build(con)
+    plain = reconcile_engine._vendor_score("constr nunoa", "obra nunoa")
+    assert plain < 1.0
+    assert reconcile_engine._vendor_score("constr nunoa", "obra nunoa", r) == 1.0
+    con.close()
+
+
+def test_vendor_score_reuses_movement_entity_keys(tmp_path, monkeypatch):
+    con = _seed(tmp_path / "keys.db")
+    r = NameResolver.build(con)
+    keys = r.entity_keys("pago ferreteria el sol")
+    assert keys == (frozenset({"76123456-7"}), frozenset({"ferreteria el sol spa"}))
+
+    resolved = []
+    original = r.resolve
+    monkeypatch.setattr(r, "resolve", lambda text, **kw: resolved.append(text) or original(text, **kw))
+
+    def no_wratio(*_a):
+        raise AssertionError("WRatio no debe correr si el RUT / nombre canónico coincide")
+
+    with monkeypatch.context() as m:
+        m.setattr(reconcile_engine.fuzz, "WRatio", no_wratio)
+        assert reconcile_engine._vendor_score("pago ferreteria el sol", "otra razon", r, "76.123.456-7", keys) == 1.0
+        assert reconcile_engine._vendor_score("pago ferreteria el sol", "Ferretería El Sol SpA", r, None, keys) == 1.0
+    assert reconcile_engine._vendor_score("pago ferreteria el sol", "edificio mar", r, None, keys) < 1.0
+    assert "pago ferreteria el sol" not in resolved
+    con.close()
@@ -0,0 +1,71 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import numbering  # noqa: E402
+
+
+def test_blocks_are_disjoint_across_allocators(tmp_path):
+    db = str(tmp_path / "seq.db")
+    conn = sqlite3.connect(db)
+    a, b = numbering.SequenceAllocator(block=3), numbering.SequenceAllocator(block=3)
+    kw = {"prefix": "PO-", "padding": 5, "start": 1}
+
+    got = [a.next_number(conn, "po_number", **kw), b.next_number(conn, "po_number", **kw)]
+    got += [a.next_number(conn, "po_number", **kw) for _ in range(3)]
+    assert got == ["PO-00001", "PO-00004", "PO-00002", "PO-00003", "PO-00007"]
+    assert a.peek_number(conn, "po_number") == "PO-00008"
+    assert conn.execute("SELECT next_value FROM ofitec_sequences WHERE name='po_number'").fetchone()[0] == 10
+    assert not conn.in_transaction
+
+    # Con una transacción abierta del llamador no se usa el bloque en memoria
+    conn.execute("CREATE TABLE t (x)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    assert a.next_number(conn, "po_number") == "PO-00010"
+    conn.rollback()
+    assert a.next_number(conn, "po_number") == "PO-00008"
+
+
+def test_year_sequence_seeds_from_callable_and_gap_report(tmp_path):
+    db = str(tmp_path / "seq.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE sales_notes (note_number TEXT)")
+    conn.executemany("INSERT INTO sales_notes VALUES (?)", [("001-2025",), ("002-2025",), ("007-2024",)])
+    conn.commit()
+    alloc = numbering.SequenceAllocator(block=4)
+    name = numbering.year_sequence("sales_note", 2025)
+    value, _, _ = alloc.next_value(conn, name, start=lambda c: 3, padding=3)
+    assert value == 3
+    conn.execute("INSERT INTO sales_notes VALUES ('003-2025')")
+    conn.execute("INSERT INTO sales_notes VALUES ('003-2025')")
+    conn.commit()
+
+    used = numbering.used_values(conn, "sales_notes", "note_number", numbering.number_pattern(conn, name))
+    report = numbering.gap_report(conn, name, used)
+    assert report["issued_max"] == 6
+    assert report["gaps"] == [(4, 6)]
+    assert report["duplicates"] == [3]
+    assert [(b["start"], b["end"]) for b in report["blocks"]] == [(3, 6)]
+
+
+def test_gap_report_starts_at_sequence_start_value(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "start.db"))
+    numbering.ensure_sequence(conn, "po_number", prefix="PO-", padding=5, start=1)
+    # --set-start antes de emitir: los números bajo 100 nunca fueron de la serie
+    numbering.ensure_sequence(conn, "po_number", start=100)
+    issued = [numbering.next_number(conn, "po_number") for _ in range(3)]
+    assert issued == ["PO-00100", "PO-00101", "PO-00102"]
+
+    report = numbering.gap_report(conn, "po_number", [100, 102, 7])
+    assert (report["issued_min"], report["issued_max"]) == (100, 102)
+    assert report["gaps"] == [(101, 101)] and report["missing"] == 1
+    assert report["out_of_range"] == [7]
+
+    # Con números ya emitidos, un nuevo inicio no oculta los huecos previos
+    numbering.ensure_sequence(conn, "po_number", start=500)
+    assert numbering.gap_report(conn, "po_number", [100, 101, 102])["issued_min"] == 100
+    conn.close()
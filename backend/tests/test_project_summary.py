@@ -0,0 +1,93 @@
+import sqlite3
+
+import project_summary
+
+DDL = """
+DROP TABLE IF EXISTS purchase_orders_unified;
+DROP TABLE IF EXISTS projects_analytic_map;
+DROP TABLE IF EXISTS daily_reports;
+DROP TABLE IF EXISTS projects_summary;
+DROP TABLE IF EXISTS projects_summary_dirty;
+CREATE TABLE purchase_orders_unified(
+  id INTEGER PRIMARY KEY AUTOINCREMENT, vendor_rut TEXT, po_number TEXT, po_date TEXT,
+  total_amount REAL, zoho_project_id TEXT, zoho_project_name TEXT
+);
+CREATE TABLE projects_analytic_map(id INTEGER PRIMARY KEY, zoho_project_id TEXT, zoho_project_name TEXT);
+CREATE TABLE daily_reports(id INTEGER PRIMARY KEY, project_name TEXT, avance_pct REAL);
+"""
+
+
+def _po(con, rut, date, amount, pid=None, name=None):
+    con.execute(
+        "INSERT INTO purchase_orders_unified(vendor_rut, po_number, po_date, total_amount, zoho_project_id,"
+        " zoho_project_name) VALUES(?,?,?,?,?,?)",
+        (rut, f"PO-{date}-{amount}", date, amount, pid, name),
+    )
+
+
+def _summary(con):
+    return con.execute(
+        "SELECT project_key, total_orders, total_amount, unique_providers, start_date, end_date, progress"
+        " FROM projects_summary ORDER BY project_key"
+    ).fetchall()
+
+
+def _seed(con):
+    con.executescript(DDL)
+    con.execute("INSERT INTO projects_analytic_map(zoho_project_id, zoho_project_name) VALUES('7', 'Obra Norte')")
+    _po(con, "1-9", "2025-01-05", 100, name="Edificio Ñuñoa")
+    _po(con, "2-7", "2025-02-01", 50, name=" edificio nunoa ")
+    _po(con, "1-9", "2025-03-01", 10, pid=7)  # nombre desde el mapa (id numérico vs texto)
+    _po(con, "3-5", "2025-03-02", 5, name="null")
+    con.execute("INSERT INTO daily_reports(project_name, avance_pct) VALUES('EDIFICIO NUÑOA', 40), ('Edificio Nunoa', 60)")
+    con.commit()
+
+
+def test_summary_built_and_maintained_from_change_queue(tmp_path):
+    con = sqlite3.connect(tmp_path / "p.db")
+    _seed(con)
+    rows, total = project_summary.list_projects(con)
+    assert total == 2 and [r["project_key"] for r in rows] == ["edificio nunoa", "obra norte"]
+    assert _summary(con) == [
+        ("edificio nunoa", 2, 150.0, 2, "2025-01-05", "2025-02-01", 50.0),
+        ("obra norte", 1, 10.0, 1, "2025-03-01", "2025-03-01", 0.0),
+    ]
+
+    # Cambios por cualquier escritor: sólo se recalculan las claves tocadas
+    _po(con, "9-9", "2025-04-01", 1, name="Obra Norte")
+    con.execute("UPDATE purchase_orders_unified SET total_amount = 70 WHERE id = 2")
+    con.execute("DELETE FROM purchase_orders_unified WHERE id = 1")
+    con.execute("UPDATE projects_analytic_map SET zoho_project_name = 'Obra Sur'")
+    con.execute("INSERT INTO daily_reports(project_name, avance_pct) VALUES('obra norte', 30)")
+    con.commit()
+    assert project_summary.refresh(con) == 3
+    assert _summary(con) == [
+        ("edificio nunoa", 1, 70.0, 1, "2025-02-01", "2025-02-01", 50.0),
+        ("obra norte", 1, 1.0, 1, "2025-04-01", "2025-04-01", 30.0),
+        ("obra sur", 1, 10.0, 1, "2025-03-01", "2025-03-01", 0.0),
+    ]
+    assert project_summary.refresh(con) == 0
+    assert project_summary.verify(con) == []
+
+    con.execute("UPDATE projects_summary SET total_orders = 9 WHERE project_key = 'obra sur'")
+    con.commit()
+    assert [d["project_key"] for d in project_summary.verify(con)] == ["obra sur"]
+    assert project_summary.rebuild(con) == 3 and project_summary.verify(con) == []
+    plan = con.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM purchase_orders_unified WHERE project_key = 'obra sur'"
+    ).fetchall()
+    assert any("ix_po_project_key" in str(r[-1]) for r in plan)
+    con.close()
+
+
+def test_projects_endpoints_read_summary(client):
+    import server
+
+    con = sqlite3.connect(server.DB_PATH)
+    _seed(con)
+    con.close()
+    items = client.get("/api/projects_v2?q=nunoa").get_json()
+    assert items["meta"]["total"] == 1
+    assert (items["items"][0]["orders"], items["items"][0]["progress"]) == (2, 50.0)
+    listing = client.get("/api/projects").get_json()
+    assert [p["spent"] for p in listing] == [150.0, 10.0]
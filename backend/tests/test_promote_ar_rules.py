@@ -0,0 +1,86 @@
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import promote_ar_rules  # noqa: E402
+
+
+def _event(conn, name, pid_key="project_id", pid="P1"):
+    payload = {"invoice": {"customer_name": name}}
+    if pid_key == "assignment":
+        payload["assignment"] = {"project_id": pid}
+    elif pid_key == "rules":
+        payload["rules"] = [{"project_id": pid}]
+    else:
+        payload[pid_key] = pid
+    conn.execute("INSERT INTO ar_map_events(user_id, payload) VALUES('u', ?)", (json.dumps(payload),))
+
+
+def _rules(conn):
+    return conn.execute(
+        "SELECT kind, pattern, project_id FROM ar_project_rules ORDER BY pattern, project_id"
+    ).fetchall()
+
+
+def test_incremental_learning_and_idempotent_promotion(tmp_path):
+    conn = sqlite3.connect(tmp_path / "rules.db")
+    promote_ar_rules.ensure_tables(conn)
+    conn.execute("CREATE TABLE sales_invoices(id INTEGER PRIMARY KEY, customer_name TEXT, project_id TEXT)")
+    conn.executemany("INSERT INTO sales_invoices(customer_name, project_id) VALUES(?,?)", [("ACME", "P9")] * 2)
+    for key in ("project_id", "assignment", "rules"):
+        _event(conn, " ACME ", key, "P1")
+    _event(conn, "ACME", pid="P9")
+    _event(conn, "Solo", pid="P2")
+    conn.execute("INSERT INTO ar_map_events(user_id, payload) VALUES('u', 'not json')")
+    conn.commit()
+
+    dry = promote_ar_rules.promote(conn, min_count=3, dry_run=True)
+    assert (dry["promoted_rules"], dry["events_scanned"]) == (2, 6)
+    assert _rules(conn) == [] and promote_ar_rules.get_watermark(conn) == 0
+
+    first = promote_ar_rules.promote(conn, min_count=3)
+    assert (first["learned_pairs"], first["promoted_rules"], first["skipped_rules"]) == (3, 2, 0)
+    assert first["unique_index"] is True
+    assert _rules(conn) == [("customer_name_like", "ACME", "P1"), ("customer_name_like", "ACME", "P9")]
+
+    # Nothing new: no events scanned, eligible pairs are skipped by the unique index
+    again = promote_ar_rules.promote(conn, min_count=3)
+    assert (again["events_scanned"], again["promoted_rules"], again["skipped_rules"]) == (0, 0, 2)
+
+    # Only events above the watermark are read; counts accumulate across runs
+    for _ in range(2):
+        _event(conn, "Solo", pid="P2")
+    conn.commit()
+    third = promote_ar_rules.promote(conn, min_count=3)
+    assert (third["events_scanned"], third["promoted_rules"]) == (2, 1)
+    assert conn.execute(
+        "SELECT event_count FROM ar_rule_candidates_stats WHERE customer_name='Solo'"
+    ).fetchone() == (3,)
+
+    rebuilt = promote_ar_rules.promote(conn, min_count=3, rebuild=True)
+    assert (rebuilt["events_scanned"], rebuilt["promoted_rules"]) == (8, 0)
+    conn.close()
+
+
+def test_existing_duplicate_rules_fall_back_to_not_exists(tmp_path):
+    conn = sqlite3.connect(tmp_path / "dups.db")
+    promote_ar_rules.ensure_tables(conn)
+    conn.executemany(
+        "INSERT INTO ar_project_rules(kind, pattern, project_id) VALUES('customer_name_like', 'B', 'P1')",
+        [(), ()],
+    )
+    for _ in range(3):
+        _event(conn, "B", pid="P1")
+        _event(conn, "C", pid="P3")
+    conn.commit()
+
+    out = promote_ar_rules.promote(conn, min_count=3)
+    assert out["unique_index"] is False
+    assert (out["promoted_rules"], out["skipped_rules"]) == (1, 1)
+    assert _rules(conn).count(("customer_name_like", "C", "P3")) == 1
+    conn.close()
@@ -0,0 +1,134 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parents[2] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.append(str(TOOLS_DIR))
+
+import create_finance_views  # noqa: E402
+
+
+def _seed(db_path):
+    con = sqlite3.connect(db_path)
+    con.executescript(
+        """
+        DROP TABLE IF EXISTS purchase_orders_unified;
+        CREATE TABLE purchase_orders_unified(
+          id INTEGER PRIMARY KEY, po_number TEXT, po_date TEXT, vendor_rut TEXT,
+          zoho_vendor_name TEXT, total_amount REAL, currency TEXT, status TEXT, source_platform TEXT
+        );
+        DROP TABLE IF EXISTS bank_movements;
+        CREATE TABLE bank_movements(
+          id INTEGER PRIMARY KEY, fecha TEXT, bank_name TEXT, account_number TEXT, glosa TEXT,
+          monto REAL, moneda TEXT, tipo TEXT, saldo REAL, referencia TEXT, fuente TEXT
+        );
+        DROP TABLE IF EXISTS recon_links;
+        CREATE TABLE recon_links(id INTEGER PRIMARY KEY, bank_movement_id INTEGER, amount REAL);
+        """
+    )
+    dates = ["2025-01-03", "2025-01-01", None, "2025-01-02", "2025-01-03", "2025-01-01", None]
+    con.executemany(
+        "INSERT INTO purchase_orders_unified(po_number, po_date, vendor_rut, total_amount) VALUES(?,?,?,?)",
+        [(f"PO-{i:02d}", d, "76-1", 100 + i) for i, d in enumerate(dates)],
+    )
+    con.executemany(
+        "INSERT INTO bank_movements(fecha, glosa, monto) VALUES(?,?,?)",
+        [(f"2025-02-0{i}", f"mov {i}", i * 10) for i in range(1, 6)],
+    )
+    con.executemany("INSERT INTO recon_links(bank_movement_id, amount) VALUES(?, 10)", [(2,), (4,)])
+    # La vista de la herramienta expone bm.id para el filtro de estado
+    create_finance_views.create_views(con)
+    con.commit()
+    con.close()
+
+
+def _walk(client, url):
+    seen, cursor, metas = [], "", []
+    while cursor is not None:
+        data = client.get(f"{url}&cursor={cursor}").get_json()
+        seen += data["items"]
+        metas.append(data["meta"])
+        cursor = data["meta"]["next_cursor"]
+    return seen, metas
+
+
+def test_cursor_pages_cover_view_in_order_and_page_contract_kept(client):
+    import server
+
+    db = server.DB_PATH
+    _seed(db)
+
+    for direction in ("DESC", "ASC"):
+        paged = client.get(
+            f"/api/finanzas/facturas_compra?page=1&page_size=50&order_by=fecha&order_dir={direction}"
+        ).get_json()
+        assert paged["meta"]["total"] == 7 and paged["meta"]["page"] == 1
+
+        rows, metas = _walk(
+            client, f"/api/finanzas/facturas_compra?page_size=2&order_by=fecha&order_dir={direction}"
+        )
+        assert len(metas) == 4 and metas[0]["total"] == 7 and metas[0]["total_cached"] is True
+        numbers = [r["documento_numero"] for r in rows]
+        assert sorted(numbers) == sorted(r["documento_numero"] for r in paged["items"])
+        assert len(set(numbers)) == 7
+        keys = [(r["fecha"] is not None, r["fecha"] or "", r["documento_numero"]) for r in rows]
+        assert keys == sorted(keys, reverse=direction == "DESC")
+
+    bogus = client.get("/api/finanzas/facturas_compra?cursor=bogus")
+    assert bogus.status_code == 400 and bogus.get_json()["error"] == "invalid_cursor"
+    first = client.get("/api/finanzas/facturas_compra?page_size=2&order_by=fecha&cursor=").get_json()
+    other = client.get(
+        f"/api/finanzas/facturas_compra?page_size=2&order_by=monto_total&cursor={first['meta']['next_cursor']}"
+    )
+    assert other.status_code == 400 and other.get_json()["error"] == "invalid_cursor"
+
+    pend, _ = _walk(client, "/api/finanzas/cartola_bancaria?page_size=2&estado=pendiente&count=none")
+    assert [r["id"] for r in pend] == [5, 3, 1]
+    conf = client.get("/api/finanzas/cartola_bancaria?estado=confirmado&page=1").get_json()
+    assert sorted(r["id"] for r in conf["items"]) == [2, 4] and conf["meta"]["total"] == 2
+
+    con = sqlite3.connect(db)
+    names = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    con.close()
+    assert {"ix_pou_date_number", "ix_bank_fecha", "idx_links_bank"} <= names
+
+
+def test_cursor_walk_returns_rows_with_duplicate_order_and_tiebreak(client):
+    import server
+
+    con = sqlite3.connect(server.DB_PATH)
+    con.executescript(
+        """
+        DROP TABLE IF EXISTS purchase_orders_unified;
+        CREATE TABLE purchase_orders_unified(
+          id INTEGER PRIMARY KEY, po_number TEXT, po_date TEXT, vendor_rut TEXT,
+          zoho_vendor_name TEXT, total_amount REAL, currency TEXT, status TEXT, source_platform TEXT
+        );
+        DROP TABLE IF EXISTS taxes;
+        CREATE TABLE taxes(
+          id INTEGER PRIMARY KEY, periodo TEXT, tipo TEXT, monto_debito REAL, monto_credito REAL,
+          neto REAL, estado TEXT, fecha_presentacion TEXT, fuente TEXT
+        );
+        """
+    )
+    # Mismo número y fecha con distinto proveedor; mismo (periodo, tipo) en impuestos
+    con.executemany(
+        "INSERT INTO purchase_orders_unified(po_number, po_date, vendor_rut, total_amount) VALUES(?,?,?,?)",
+        [("F-1", "2025-03-01", f"76-{i}", 100) for i in range(5)],
+    )
+    con.executemany(
+        "INSERT INTO taxes(periodo, tipo, neto) VALUES(?,?,?)",
+        [("2025-01", "IVA", 10)] * 5,
+    )
+    create_finance_views.create_views(con)
+    con.commit()
+    con.close()
+
+    for url, key in (
+        ("/api/finanzas/facturas_compra?page_size=2&order_by=fecha", "proveedor_rut"),
+        ("/api/finanzas/impuestos?page_size=2&order_by=periodo&order_dir=ASC", "id"),
+    ):
+        rows, metas = _walk(client, url)
+        assert len(rows) == metas[0]["total"] == 5
+        assert len({r[key] for r in rows}) == 5
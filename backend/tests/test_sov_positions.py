@@ -0,0 +1,57 @@
+import ep_api
+import sov_positions
+from db_utils import db_conn
+
+
+def _post(client, path, payload, expected=200):
+    r = client.post(path, json=payload)
+    assert r.status_code == expected, r.get_data(as_text=True)
+    return r.get_json()
+
+
+def test_positions_follow_ep_lifecycle_and_validate_batches(client):
+    cid = _post(client, "/api/contracts", {"project_id": 88, "customer_id": 1, "code": "CT-SOVPOS"})["contract_id"]
+    _post(client, f"/api/contracts/{cid}/sov/import", {"items": [
+        {"item_code": "S1", "qty": 10, "unit_price": 100},
+        {"item_code": "S2", "line_total": 500},
+    ]})
+    ep1 = _post(client, "/api/ep", {"project_id": 88, "contract_id": cid, "ep_number": "EP-P1"}, expected=201)["ep_id"]
+    _post(client, f"/api/ep/{ep1}/lines/bulk", {"lines": [
+        {"item_code": "S1", "amount_period": 600},
+        {"item_code": "S2", "qty_period": 2, "unit_price": 100},
+        {"item_code": "X9", "amount_period": 5},
+    ]})
+
+    with db_conn(ep_api._db_path()) as con:
+        pos = sov_positions.load_positions(con, cid)
+    assert pos["S1"] == {"cap": 1000, "approved_to_date": 0, "pending": 600}
+    assert pos["X9"]["cap"] is None
+
+    _post(client, f"/api/ep/{ep1}/approve", {})
+    ep2 = _post(client, "/api/ep/import", {
+        "header": {"project_id": 88, "contract_id": cid, "ep_number": "EP-P2"},
+        "lines": [{"item_code": "S1", "amount_period": 300}],
+    })["ep_id"]
+
+    # La validación usa lo aprobado (600) y no lo pendiente del propio lote
+    r = client.post(f"/api/ep/{ep2}/lines/bulk", json={"lines": [
+        {"item_code": "S2", "amount_period": 100},
+        {"item_code": "S1", "qty_period": 5, "unit_price": 100},
+    ]})
+    assert r.status_code == 422
+    body = r.get_json()
+    assert body["error"] == "ep_exceeds_contract_item"
+    assert (body["item_code"], body["cap"], body["prev"], body["attempt"]) == ("S1", 1000.0, 600.0, 500.0)
+
+    r = client.put(f"/api/ep/{ep1}", json={"status": "rejected"})
+    assert r.status_code == 200
+    with db_conn(ep_api._db_path()) as con:
+        pos = sov_positions.load_positions(con, cid)
+        assert (pos["S1"]["approved_to_date"], pos["S1"]["pending"]) == (0, 300)
+        assert sov_positions.verify(con) == []
+
+        con.execute("UPDATE contract_sov_positions SET pending = 0 WHERE contract_id=?", (cid,))
+        con.commit()
+        assert [d["item_code"] for d in sov_positions.verify(con)] == ["S1"]
+        sov_positions.rebuild(con)
+        assert sov_positions.verify(con) == []
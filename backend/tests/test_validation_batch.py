@@ -0,0 +1,132 @@
+import sqlite3
+from dataclasses import asdict
+
+from validation_engine import FinancialValidator
+
+
+def _seed(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE purchase_order_lines (id INTEGER PRIMARY KEY, po_number TEXT, line_total REAL);
+        CREATE TABLE zoho_ordenes_final ("Purchase Order Number" TEXT, "Total" REAL);
+        CREATE TABLE ap_po_links (id INTEGER PRIMARY KEY, invoice_id INTEGER, po_id TEXT, po_line_id TEXT, amount REAL);
+        CREATE TABLE ap_invoices (id INTEGER PRIMARY KEY, total_amount REAL, invoice_number TEXT,
+                                  supplier_name TEXT, project_name TEXT);
+        CREATE TABLE bank_payments (invoice_id INTEGER, monto REAL);
+        CREATE VIEW v_cartola_bancaria AS SELECT invoice_id, monto FROM bank_payments;
+        CREATE TABLE projects (name TEXT, budget_total REAL);
+        CREATE TABLE presupuestos (proyecto TEXT, total REAL);
+        CREATE VIEW v_presupuesto_totales AS SELECT proyecto, SUM(total) AS total_presupuesto FROM presupuestos GROUP BY proyecto;
+        CREATE TABLE purchase_orders_unified (id INTEGER PRIMARY KEY, project_name TEXT, total_amount REAL, status TEXT);
+
+        INSERT INTO purchase_order_lines VALUES (1, 'OC-1', 1000), (2, 'OC-1', 500);
+        INSERT INTO zoho_ordenes_final VALUES ('OC-1', 1500), ('OC-2', 800);
+        INSERT INTO ap_po_links (invoice_id, po_id, po_line_id, amount) VALUES
+            (10, 'OC-1', '1', 600), (11, 'OC-2', NULL, 100);
+        INSERT INTO ap_invoices VALUES (10, 600, 'F-10', 'Prov', 'Obra A'), (11, 100, 'F-11', 'Prov', 'Obra B');
+        INSERT INTO bank_payments VALUES (10, 200);
+        INSERT INTO projects VALUES ('Obra A', 10000), ('Obra B', NULL), ('Obra C', 0);
+        INSERT INTO presupuestos VALUES ('Obra B', 2000);
+        INSERT INTO purchase_orders_unified (project_name, total_amount, status) VALUES
+            ('Obra A', 4000, 'approved'), ('obra a ', 1000, 'closed'), ('Obra B', 1900, 'approved');
+        """
+    )
+    conn.commit()
+    conn.close()
+
+
+def _single(v, item):
+    kind = item["type"]
+    if kind == "invoice":
+        return v.validate_invoice_vs_po(item["po_number"], item["invoice_amount"], item.get("po_line_id"))
+    if kind == "payment":
+        return v.validate_payment_vs_invoice(item["invoice_id"], item["payment_amount"])
+    return v.validate_po_vs_budget(item["project_name"], item["po_amount"])
+
+
+def _comparable(result):
+    data = asdict(result)
+    data.pop("validated_at")
+    return data
+
+
+def test_validate_many_matches_single_path(tmp_path):
+    db = str(tmp_path / "val.db")
+    _seed(db)
+    v = FinancialValidator(db)
+    items = [
+        {"type": "invoice", "po_number": "OC-1", "invoice_amount": 300.0, "po_line_id": "1"},
+        {"type": "invoice", "po_number": "OC-1", "invoice_amount": 450.0, "po_line_id": "1"},
+        {"type": "invoice", "po_number": "OC-1", "invoice_amount": 100.0, "po_line_id": "2"},
+        {"type": "invoice", "po_number": "OC-2", "invoice_amount": 690.0},
+        {"type": "invoice", "po_number": "OC-9", "invoice_amount": 1.0},
+        {"type": "payment", "invoice_id": 10, "payment_amount": 500.0},
+        {"type": "payment", "invoice_id": 11, "payment_amount": 50.0},
+        {"type": "payment", "invoice_id": 99, "payment_amount": 1.0},
+        {"type": "po_budget", "project_name": "Obra A", "po_amount": 4500.0},
+        {"type": "po_budget", "project_name": "obra a", "po_amount": 5500.0},
+        {"type": "po_budget", "project_name": "Obra B", "po_amount": 50.0},
+        {"type": "po_budget", "project_name": "Obra C", "po_amount": 1.0},
+        {"type": "po_budget", "project_name": "Inexistente", "po_amount": 1.0},
+    ]
+    batch = v.validate_many(items)
+    assert len(batch) == len(items)
+    for item, res in zip(items, batch):
+        assert _comparable(res) == _comparable(_single(v, item)), item
+
+    flags = [[f.flag_type for f in r.flags] for r in batch]
+    assert flags[1] == ["invoice_over_po"]
+    assert flags[5] == ["overpaid"]
+    assert flags[9] == ["exceeds_budget"]
+
+
+def test_validate_many_flags_unknown_type_and_query_errors(tmp_path):
+    db = str(tmp_path / "empty.db")
+    sqlite3.connect(db).close()
+    v = FinancialValidator(db)
+    res = v.validate_many([
+        {"type": "nope"},
+        {"type": "payment", "invoice_id": 1, "payment_amount": 1.0},
+    ])
+    assert res[0].flags[0].flag_type == "invalid_item"
+    assert _comparable(res[1]) == _comparable(v.validate_payment_vs_invoice(1, 1.0))
+    assert res[1].flags[0].flag_type == "validation_error"
+
+
+def test_batch_endpoint(client):
+    rv = client.post("/api/validations/batch", json={"items": [
+        {"type": "po_budget", "project_name": "Sin Presupuesto", "po_amount": 10},
+        {"type": "other"},
+    ]})
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert body["summary"]["total"] == 2
+    assert body["results"][0]["status"] in (200, 422)
+    assert body["results"][1]["status"] == 422
+    assert body["results"][1]["error"] == "invalid_item"
+
+    assert client.post("/api/validations/batch", json={}).status_code == 400
+    assert client.post("/api/validations/batch", json=[1]).status_code == 400
+
+    rv = client.post("/api/validations/batch", json={"items": ["x", 3, None, ["type"]]})
+    assert rv.status_code == 200
+    results = rv.get_json()["results"]
+    assert [r["error"] for r in results] == ["invalid_item"] * 4
+    assert [r["details"]["index"] for r in results] == [0, 1, 2, 3]
+
+
+def test_batch_endpoint_rejects_unhashable_fields_per_item(client):
+    rv = client.post("/api/validations/batch", json={"items": [
+        {"type": []},
+        {"type": "invoice", "po_number": {"x": 1}, "invoice_amount": 1},
+        {"type": "payment", "invoice_id": [1], "payment_amount": 1},
+        {"type": "po_budget", "project_name": ["a"], "po_amount": 1},
+        {"type": "po_budget", "project_name": "Sin Presupuesto", "po_amount": 10},
+    ]})
+    assert rv.status_code == 200
+    results = rv.get_json()["results"]
+    assert [r["error"] for r in results[:4]] == ["invalid_item"] * 4
+    assert [r["details"]["index"] for r in results[:4]] == [0, 1, 2, 3]
+    assert results[0]["details"]["type"] is None
+    assert results[4]["status"] in (200, 422) and results[4].get("error") != "invalid_item"
@@ -14,6 +14,8 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 
+from ap_balance_ledger import ledger_exists
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,6 +45,18 @@ class ValidationResult:
             self.validated_at = datetime.now()
 
 
+# Campos clave por tipo de item en validate_many (se agrupan en dicts / sets)
+_BATCH_KEY_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "invoice": ("po_number", "po_line_id"),
+    "payment": ("invoice_id",),
+    "po_budget": ("project_name",),
+}
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float))
+
+
 class FinancialValidator:
     """Motor de validaciones financieras."""
 
@@ -55,6 +69,154 @@ class FinancialValidator:
         conn.row_factory = sqlite3.Row
         return conn
 
+    # ------------------------------------------------------------------
+    # Reglas puras: evalúan una fila de saldos ya cargada (o None).
+    # Compartidas por la ruta individual y por validate_many.
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _check_invoice_vs_po(po_number: str, invoice_amount: float,
+                             po_line_id: Optional[str], row: Optional[Any]) -> ValidationResult:
+        flags: List[ValidationFlag] = []
+        if not row:
+            flags.append(ValidationFlag(
+                flag_type="po_not_found",
+                severity="error",
+                message=f"Orden de compra {po_number} no encontrada",
+                details={"po_number": po_number}
+            ))
+            return ValidationResult(False, flags)
+
+        total_amount = row["total_amount"] if "total_amount" in row.keys() else row["line_total"]
+        already_invoiced = row["already_invoiced"]
+        remaining = row["remaining"]
+
+        if invoice_amount > remaining:
+            flags.append(ValidationFlag(
+                flag_type="invoice_over_po",
+                severity="error",
+                message=f"Factura excede disponible en OC {po_number}",
+                details={
+                    "po_number": po_number,
+                    "po_line_id": po_line_id,
+                    "total_po": total_amount,
+                    "already_invoiced": already_invoiced,
+                    "remaining": remaining,
+                    "attempted": invoice_amount,
+                    "excess": invoice_amount - remaining
+                }
+            ))
+            return ValidationResult(False, flags, remaining, invoice_amount)
+
+        # Advertencia si se consume más del 90%
+        if invoice_amount > (remaining * 0.9):
+            flags.append(ValidationFlag(
+                flag_type="po_nearly_consumed",
+                severity="warning",
+                message=f"OC {po_number} cerca del límite (>90%)",
+                details={
+                    "po_number": po_number,
+                    "remaining_after": remaining - invoice_amount,
+                    "consumption_pct": ((already_invoiced + invoice_amount) / total_amount) * 100
+                }
+            ))
+
+        return ValidationResult(True, flags, remaining, invoice_amount)
+
+    @staticmethod
+    def _check_payment_vs_invoice(invoice_id: int, payment_amount: float,
+                                  row: Optional[Any]) -> ValidationResult:
+        flags: List[ValidationFlag] = []
+        if not row:
+            flags.append(ValidationFlag(
+                flag_type="invoice_not_found",
+                severity="error",
+                message=f"Factura ID {invoice_id} no encontrada",
+                details={"invoice_id": invoice_id}
+            ))
+            return ValidationResult(False, flags)
+
+        total_amount = row["total_amount"]
+        already_paid = row["already_paid"]
+        remaining = row["remaining"]
+
+        if payment_amount > remaining:
+            flags.append(ValidationFlag(
+                flag_type="overpaid",
+                severity="error",
+                message=f"Pago excede saldo de factura {row['invoice_number']}",
+                details={
+                    "invoice_id": invoice_id,
+                    "invoice_number": row["invoice_number"],
+                    "supplier": row["supplier_name"],
+                    "total_invoice": total_amount,
+                    "already_paid": already_paid,
+                    "remaining": remaining,
+                    "attempted": payment_amount,
+                    "excess": payment_amount - remaining
+                }
+            ))
+            return ValidationResult(False, flags, remaining, payment_amount)
+
+        return ValidationResult(True, flags, remaining, payment_amount)
+
+    @staticmethod
+    def _check_po_vs_budget(project_name: str, po_amount: float,
+                            row: Optional[Any]) -> ValidationResult:
+        flags: List[ValidationFlag] = []
+        if not row or row["budget_total"] == 0:
+            # Proyecto sin presupuesto definido
+            flags.append(ValidationFlag(
+                flag_type="no_budget",
+                severity="warning",
+                message=f"Proyecto {project_name} sin presupuesto definido",
+                details={
+                    "project_name": project_name,
+                    "po_amount": po_amount,
+                    "needs_budget": True
+                },
+                project_name=project_name
+            ))
+            return ValidationResult(True, flags)  # Permitir pero advertir
+
+        budget_total = row["budget_total"]
+        committed = row["committed"]
+        available = row["available"]
+
+        if po_amount > available:
+            flags.append(ValidationFlag(
+                flag_type="exceeds_budget",
+                severity="error" if po_amount > budget_total else "warning",
+                message=f"OC excede presupuesto disponible en {project_name}",
+                details={
+                    "project_name": project_name,
+                    "budget_total": budget_total,
+                    "committed": committed,
+                    "available": available,
+                    "attempted": po_amount,
+                    "excess": po_amount - available,
+                    "requires_approval": True
+                },
+                project_name=project_name
+            ))
+            return ValidationResult(False, flags, available, po_amount)
+
+        # Advertencia si consume más del 90% del disponible
+        if po_amount > (available * 0.9):
+            flags.append(ValidationFlag(
+                flag_type="budget_nearly_consumed",
+                severity="warning",
+                message=f"Proyecto {project_name} cerca del límite presupuestal",
+                details={
+                    "project_name": project_name,
+                    "remaining_after": available - po_amount,
+                    "budget_consumption_pct": ((committed + po_amount) / budget_total) * 100
+                },
+                project_name=project_name
+            ))
+
+        return ValidationResult(True, flags, available, po_amount)
+
     def validate_invoice_vs_po(self, po_number: str, invoice_amount: float,
                                po_line_id: Optional[str] = None) -> ValidationResult:
         """
@@ -78,72 +240,28 @@ class FinancialValidator:
                         SELECT
                             pol.po_number,
                             pol.line_total,
-                            COALESCE(SUM(apl.amount), 0) as already_invoiced,
-                            pol.line_total - COALESCE(SUM(apl.amount), 0) as remaining
+                            {linked} as already_invoiced,
+                            pol.line_total - {linked} as remaining
                         FROM purchase_order_lines pol
-                        LEFT JOIN ap_po_links apl ON apl.po_line_id = pol.id
+                        {join}
                         WHERE pol.po_number = ? AND pol.id = ?
                         GROUP BY pol.po_number, pol.id, pol.line_total
-                    """, (po_number, po_line_id))
+                    """.format(**self._linked_join(conn, "po_line", "pol.id")), (po_number, po_line_id))
                 else:
                     # Validación por OC total - usar zoho_ordenes_final
                     cur = conn.execute("""
                         SELECT
                             zo."Purchase Order Number" as po_number,
                             zo."Total" as total_amount,
-                            COALESCE(SUM(apl.amount), 0) as already_invoiced,
-                            zo."Total" - COALESCE(SUM(apl.amount), 0) as remaining
+                            {linked} as already_invoiced,
+                            zo."Total" - {linked} as remaining
                         FROM zoho_ordenes_final zo
-                        LEFT JOIN ap_po_links apl ON apl.po_id = zo."Purchase Order Number"
+                        {join}
                         WHERE zo."Purchase Order Number" = ?
                         GROUP BY zo."Purchase Order Number", zo."Total"
-                    """, (po_number,))
+                    """.format(**self._linked_join(conn, "po", 'zo."Purchase Order Number"')), (po_number,))
 
-                row = cur.fetchone()
-                if not row:
-                    flags.append(ValidationFlag(
-                        flag_type="po_not_found",
-                        severity="error",
-                        message=f"Orden de compra {po_number} no encontrada",
-                        details={"po_number": po_number}
-                    ))
-                    return ValidationResult(False, flags)
-
-                total_amount = row["total_amount"] if "total_amount" in row.keys() else row["line_total"]
-                already_invoiced = row["already_invoiced"]
-                remaining = row["remaining"]
-
-                if invoice_amount > remaining:
-                    flags.append(ValidationFlag(
-                        flag_type="invoice_over_po",
-                        severity="error",
-                        message=f"Factura excede disponible en OC {po_number}",
-                        details={
-                            "po_number": po_number,
-                            "po_line_id": po_line_id,
-                            "total_po": total_amount,
-                            "already_invoiced": already_invoiced,
-                            "remaining": remaining,
-                            "attempted": invoice_amount,
-                            "excess": invoice_amount - remaining
-                        }
-                    ))
-                    return ValidationResult(False, flags, remaining, invoice_amount)
-
-                # Advertencia si se consume más del 90%
-                if invoice_amount > (remaining * 0.9):
-                    flags.append(ValidationFlag(
-                        flag_type="po_nearly_consumed",
-                        severity="warning",
-                        message=f"OC {po_number} cerca del límite (>90%)",
-                        details={
-                            "po_number": po_number,
-                            "remaining_after": remaining - invoice_amount,
-                            "consumption_pct": ((already_invoiced + invoice_amount) / total_amount) * 100
-                        }
-                    ))
-
-                return ValidationResult(True, flags, remaining, invoice_amount)
+                return self._check_invoice_vs_po(po_number, invoice_amount, po_line_id, cur.fetchone())
 
         except Exception as e:
             logger.error(f"Error validating invoice vs PO: {e}")
@@ -184,39 +302,7 @@ class FinancialValidator:
                     GROUP BY ai.id, ai.total_amount, ai.invoice_number, ai.supplier_name
                 """, (invoice_id,))
 
-                row = cur.fetchone()
-                if not row:
-                    flags.append(ValidationFlag(
-                        flag_type="invoice_not_found",
-                        severity="error",
-                        message=f"Factura ID {invoice_id} no encontrada",
-                        details={"invoice_id": invoice_id}
-                    ))
-                    return ValidationResult(False, flags)
-
-                total_amount = row["total_amount"]
-                already_paid = row["already_paid"]
-                remaining = row["remaining"]
-
-                if payment_amount > remaining:
-                    flags.append(ValidationFlag(
-                        flag_type="overpaid",
-                        severity="error",
-                        message=f"Pago excede saldo de factura {row['invoice_number']}",
-                        details={
-                            "invoice_id": invoice_id,
-                            "invoice_number": row["invoice_number"],
-                            "supplier": row["supplier_name"],
-                            "total_invoice": total_amount,
-                            "already_paid": already_paid,
-                            "remaining": remaining,
-                            "attempted": payment_amount,
-                            "excess": payment_amount - remaining
-                        }
-                    ))
-                    return ValidationResult(False, flags, remaining, payment_amount)
-
-                return ValidationResult(True, flags, remaining, payment_amount)
+                return self._check_payment_vs_invoice(invoice_id, payment_amount, cur.fetchone())
 
         except Exception as e:
             logger.error(f"Error validating payment vs invoice: {e}")
@@ -258,59 +344,7 @@ class FinancialValidator:
                     GROUP BY p.name, p.budget_total, vpt.total_presupuesto
                 """, (project_name,))
 
-                row = cur.fetchone()
-                if not row or row["budget_total"] == 0:
-                    # Proyecto sin presupuesto definido
-                    flags.append(ValidationFlag(
-                        flag_type="no_budget",
-                        severity="warning",
-                        message=f"Proyecto {project_name} sin presupuesto definido",
-                        details={
-                            "project_name": project_name,
-                            "po_amount": po_amount,
-                            "needs_budget": True
-                        },
-                        project_name=project_name
-                    ))
-                    return ValidationResult(True, flags)  # Permitir pero advertir
-
-                budget_total = row["budget_total"]
-                committed = row["committed"]
-                available = row["available"]
-
-                if po_amount > available:
-                    flags.append(ValidationFlag(
-                        flag_type="exceeds_budget",
-                        severity="error" if po_amount > budget_total else "warning",
-                        message=f"OC excede presupuesto disponible en {project_name}",
-                        details={
-                            "project_name": project_name,
-                            "budget_total": budget_total,
-                            "committed": committed,
-                            "available": available,
-                            "attempted": po_amount,
-                            "excess": po_amount - available,
-                            "requires_approval": True
-                        },
-                        project_name=project_name
-                    ))
-                    return ValidationResult(False, flags, available, po_amount)
-
-                # Advertencia si consume más del 90% del disponible
-                if po_amount > (available * 0.9):
-                    flags.append(ValidationFlag(
-                        flag_type="budget_nearly_consumed",
-                        severity="warning",
-                        message=f"Proyecto {project_name} cerca del límite presupuestal",
-                        details={
-                            "project_name": project_name,
-                            "remaining_after": available - po_amount,
-                            "budget_consumption_pct": ((committed + po_amount) / budget_total) * 100
-                        },
-                        project_name=project_name
-                    ))
-
-                return ValidationResult(True, flags, available, po_amount)
+                return self._check_po_vs_budget(project_name, po_amount, cur.fetchone())
 
         except Exception as e:
             logger.error(f"Error validating PO vs budget: {e}")
@@ -322,6 +356,235 @@ class FinancialValidator:
             ))
             return ValidationResult(False, flags)
 
+    # ------------------------------------------------------------------
+    # Validación por lotes
+    # ------------------------------------------------------------------
+
+    BATCH_CHUNK = 400  # claves por consulta (muy por debajo del límite de parámetros)
+
+    @staticmethod
+    def _linked_join(conn: sqlite3.Connection, scope: str, target: str) -> Dict[str, str]:
+        """JOIN y expresión de monto ya facturado para `scope` ('po' | 'po_line').
+
+        Con `ap_balance_ledger` presente es una búsqueda por clave primaria;
+        si no, se agrega `ap_po_links` como antes.
+        """
+        if ledger_exists(conn):
+            return {
+                "join": (f"LEFT JOIN ap_balance_ledger apl ON apl.scope = '{scope}' "
+                         f"AND apl.key = CAST({target} AS TEXT)"),
+                "linked": "COALESCE(MAX(apl.linked_amount), 0)",
+            }
+        col = "po_line_id" if scope == "po_line" else "po_id"
+        return {
+            "join": f"LEFT JOIN ap_po_links apl ON apl.{col} = {target}",
+            "linked": "COALESCE(SUM(apl.amount), 0)",
+        }
+
+    @staticmethod
+    def _error_result(e: Exception) -> ValidationResult:
+        return ValidationResult(False, [ValidationFlag(
+            flag_type="validation_error",
+            severity="error",
+            message=f"Error en validación: {str(e)}",
+            details={"exception": str(e)}
+        )])
+
+    def _load_keyed(self, conn: sqlite3.Connection, keys: List[Tuple], sql: str) -> Dict[Tuple, Any]:
+        """Ejecuta `sql` una vez por bloque de claves y devuelve {clave: primera fila}.
+
+        `sql` recibe un CTE `req(k, a, b)` con las claves pedidas; `k` es el índice
+        de la clave y debe ser la primera columna del SELECT.
+        """
+        found: Dict[Tuple, Any] = {}
+        for start in range(0, len(keys), self.BATCH_CHUNK):
+            chunk = keys[start:start + self.BATCH_CHUNK]
+            values = ", ".join("(?, ?, ?)" for _ in chunk)
+            params: List[Any] = []
+            for i, key in enumerate(chunk, start):
+                params.extend((i, key[0], key[1] if len(key) > 1 else None))
+            cte = f"WITH req(k, a, b) AS (VALUES {values}) "
+            for row in conn.execute(cte + sql, params):
+                found.setdefault(keys[row["k"]], row)
+        return found
+
+    def validate_many(self, items: List[Dict[str, Any]]) -> List[ValidationResult]:
+        """
+        Validar muchos documentos con una sola conexión y consultas por conjunto.
+
+        Cada item es un dict con `type` y los mismos campos que la ruta individual:
+        - {"type": "invoice", "po_number", "invoice_amount", "po_line_id"?}
+        - {"type": "payment", "invoice_id", "payment_amount"}
+        - {"type": "po_budget", "project_name", "po_amount"}
+
+        Cada item se evalúa de forma independiente contra el estado actual de la
+        BD (igual que llamar N veces a la ruta individual), por lo que los flags
+        coinciden con los de validate_invoice_vs_po / validate_payment_vs_invoice /
+        validate_po_vs_budget. Devuelve los resultados en el mismo orden.
+        """
+        results: List[Optional[ValidationResult]] = [None] * len(items)
+        by_type: Dict[str, List[int]] = {"invoice": [], "payment": [], "po_budget": []}
+        for idx, item in enumerate(items):
+            problem = self._batch_item_problem(item)
+            if problem:
+                kind = item.get("type") if isinstance(item, dict) else None
+                results[idx] = ValidationResult(False, [ValidationFlag(
+                    flag_type="invalid_item",
+                    severity="error",
+                    message=problem,
+                    details={"index": idx, "type": kind if _is_scalar(kind) else None}
+                )])
+                continue
+            by_type[item["type"]].append(idx)
+
+        try:
+            conn = self._get_connection()
+        except Exception as e:
+            logger.error(f"Error validating batch: {e}")
+            return [r or self._error_result(e) for r in results]
+
+        try:
+            self._validate_invoices_batch(conn, items, by_type["invoice"], results)
+            self._validate_payments_batch(conn, items, by_type["payment"], results)
+            self._validate_budgets_batch(conn, items, by_type["po_budget"], results)
+        finally:
+            conn.close()
+        return results  # type: ignore[return-value]
+
+    @staticmethod
+    def _batch_item_problem(item: Any) -> Optional[str]:
+        """Motivo por el que un item del lote no es validable (None si lo es).
+
+        Tipo y campos clave deben ser escalares: se usan en dicts / sets.
+        """
+        if not isinstance(item, dict):
+            return "Cada item debe ser un objeto"
+        kind = item.get("type")
+        if not _is_scalar(kind) or kind not in _BATCH_KEY_FIELDS:
+            return f"Tipo de validación no soportado: {kind}"
+        bad = [f for f in _BATCH_KEY_FIELDS[kind] if not _is_scalar(item.get(f))]
+        if bad:
+            return f"Campos con valor no escalar: {', '.join(bad)}"
+        return None
+
+    def _validate_invoices_batch(self, conn, items, idxs, results) -> None:
+        if not idxs:
+            return
+        line_keys = sorted({(items[i].get("po_number"), items[i].get("po_line_id")) for i in idxs
+                            if items[i].get("po_line_id")}, key=repr)
+        po_keys = sorted({(items[i].get("po_number"),) for i in idxs
+                          if not items[i].get("po_line_id")}, key=repr)
+        try:
+            lines = self._load_keyed(conn, line_keys, """
+                SELECT
+                    req.k,
+                    pol.po_number,
+                    pol.line_total,
+                    {linked} as already_invoiced,
+                    pol.line_total - {linked} as remaining
+                FROM req
+                JOIN purchase_order_lines pol ON pol.po_number = req.a AND pol.id = req.b
+                {join}
+                GROUP BY req.k, pol.po_number, pol.id, pol.line_total
+            """.format(**self._linked_join(conn, "po_line", "pol.id"))) if line_keys else {}
+            pos = self._load_keyed(conn, po_keys, """
+                SELECT
+                    req.k,
+                    zo."Purchase Order Number" as po_number,
+                    zo."Total" as total_amount,
+                    {linked} as already_invoiced,
+                    zo."Total" - {linked} as remaining
+                FROM req
+                JOIN zoho_ordenes_final zo ON zo."Purchase Order Number" = req.a
+                {join}
+                GROUP BY req.k, zo."Purchase Order Number", zo."Total"
+            """.format(**self._linked_join(conn, "po", 'zo."Purchase Order Number"'))) if po_keys else {}
+        except Exception as e:
+            logger.error(f"Error validating invoice vs PO: {e}")
+            for i in idxs:
+                results[i] = self._error_result(e)
+            return
+
+        for i in idxs:
+            item = items[i]
+            po_number, po_line_id = item.get("po_number"), item.get("po_line_id")
+            row = lines.get((po_number, po_line_id)) if po_line_id else pos.get((po_number,))
+            try:
+                results[i] = self._check_invoice_vs_po(po_number, float(item.get("invoice_amount", 0)), po_line_id, row)
+            except Exception as e:
+                logger.error(f"Error validating invoice vs PO: {e}")
+                results[i] = self._error_result(e)
+
+    def _validate_payments_batch(self, conn, items, idxs, results) -> None:
+        if not idxs:
+            return
+        keys = sorted({(items[i].get("invoice_id"),) for i in idxs}, key=repr)
+        try:
+            invoices = self._load_keyed(conn, keys, """
+                SELECT
+                    req.k,
+                    ai.id,
+                    ai.total_amount,
+                    ai.invoice_number,
+                    ai.supplier_name,
+                    COALESCE(SUM(cb.monto), 0) as already_paid,
+                    ai.total_amount - COALESCE(SUM(cb.monto), 0) as remaining
+                FROM req
+                JOIN ap_invoices ai ON ai.id = req.a
+                LEFT JOIN v_cartola_bancaria cb ON cb.invoice_id = ai.id
+                GROUP BY req.k, ai.id, ai.total_amount, ai.invoice_number, ai.supplier_name
+            """)
+        except Exception as e:
+            logger.error(f"Error validating payment vs invoice: {e}")
+            for i in idxs:
+                results[i] = self._error_result(e)
+            return
+
+        for i in idxs:
+            item = items[i]
+            invoice_id = item.get("invoice_id")
+            try:
+                results[i] = self._check_payment_vs_invoice(
+                    invoice_id, float(item.get("payment_amount", 0)), invoices.get((invoice_id,)))
+            except Exception as e:
+                logger.error(f"Error validating payment vs invoice: {e}")
+                results[i] = self._error_result(e)
+
+    def _validate_budgets_batch(self, conn, items, idxs, results) -> None:
+        if not idxs:
+            return
+        keys = sorted({(items[i].get("project_name"),) for i in idxs}, key=repr)
+        try:
+            projects = self._load_keyed(conn, keys, """
+                SELECT
+                    req.k,
+                    p.name as project_name,
+                    COALESCE(p.budget_total, vpt.total_presupuesto, 0) as budget_total,
+                    COALESCE(SUM(po.total_amount), 0) as committed,
+                    COALESCE(p.budget_total, vpt.total_presupuesto, 0) - COALESCE(SUM(po.total_amount), 0) as available
+                FROM req
+                JOIN projects p ON LOWER(TRIM(p.name)) = LOWER(TRIM(req.a))
+                LEFT JOIN v_presupuesto_totales vpt ON LOWER(TRIM(vpt.proyecto)) = LOWER(TRIM(p.name))
+                LEFT JOIN purchase_orders_unified po ON LOWER(TRIM(po.project_name)) = LOWER(TRIM(p.name))
+                    AND po.status IN ('approved', 'closed')
+                GROUP BY req.k, p.name, p.budget_total, vpt.total_presupuesto
+            """)
+        except Exception as e:
+            logger.error(f"Error validating PO vs budget: {e}")
+            for i in idxs:
+                results[i] = self._error_result(e)
+            return
+
+        for i in idxs:
+            item = items[i]
+            project_name = item.get("project_name")
+            try:
+                results[i] = self._check_po_vs_budget(
+                    project_name, float(item.get("po_amount", 0)), projects.get((project_name,)))
+            except Exception as e:
+                logger.error(f"Error validating PO vs budget: {e}")
+                results[i] = self._error_result(e)
+
     def get_project_risk_flags(self, project_name: str) -> List[ValidationFlag]:
         """
         Obtener todos los flags de riesgo para un proyecto.
@@ -361,13 +624,23 @@ class FinancialValidator:
                     ))
 
                 # Buscar facturas sin OC
-                cur = conn.execute("""
-                    SELECT COUNT(*) as orphan_invoices
-                    FROM ap_invoices ai
-                    LEFT JOIN ap_po_links apl ON apl.invoice_id = ai.id
-                    WHERE LOWER(TRIM(ai.project_name)) = LOWER(TRIM(?))
-                    AND apl.id IS NULL
-                """, (project_name,))
+                if ledger_exists(conn):
+                    cur = conn.execute("""
+                        SELECT COUNT(*) as orphan_invoices
+                        FROM ap_invoices ai
+                        LEFT JOIN ap_balance_ledger b
+                          ON b.scope = 'invoice' AND b.key = CAST(ai.id AS TEXT)
+                        WHERE LOWER(TRIM(ai.project_name)) = LOWER(TRIM(?))
+                        AND COALESCE(b.links, 0) <= 0
+                    """, (project_name,))
+                else:
+                    cur = conn.execute("""
+                        SELECT COUNT(*) as orphan_invoices
+                        FROM ap_invoices ai
+                        LEFT JOIN ap_po_links apl ON apl.invoice_id = ai.id
+                        WHERE LOWER(TRIM(ai.project_name)) = LOWER(TRIM(?))
+                        AND apl.id IS NULL
+                    """, (project_name,))
 
                 orphan_count = cur.fetchone()["orphan_invoices"]
                 if orphan_count > 0:
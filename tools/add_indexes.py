@@ -11,6 +11,7 @@ if __package__ in (None, ""):
     sys.path.append(str(here))
 
 from common_db import default_db_path
+from create_finance_views import create_view_indexes
 
 
 def main() -> int:
@@ -40,6 +41,8 @@ def main() -> int:
             except sqlite3.Error:
                 # Skip if table not present yet
                 pass
+        # Índices de las vistas de finanzas (filtros, orden y keyset)
+        create_view_indexes(conn)
         conn.commit()
         print("Indexes ensured on:", db)
         return 0
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Shared history engine for the `gen_ar_rules_*` badge generators.
+
+Loads `badges/ar_rules_history.csv` once into columnar arrays (`array('d')`
+per rate column) and computes every rolling statistic the badges need
+(min/max/avg, WMA, sample std dev, percentiles, current streak) from one
+slice per window. Results are memoized per window, so rendering all
+artifacts in one process parses the CSV and walks each window only once.
+
+Optional binary cache (`--cache PATH`): the parsed columns are stored with
+`marshal`, keyed by the CSV mtime and size; a stale or unreadable cache is
+simply rebuilt.
+
+Render every history-derived artifact in one invocation:
+
+  python tools/ar_rules_history.py --history badges/ar_rules_history.csv --out-dir badges \
+      [--emit-github-output "$GITHUB_OUTPUT"] [--cache .cache/ar_rules_history.bin]
+
+Writes ar_rules_trend.svg, ar_rules_trend_wma.svg, ar_rules_volatility.svg,
+ar_rules_volatility.json, ar_rules_weekly.json, ar_rules_sparkline.svg and
+ar_rules_streak.svg. The individual `gen_ar_rules_*` scripts keep their CLIs
+and use the same engine.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import marshal
+import math
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ASSIGN_COL = "project_assign_rate"
+COVERAGE_COL = "customer_name_rule_coverage"
+_CACHE_VERSION = 1
+
+# path -> ((mtime_ns, size), History); avoids re-parsing inside one process
+_loaded: Dict[str, Tuple[Tuple[int, int], "History"]] = {}
+
+
+def stdev(values: Sequence[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    m = sum(values) / len(values)
+    var = sum((v - m) ** 2 for v in values) / (len(values) - 1)
+    return math.sqrt(var)
+
+
+def wma(values: Sequence[float]) -> float:
+    """Linear weights 1..N (most recent row weighs N)."""
+    if not values:
+        return 0.0
+    total_w = len(values) * (len(values) + 1) / 2
+    return sum(v * w for w, v in enumerate(values, start=1)) / total_w
+
+
+def percentile(sorted_vals: Sequence[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    if p <= 0:
+        return sorted_vals[0]
+    if p >= 1:
+        return sorted_vals[-1]
+    k = (len(sorted_vals) - 1) * p
+    f = int(k)
+    c = min(f + 1, len(sorted_vals) - 1)
+    if f == c:
+        return sorted_vals[f]
+    d = k - f
+    return sorted_vals[f] + (sorted_vals[c] - sorted_vals[f]) * d
+
+
+def streak(values: Sequence[float]) -> Tuple[int, int]:
+    """(direction, points) of the current strict up (1) / down (-1) run.
+
+    Walks back from the last value until the direction changes or two values
+    are equal; `points` counts values in the run (0 when there is no run).
+    """
+    direction = 0
+    transitions = 0
+    for i in range(len(values) - 1, 0, -1):
+        step = (values[i] > values[i - 1]) - (values[i] < values[i - 1])
+        if step == 0 or (direction and step != direction):
+            break
+        direction = step
+        transitions += 1
+    return direction, (transitions + 1 if transitions else 0)
+
+
+@dataclass(frozen=True)
+class SeriesStats:
+    values: Tuple[float, ...]
+    rows: int
+    min: Optional[float]
+    max: Optional[float]
+    avg: Optional[float]
+    wma: float
+    sd: float
+    streak_dir: int
+    streak_len: int
+    sorted_values: Tuple[float, ...] = field(repr=False)
+
+    @classmethod
+    def of(cls, values: Sequence[float]) -> "SeriesStats":
+        vals = tuple(values)
+        n = len(vals)
+        direction, points = streak(vals)
+        return cls(
+            values=vals,
+            rows=n,
+            min=min(vals) if n else None,
+            max=max(vals) if n else None,
+            avg=sum(vals) / n if n else None,
+            wma=wma(vals),
+            sd=stdev(vals),
+            streak_dir=direction,
+            streak_len=points,
+            sorted_values=tuple(sorted(vals)),
+        )
+
+    def percentile(self, p: float) -> float:
+        return percentile(self.sorted_values, p)
+
+
+@dataclass
+class History:
+    timestamps: List[str]
+    assign: array
+    coverage: array
+    _windows: Dict[int, Tuple[SeriesStats, SeriesStats]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    @classmethod
+    def empty(cls) -> "History":
+        return cls([], array("d"), array("d"))
+
+    def __len__(self) -> int:
+        return len(self.assign)
+
+    def _slice(self, n: Optional[int]) -> slice:
+        # Same semantics as the scripts' previous `rows[-n:]`
+        return slice(-n, None) if n else slice(None)
+
+    def rows(self, n: Optional[int] = None) -> List[Tuple[float, float]]:
+        s = self._slice(n)
+        return list(zip(self.assign[s], self.coverage[s]))
+
+    def window(self, n: Optional[int]) -> Tuple[SeriesStats, SeriesStats]:
+        """(assign, coverage) stats of the last `n` rows, memoized per window."""
+        key = n or 0
+        if key not in self._windows:
+            s = self._slice(n)
+            self._windows[key] = (SeriesStats.of(self.assign[s]), SeriesStats.of(self.coverage[s]))
+        return self._windows[key]
+
+
+def _parse(path: Path) -> History:
+    hist = History.empty()
+    with path.open("r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                a = float(row.get(ASSIGN_COL) or 0)
+                c = float(row.get(COVERAGE_COL) or 0)
+            except ValueError:
+                continue
+            hist.timestamps.append(row.get("timestamp") or "")
+            hist.assign.append(a)
+            hist.coverage.append(c)
+    return hist
+
+
+def _read_cache(cache_path: Path, key: Tuple[int, int]) -> Optional[History]:
+    try:
+        version, cached_key, timestamps, assign, coverage = marshal.loads(cache_path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != _CACHE_VERSION or tuple(cached_key) != key:
+        return None
+    hist = History(list(timestamps), array("d"), array("d"))
+    hist.assign.frombytes(assign)
+    hist.coverage.frombytes(coverage)
+    return hist
+
+
+def _write_cache(cache_path: Path, key: Tuple[int, int], hist: History) -> None:
+    payload = (_CACHE_VERSION, key, hist.timestamps, hist.assign.tobytes(), hist.coverage.tobytes())
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_bytes(marshal.dumps(payload))
+    except OSError:
+        pass  # the cache is an optimization only
+
+
+def load_history(path: Path | str, cache_path: Path | str | None = None) -> History:
+    """Parsed history for `path` (empty if missing), reused while the file is unchanged."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return History.empty()
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _loaded.get(str(path))
+    if hit and hit[0] == key:
+        return hit[1]
+    hist = _read_cache(Path(cache_path), key) if cache_path else None
+    if hist is None:
+        hist = _parse(path)
+        if cache_path:
+            _write_cache(Path(cache_path), key, hist)
+    _loaded[str(path)] = (key, hist)
+    return hist
+
+
+def render_all(
+    hist: History,
+    out_dir: Path,
+    *,
+    short_window: int = 7,
+    streak_window: int = 14,
+    sparkline_window: int = 30,
+) -> Dict[str, Path]:
+    """Write every history-derived artifact into `out_dir`; returns name -> path."""
+    import gen_ar_rules_sparkline_badge as sparkline
+    import gen_ar_rules_streak_badge as streak_badge
+    import gen_ar_rules_trend_badge as trend
+    import gen_ar_rules_volatility_badge as volatility
+    import gen_ar_rules_volatility_json as volatility_json
+    import gen_ar_rules_weekly_agg as weekly
+    import gen_ar_rules_wma_badge as wma_badge
+
+    artifacts = {
+        "ar_rules_trend.svg": trend.render(hist, short_window),
+        "ar_rules_trend_wma.svg": wma_badge.render(hist, short_window),
+        "ar_rules_volatility.svg": volatility.render(hist, short_window),
+        "ar_rules_volatility.json": json.dumps(volatility_json.metrics(hist, short_window), indent=2),
+        "ar_rules_weekly.json": json.dumps(weekly.aggregate(*hist.window(short_window)), indent=2),
+        "ar_rules_sparkline.svg": sparkline.build_svg(hist.rows(sparkline_window)),
+        "ar_rules_streak.svg": streak_badge.render(hist, streak_window),
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written: Dict[str, Path] = {}
+    for name, text in artifacts.items():
+        outp = out_dir / name
+        outp.write_text(text, encoding="utf-8")
+        written[name] = outp
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--history", required=True)
+    ap.add_argument("--out-dir", required=True)
+    ap.add_argument("--cache", default=None, help="Binary cache file keyed by CSV mtime/size")
+    ap.add_argument("--window", type=int, default=7, help="Window for trend/WMA/volatility/weekly")
+    ap.add_argument("--streak-window", type=int, default=14)
+    ap.add_argument("--sparkline-window", type=int, default=30)
+    ap.add_argument("--emit-github-output", default=None, help="Path to $GITHUB_OUTPUT to write volatility pp values")
+    args = ap.parse_args(argv)
+
+    hist = load_history(args.history, args.cache)
+    written = render_all(
+        hist,
+        Path(args.out_dir),
+        short_window=args.window,
+        streak_window=args.streak_window,
+        sparkline_window=args.sparkline_window,
+    )
+    if args.emit_github_output:
+        import gen_ar_rules_volatility_badge as volatility
+
+        assign, cov = hist.window(args.window)
+        volatility.write_github_output(args.emit_github_output, assign.sd, cov.sd)
+    print(f"{len(hist)} history rows -> {len(written)} artifacts in {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
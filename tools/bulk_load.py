@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Chunked, set-based bulk upsert engine for the SQLite importers.
+
+Rows are streamed in, staged into a TEMP table with ``executemany`` and merged
+into the target with a single ``INSERT ... SELECT ... ON CONFLICT DO UPDATE``
+per chunk. Insert/update counts are derived without per-row lookups:
+
+- ``changes`` = ``total_changes`` delta of the merge (one per staged row)
+- ``inserted`` = rows whose rowid is above the pre-merge ``MAX(rowid)``
+- ``updated`` = ``changes - inserted``
+
+``bulk_insert_missing`` is the variant for tables without a UNIQUE key
+(expenses, payroll, Previred): staged rows are inserted only when no existing
+row, nor an earlier row of the same load, matches a caller-supplied predicate.
+
+Each chunk commits on its own (``commit=False`` leaves that to the caller),
+and ``load_pragmas`` relaxes durability (``synchronous=OFF``,
+``journal_mode=WAL``) for the duration of a load.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Optional, Sequence
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Chunks per commit for bulk_insert_missing (0 = the caller commits)
+DEFAULT_COMMIT_EVERY = int(os.getenv("IMPORT_COMMIT_EVERY", "1"))
+
+
+@dataclass
+class BulkResult:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = self.__dict__.copy()
+        data["seconds"] = round(self.seconds, 4)
+        data["rows_per_sec"] = self.rows_per_sec
+        return data
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _chunks(rows: Iterable[Sequence[Any]], size: int) -> Iterator[list[Sequence[Any]]]:
+    batch: list[Sequence[Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def load_pragmas(
+    con: sqlite3.Connection,
+    *,
+    synchronous: str = "OFF",
+    journal_mode: str = "WAL",
+) -> Iterator[None]:
+    """Apply fast-load pragmas and restore the previous values afterwards."""
+    con.commit()  # journal_mode cannot change inside a transaction
+    prev_sync = con.execute("PRAGMA synchronous").fetchone()[0]
+    prev_journal = con.execute("PRAGMA journal_mode").fetchone()[0]
+    con.execute(f"PRAGMA synchronous={synchronous}")
+    if journal_mode and str(prev_journal).lower() not in ("memory", journal_mode.lower()):
+        con.execute(f"PRAGMA journal_mode={journal_mode}")
+    try:
+        yield
+    finally:
+        con.commit()
+        con.execute(f"PRAGMA synchronous={int(prev_sync)}")
+        if journal_mode and str(prev_journal).lower() != journal_mode.lower():
+            try:
+                con.execute(f"PRAGMA journal_mode={prev_journal}")
+            except sqlite3.Error:
+                # Other readers may hold the WAL open; keeping WAL is harmless.
+                pass
+
+
+def bulk_upsert(
+    con: sqlite3.Connection,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    *,
+    conflict: Sequence[str],
+    update: Optional[Mapping[str, str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    commit: bool = True,
+    on_chunk: Optional[Callable[[BulkResult], None]] = None,
+) -> BulkResult:
+    """Upsert ``rows`` (tuples ordered as ``columns``) into ``table``.
+
+    ``conflict`` must match a UNIQUE index on the target. ``update`` maps a
+    column to the SQL expression assigned on conflict; by default every
+    non-key column takes ``excluded.<col>``; an empty mapping keeps existing
+    rows (``DO NOTHING``). Later rows win over earlier ones with the same key,
+    exactly like a per-row upsert loop. With ``commit=False`` chunks are not
+    committed and the whole load stays in the caller's transaction.
+    ``on_chunk`` receives the running result after each chunk (progress).
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if update is None:
+        update = {c: f"excluded.{_quote(c)}" for c in columns if c not in conflict}
+
+    stage = _quote(f"_bulk_{table}")
+    target = _quote(table)
+    col_list = ", ".join(_quote(c) for c in columns)
+    con.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+    con.execute(f"CREATE TEMP TABLE {stage} (_seq INTEGER PRIMARY KEY, {col_list})")
+    stage_insert = f"INSERT INTO {stage} ({col_list}) VALUES ({', '.join('?' for _ in columns)})"
+    set_clause = ", ".join(f"{_quote(c)}={expr}" for c, expr in update.items())
+    on_conflict = f"DO UPDATE SET {set_clause}" if set_clause else "DO NOTHING"
+    merge = (
+        f"INSERT INTO {target} ({col_list}) "
+        f"SELECT {col_list} FROM {stage} WHERE true ORDER BY _seq "
+        f"ON CONFLICT({', '.join(_quote(c) for c in conflict)}) {on_conflict}"
+    )
+
+    result = BulkResult()
+    started = time.perf_counter()
+    try:
+        for batch in _chunks(rows, chunk_size):
+            con.execute(f"DELETE FROM {stage}")
+            con.executemany(stage_insert, batch)
+            max_rowid = con.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {target}").fetchone()[0]
+            before = con.total_changes
+            con.execute(merge)
+            changes = con.total_changes - before
+            inserted = con.execute(
+                f"SELECT COUNT(*) FROM {target} WHERE rowid > ?", (max_rowid,)
+            ).fetchone()[0]
+            if commit:
+                con.commit()
+            result.rows += len(batch)
+            result.inserted += inserted
+            result.updated += max(changes - inserted, 0)
+            result.chunks += 1
+            if on_chunk is not None:
+                on_chunk(result)
+    finally:
+        con.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+        result.seconds = time.perf_counter() - started
+    return result
+
+
+def bulk_insert_missing(
+    con: sqlite3.Connection,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    *,
+    match: str,
+    stage_indexes: Sequence[Sequence[str]] = (),
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+) -> BulkResult:
+    """Insert the ``rows`` that do not duplicate an existing row.
+
+    ``rows`` may contain ``None`` (rejected upstream; not counted). The target
+    column set is resolved once: ``columns`` missing from an older table are
+    dropped from every row.
+
+    ``match`` is an SQL predicate over ``t`` (a row already loaded) and ``s``
+    (the staged row), e.g. ``"t.periodo = s.periodo"``; it should be able to
+    use an index on the target. Earlier rows of the same load count as loaded,
+    so the first occurrence wins like in a per-row check-then-insert loop.
+    ``stage_indexes`` (tuples of columns or expressions, as written in
+    ``match``) are created on the staging table for that in-load check. Commits every ``commit_every`` chunks (0 = never; the
+    caller owns the transaction). ``updated`` is always 0.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    target = _quote(table)
+    present = {r[1] for r in con.execute(f"PRAGMA table_info({target})")}
+    keep = [i for i, c in enumerate(columns) if c in present]
+    if len(keep) == len(columns):
+        rows = (r for r in rows if r is not None)
+    else:
+        rows = (tuple(r[i] for i in keep) for r in rows if r is not None)
+        columns = [columns[i] for i in keep]
+    stage = _quote(f"_bulk_{table}")
+    col_list = ", ".join(_quote(c) for c in columns)
+    con.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+    con.execute(f"CREATE TEMP TABLE {stage} (_seq INTEGER PRIMARY KEY, {col_list})")
+    for n, exprs in enumerate(stage_indexes):
+        con.execute(
+            f"CREATE INDEX temp.{_quote(f'_bulk_{table}_key{n}')} ON {stage} ({', '.join(exprs)})"
+        )
+    stage_insert = f"INSERT INTO {stage} ({col_list}) VALUES ({', '.join('?' for _ in columns)})"
+    merge = (
+        f"INSERT INTO {target} ({col_list}) "
+        f"SELECT {', '.join('s.' + _quote(c) for c in columns)} FROM {stage} s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE {match}) "
+        f"AND NOT EXISTS (SELECT 1 FROM {stage} t WHERE t._seq < s._seq AND ({match})) "
+        "ORDER BY s._seq"
+    )
+
+    result = BulkResult()
+    started = time.perf_counter()
+    try:
+        for batch in _chunks(rows, chunk_size):
+            con.execute(f"DELETE FROM {stage}")
+            con.executemany(stage_insert, batch)
+            before = con.total_changes
+            con.execute(merge)
+            result.rows += len(batch)
+            result.inserted += con.total_changes - before
+            result.chunks += 1
+            if commit_every > 0 and result.chunks % commit_every == 0:
+                con.commit()
+        if commit_every > 0:
+            con.commit()
+    finally:
+        con.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+        result.seconds = time.perf_counter() - started
+    return result
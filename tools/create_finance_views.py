@@ -17,6 +17,10 @@ Usage:
     python create_finance_views.py --db "ofitec.ai/data/chipax_data.db"
 
 Idempotent: existing views are dropped and recreated.
+
+Also ensures VIEW_INDEX_PLAN: base-table indexes backing the filters, ORDER BY
+fields and keyset tiebreaks used by `server._query_view` (`--indexes-only`
+applies just the plan).
 """
 
 from __future__ import annotations
@@ -59,6 +63,68 @@ def table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
         return []
 
 
+def id_column(conn: sqlite3.Connection, table: str) -> str:
+    """Expresión `id` de la vista: la PK de la tabla base, o su rowid si no la tiene."""
+    return "id" if "id" in table_columns(conn, table) else "rowid AS id"
+
+
+# view -> [(index, base table, columns)]; columns mirror `_VIEW_SPECS` in
+# backend/server.py (order_fields + tiebreak, date/rut filters)
+VIEW_INDEX_PLAN: dict[str, List[Tuple[str, str, Tuple[str, ...]]]] = {
+    "v_facturas_compra": [
+        ("ix_pou_date_number", "purchase_orders_unified", ("po_date", "po_number")),
+        ("ix_pou_amount_number", "purchase_orders_unified", ("total_amount", "po_number")),
+        ("ix_pou_vendor", "purchase_orders_unified", ("vendor_rut",)),
+    ],
+    "v_facturas_venta": [
+        ("ix_si_date_number", "sales_invoices", ("invoice_date", "invoice_number")),
+        ("idx_si_customer", "sales_invoices", ("customer_rut",)),
+    ],
+    "v_cartola_bancaria": [
+        # rowid (id) va implícito en el índice: cubre ORDER BY fecha, id
+        ("ix_bank_fecha", "bank_movements", ("fecha",)),
+        ("ix_bank_monto", "bank_movements", ("monto",)),
+        ("idx_links_bank", "recon_links", ("bank_movement_id",)),
+        ("ix_bank_recon_state", "bank_movements", ("reconciled_state", "fecha")),
+    ],
+    "v_gastos": [
+        ("ix_expenses_fecha", "expenses", ("fecha",)),
+        ("ix_expenses_proveedor", "expenses", ("proveedor_rut",)),
+    ],
+    "v_impuestos": [
+        ("ix_taxes_periodo_tipo", "taxes", ("periodo", "tipo")),
+    ],
+    "v_previred": [
+        ("ix_previred_periodo_rut", "previred_contributions", ("periodo", "rut_trabajador", "rut_empresa")),
+        ("ix_previred_rut", "previred_contributions", ("rut_trabajador",)),
+    ],
+    "v_sueldos": [
+        ("ix_payroll_periodo_rut", "payroll_slips", ("periodo", "rut_trabajador")),
+        ("ix_payroll_rut", "payroll_slips", ("rut_trabajador",)),
+    ],
+}
+
+
+def create_view_indexes(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """Apply VIEW_INDEX_PLAN for tables/columns that exist; returns (index, status)."""
+    statuses: List[Tuple[str, str]] = []
+    for plan in VIEW_INDEX_PLAN.values():
+        for name, table, columns in plan:
+            if not table_exists(conn, table):
+                continue
+            if not set(columns) <= set(table_columns(conn, table)):
+                statuses.append((name, "skipped_missing_columns"))
+                continue
+            try:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)})"
+                )
+                statuses.append((name, "ok"))
+            except sqlite3.Error as e:
+                statuses.append((name, f"error: {e}"))
+    return statuses
+
+
 def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     """Create or refresh all finance views; returns list of (view, status)."""
     statuses: List[Tuple[str, str]] = []
@@ -67,9 +133,10 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     drop_view(conn, "v_facturas_compra")
     if table_exists(conn, "purchase_orders_unified"):
         conn.execute(
-            """
+            f"""
             CREATE VIEW v_facturas_compra AS
             SELECT
+              {id_column(conn, "purchase_orders_unified")},
               po_number         AS documento_numero,
               po_date           AS fecha,
               vendor_rut        AS proveedor_rut,
@@ -93,6 +160,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
             """
             CREATE VIEW v_facturas_compra AS
             SELECT
+              CAST(NULL AS INTEGER) AS id,
               CAST(NULL AS TEXT) AS documento_numero,
               CAST(NULL AS TEXT) AS fecha,
               CAST(NULL AS TEXT) AS proveedor_rut,
@@ -139,6 +207,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
             f"""
             CREATE VIEW v_facturas_venta AS
             SELECT
+              {id_column(conn, "sales_invoices")},
               invoice_number  AS documento_numero,
               {fecha_col}     AS fecha,
               customer_rut    AS cliente_rut,
@@ -155,6 +224,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_facturas_venta",
             [
+                ("id", "INTEGER"),
                 ("documento_numero", "TEXT"),
                 ("fecha", "TEXT"),
                 ("cliente_rut", "TEXT"),
@@ -170,9 +240,10 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     drop_view(conn, "v_gastos")
     if table_exists(conn, "expenses"):
         conn.execute(
-            """
+            f"""
             CREATE VIEW v_gastos AS
             SELECT
+              {id_column(conn, "expenses")},
               CAST(id AS TEXT) AS gasto_id,
               fecha,
               categoria,
@@ -190,6 +261,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_gastos",
             [
+                ("id", "INTEGER"),
                 ("gasto_id", "TEXT"),
                 ("fecha", "TEXT"),
                 ("categoria", "TEXT"),
@@ -206,9 +278,10 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     drop_view(conn, "v_impuestos")
     if table_exists(conn, "taxes"):
         conn.execute(
-            """
+            f"""
             CREATE VIEW v_impuestos AS
             SELECT
+              {id_column(conn, "taxes")},
               periodo,
               tipo,
               monto_debito,
@@ -225,6 +298,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_impuestos",
             [
+                ("id", "INTEGER"),
                 ("periodo", "TEXT"),
                 ("tipo", "TEXT"),
                 ("monto_debito", "REAL"),
@@ -242,6 +316,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_gastos",
             [
+                ("id", "INTEGER"),
                 ("gasto_id", "TEXT"),
                 ("fecha", "TEXT"),
                 ("categoria", "TEXT"),
@@ -257,6 +332,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_impuestos",
             [
+                ("id", "INTEGER"),
                 ("periodo", "TEXT"),
                 ("tipo", "TEXT"),
                 ("monto_debito", "REAL"),
@@ -272,9 +348,10 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     drop_view(conn, "v_previred")
     if table_exists(conn, "previred_contributions"):
         conn.execute(
-            """
+            f"""
             CREATE VIEW v_previred AS
             SELECT
+              {id_column(conn, "previred_contributions")},
               periodo,
               rut_trabajador,
               nombre_trabajador,
@@ -291,6 +368,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_previred",
             [
+                ("id", "INTEGER"),
                 ("periodo", "TEXT"),
                 ("rut_trabajador", "TEXT"),
                 ("nombre_trabajador", "TEXT"),
@@ -306,9 +384,10 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     drop_view(conn, "v_sueldos")
     if table_exists(conn, "payroll_slips"):
         conn.execute(
-            """
+            f"""
             CREATE VIEW v_sueldos AS
             SELECT
+              {id_column(conn, "payroll_slips")},
               periodo,
               rut_trabajador,
               nombre_trabajador,
@@ -326,6 +405,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_sueldos",
             [
+                ("id", "INTEGER"),
                 ("periodo", "TEXT"),
                 ("rut_trabajador", "TEXT"),
                 ("nombre_trabajador", "TEXT"),
@@ -341,10 +421,18 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     # 7) v_cartola_bancaria
     drop_view(conn, "v_cartola_bancaria")
     if table_exists(conn, "bank_movements"):
+        # Estado de conciliación mantenido en la tabla (backend/bank_recon_state.py)
+        recon_cols = ""
+        if "reconciled_state" in table_columns(conn, "bank_movements"):
+            recon_cols = """,
+              CASE WHEN reconciled_state = 'confirmado' THEN 1 ELSE 0 END AS conciliado,
+              reconciled_amount AS monto_conciliado,
+              reconciled_state  AS estado"""
         conn.execute(
-            """
+            f"""
             CREATE VIEW v_cartola_bancaria AS
             SELECT
+              id,
               fecha,
               bank_name      AS banco,
               account_number AS cuenta,
@@ -354,7 +442,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
               tipo,
               saldo,
               referencia,
-              COALESCE(fuente, 'unknown') AS fuente
+              COALESCE(fuente, 'unknown') AS fuente{recon_cols}
             FROM bank_movements;
             """
         )
@@ -363,6 +451,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
         create_placeholder(
             "v_cartola_bancaria",
             [
+                ("id", "INTEGER"),
                 ("fecha", "TEXT"),
                 ("banco", "TEXT"),
                 ("cuenta", "TEXT"),
@@ -585,6 +674,7 @@ def create_views(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
     except sqlite3.Error:
         # ignore index creation errors
         pass
+    statuses.extend(create_view_indexes(conn))
 
     return statuses
 
@@ -604,6 +694,11 @@ def main() -> int:
         action="store_true",
         help="Deprecated (views are dropped automatically if present)",
     )
+    parser.add_argument(
+        "--indexes-only",
+        action="store_true",
+        help="Only ensure VIEW_INDEX_PLAN (views untouched)",
+    )
     args = parser.parse_args()
 
     db_path = os.path.abspath(args.db_path)
@@ -612,7 +707,10 @@ def main() -> int:
     conn = sqlite3.connect(db_path)
     try:
         conn.execute("PRAGMA foreign_keys = ON;")
-        statuses = create_views(conn)
+        if args.indexes_only:
+            statuses = create_view_indexes(conn)
+        else:
+            statuses = create_views(conn)
         conn.commit()
     finally:
         conn.close()
@@ -30,6 +30,7 @@ if __package__ in (None, ""):
 from common_db import default_db_path
 from rut_utils import normalize_rut, is_valid_rut
 from numbering import ensure_sequence, next_number
+from period_cube import refresh as refresh_period_cube
 
 
 def main() -> int:
@@ -95,6 +96,8 @@ def main() -> int:
             "INSERT INTO purchase_orders_unified (" + ", ".join(parts) + ") VALUES (" + ", ".join(["?"]*len(parts)) + ")"
         )
         conn.execute(sql, vals)
+        # Recalcula solo los periodos de la OC; confirma junto con el insert
+        refresh_period_cube(conn, ["purchase_orders"], since=args.po_date)
         conn.commit()
         print("Created PO:", po_number)
         return 0
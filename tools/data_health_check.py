@@ -9,22 +9,37 @@ Objetivos:
      ser claves de búsqueda.
  4. Heurística de fragmentación: páginas freelist vs páginas totales.
  5. Recomendaciones: ejecutar VACUUM / ANALYZE según umbrales.
- 6. Validación de integridad: PRAGMA integrity_check.
+ 6. Validación de integridad: PRAGMA quick_check sobre la BD y
+     PRAGMA integrity_check(tabla) solo para tablas que cambiaron.
+
+Incremental: cada tabla tiene una huella (COUNT(*), max rowid y hash del
+DDL) que se guarda junto a las fechas del último cálculo en un archivo de
+estado junto a la BD (`<db>.health.json`, o `--state`). Si la huella no
+cambió se reutilizan las fechas del estado y no se revisa la integridad de
+la tabla. La huella cuesta un COUNT(*) por tabla: lo que se evita son los
+MIN/MAX de fechas y el integrity_check, no el conteo.
+Sin estado previo (o con `--full`) se recalcula todo y la integridad es un
+`PRAGMA integrity_check` completo.
 
 Uso:
   python tools/data_health_check.py --db data/chipax_data.db --json
+  python tools/data_health_check.py --db data/chipax_data.db --full
 
 Salida:
   - Por defecto: reporte humano.
   - Con --json: objeto JSON serializado.
 
 Limitaciones:
-  - No modifica la BD.
+  - No modifica la BD (solo escribe el archivo de estado).
+  - Los UPDATE (o DELETE + INSERT) que dejan igual el conteo y el max
+    rowid no se detectan: fechas e integridad de esa tabla quedan del
+    estado anterior hasta una corrida con `--full`.
   - No fuerza ANALYZE (solo recomienda).
 
 """
 from __future__ import annotations
 import argparse
+import hashlib
 import json
 import os
 import sqlite3
@@ -127,6 +142,62 @@ def integrity_check(conn) -> str:
         return f"ERROR: {e}"
 
 
+STATE_VERSION = 2
+
+
+def default_state_path(db_path: str) -> str:
+    return db_path + '.health.json'
+
+
+def load_state(state_path: str | None) -> dict:
+    if not state_path or not os.path.exists(state_path):
+        return {}
+    try:
+        with open(state_path, encoding='utf-8') as fh:
+            state = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    if state.get('version') != STATE_VERSION:
+        return {}
+    return state.get('tables') or {}
+
+
+def save_state(state_path: str, tables: dict) -> None:
+    tmp = state_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump({'version': STATE_VERSION, 'tables': tables}, fh,
+                  ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, state_path)
+
+
+def table_fingerprint(conn, table: str, ddl: str | None) -> dict:
+    """Huella de la tabla: filas, max rowid y hash del DDL."""
+    try:
+        max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0]
+    except sqlite3.Error:  # WITHOUT ROWID
+        max_rowid = None
+    return {
+        'rows': table_row_count(conn, table),
+        'max_rowid': max_rowid,
+        'ddl': hashlib.sha1((ddl or '').encode('utf-8')).hexdigest()[:16],
+    }
+
+
+def integrity_check_table(conn, table: str) -> str:
+    try:
+        rows = conn.execute(f"PRAGMA integrity_check({table})").fetchall()
+        return '; '.join(str(r[0]) for r in rows)
+    except sqlite3.Error as e:
+        return f"ERROR: {e}"
+
+
+def quick_check(conn) -> str:
+    try:
+        return conn.execute("PRAGMA quick_check").fetchone()[0]
+    except sqlite3.Error as e:
+        return f"ERROR: {e}"
+
+
 def analyze_last_run(conn) -> int | None:
     try:
         cur = conn.execute("SELECT MAX(timestamp) FROM sqlite_stat1")
@@ -155,19 +226,36 @@ def suggest_actions(data) -> list[str]:
     return suggestions
 
 
-def build_report(db_path: str):
+def build_report(db_path: str, state_path: str | None = None,
+                 full: bool = False):
+    """Reporte de salud; con `state_path` solo recalcula tablas cambiadas."""
     size_bytes = Path(db_path).stat().st_size if os.path.exists(db_path) else 0
+    previous = {} if full else load_state(state_path)
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
     try:
         tables, views, _ = collect_schema(conn)
+        ddls = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='table'"
+        ).fetchall())
 
         table_reports = []
+        changed = []
+        new_state = {}
         total_rows = 0
         for t in sorted(t for t in tables if not t.startswith('sqlite_')):
-            rc = table_row_count(conn, t)
+            fp = table_fingerprint(conn, t, ddls.get(t))
+            prev = previous.get(t)
+            cached = bool(prev) and prev.get('fingerprint') == fp
+            rc = fp['rows']
+            if cached:
+                date_col, dmin, dmax = (
+                    prev['date_col'], prev['date_min'], prev['date_max']
+                )
+            else:
+                changed.append(t)
+                date_col, dmin, dmax = table_min_max_dates(conn, t)
             total_rows += rc if rc > 0 else 0
-            date_col, dmin, dmax = table_min_max_dates(conn, t)
             missing = []
             if t in CANDIDATE_INDEX_COLUMNS:
                 for col in CANDIDATE_INDEX_COLUMNS[t]:
@@ -180,10 +268,29 @@ def build_report(db_path: str):
                 'date_min': dmin,
                 'date_max': dmax,
                 'missing_indexes': missing,
+                'cached': cached,
             })
+            new_state[t] = {
+                'fingerprint': fp,
+                'rows': rc,
+                'date_col': date_col,
+                'date_min': dmin,
+                'date_max': dmax,
+            }
 
         page_count, freelist_count, ratio = freelist_ratio(conn)
-        integrity = integrity_check(conn)
+        table_integrity = {}
+        if not previous:
+            integrity_mode = 'full'
+            integrity = integrity_check(conn)
+        else:
+            integrity_mode = 'quick'
+            integrity = quick_check(conn)
+            for t in changed:
+                table_integrity[t] = integrity_check_table(conn, t)
+            bad = {t: r for t, r in table_integrity.items() if r != 'ok'}
+            if integrity == 'ok' and bad:
+                integrity = '; '.join(f"{t}: {r}" for t, r in bad.items())
         analyze_ts = analyze_last_run(conn)
 
         report = {
@@ -191,6 +298,7 @@ def build_report(db_path: str):
             'db_size_bytes': size_bytes,
             'row_counts_total': total_rows,
             'tables': table_reports,
+            'tables_changed': changed,
             'views_present': sorted(list(views)),
             'core_tables_missing': [t for t in CORE_TABLES if t not in tables],
             'core_views_missing': [v for v in CORE_VIEWS if v not in views],
@@ -200,12 +308,17 @@ def build_report(db_path: str):
                 'ratio': round(ratio, 4),
             },
             'integrity_check': integrity,
+            'integrity_mode': integrity_mode,
+            'integrity_tables': table_integrity,
             'analyze_last_run': analyze_ts,
         }
         report['suggestions'] = suggest_actions(report)
-        return report
     finally:
         conn.close()
+    # Una BD con problemas de integridad no deja huellas de referencia
+    if state_path and integrity == 'ok':
+        save_state(state_path, new_state)
+    return report
 
 
 def render_human(report):
@@ -231,6 +344,8 @@ def render_human(report):
             )
         if tr['missing_indexes']:
             line += f" | idx sugeridos: {', '.join(tr['missing_indexes'])}"
+        if tr.get('cached'):
+            line += " | sin cambios"
         out.append(line)
     out.append("")
     fr = report['freelist']
@@ -238,7 +353,12 @@ def render_human(report):
         f"[FRAGMENTACION] pages={fr['page_count']} "
         f"freelist={fr['freelist_count']} ratio={fr['ratio']}"
     )
-    out.append(f"[INTEGRIDAD] {report['integrity_check']}")
+    out.append(
+        f"[INTEGRIDAD] {report['integrity_check']} "
+        f"({report['integrity_mode']}, "
+        f"{len(report['tables_changed'])}/{len(report['tables'])} "
+        "tablas cambiadas)"
+    )
     out.append(f"[ANALYZE] timestamp={report['analyze_last_run']}")
     out.append("")
     out.append("[SUGERENCIAS]")
@@ -251,6 +371,14 @@ def main():
     ap = argparse.ArgumentParser(description='Health check DB SQLite')
     ap.add_argument('--db', default=default_db_path())
     ap.add_argument('--json', action='store_true', help='Salida JSON')
+    ap.add_argument(
+        '--state', default=None,
+        help='Archivo de huellas (default: <db>.health.json)'
+    )
+    ap.add_argument(
+        '--full', action='store_true',
+        help='Ignorar huellas: recalcular todo + integrity_check completo'
+    )
     args = ap.parse_args()
 
     db_path = os.path.abspath(args.db)
@@ -258,7 +386,9 @@ def main():
         print('DB not found:', db_path)
         return 2
 
-    report = build_report(db_path)
+    report = build_report(
+        db_path, args.state or default_state_path(db_path), full=args.full
+    )
     if args.json:
         print(json.dumps(report, ensure_ascii=False, indent=2))
     else:
@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import os
 import re
 import unicodedata
+from functools import lru_cache
+from typing import Any, Iterable
 
 NBSP = chr(0x00A0)
 NNBSP = chr(0x202F)
 
 
-def norm_text(s: str | None) -> str:
+# Bounded LRU for norm_text / norm_colname (ETL_NORM_CACHE_SIZE, 0 = off):
+# vendor names, glosas and project names repeat heavily within an import.
+NORM_CACHE_SIZE = int(os.getenv("ETL_NORM_CACHE_SIZE", "65536"))
+
+
+def _norm_text(s: Any) -> str:
     if s is None:
         return ""
     s = str(s).strip()
@@ -18,7 +26,7 @@ def norm_text(s: str | None) -> str:
     return s
 
 
-def norm_colname(s: str | None) -> str:
+def _norm_colname(s: Any) -> str:
     s = norm_text(s).lower()
     for ch in (' ', '-', '/', '\\', '.', ',', ':', ';', '(', ')', '[', ']', '{', '}'):
         s = s.replace(ch, "_")
@@ -27,16 +35,77 @@ def norm_colname(s: str | None) -> str:
     return s.strip("_")
 
 
-def parse_number(val: str | int | float | None, decimal: str | None = None) -> float:
-    """Parse numeric strings tolerant to various locale formats and symbols."""
-    if val is None:
-        return 0.0
-    if isinstance(val, (int, float)):
-        return float(val)
-    s = str(val).strip()
-    if s == "":
-        return 0.0
+# typed=True: 1 and 1.0 normalize to "1" and "1.0"
+_norm_text_cached = lru_cache(maxsize=NORM_CACHE_SIZE, typed=True)(_norm_text)
+_norm_colname_cached = lru_cache(maxsize=NORM_CACHE_SIZE, typed=True)(_norm_colname)
+
+
+def norm_text(s: str | None) -> str:
+    try:
+        return _norm_text_cached(s)
+    except TypeError:  # unhashable input
+        return _norm_text(s)
+
+
+def norm_colname(s: str | None) -> str:
+    try:
+        return _norm_colname_cached(s)
+    except TypeError:
+        return _norm_colname(s)
+
+
+def norm_texts(values: Iterable[Any]) -> list[str]:
+    """`norm_text` over a column; each distinct value is looked up once."""
+    # Keyed by type like the typed LRU: 1, 1.0 and True compare equal
+    seen: dict[tuple[type, Any], str] = {}
+    out: list[str] = []
+    for v in values:
+        key = (type(v), v)
+        try:
+            n = seen.get(key)
+        except TypeError:
+            out.append(_norm_text(v))
+            continue
+        if n is None:
+            n = seen[key] = norm_text(v)
+        out.append(n)
+    return out
+
+
+def norm_colnames(values: Iterable[Any]) -> list[str]:
+    """`norm_colname` for a list of headers."""
+    return [norm_colname(v) for v in values]
+
+
+def norm_cache_stats() -> dict[str, dict[str, int]]:
+    """Hit/miss counters of the normalization caches (per process)."""
+    stats = {}
+    for name, fn in (("norm_text", _norm_text_cached), ("norm_colname", _norm_colname_cached)):
+        info = fn.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize or 0,
+        }
+    return stats
 
+
+def norm_cache_clear() -> None:
+    _norm_text_cached.cache_clear()
+    _norm_colname_cached.cache_clear()
+
+
+# Everything that is not a digit, separator or inner sign. Currency symbols
+# ("$", "CLP", "USD", ...) and any whitespace (NBSP/NNBSP included) fall in
+# this class, so one compiled substitution replaces the old replace() chain.
+_NON_NUMERIC = re.compile(r"[^0-9.,-]+")
+# Already clean (digits and separators only): nothing to strip
+_PLAIN = re.compile(r"[0-9.,]*")
+
+
+def _clean_number(s: str) -> tuple[bool, str]:
+    """(negative, digits-and-separators) for an already stripped, non-empty string."""
     negative = False
     if s.startswith("(") and s.endswith(")"):
         negative = True
@@ -47,25 +116,24 @@ def parse_number(val: str | int | float | None, decimal: str | None = None) -> f
     if s.startswith("-"):
         negative = True
         s = s[1:]
+    return negative, _NON_NUMERIC.sub("", s)
+
+
+def _cell_decimal(s: str) -> str:
+    last_comma = s.rfind(",")
+    if last_comma == -1:
+        return "."
+    last_dot = s.rfind(".")
+    if last_dot == -1:
+        return ","
+    return "," if last_comma > last_dot else "."
 
-    s = s.replace(NBSP, "").replace(NNBSP, "").replace(" ", "")
-    for symbol in ("$", "CLP", "USD", "EUR", "GBP", "CHF", "CAD", "MXN", "ARS"):
-        s = s.replace(symbol, "")
-    s = re.sub(r"[^0-9.,-]", "", s)
+
+def _to_float(negative: bool, s: str, decimal: str | None) -> float:
     if s == "":
         return 0.0
-
     if decimal not in (",", "."):
-        last_comma = s.rfind(",")
-        last_dot = s.rfind(".")
-        if last_comma == -1 and last_dot == -1:
-            decimal = "."
-        elif last_comma == -1:
-            decimal = "."
-        elif last_dot == -1:
-            decimal = ","
-        else:
-            decimal = "," if last_comma > last_dot else "."
+        decimal = _cell_decimal(s)
 
     if decimal == ",":
         s = s.replace(".", "").replace(",", ".")
@@ -82,3 +150,77 @@ def parse_number(val: str | int | float | None, decimal: str | None = None) -> f
     except ValueError:
         return 0.0
     return -value if negative else value
+
+
+def parse_number(val: str | int | float | None, decimal: str | None = None) -> float:
+    """Parse numeric strings tolerant to various locale formats and symbols."""
+    if val is None:
+        return 0.0
+    if isinstance(val, (int, float)):
+        return float(val)
+    s = str(val).strip()
+    if s == "":
+        return 0.0
+    if s.isascii() and s.isdigit():
+        return float(s)
+    negative, s = _clean_number(s)
+    return _to_float(negative, s, decimal)
+
+
+def infer_decimal(cleaned: Iterable[str], counts: Iterable[int] | None = None) -> str | None:
+    """Decimal separator voted by a column of cleaned numbers (None = no evidence).
+
+    Only unambiguous cells vote: both separators present (the last one is the
+    decimal), a repeated separator (thousands), or a single separator not
+    followed by exactly three digits. "1.000" / "1,000" do not vote. `counts`
+    weighs each value (occurrences in the column).
+    """
+    votes = {",": 0, ".": 0}
+    weights = counts if counts is not None else iter(lambda: 1, None)
+    for s, w in zip(cleaned, weights):
+        commas, dots = s.count(","), s.count(".")
+        if commas and dots:
+            votes[_cell_decimal(s)] += w
+        elif commas > 1 or dots > 1:
+            votes["." if commas else ","] += w
+        elif commas or dots:
+            sep = "," if commas else "."
+            if len(s) - s.rfind(sep) - 1 != 3:
+                votes[sep] += w
+    if votes[","] == votes["."]:
+        return None
+    return "," if votes[","] > votes["."] else "."
+
+
+def parse_numbers(values: Iterable[Any], decimal: str | None = None) -> list[float]:
+    """Batch `parse_number` for one column.
+
+    With `decimal=None` the separator is inferred once for the whole column
+    (`infer_decimal`), so ambiguous cells such as "1.000" follow the rest of
+    the column instead of being guessed cell by cell. The result is always
+    `[parse_number(v, d) for v in values]` with `d` the given or inferred
+    separator (per-cell inference when the column gives no evidence). Each
+    distinct string is cleaned and converted once.
+    """
+    values = values if isinstance(values, list) else list(values)
+    # distinct string -> (negative, cleaned); occurrences only matter for inference
+    distinct: dict[Any, tuple[bool, str]] = {}
+    counts: dict[Any, int] = {}
+    plain = _PLAIN.fullmatch
+    for v in values:
+        if v is None or isinstance(v, (int, float)):
+            continue
+        if v in distinct:
+            counts[v] += 1
+            continue
+        counts[v] = 1
+        s = v.strip() if isinstance(v, str) else str(v).strip()
+        distinct[v] = (False, s) if plain(s) else _clean_number(s)
+    if decimal not in (",", ".") and distinct:
+        decimal = infer_decimal((c for _, c in distinct.values()), counts.values())
+    to_float = _to_float
+    parsed = {k: to_float(neg, c, decimal) for k, (neg, c) in distinct.items()}
+    return [
+        0.0 if v is None else float(v) if isinstance(v, (int, float)) else parsed[v]
+        for v in values
+    ]
@@ -10,29 +10,18 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import csv
 from pathlib import Path
 from typing import List, Tuple
 
+from ar_rules_history import load_history
+
 WIDTH = 220
 HEIGHT = 40
 PAD = 4
 
 
 def read_last(path: Path, n: int) -> List[Tuple[float, float]]:
-    if not path.exists():
-        return []
-    rows: List[Tuple[float, float]] = []
-    with path.open('r', encoding='utf-8') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            try:
-                a = float(row.get('project_assign_rate') or 0)
-                c = float(row.get('customer_name_rule_coverage') or 0)
-            except ValueError:
-                continue
-            rows.append((a, c))
-    return rows[-n:]
+    return load_history(path).rows(n)
 
 
 def scale_points(values: List[float]) -> List[Tuple[float, float]]:
@@ -19,79 +19,26 @@ Uso:
 from __future__ import annotations
 
 import argparse
-import csv
 from pathlib import Path
 from typing import List, Tuple
 
+from ar_rules_history import History, load_history, streak
+
 LEFT_COLOR = "#555"
 LABEL = "ar streak"
 
 
 def read_rates(path: Path) -> List[Tuple[float, float]]:
-    if not path.exists():
-        return []
-    rows: List[Tuple[float, float]] = []
-    with path.open('r', encoding='utf-8') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            try:
-                a = float(row.get('project_assign_rate') or 0)
-                c = float(row.get('customer_name_rule_coverage') or 0)
-            except ValueError:
-                continue
-            rows.append((a, c))
-    return rows
+    return load_history(path).rows()
 
 
 def streak_length(values: List[float]) -> int:
-    if len(values) < 2:
-        return 0
-    # Determine direction from last backwards
-    direction = 0  # 1 up, -1 down
-    length = 0
-    for i in range(len(values) - 1, 0, -1):
-        cur = values[i]
-        prev = values[i - 1]
-        if cur > prev:
-            if direction in (0, 1):
-                direction = 1
-                length += 1
-            else:
-                break
-        elif cur < prev:
-            if direction in (0, -1):
-                direction = -1
-                length += 1
-            else:
-                break
-        else:  # equal resets
-            break
-    # length cuenta transiciones; racha de 2 valores tiene length=1; normalizamos a número de puntos
-    if length == 0:
-        return 0
-    return length + 1
+    # número de puntos de la racha (una racha de 2 valores tiene length=2)
+    return streak(values)[1]
 
 
 def streak_dir(values: List[float]) -> int:
-    if len(values) < 2:
-        return 0
-    direction = 0
-    for i in range(len(values) - 1, 0, -1):
-        cur = values[i]
-        prev = values[i - 1]
-        if cur > prev:
-            if direction in (0, 1):
-                direction = 1
-            else:
-                break
-        elif cur < prev:
-            if direction in (0, -1):
-                direction = -1
-            else:
-                break
-        else:
-            break
-    return direction
+    return streak(values)[0]
 
 
 def estimate_width(left: str, right: str) -> tuple[int, int, int]:
@@ -141,21 +88,18 @@ def build_svg(assign_dir: int, assign_len: int, cov_dir: int, cov_len: int) -> s
 </svg>"""
 
 
+def render(hist: History, window: int) -> str:
+    assign, cov = hist.window(window)
+    return build_svg(assign.streak_dir, assign.streak_len, cov.streak_dir, cov.streak_len)
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument('--history', required=True)
     ap.add_argument('--out', required=True)
     ap.add_argument('--window', type=int, default=14)
     args = ap.parse_args()
-    rows = read_rates(Path(args.history))
-    window_rows = rows[-args.window :]
-    assigns = [r[0] for r in window_rows]
-    covs = [r[1] for r in window_rows]
-    a_dir = streak_dir(assigns)
-    c_dir = streak_dir(covs)
-    a_len = streak_length(assigns)
-    c_len = streak_length(covs)
-    svg = build_svg(a_dir, a_len, c_dir, c_len)
+    svg = render(load_history(args.history), args.window)
     outp = Path(args.out)
     outp.parent.mkdir(parents=True, exist_ok=True)
     outp.write_text(svg, encoding='utf-8')
@@ -15,10 +15,11 @@ Usage:
 """
 from __future__ import annotations
 import argparse
-import csv
 from pathlib import Path
 from typing import List, Tuple
 
+from ar_rules_history import History, load_history
+
 BADGE_TEMPLATE = (
     "<svg xmlns='http://www.w3.org/2000/svg' width='{w}' height='20' role='img' aria-label='AR Trend: {label_values}'>"
     "\n  <linearGradient id='smooth' x2='0' y2='100%'>"
@@ -59,19 +60,7 @@ def pick_color(assign_avg: float) -> str:
 
 
 def read_last_rows(path: Path, n: int) -> List[Tuple[float, float]]:
-    rows: List[Tuple[float, float]] = []
-    if not path.exists():
-        return rows
-    with path.open('r', encoding='utf-8', newline='') as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            try:
-                a = float(r.get('project_assign_rate') or 0)
-                c = float(r.get('customer_name_rule_coverage') or 0)
-                rows.append((a, c))
-            except ValueError:
-                continue
-    return rows[-n:]
+    return load_history(path).rows(n)
 
 
 def format_pct(v: float) -> str:
@@ -98,6 +87,14 @@ def build_svg(assign_avg: float, cov_avg: float) -> str:
     )
 
 
+def render(hist: History, window: int) -> str:
+    assign, cov = hist.window(window)
+    if assign.rows < 2:
+        # Not enough data
+        return build_svg(0.0, 0.0).replace('Assign 0.0% | Cov 0.0%', 'n/a')
+    return build_svg(assign.avg, cov.avg)
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument('--history', required=True)
@@ -105,14 +102,7 @@ def main() -> int:
     ap.add_argument('--window', type=int, default=7, help='Number of last rows to average (default 7)')
     args = ap.parse_args()
 
-    rows = read_last_rows(Path(args.history), args.window)
-    if len(rows) < 2:
-        # Not enough data
-        svg = build_svg(0.0, 0.0).replace('Assign 0.0% | Cov 0.0%', 'n/a')
-    else:
-        assign_avg = sum(r[0] for r in rows) / len(rows)
-        cov_avg = sum(r[1] for r in rows) / len(rows)
-        svg = build_svg(assign_avg, cov_avg)
+    svg = render(load_history(args.history), args.window)
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text(svg, encoding='utf-8')
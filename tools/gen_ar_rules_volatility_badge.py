@@ -16,37 +16,17 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import csv
-import math
 from pathlib import Path
 from typing import List, Tuple
 
+from ar_rules_history import History, load_history
+
 LEFT_COLOR = "#555"
 LABEL = "ar vol"
 
 
 def read_last(path: Path, n: int) -> List[Tuple[float, float]]:
-    if not path.exists():
-        return []
-    rows: List[Tuple[float, float]] = []
-    with path.open("r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            try:
-                a = float(row.get("project_assign_rate") or 0)
-                c = float(row.get("customer_name_rule_coverage") or 0)
-            except ValueError:
-                continue
-            rows.append((a, c))
-    return rows[-n:]
-
-
-def stdev(values: List[float]) -> float:
-    if len(values) < 2:
-        return 0.0
-    m = sum(values) / len(values)
-    var = sum((v - m) ** 2 for v in values) / (len(values) - 1)
-    return math.sqrt(var)
+    return load_history(path).rows(n)
 
 
 def estimate_width(left: str, right: str) -> Tuple[int, int, int]:
@@ -95,6 +75,18 @@ def build_svg(assign_sd: float, cov_sd: float) -> str:
 </svg>"""
 
 
+def render(hist: History, window: int) -> str:
+    assign, cov = hist.window(window)
+    return build_svg(assign.sd, cov.sd)
+
+
+def write_github_output(path: str, assign_sd: float, cov_sd: float) -> None:
+    # expose pp (percentage points) values with 1 decimal
+    with open(path, 'a', encoding='utf-8') as gh:
+        gh.write(f"assignment_volatility_pp={assign_sd*100:.1f}\n")
+        gh.write(f"coverage_volatility_pp={cov_sd*100:.1f}\n")
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument('--history', required=True)
@@ -102,20 +94,14 @@ def main() -> int:
     ap.add_argument('--window', type=int, default=7)
     ap.add_argument('--emit-github-output', default=None, help='Path to $GITHUB_OUTPUT to write volatility pp values')
     args = ap.parse_args()
-    rows = read_last(Path(args.history), args.window)
-    assigns = [r[0] for r in rows]
-    covs = [r[1] for r in rows]
-    assign_sd = stdev(assigns)
-    cov_sd = stdev(covs)
-    svg = build_svg(assign_sd, cov_sd)
+    hist = load_history(args.history)
+    svg = render(hist, args.window)
     outp = Path(args.out)
     outp.parent.mkdir(parents=True, exist_ok=True)
     outp.write_text(svg, encoding='utf-8')
     if args.emit_github_output:
-        # expose pp (percentage points) values with 1 decimal
-        with open(args.emit_github_output, 'a', encoding='utf-8') as gh:
-            gh.write(f"assignment_volatility_pp={assign_sd*100:.1f}\n")
-            gh.write(f"coverage_volatility_pp={cov_sd*100:.1f}\n")
+        assign, cov = hist.window(args.window)
+        write_github_output(args.emit_github_output, assign.sd, cov.sd)
     return 0
 
 
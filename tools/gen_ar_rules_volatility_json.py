@@ -17,51 +17,39 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import csv
 import json
-import math
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, Dict, List, Tuple
 
-
-def read_last(path: Path, n: int) -> List[Tuple[float, float]]:
-    if not path.exists():
-        return []
-    rows: List[Tuple[float, float]] = []
-    with path.open("r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            try:
-                a = float(row.get("project_assign_rate") or 0)
-                c = float(row.get("customer_name_rule_coverage") or 0)
-            except ValueError:
-                continue
-            rows.append((a, c))
-    return rows[-n:]
+from ar_rules_history import History, load_history
 
 
-def stdev(values: List[float]) -> float:
-    if len(values) < 2:
-        return 0.0
-    m = sum(values) / len(values)
-    var = sum((v - m) ** 2 for v in values) / (len(values) - 1)
-    return math.sqrt(var)
+def read_last(path: Path, n: int) -> List[Tuple[float, float]]:
+    return load_history(path).rows(n)
 
 
-def percentile(sorted_vals: List[float], p: float) -> float:
-    if not sorted_vals:
-        return 0.0
-    if p <= 0:
-        return sorted_vals[0]
-    if p >= 1:
-        return sorted_vals[-1]
-    k = (len(sorted_vals) - 1) * p
-    f = int(k)
-    c = min(f + 1, len(sorted_vals) - 1)
-    if f == c:
-        return sorted_vals[f]
-    d = k - f
-    return sorted_vals[f] + (sorted_vals[c] - sorted_vals[f]) * d
+def metrics(hist: History, window: int) -> Dict[str, Any]:
+    a, c = hist.window(window)
+    a_p10, a_p90 = a.percentile(0.10), a.percentile(0.90)
+    c_p10, c_p90 = c.percentile(0.10), c.percentile(0.90)
+    a_p25, a_p75 = a.percentile(0.25), a.percentile(0.75)
+    c_p25, c_p75 = c.percentile(0.25), c.percentile(0.75)
+    return {
+        'window': window,
+        'rows': a.rows,
+        'assignment_sd': a.sd,
+        'coverage_sd': c.sd,
+        'assignment_volatility_pp': a.sd * 100,
+        'coverage_volatility_pp': c.sd * 100,
+        'assignment_p10': a_p10,
+        'assignment_p90': a_p90,
+        'assignment_range': (a_p90 - a_p10) if a.rows else 0.0,
+        'assignment_iqr': (a_p75 - a_p25) if a.rows else 0.0,
+        'coverage_p10': c_p10,
+        'coverage_p90': c_p90,
+        'coverage_range': (c_p90 - c_p10) if c.rows else 0.0,
+        'coverage_iqr': (c_p75 - c_p25) if c.rows else 0.0,
+    }
 
 
 def main() -> int:
@@ -70,37 +58,7 @@ def main() -> int:
     ap.add_argument('--out', required=True)
     ap.add_argument('--window', type=int, default=7)
     args = ap.parse_args()
-    rows = read_last(Path(args.history), args.window)
-    assigns = [r[0] for r in rows]
-    covs = [r[1] for r in rows]
-    a_sd = stdev(assigns)
-    c_sd = stdev(covs)
-    assigns_sorted = sorted(assigns)
-    covs_sorted = sorted(covs)
-    a_p10 = percentile(assigns_sorted, 0.10)
-    a_p90 = percentile(assigns_sorted, 0.90)
-    c_p10 = percentile(covs_sorted, 0.10)
-    c_p90 = percentile(covs_sorted, 0.90)
-    a_p25 = percentile(assigns_sorted, 0.25)
-    a_p75 = percentile(assigns_sorted, 0.75)
-    c_p25 = percentile(covs_sorted, 0.25)
-    c_p75 = percentile(covs_sorted, 0.75)
-    out = {
-        'window': args.window,
-        'rows': len(rows),
-        'assignment_sd': a_sd,
-        'coverage_sd': c_sd,
-        'assignment_volatility_pp': a_sd * 100,
-        'coverage_volatility_pp': c_sd * 100,
-        'assignment_p10': a_p10,
-        'assignment_p90': a_p90,
-        'assignment_range': (a_p90 - a_p10) if assigns_sorted else 0.0,
-        'assignment_iqr': (a_p75 - a_p25) if assigns_sorted else 0.0,
-        'coverage_p10': c_p10,
-        'coverage_p90': c_p90,
-        'coverage_range': (c_p90 - c_p10) if covs_sorted else 0.0,
-        'coverage_iqr': (c_p75 - c_p25) if covs_sorted else 0.0,
-    }
+    out = metrics(load_history(args.history), args.window)
     outp = Path(args.out)
     outp.parent.mkdir(parents=True, exist_ok=True)
     outp.write_text(json.dumps(out, indent=2), encoding='utf-8')
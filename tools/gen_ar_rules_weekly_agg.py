@@ -11,51 +11,27 @@ Usage:
 """
 from __future__ import annotations
 import argparse
-import csv
 import json
 from pathlib import Path
 from typing import List, Tuple
 
+from ar_rules_history import SeriesStats, load_history
+
 
 def read_last(path: Path, n: int) -> List[Tuple[float, float]]:
-    if not path.exists():
-        return []
-    out = []
-    with path.open('r', encoding='utf-8') as f:
-        r = csv.DictReader(f)
-        for row in r:
-            try:
-                a = float(row.get('project_assign_rate') or 0)
-                c = float(row.get('customer_name_rule_coverage') or 0)
-            except ValueError:
-                continue
-            out.append((a, c))
-    return out[-n:]
+    return load_history(path).rows(n)
 
 
-def aggregate(rows: List[Tuple[float, float]]):
-    if not rows:
-        return {
-            'window_size': 0,
-            'rows': 0,
-            'assign_min': None,
-            'assign_max': None,
-            'assign_avg': None,
-            'coverage_min': None,
-            'coverage_max': None,
-            'coverage_avg': None,
-        }
-    assigns = [r[0] for r in rows]
-    covs = [r[1] for r in rows]
+def aggregate(assign: SeriesStats, cov: SeriesStats):
     return {
-        'window_size': len(rows),
-        'rows': len(rows),
-        'assign_min': min(assigns),
-        'assign_max': max(assigns),
-        'assign_avg': sum(assigns)/len(assigns),
-        'coverage_min': min(covs),
-        'coverage_max': max(covs),
-        'coverage_avg': sum(covs)/len(covs),
+        'window_size': assign.rows,
+        'rows': assign.rows,
+        'assign_min': assign.min,
+        'assign_max': assign.max,
+        'assign_avg': assign.avg,
+        'coverage_min': cov.min,
+        'coverage_max': cov.max,
+        'coverage_avg': cov.avg,
     }
 
 
@@ -65,8 +41,7 @@ def main() -> int:
     ap.add_argument('--out', required=True)
     ap.add_argument('--window', type=int, default=7)
     args = ap.parse_args()
-    rows = read_last(Path(args.history), args.window)
-    agg = aggregate(rows)
+    agg = aggregate(*load_history(args.history).window(args.window))
     outp = Path(args.out)
     outp.parent.mkdir(parents=True, exist_ok=True)
     outp.write_text(json.dumps(agg, indent=2), encoding='utf-8')
@@ -16,10 +16,11 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import csv
 from pathlib import Path
 from typing import List, Tuple
 
+from ar_rules_history import History, load_history
+
 
 LABEL = "ar rules wma"
 LEFT_COLOR = "#555"
@@ -34,27 +35,7 @@ THRESHOLDS = [
 
 
 def read_rates(path: Path) -> List[Tuple[float, float]]:
-    if not path.exists():
-        return []
-    rows: List[Tuple[float, float]] = []
-    with path.open("r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            try:
-                a = float(row.get("project_assign_rate") or 0)
-                c = float(row.get("customer_name_rule_coverage") or 0)
-            except ValueError:
-                continue
-            rows.append((a, c))
-    return rows
-
-
-def wma(values: List[float]) -> float:
-    if not values:
-        return 0.0
-    weights = list(range(1, len(values) + 1))
-    total_w = sum(weights)
-    return sum(v * w for v, w in zip(values, weights)) / total_w
+    return load_history(path).rows()
 
 
 def pick_color(value: float) -> str:
@@ -97,6 +78,13 @@ def build_svg(label: str, value_text: str, color: str) -> str:
 </svg>"""
 
 
+def render(hist: History, window: int) -> str:
+    assign, cov = hist.window(window)
+    # Provide both assignment and coverage in value text.
+    value_text = f"assign {assign.wma:.1%} | cov {cov.wma:.1%}"
+    return build_svg(LABEL, value_text, pick_color(assign.wma))
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--history", required=True)
@@ -104,21 +92,7 @@ def main() -> int:
     ap.add_argument("--window", type=int, default=7, help="Number of recent rows for WMA")
     args = ap.parse_args()
 
-    rows = read_rates(Path(args.history))
-    if not rows:
-        wma_assign = 0.0
-        wma_cov = 0.0
-    else:
-        window_rows = rows[-args.window :]
-        assigns = [r[0] for r in window_rows]
-        covs = [r[1] for r in window_rows]
-        wma_assign = wma(assigns)
-        wma_cov = wma(covs)
-
-    # Provide both assignment and coverage in value text.
-    value_text = f"assign {wma_assign:.1%} | cov {wma_cov:.1%}"
-    color = pick_color(wma_assign)
-    svg = build_svg(LABEL, value_text, color)
+    svg = render(load_history(args.history), args.window)
 
     outp = Path(args.out)
     outp.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Orquestador de importaciones: aplica un manifiesto de fuentes en orden de dependencias.
+
+- Parseo de archivos en paralelo (ProcessPoolExecutor, `--workers`), con a lo
+  más `--max-in-flight` archivos (por defecto `--workers`) parseados o en
+  parseo por delante del escritor: cada resultado es la lista completa de filas
+- Un único escritor (proceso principal, una conexión) aplica los lotes por etapa:
+  proveedores -> proyectos -> OCs (cabeceras antes que líneas) -> gastos / sueldos /
+  previred / impuestos -> movimientos bancarios -> conciliación Chipax
+- Omite fuentes sin cambios comparando el SHA-256 del contenido (misma idea que
+  `zoho_po_raw.hash`, pero por archivo) registrado en `import_file_log`
+- Reporte de tiempos por etapa (parseo / escritura / filas)
+- gastos / sueldos / previred cargan por lotes (`bulk_load.bulk_insert_missing`);
+  `options.chunk_size` / `options.commit_every` (por defecto un commit por fuente)
+
+Manifiesto (JSON); rutas relativas se resuelven respecto del manifiesto:
+  {"sources": [
+     {"kind": "zoho_vendors", "path": "raw/zoho/Proveedores.csv"},
+     {"kind": "zoho_po", "path": "raw/zoho/Orden_de_compra.xlsx", "options": {"batch": "B1"}},
+     {"kind": "expenses", "path": "raw/gastos.csv", "options": {"source": "CHIPAX"}},
+     {"kind": "chipax_conciliacion", "path": "raw/chipax"}
+  ]}
+
+Uso:
+  python tools/import_all.py --manifest imports.json --db data/chipax_data.db \
+    [--workers 4] [--force] [--report timings.json]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+
+from bulk_load import DEFAULT_CHUNK_SIZE
+from common_db import default_db_path
+from io_utils import load_rows
+
+
+@dataclass
+class Source:
+    kind: str
+    path: str
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+ApplyFn = Callable[[sqlite3.Connection, Source, List[Dict[str, Any]], str], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class Stage:
+    kind: str
+    apply: ApplyFn
+    # False: la ruta es un directorio que el importador recorre por sí mismo
+    parse: bool = True
+
+
+# Aplicadores -------------------------------------------------------------
+
+
+def _apply_vendors(conn, src, rows, db_path):
+    mod = importlib.import_module("import_zoho_vendors")
+    mod.ensure_table(conn)
+    return mod.import_rows(conn, rows, src.options.get("source", "ZOHO"))
+
+
+def _apply_projects(conn, src, rows, db_path):
+    mod = importlib.import_module("import_zoho_projects")
+    mod.ensure_table(conn)
+    return mod.import_rows(conn, rows)
+
+
+def _apply_zoho_po(conn, src, rows, db_path):
+    mod = importlib.import_module("import_zoho_po")
+    mod.ensure_tables(conn)
+    return mod.import_rows(
+        conn,
+        rows,
+        source_file=os.path.basename(src.path),
+        batch=src.options.get("batch", "BATCH_001"),
+        refresh_lines=bool(src.options.get("refresh_lines", False)),
+        update_header=bool(src.options.get("update_header", False)),
+    )
+
+
+def _batch_options(src) -> dict:
+    # Por defecto la fuente completa queda en la transacción del orquestador
+    return {
+        "chunk_size": int(src.options.get("chunk_size") or DEFAULT_CHUNK_SIZE),
+        "commit_every": int(src.options.get("commit_every") or 0),
+    }
+
+
+def _apply_expenses(conn, src, rows, db_path):
+    mod = importlib.import_module("import_expenses")
+    mod.ensure_table(conn)
+    return mod.import_rows(
+        conn,
+        rows,
+        src.options.get("source", "import"),
+        src.options.get("status", "emitido"),
+        allow_invalid_rut=bool(src.options.get("allow_invalid_rut", False)),
+        **_batch_options(src),
+    )
+
+
+def _apply_rut_rows(module: str) -> ApplyFn:
+    # import_payroll / import_previred comparten firma de import_rows
+    def _apply(conn, src, rows, db_path):
+        mod = importlib.import_module(module)
+        mod.ensure_table(conn)
+        return mod.import_rows(
+            conn,
+            rows,
+            src.options.get("source", "import"),
+            allow_invalid_rut=bool(src.options.get("allow_invalid_rut", False)),
+            **_batch_options(src),
+        )
+
+    return _apply
+
+
+def _apply_taxes(conn, src, rows, db_path):
+    mod = importlib.import_module("import_taxes")
+    mod.ensure_table(conn)
+    for r in rows:
+        mod.upsert_tax(conn, r, src.options.get("source", "import"))
+    return {"rows": len(rows)}
+
+
+def _apply_bank_movements(conn, src, rows, db_path):
+    mod = importlib.import_module("import_bank_movements")
+    return {"rows": mod.import_rows(conn, rows, source=src.options.get("source", "import"))}
+
+
+def _apply_chipax(conn, src, rows, db_path):
+    mod = importlib.import_module("import_chipax_conciliacion")
+    conn.commit()  # el importador usa su propia conexión sobre la misma BD
+    metrics = mod.run(db_path=db_path, raw_dir=src.path, chunk_size=src.options.get("chunk_size"))
+    metrics.pop("files", None)
+    return metrics
+
+
+# Orden de dependencias: proveedores antes que OCs, OCs (cabeceras) antes que líneas.
+STAGES: List[Stage] = [
+    Stage("zoho_vendors", _apply_vendors),
+    Stage("zoho_projects", _apply_projects),
+    Stage("zoho_po", _apply_zoho_po),
+    Stage("expenses", _apply_expenses),
+    Stage("payroll", _apply_rut_rows("import_payroll")),
+    Stage("previred", _apply_rut_rows("import_previred")),
+    Stage("taxes", _apply_taxes),
+    Stage("bank_movements", _apply_bank_movements),
+    Stage("chipax_conciliacion", _apply_chipax, parse=False),
+]
+STAGE_BY_KIND = {s.kind: s for s in STAGES}
+
+
+# Manifiesto / hashes -----------------------------------------------------
+
+
+def load_manifest(path: str) -> List[Source]:
+    base = Path(path).resolve().parent
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    items = data.get("sources", []) if isinstance(data, dict) else data
+    sources: List[Source] = []
+    for item in items:
+        kind = item.get("kind")
+        if kind not in STAGE_BY_KIND:
+            raise ValueError(f"Tipo de fuente desconocido: {kind!r}. Válidos: {sorted(STAGE_BY_KIND)}")
+        p = Path(item["path"])
+        if not p.is_absolute():
+            p = base / p
+        sources.append(Source(kind=kind, path=str(p), options=dict(item.get("options") or {})))
+    return sources
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 del contenido; para directorios, de los CSV que contiene (por nombre)."""
+    h = hashlib.sha256()
+    p = Path(path)
+    files = sorted(p.glob("*.csv")) if p.is_dir() else [p]
+    for f in files:
+        if p.is_dir():
+            h.update(f.name.encode("utf-8") + b"\0")
+        with open(f, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def ensure_log_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_file_log (
+          kind TEXT NOT NULL,
+          path TEXT NOT NULL,
+          hash TEXT NOT NULL,
+          rows INTEGER,
+          imported_at TEXT DEFAULT (datetime('now')),
+          PRIMARY KEY (kind, path)
+        )
+        """
+    )
+
+
+def _parse_file(path: str, sheet: str | int | None) -> tuple[List[Dict[str, Any]], float]:
+    # Ejecutado en los procesos del pool: sólo lectura, sin tocar la BD
+    t0 = time.perf_counter()
+    rows = load_rows(path, sheet=sheet)
+    return rows, time.perf_counter() - t0
+
+
+class _InlineFuture:
+    def __init__(self, fn, *args):
+        self._fn, self._args = fn, args
+
+    def result(self):
+        return self._fn(*self._args)
+
+
+# Ejecución ---------------------------------------------------------------
+
+
+def run(
+    sources: List[Source],
+    db_path: str,
+    *,
+    workers: int = 0,
+    force: bool = False,
+    max_in_flight: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Importa `sources` y devuelve el reporte {"sources": [...], "stages": {...}}.
+
+    `max_in_flight` acota los archivos enviados al pool y aún no aplicados
+    (por defecto `workers`), así solo esos resultados están en memoria a la vez.
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    report_sources: List[Dict[str, Any]] = []
+    pool: Optional[ProcessPoolExecutor] = None
+    try:
+        ensure_log_table(conn)
+        logged = {
+            (r["kind"], r["path"]): r["hash"]
+            for r in conn.execute("SELECT kind, path, hash FROM import_file_log")
+        }
+
+        pending: List[tuple[Source, str]] = []
+        if workers and workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+        for src in sources:
+            try:
+                digest = content_hash(src.path)
+            except OSError as e:
+                report_sources.append({"kind": src.kind, "path": src.path, "status": "error", "error": str(e)})
+                continue
+            if not force and logged.get((src.kind, src.path)) == digest:
+                report_sources.append({"kind": src.kind, "path": src.path, "status": "skipped", "hash": digest})
+                continue
+            pending.append((src, digest))
+
+        # Escritor único: aplica en orden de etapas mientras el pool parsea los
+        # siguientes `window` archivos (no todos: cada resultado ocupa memoria)
+        queue = [p for stage in STAGES for p in pending if p[0].kind == stage.kind]
+        window = max(1, max_in_flight or workers or 1)
+        futures: Dict[int, Any] = {}
+        submitted = 0
+
+        def _submit_until(limit: int) -> None:
+            nonlocal submitted
+            while submitted < min(limit, len(queue)):
+                src = queue[submitted][0]
+                if STAGE_BY_KIND[src.kind].parse:
+                    sheet = src.options.get("sheet")
+                    futures[submitted] = (
+                        pool.submit(_parse_file, src.path, sheet)
+                        if pool
+                        else _InlineFuture(_parse_file, src.path, sheet)
+                    )
+                submitted += 1
+
+        for i, (src, digest) in enumerate(queue):
+            stage = STAGE_BY_KIND[src.kind]
+            _submit_until(i + window)
+            fut = futures.pop(i, None)
+            entry: Dict[str, Any] = {"kind": src.kind, "path": src.path, "hash": digest}
+            try:
+                rows, parse_s = fut.result() if fut is not None else ([], 0.0)
+                t0 = time.perf_counter()
+                counters = stage.apply(conn, src, rows, db_path)
+                conn.execute(
+                    "INSERT INTO import_file_log (kind, path, hash, rows) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(kind, path) DO UPDATE SET hash=excluded.hash, rows=excluded.rows, "
+                    "imported_at=datetime('now')",
+                    (src.kind, src.path, digest, len(rows)),
+                )
+                conn.commit()
+                entry.update(
+                    status="imported",
+                    rows=len(rows),
+                    parse_s=round(parse_s, 4),
+                    apply_s=round(time.perf_counter() - t0, 4),
+                    counters=counters,
+                )
+            except Exception as e:  # noqa: BLE001
+                conn.rollback()
+                entry.update(status="error", error=str(e))
+            report_sources.append(entry)
+            # Filas y future (que retiene el resultado) se liberan antes del siguiente
+            rows = fut = None
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        conn.close()
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    for item in report_sources:
+        agg = stages.setdefault(
+            item["kind"], {"files": 0, "skipped": 0, "errors": 0, "rows": 0, "parse_s": 0.0, "apply_s": 0.0}
+        )
+        agg["files"] += 1
+        agg["skipped"] += item["status"] == "skipped"
+        agg["errors"] += item["status"] == "error"
+        agg["rows"] += item.get("rows", 0)
+        agg["parse_s"] = round(agg["parse_s"] + item.get("parse_s", 0.0), 4)
+        agg["apply_s"] = round(agg["apply_s"] + item.get("apply_s", 0.0), 4)
+    ordered = {s.kind: stages[s.kind] for s in STAGES if s.kind in stages}
+    return {
+        "sources": report_sources,
+        "stages": ordered,
+        "total_s": round(time.perf_counter() - started, 4),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--manifest", required=True, help="JSON con la lista de fuentes")
+    ap.add_argument("--db", default=default_db_path(prefer_root=False))
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos de parseo (<=1: en línea)")
+    ap.add_argument(
+        "--max-in-flight", type=int, default=None,
+        help="Archivos parseados por delante del escritor (por defecto = --workers)",
+    )
+    ap.add_argument("--force", action="store_true", help="Reimporta aunque el hash no haya cambiado")
+    ap.add_argument("--report", default=None, help="Ruta opcional para escribir el reporte JSON")
+    args = ap.parse_args(argv)
+
+    db_path = os.path.abspath(args.db)
+    if not os.path.exists(db_path):
+        print("DB not found:", db_path)
+        return 2
+
+    report = run(
+        load_manifest(args.manifest),
+        db_path,
+        workers=args.workers,
+        force=args.force,
+        max_in_flight=args.max_in_flight,
+    )
+
+    print(f"{'etapa':<22}{'archivos':>9}{'omitidos':>9}{'errores':>8}{'filas':>10}{'parse_s':>10}{'apply_s':>10}")
+    for kind, agg in report["stages"].items():
+        print(
+            f"{kind:<22}{agg['files']:>9}{agg['skipped']:>9}{agg['errors']:>8}{agg['rows']:>10}"
+            f"{agg['parse_s']:>10.3f}{agg['apply_s']:>10.3f}"
+        )
+    print(f"Total: {report['total_s']:.3f}s")
+    for item in report["sources"]:
+        if item["status"] == "error":
+            print(f"ERROR [{item['kind']}] {item['path']}: {item['error']}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    return 1 if any(i["status"] == "error" for i in report["sources"]) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,9 +2,13 @@
 """
 Importa movimientos bancarios desde CSV a bank_movements (idempotente por external_id cuando esté).
 
+Carga set-based: las filas se normalizan en streaming y entran por
+`bulk_load.bulk_upsert` (staging TEMP + INSERT ... ON CONFLICT(external_id)
+DO NOTHING sobre ux_bank_external) en una sola transacción.
+
 Uso:
   python tools/import_bank_movements.py --csv path/to/movimientos.{csv|xlsx} \
-    --db data/chipax_data.db --source CHIPAX
+    --db data/chipax_data.db --source CHIPAX [--chunk-size 5000]
 """
 
 from __future__ import annotations
@@ -18,8 +22,10 @@ import sys
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
 from common_db import default_db_path
+from bulk_load import DEFAULT_CHUNK_SIZE, BulkResult, bulk_upsert, load_pragmas
 from io_utils import load_rows
 from etl_common import parse_number
+from period_cube import refresh as refresh_period_cube
 
 
 def ensure_table(conn: sqlite3.Connection) -> None:
@@ -44,44 +50,92 @@ def ensure_table(conn: sqlite3.Connection) -> None:
     conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_bank_external ON bank_movements(external_id)")
 
 
+COLUMNS = (
+    "fecha", "bank_name", "account_number", "glosa", "monto", "moneda",
+    "tipo", "saldo", "referencia", "fuente", "external_id",
+)
+
+
 def norm_amount(val) -> float:
     return round(parse_number(val), 2)
 
 
-def upsert_movement(conn: sqlite3.Connection, r: dict, source: str) -> None:
-    cols = {c[1] for c in conn.execute("PRAGMA table_info(bank_movements)").fetchall()}
-    fecha = r.get("Fecha") or r.get("fecha")
-    bank = r.get("Banco") or r.get("bank") or r.get("bank_name")
-    account = r.get("Cuenta") or r.get("account") or r.get("account_number")
-    glosa = r.get("Glosa") or r.get("glosa") or r.get("Descripción") or r.get("description")
+def movement_values(r: dict, source: str) -> tuple:
+    """Fila CSV -> tupla ordenada como COLUMNS."""
     amount = norm_amount(r.get("Monto") or r.get("amount"))
-    moneda = r.get("Moneda") or r.get("currency") or "CLP"
-    tipo = r.get("Tipo") or r.get("type") or ("credit" if amount > 0 else "debit")
-    saldo = norm_amount(r.get("Saldo") or r.get("balance") or 0)
-    ref = r.get("Referencia") or r.get("reference")
-    external = r.get("ID") or r.get("external_id") or None
-
-    if external:
-        cur = conn.execute("SELECT 1 FROM bank_movements WHERE external_id = ?", (external,))
-        if cur.fetchone():
-            # Already there; could update minor fields if desired
-            return
+    return (
+        r.get("Fecha") or r.get("fecha"),
+        r.get("Banco") or r.get("bank") or r.get("bank_name"),
+        r.get("Cuenta") or r.get("account") or r.get("account_number"),
+        r.get("Glosa") or r.get("glosa") or r.get("Descripción") or r.get("description"),
+        amount,
+        r.get("Moneda") or r.get("currency") or "CLP",
+        r.get("Tipo") or r.get("type") or ("credit" if amount > 0 else "debit"),
+        norm_amount(r.get("Saldo") or r.get("balance") or 0),
+        r.get("Referencia") or r.get("reference"),
+        source,
+        r.get("ID") or r.get("external_id") or None,
+    )
 
+
+def upsert_movement(conn: sqlite3.Connection, r: dict, source: str) -> None:
+    """Inserta un movimiento; si su external_id ya existe se deja como está."""
     conn.execute(
-        (
-            "INSERT INTO bank_movements (fecha, bank_name, account_number, glosa, monto, moneda, tipo, saldo, referencia, fuente, external_id)"
-            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        ),
-        (fecha, bank, account, glosa, amount, moneda, tipo, saldo, ref, source, external),
+        f"INSERT INTO bank_movements ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+        "ON CONFLICT(external_id) DO NOTHING",
+        movement_values(r, source),
     )
 
 
+def load_movements(
+    conn: sqlite3.Connection, rows, source: str, *, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> tuple[BulkResult, str | None]:
+    """Carga set-based en una sola transacción; retorna (resultado, fecha mínima).
+
+    Las columnas de bank_movements se resuelven una vez por carga (tablas
+    legacy sin alguna columna opcional simplemente no la reciben).
+    """
+    ensure_table(conn)
+    present = {c[1] for c in conn.execute("PRAGMA table_info(bank_movements)").fetchall()}
+    keep = [i for i, c in enumerate(COLUMNS) if c in present]
+    columns = [COLUMNS[i] for i in keep]
+    min_fecha: list[str | None] = [None]
+
+    def tuples():
+        for r in rows:
+            values = movement_values(r, source)
+            fecha = str(values[0] or "")
+            if fecha and (min_fecha[0] is None or fecha < min_fecha[0]):
+                min_fecha[0] = fecha
+            yield tuple(values[i] for i in keep)
+
+    try:
+        # external_id repetido: se conserva el existente (DO NOTHING), igual que antes
+        result = bulk_upsert(
+            conn, "bank_movements", columns, tuples(),
+            conflict=("external_id",), update={}, chunk_size=chunk_size, commit=False,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result, min_fecha[0]
+
+
+def import_rows(conn: sqlite3.Connection, rows, source: str, *, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Upsert de movimientos + refresco del cubo de periodos desde la fecha mínima."""
+    result, min_fecha = load_movements(conn, rows, source, chunk_size=chunk_size)
+    refresh_period_cube(conn, ["bank_movements"], since=min_fecha)
+    return result.rows
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description=__doc__)
     repo_root = Path(__file__).resolve().parents[1]
     ap.add_argument("--csv", required=True)
     ap.add_argument("--db", default=default_db_path(prefer_root=False))
     ap.add_argument("--source", default="import")
+    ap.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
     args = ap.parse_args()
 
     db_path = os.path.abspath(args.db)
@@ -90,14 +144,15 @@ def main() -> int:
 
     conn = sqlite3.connect(db_path)
     try:
-        ensure_table(conn)
-        rows = load_rows(args.csv)
-        n = 0
-        for r in rows:
-            upsert_movement(conn, r, source=args.source)
-            n += 1
-        conn.commit()
-        print(f"Imported {n} bank movements")
+        with load_pragmas(conn):
+            result, min_fecha = load_movements(
+                conn, load_rows(args.csv), source=args.source, chunk_size=args.chunk_size
+            )
+        refresh_period_cube(conn, ["bank_movements"], since=min_fecha)
+        print(
+            f"Imported {result.rows} bank movements ({result.inserted} new) "
+            f"in {result.seconds:.2f}s, {result.rows_per_sec} rows/s"
+        )
         return 0
     finally:
         conn.close()
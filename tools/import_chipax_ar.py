@@ -23,6 +23,7 @@ if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
 from common_db import default_db_path, ensure_parent_dir
 from etl_common import parse_number
+from period_cube import refresh as refresh_period_cube
 
 
 def normalize_amount(val: str | float | int | None) -> float:
@@ -69,6 +70,7 @@ def import_csv(csv_path: str, db_path: str) -> dict[str, int]:
         ensure_sales_invoices(conn)
         inserted = 0
         updated = 0
+        min_issue = None
         with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
             reader = csv.DictReader(f)
             for row in reader:
@@ -89,6 +91,8 @@ def import_csv(csv_path: str, db_path: str) -> dict[str, int]:
                 ).strip()
                 if not folio or not issue:
                     continue
+                if min_issue is None or issue < min_issue:
+                    min_issue = issue
                 due = (row.get("Fecha Vencimiento") or row.get("Vencimiento") or "").strip()
                 currency = (row.get("Moneda") or row.get("Moneda / TC") or "CLP").strip() or "CLP"
                 net = normalize_amount(
@@ -163,6 +167,7 @@ def import_csv(csv_path: str, db_path: str) -> dict[str, int]:
                 else:
                     inserted += 1
         conn.commit()
+        refresh_period_cube(conn, ["sales_invoices", "revenue"], since=min_issue)
         return {"inserted": inserted, "updated": updated}
     finally:
         conn.close()
@@ -9,9 +9,9 @@ import hashlib
 import os
 import sqlite3
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
 
 TOOLS_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = TOOLS_DIR.parents[1]
@@ -23,13 +23,18 @@ SOURCE_PLATFORM = "CHIPAX"
 if __package__ in (None, ""):
     sys.path.append(str(TOOLS_DIR))
 
+from bulk_load import DEFAULT_CHUNK_SIZE, BulkResult, bulk_upsert, load_pragmas
 from etl_common import parse_number
+from period_cube import parse_day, refresh as refresh_period_cube
 
 
 @dataclass(frozen=True)
 class ImportConfig:
     db_path: str
     raw_dir: Path
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    # Receives Metrics.progress() after every merged chunk
+    progress: Optional[Callable[[Dict[str, int]], None]] = None
 
 
 @dataclass
@@ -44,9 +49,35 @@ class Metrics:
     bank_updated: int = 0
     reconciliations: int = 0
     links: int = 0
-
-    def as_dict(self) -> Dict[str, int]:
+    rows_scanned: int = 0
+    files: list[Dict[str, Any]] = field(default_factory=list)
+    # Fecha ISO mínima cargada por tipo: `since` del refresh del cubo
+    min_dates: Dict[str, str] = field(default_factory=dict)
+
+    def progress(self, current: Optional[BulkResult] = None) -> Dict[str, int]:
+        """Counters so far; ``current`` is the file still being loaded.
+
+        Skipped rows are the ones without key fields plus the ones left
+        untouched by the upsert.
+        """
+        inserted = self.ap_inserted + self.ar_inserted + self.expenses_inserted + self.bank_inserted
+        updated = self.ap_updated + self.ar_updated + self.expenses_updated + self.bank_updated
+        if current is not None:
+            inserted += current.inserted
+            updated += current.updated
+        return {
+            "rows_scanned": self.rows_scanned,
+            "inserted": inserted,
+            "updated": updated,
+            "skipped": self.rows_scanned - inserted - updated,
+            "files": len(self.files),
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
         data = self.__dict__.copy()
+        data["files"] = list(self.files)
+        data.pop("min_dates", None)
+        data["rows_skipped"] = self.progress()["skipped"]
         data["ap_upserts"] = self.ap_inserted + self.ap_updated
         data["ar_upserts"] = self.ar_inserted + self.ar_updated
         data["expenses_upserts"] = self.expenses_inserted + self.expenses_updated
@@ -114,10 +145,67 @@ def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str
             conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {definition}')
 
 
-
-
-
-
+def _iter_dict_rows(path: Path) -> Iterator[Dict[str, str]]:
+    with path.open("r", encoding="utf-8-sig", newline="") as handle:
+        yield from csv.DictReader(handle)
+
+
+def _bulk_load_files(
+    cfg: ImportConfig,
+    metrics: Metrics,
+    kind: str,
+    files: Iterable[Path],
+    parse: Callable[[Dict[str, str]], Optional[Sequence[Any]]],
+    *,
+    table: str,
+    columns: Sequence[str],
+    conflict: Sequence[str],
+    update: Optional[Dict[str, str]] = None,
+    date_index: Optional[int] = None,
+) -> None:
+    """Stream each CSV through ``parse`` and bulk-upsert the resulting tuples.
+
+    ``parse`` returns ``None`` for rows that must be skipped. Inserted/updated
+    counters are added to ``metrics`` and per-file throughput to ``metrics.files``.
+    With ``date_index`` the smallest ISO date of that tuple position is kept in
+    ``metrics.min_dates[kind]``.
+    """
+    def _scanned(rows: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+        for row in rows:
+            metrics.rows_scanned += 1
+            yield row
+
+    def _dated(rows: Iterable[Sequence[Any]]) -> Iterator[Sequence[Any]]:
+        for row in rows:
+            day = row[date_index]
+            current = metrics.min_dates.get(kind)
+            if day and (current is None or day < current) and parse_day(day):
+                metrics.min_dates[kind] = day
+            yield row
+
+    on_chunk = None
+    if cfg.progress is not None:
+        def on_chunk(result: BulkResult) -> None:
+            cfg.progress(metrics.progress(result))
+
+    with _connect(cfg) as con, load_pragmas(con):
+        for path in files:
+            rows = (t for t in map(parse, _scanned(_iter_dict_rows(path))) if t is not None)
+            if date_index is not None:
+                rows = _dated(rows)
+            result = bulk_upsert(
+                con,
+                table,
+                columns,
+                rows,
+                conflict=conflict,
+                update=update,
+                chunk_size=cfg.chunk_size,
+                on_chunk=on_chunk,
+            )
+            setattr(metrics, f"{kind}_inserted", getattr(metrics, f"{kind}_inserted") + result.inserted)
+            setattr(metrics, f"{kind}_updated", getattr(metrics, f"{kind}_updated") + result.updated)
+            metrics.files.append({"kind": kind, "file": path.name, **result.as_dict()})
 
 
 def import_ap(cfg: ImportConfig, metrics: Metrics) -> None:
@@ -162,87 +250,75 @@ def import_ap(cfg: ImportConfig, metrics: Metrics) -> None:
     if not files:
         return
 
-    with _connect(cfg) as con:
-        cur = con.cursor()
-        for path in files:
-            with path.open("r", encoding="utf-8-sig", newline="") as handle:
-                reader = csv.DictReader(handle)
-                for row in reader:
-                    vendor_rut = _strip(row.get("RUT") or row.get("Rut"))
-                    invoice_number = _strip(row.get("Folio") or row.get("Serie"))
-                    invoice_date = _strip(
-                        row.get("Fecha Emision")
-                        or row.get("Fecha Emisión")
-                        or row.get("Fecha Emisión (DTE)")
-                    )
-                    if not invoice_number or not invoice_date:
-                        continue
-
-                    vendor_name = _strip(
-                        row.get("Razon Social")
-                        or row.get("Razón Social")
-                        or row.get("Proveedor")
-                    )
-                    due_date = _strip(row.get("Fecha Vencimiento") or row.get("Vencimiento"))
-                    currency = _safe_currency(row.get("Moneda"))
-                    net_amount = _parse_amount(row.get("Monto Neto (CLP)") or row.get("Monto Neto"))
-                    tax_amount = _parse_amount(row.get("Monto IVA (CLP)") or row.get("IVA"))
-                    exempt_amount = _parse_amount(row.get("Monto Exento (CLP)") or row.get("Exento"))
-                    total_amount = _parse_amount(row.get("Monto Total (CLP)") or row.get("Monto Total"))
-                    project_name = _strip(row.get("Proyecto")) or None
-                    status = _strip(row.get("Estado") or row.get("Status") or "open").lower() or "open"
-                    source_id = _strip(row.get("ID") or row.get("Id Documento")) or None
-
-                    exists = cur.execute(
-                        """
-                        SELECT id FROM ap_invoices
-                         WHERE vendor_rut=? AND invoice_number=? AND invoice_date=? AND source_platform=?
-                        """,
-                        (vendor_rut, invoice_number, invoice_date, SOURCE_PLATFORM),
-                    ).fetchone()
-
-                    cur.execute(
-                        """
-                        INSERT INTO ap_invoices (
-                            vendor_rut, vendor_name, invoice_number, invoice_date,
-                            due_date, currency, net_amount, tax_amount, exempt_amount,
-                            total_amount, source_platform, source_id, project_name, status
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(vendor_rut, invoice_number, invoice_date, source_platform)
-                        DO UPDATE SET
-                            vendor_name=excluded.vendor_name,
-                            due_date=excluded.due_date,
-                            currency=excluded.currency,
-                            net_amount=excluded.net_amount,
-                            tax_amount=excluded.tax_amount,
-                            exempt_amount=excluded.exempt_amount,
-                            total_amount=excluded.total_amount,
-                            source_id=COALESCE(excluded.source_id, ap_invoices.source_id),
-                            project_name=COALESCE(excluded.project_name, ap_invoices.project_name),
-                            status=excluded.status
-                        """,
-                        (
-                            vendor_rut,
-                            vendor_name,
-                            invoice_number,
-                            invoice_date,
-                            due_date,
-                            currency,
-                            net_amount,
-                            tax_amount,
-                            exempt_amount,
-                            total_amount,
-                            SOURCE_PLATFORM,
-                            source_id,
-                            project_name,
-                            status,
-                        ),
-                    )
-                    if exists:
-                        metrics.ap_updated += 1
-                    else:
-                        metrics.ap_inserted += 1
-        con.commit()
+    _bulk_load_files(
+        cfg,
+        metrics,
+        "ap",
+        files,
+        _ap_row,
+        table="ap_invoices",
+        columns=(
+            "vendor_rut", "vendor_name", "invoice_number", "invoice_date",
+            "due_date", "currency", "net_amount", "tax_amount", "exempt_amount",
+            "total_amount", "source_platform", "source_id", "project_name", "status",
+        ),
+        conflict=("vendor_rut", "invoice_number", "invoice_date", "source_platform"),
+        update={
+            "vendor_name": "excluded.vendor_name",
+            "due_date": "excluded.due_date",
+            "currency": "excluded.currency",
+            "net_amount": "excluded.net_amount",
+            "tax_amount": "excluded.tax_amount",
+            "exempt_amount": "excluded.exempt_amount",
+            "total_amount": "excluded.total_amount",
+            "source_id": "COALESCE(excluded.source_id, ap_invoices.source_id)",
+            "project_name": "COALESCE(excluded.project_name, ap_invoices.project_name)",
+            "status": "excluded.status",
+        },
+    )
+
+
+def _ap_row(row: Dict[str, str]) -> Optional[tuple]:
+    vendor_rut = _strip(row.get("RUT") or row.get("Rut"))
+    invoice_number = _strip(row.get("Folio") or row.get("Serie"))
+    invoice_date = _strip(
+        row.get("Fecha Emision")
+        or row.get("Fecha Emisión")
+        or row.get("Fecha Emisión (DTE)")
+    )
+    if not invoice_number or not invoice_date:
+        return None
+
+    vendor_name = _strip(
+        row.get("Razon Social")
+        or row.get("Razón Social")
+        or row.get("Proveedor")
+    )
+    due_date = _strip(row.get("Fecha Vencimiento") or row.get("Vencimiento"))
+    currency = _safe_currency(row.get("Moneda"))
+    net_amount = _parse_amount(row.get("Monto Neto (CLP)") or row.get("Monto Neto"))
+    tax_amount = _parse_amount(row.get("Monto IVA (CLP)") or row.get("IVA"))
+    exempt_amount = _parse_amount(row.get("Monto Exento (CLP)") or row.get("Exento"))
+    total_amount = _parse_amount(row.get("Monto Total (CLP)") or row.get("Monto Total"))
+    project_name = _strip(row.get("Proyecto")) or None
+    status = _strip(row.get("Estado") or row.get("Status") or "open").lower() or "open"
+    source_id = _strip(row.get("ID") or row.get("Id Documento")) or None
+    return (
+        vendor_rut,
+        vendor_name,
+        invoice_number,
+        invoice_date,
+        due_date,
+        currency,
+        net_amount,
+        tax_amount,
+        exempt_amount,
+        total_amount,
+        SOURCE_PLATFORM,
+        source_id,
+        project_name,
+        status,
+    )
 
 
 def import_ar(cfg: ImportConfig, metrics: Metrics) -> None:
@@ -287,85 +363,74 @@ def import_ar(cfg: ImportConfig, metrics: Metrics) -> None:
     if not files:
         return
 
-    with _connect(cfg) as con:
-        cur = con.cursor()
-        for path in files:
-            with path.open("r", encoding="utf-8-sig", newline="") as handle:
-                reader = csv.DictReader(handle)
-                for row in reader:
-                    rut = _strip(row.get("RUT") or row.get("Rut"))
-                    invoice_number = _strip(row.get("Folio") or row.get("Serie"))
-                    invoice_date = _strip(
-                        row.get("Fecha Emision")
-                        or row.get("Fecha Emisión")
-                        or row.get("Fecha Emisión (DTE)")
-                    )
-                    if not invoice_number or not invoice_date:
-                        continue
-
-                    customer_name = _strip(
-                        row.get("Razon Social")
-                        or row.get("Razón Social")
-                        or row.get("Cliente")
-                    )
-                    due_date = _strip(row.get("Fecha Vencimiento") or row.get("Vencimiento"))
-                    currency = _safe_currency(row.get("Moneda"))
-                    net_amount = _parse_amount(row.get("Monto Neto (CLP)") or row.get("Monto Neto"))
-                    tax_amount = _parse_amount(row.get("Monto IVA (CLP)") or row.get("IVA"))
-                    exempt_amount = _parse_amount(row.get("Monto Exento (CLP)") or row.get("Exento"))
-                    total_amount = _parse_amount(row.get("Monto Total (CLP)") or row.get("Monto Total"))
-                    status = _strip(row.get("Estado") or row.get("Status") or "open").lower() or "open"
-                    source_id = _strip(row.get("ID") or row.get("Id Documento")) or None
-
-                    exists = cur.execute(
-                        """
-                        SELECT id FROM sales_invoices
-                         WHERE customer_rut=? AND invoice_number=? AND invoice_date=? AND source_platform=?
-                        """,
-                        (rut, invoice_number, invoice_date, SOURCE_PLATFORM),
-                    ).fetchone()
-
-                    cur.execute(
-                        """
-                        INSERT INTO sales_invoices (
-                            customer_rut, customer_name, invoice_number, invoice_date,
-                            due_date, currency, net_amount, tax_amount, exempt_amount,
-                            total_amount, status, project_id, source_platform, source_id
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(customer_rut, invoice_number, invoice_date, source_platform)
-                        DO UPDATE SET
-                            customer_name=excluded.customer_name,
-                            due_date=excluded.due_date,
-                            currency=excluded.currency,
-                            net_amount=excluded.net_amount,
-                            tax_amount=excluded.tax_amount,
-                            exempt_amount=excluded.exempt_amount,
-                            total_amount=excluded.total_amount,
-                            status=excluded.status,
-                            source_id=COALESCE(excluded.source_id, sales_invoices.source_id)
-                        """,
-                        (
-                            rut,
-                            customer_name,
-                            invoice_number,
-                            invoice_date,
-                            due_date,
-                            currency,
-                            net_amount,
-                            tax_amount,
-                            exempt_amount,
-                            total_amount,
-                            status,
-                            None,
-                            SOURCE_PLATFORM,
-                            source_id,
-                        ),
-                    )
-                    if exists:
-                        metrics.ar_updated += 1
-                    else:
-                        metrics.ar_inserted += 1
-        con.commit()
+    _bulk_load_files(
+        cfg,
+        metrics,
+        "ar",
+        files,
+        _ar_row,
+        table="sales_invoices",
+        columns=(
+            "customer_rut", "customer_name", "invoice_number", "invoice_date",
+            "due_date", "currency", "net_amount", "tax_amount", "exempt_amount",
+            "total_amount", "status", "project_id", "source_platform", "source_id",
+        ),
+        conflict=("customer_rut", "invoice_number", "invoice_date", "source_platform"),
+        update={
+            "customer_name": "excluded.customer_name",
+            "due_date": "excluded.due_date",
+            "currency": "excluded.currency",
+            "net_amount": "excluded.net_amount",
+            "tax_amount": "excluded.tax_amount",
+            "exempt_amount": "excluded.exempt_amount",
+            "total_amount": "excluded.total_amount",
+            "status": "excluded.status",
+            "source_id": "COALESCE(excluded.source_id, sales_invoices.source_id)",
+        },
+        date_index=3,
+    )
+
+
+def _ar_row(row: Dict[str, str]) -> Optional[tuple]:
+    rut = _strip(row.get("RUT") or row.get("Rut"))
+    invoice_number = _strip(row.get("Folio") or row.get("Serie"))
+    invoice_date = _strip(
+        row.get("Fecha Emision")
+        or row.get("Fecha Emisión")
+        or row.get("Fecha Emisión (DTE)")
+    )
+    if not invoice_number or not invoice_date:
+        return None
+
+    customer_name = _strip(
+        row.get("Razon Social")
+        or row.get("Razón Social")
+        or row.get("Cliente")
+    )
+    due_date = _strip(row.get("Fecha Vencimiento") or row.get("Vencimiento"))
+    currency = _safe_currency(row.get("Moneda"))
+    net_amount = _parse_amount(row.get("Monto Neto (CLP)") or row.get("Monto Neto"))
+    tax_amount = _parse_amount(row.get("Monto IVA (CLP)") or row.get("IVA"))
+    exempt_amount = _parse_amount(row.get("Monto Exento (CLP)") or row.get("Exento"))
+    total_amount = _parse_amount(row.get("Monto Total (CLP)") or row.get("Monto Total"))
+    status = _strip(row.get("Estado") or row.get("Status") or "open").lower() or "open"
+    source_id = _strip(row.get("ID") or row.get("Id Documento")) or None
+    return (
+        rut,
+        customer_name,
+        invoice_number,
+        invoice_date,
+        due_date,
+        currency,
+        net_amount,
+        tax_amount,
+        exempt_amount,
+        total_amount,
+        status,
+        None,
+        SOURCE_PLATFORM,
+        source_id,
+    )
 
 
 def _bank_external_id(fecha: str, cuenta: str, moneda: str, monto: float, glosa: str) -> str:
@@ -413,79 +478,59 @@ def import_bank(cfg: ImportConfig, metrics: Metrics) -> None:
     if not files:
         return
 
-    with _connect(cfg) as con:
-        cur = con.cursor()
-        for path in files:
-            with path.open("r", encoding="utf-8-sig", newline="") as handle:
-                reader = csv.DictReader(handle)
-                for row in reader:
-                    fecha = _strip(row.get("Fecha") or row.get("fecha"))
-                    glosa = _strip(
-                        row.get("Glosa")
-                        or row.get("Descripcion")
-                        or row.get("Descripción")
-                    )
-                    # Handle Chipax format: Cargo (debit) and Abono (credit)
-                    cargo = _parse_amount(row.get("Cargo") or 0)
-                    abono = _parse_amount(row.get("Abono") or 0)
-                    monto = abono - cargo  # Net amount (positive for credit, negative for debit)
-                    if monto == 0:
-                        # Fallback to generic Monto column
-                        monto = _parse_amount(row.get("Monto") or row.get("monto"))
-                    moneda = _safe_currency(row.get("Moneda"))
-                    banco = _strip(row.get("Banco") or row.get("bank"))
-                    # Handle different account number column names
-                    cuenta = _strip(row.get("Cuenta") or row.get("account") or row.get("Número Cuenta"))
-                    referencia = _strip(row.get("Referencia") or row.get("referencia"))
-                    saldo = _parse_amount(row.get("Saldo") or row.get("saldo"))
-                    tipo = _strip(row.get("Tipo") or row.get("tipo") or ("credito" if monto >= 0 else "debito")).lower()
-                    external_id = _strip(row.get("ID") or row.get("id") or row.get("External ID") or row.get("Id"))
-                    if not external_id:
-                        external_id = _bank_external_id(fecha, cuenta, moneda, monto, glosa)
-
-                    exists = cur.execute(
-                        "SELECT id FROM bank_movements WHERE external_id=?",
-                        (external_id,),
-                    ).fetchone()
-
-                    cur.execute(
-                        """
-                        INSERT INTO bank_movements (
-                            fecha, bank_name, account_number, glosa, monto,
-                            moneda, tipo, saldo, referencia, fuente, external_id
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(external_id)
-                        DO UPDATE SET
-                            fecha=excluded.fecha,
-                            bank_name=excluded.bank_name,
-                            account_number=excluded.account_number,
-                            glosa=excluded.glosa,
-                            monto=excluded.monto,
-                            moneda=excluded.moneda,
-                            tipo=excluded.tipo,
-                            saldo=excluded.saldo,
-                            referencia=excluded.referencia,
-                            fuente=excluded.fuente
-                        """,
-                        (
-                            fecha,
-                            banco,
-                            cuenta,
-                            glosa,
-                            monto,
-                            moneda,
-                            tipo,
-                            saldo,
-                            referencia,
-                            SOURCE_PLATFORM,
-                            external_id,
-                        ),
-                    )
-                    if exists:
-                        metrics.bank_updated += 1
-                    else:
-                        metrics.bank_inserted += 1
-        con.commit()
+    _bulk_load_files(
+        cfg,
+        metrics,
+        "bank",
+        files,
+        _bank_row,
+        table="bank_movements",
+        columns=(
+            "fecha", "bank_name", "account_number", "glosa", "monto",
+            "moneda", "tipo", "saldo", "referencia", "fuente", "external_id",
+        ),
+        conflict=("external_id",),
+        date_index=0,
+    )
+
+
+def _bank_row(row: Dict[str, str]) -> tuple:
+    fecha = _strip(row.get("Fecha") or row.get("fecha"))
+    glosa = _strip(
+        row.get("Glosa")
+        or row.get("Descripcion")
+        or row.get("Descripción")
+    )
+    # Handle Chipax format: Cargo (debit) and Abono (credit)
+    cargo = _parse_amount(row.get("Cargo") or 0)
+    abono = _parse_amount(row.get("Abono") or 0)
+    monto = abono - cargo  # Net amount (positive for credit, negative for debit)
+    if monto == 0:
+        # Fallback to generic Monto column
+        monto = _parse_amount(row.get("Monto") or row.get("monto"))
+    moneda = _safe_currency(row.get("Moneda"))
+    banco = _strip(row.get("Banco") or row.get("bank"))
+    # Handle different account number column names
+    cuenta = _strip(row.get("Cuenta") or row.get("account") or row.get("Número Cuenta"))
+    referencia = _strip(row.get("Referencia") or row.get("referencia"))
+    saldo = _parse_amount(row.get("Saldo") or row.get("saldo"))
+    tipo = _strip(row.get("Tipo") or row.get("tipo") or ("credito" if monto >= 0 else "debito")).lower()
+    external_id = _strip(row.get("ID") or row.get("id") or row.get("External ID") or row.get("Id"))
+    if not external_id:
+        external_id = _bank_external_id(fecha, cuenta, moneda, monto, glosa)
+    return (
+        fecha,
+        banco,
+        cuenta,
+        glosa,
+        monto,
+        moneda,
+        tipo,
+        saldo,
+        referencia,
+        SOURCE_PLATFORM,
+        external_id,
+    )
 
 
 def import_expenses(cfg: ImportConfig, metrics: Metrics) -> None:
@@ -525,114 +570,98 @@ def import_expenses(cfg: ImportConfig, metrics: Metrics) -> None:
     if not files:
         return
 
-    with _connect(cfg) as con:
-        cur = con.cursor()
-        for path in files:
-            with path.open("r", encoding="utf-8-sig", newline="") as handle:
-                reader = csv.DictReader(handle)
-                for row in reader:
-                    fecha = _strip(row.get("Fecha") or row.get("fecha"))
-                    categoria = _strip(row.get("Categoria") or row.get("Categoría"))
-                    descripcion = _strip(
-                        row.get("Descripcion")
-                        or row.get("Descripción")
-                        or row.get("Glosa")
-                        or row.get("Detalle")
-                    )
-                    monto = _parse_amount(
-                        row.get("Monto")
-                        or row.get("monto")
-                        or row.get("Monto Conciliado")
-                        or row.get("Monto Moneda Original")
-                    )
-                    moneda = _safe_currency(row.get("Moneda") or row.get("Moneda.1"))
-                    proveedor_rut = _strip(
-                        row.get("Proveedor_RUT")
-                        or row.get("Rut Proveedor")
-                        or row.get("RUT Proveedor")
-                        or row.get("RUT")
-                    )
-                    proyecto = _strip(row.get("Proyecto")) or None
-                    comprobante = _strip(
-                        row.get("Comprobante")
-                        or row.get("Documento")
-                        or row.get("Numero Documento")
-                        or row.get("Numero Comprobante")
-                    )
-
-                    exists = cur.execute(
-                        """
-                        SELECT id FROM expenses
-                         WHERE fuente=? AND comprobante=? AND fecha=?
-                           AND proveedor_rut=? AND descripcion=? AND monto=?
-                        """,
-                        (
-                            SOURCE_PLATFORM,
-                            comprobante,
-                            fecha,
-                            proveedor_rut,
-                            descripcion,
-                            monto,
-                        ),
-                    ).fetchone()
-
-                    if exists:
-                        cur.execute(
-                            """
-                            UPDATE expenses
-                               SET categoria=?, descripcion=?, moneda=?, proveedor_rut=?,
-                                   proyecto=?, status=?
-                             WHERE id=?
-                            """,
-                            (
-                                categoria,
-                                descripcion,
-                                moneda,
-                                proveedor_rut,
-                                proyecto,
-                                "posted",
-                                exists["id"],
-                            ),
-                        )
-                        metrics.expenses_updated += 1
-                    else:
-                        cur.execute(
-                            """
-                            INSERT INTO expenses (
-                                fecha, categoria, descripcion, monto, moneda,
-                                proveedor_rut, proyecto, fuente, status, comprobante
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                fecha,
-                                categoria,
-                                descripcion,
-                                monto,
-                                moneda,
-                                proveedor_rut,
-                                proyecto,
-                                SOURCE_PLATFORM,
-                                "posted",
-                                comprobante,
-                            ),
-                        )
-                        metrics.expenses_inserted += 1
-        con.commit()
+    # Key columns match ux_expenses_chipax, so the former SELECT + UPDATE/INSERT
+    # pair collapses into one upsert that refreshes the descriptive fields.
+    _bulk_load_files(
+        cfg,
+        metrics,
+        "expenses",
+        files,
+        _expense_row,
+        table="expenses",
+        columns=(
+            "fecha", "categoria", "descripcion", "monto", "moneda",
+            "proveedor_rut", "proyecto", "fuente", "status", "comprobante",
+        ),
+        conflict=("fuente", "comprobante", "fecha", "proveedor_rut", "descripcion", "monto"),
+        update={
+            "categoria": "excluded.categoria",
+            "moneda": "excluded.moneda",
+            "proyecto": "excluded.proyecto",
+            "status": "excluded.status",
+        },
+    )
+
+
+def _expense_row(row: Dict[str, str]) -> tuple:
+    fecha = _strip(row.get("Fecha") or row.get("fecha"))
+    categoria = _strip(row.get("Categoria") or row.get("Categoría"))
+    descripcion = _strip(
+        row.get("Descripcion")
+        or row.get("Descripción")
+        or row.get("Glosa")
+        or row.get("Detalle")
+    )
+    monto = _parse_amount(
+        row.get("Monto")
+        or row.get("monto")
+        or row.get("Monto Conciliado")
+        or row.get("Monto Moneda Original")
+    )
+    moneda = _safe_currency(row.get("Moneda") or row.get("Moneda.1"))
+    proveedor_rut = _strip(
+        row.get("Proveedor_RUT")
+        or row.get("Rut Proveedor")
+        or row.get("RUT Proveedor")
+        or row.get("RUT")
+    )
+    proyecto = _strip(row.get("Proyecto")) or None
+    comprobante = _strip(
+        row.get("Comprobante")
+        or row.get("Documento")
+        or row.get("Numero Documento")
+        or row.get("Numero Comprobante")
+    )
+    return (
+        fecha,
+        categoria,
+        descripcion,
+        monto,
+        moneda,
+        proveedor_rut,
+        proyecto,
+        SOURCE_PLATFORM,
+        "posted",
+        comprobante,
+    )
 
 
 # Public API -------------------------------------------------------------
 
 
-def run(db_path: Optional[str] = None, raw_dir: Optional[str | Path] = None) -> Dict[str, int]:
+def run(
+    db_path: Optional[str] = None,
+    raw_dir: Optional[str | Path] = None,
+    chunk_size: Optional[int] = None,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> Dict[str, Any]:
     cfg = ImportConfig(
         db_path=str(db_path or DEFAULT_DB_PATH),
         raw_dir=Path(raw_dir or DEFAULT_RAW_DIR),
+        chunk_size=chunk_size or DEFAULT_CHUNK_SIZE,
+        progress=progress,
     )
     metrics = Metrics()
     import_ap(cfg, metrics)
     import_ar(cfg, metrics)
     import_expenses(cfg, metrics)
     import_bank(cfg, metrics)
+    # Solo los periodos desde la fecha mínima cargada (como import_chipax_ar /
+    # import_bank_movements); sin cambios no se toca la fuente
+    with _connect(cfg) as con:
+        for kind, sources in (("ar", ["sales_invoices", "revenue"]), ("bank", ["bank_movements"])):
+            if getattr(metrics, f"{kind}_inserted") + getattr(metrics, f"{kind}_updated"):
+                refresh_period_cube(con, sources, since=metrics.min_dates.get(kind))
     return metrics.as_dict()
 
 
@@ -644,12 +673,21 @@ def main(argv: Optional[Iterable[str]] = None) -> int:
         default=str(DEFAULT_RAW_DIR),
         help="Directory containing Chipax CSV exports",
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Rows staged and merged per transaction",
+    )
     args = parser.parse_args(argv)
 
-    metrics = run(db_path=args.db, raw_dir=args.raw_dir)
+    metrics = run(db_path=args.db, raw_dir=args.raw_dir, chunk_size=args.chunk_size)
+    files = metrics.pop("files", [])
     print("Chipax import completed")
     for key in sorted(metrics):
         print(f"  {key}: {metrics[key]}")
+    for item in files:
+        print(f"  [{item['kind']}] {item['file']}: {item['rows']} rows in {item['seconds']}s ({item['rows_per_sec']} rows/s)")
     return 0
 
 
@@ -6,16 +6,20 @@ Idempotencia:
 - Si viene `comprobante`, se evita duplicar por ese campo.
 - Si no, se considera combinación (fecha, monto, proveedor_rut, descripcion) como llave de existencia.
 
+Carga por lotes con `bulk_load.bulk_insert_missing` (staging TEMP + un INSERT
+... SELECT por chunk), commit cada `--commit-every` chunks.
+
 Uso:
   python tools/import_expenses.py --csv path/to/gastos.{csv|xlsx} \
     --db data/chipax_data.db \
-    [--source CHIPAX] [--status validado]
+    [--source CHIPAX] [--status validado] [--chunk-size 5000] [--commit-every 1]
 """
 
 from __future__ import annotations
 
 import argparse
-import csv\nfrom io_utils import load_rows
+import csv
+from io_utils import load_rows
 import os
 import sqlite3
 from pathlib import Path
@@ -25,6 +29,7 @@ if __package__ in (None, ""):
     _here = Path(__file__).resolve().parent
     sys.path.append(str(_here))
 from common_db import default_db_path
+from bulk_load import DEFAULT_CHUNK_SIZE, DEFAULT_COMMIT_EVERY, bulk_insert_missing, load_pragmas
 from rut_utils import normalize_rut, is_valid_rut
 
 
@@ -53,6 +58,8 @@ def ensure_table(conn: sqlite3.Connection) -> None:
         )
     except sqlite3.Error:
         pass
+    # Sostiene la búsqueda por combinación de las cargas por lote
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_expenses_monto_fecha ON expenses(monto, fecha)")
 
 
 def norm_amount(v) -> float:
@@ -69,97 +76,112 @@ def norm_amount(v) -> float:
             return 0.0
 
 
-def upsert_expense(
-    conn: sqlite3.Connection,
+COLUMNS = (
+    "fecha", "categoria", "descripcion", "monto", "moneda", "proveedor_rut",
+    "proyecto", "fuente", "status", "comprobante",
+)
+
+
+def match_predicate(conn: sqlite3.Connection) -> str:
+    """Llave de existencia previa como predicado sobre `t` (cargado) y `s` (nuevo).
+
+    Duplicado si coincide el comprobante, o la combinación (fecha, monto,
+    proveedor_rut, descripcion) considerando sólo los campos no vacíos del
+    nuevo registro y las columnas presentes en la tabla.
+    """
+    cols = {c[1] for c in conn.execute("PRAGMA table_info(expenses)").fetchall()}
+    parts = []
+    for col in ("fecha", "proveedor_rut", "descripcion"):
+        if col in cols:
+            parts.append(f"(IFNULL(s.{col},'') = '' OR t.{col} = s.{col})")
+    if "monto" in cols:
+        parts.insert(0, "t.monto = s.monto")  # siempre informado (norm_amount)
+    combo = " AND ".join(parts) if parts else "0"
+    if "comprobante" in cols:
+        return f"(IFNULL(s.comprobante,'') <> '' AND t.comprobante = s.comprobante) OR ({combo})"
+    return combo
+
+
+def row_values(
     r: dict,
     default_source: str | None,
     default_status: str | None,
     *,
     allow_invalid_rut: bool,
     counters: dict,
-) -> None:
-    cols = {c[1] for c in conn.execute("PRAGMA table_info(expenses)").fetchall()}
-
-    fecha = r.get("Fecha") or r.get("fecha")
-    categoria = r.get("Categoria") or r.get("categoria") or r.get("Categoría")
-    descripcion = (
-        r.get("Descripcion")
-        or r.get("descripción")
-        or r.get("descripcion")
-        or r.get("Glosa")
-        or r.get("glosa")
-    )
-    monto = norm_amount(r.get("Monto") or r.get("monto") or r.get("Total"))
-    moneda = r.get("Moneda") or r.get("moneda") or "CLP"
-    proveedor_rut_raw = (
+) -> tuple | None:
+    """Fila CSV -> tupla ordenada como COLUMNS (None si se descarta por RUT)."""
+    proveedor_rut = normalize_rut(
         r.get("Proveedor_RUT") or r.get("RUT_Proveedor") or r.get("proveedor_rut") or r.get("RUT")
     )
-    proveedor_rut = normalize_rut(proveedor_rut_raw)
-    if proveedor_rut and not is_valid_rut(proveedor_rut):
-        if not allow_invalid_rut:
-            counters["invalid_rut"] = counters.get("invalid_rut", 0) + 1
-            return
-    proyecto = r.get("Proyecto") or r.get("proyecto")
-    fuente = r.get("Fuente") or r.get("fuente") or default_source or "import"
-    status = r.get("Estado") or r.get("status") or default_status or "emitido"
-    comprobante = r.get("Comprobante") or r.get("comprobante") or r.get("Nro comprobante")
-
-    # Detección por comprobante
-    if comprobante:
-        cur = conn.execute(
-            "SELECT 1 FROM expenses WHERE comprobante = ?", (str(comprobante),)
-        )
-        if cur.fetchone():
-            counters["duplicates"] = counters.get("duplicates", 0) + 1
-            return
-
-    # Detección por combinación si no hay comprobante
-    where_parts, params = [], []
-    for col, val in [
-        ("fecha", fecha),
-        ("monto", monto),
-        ("proveedor_rut", proveedor_rut),
-        ("descripcion", descripcion),
-    ]:
-        if col in cols and val not in (None, ""):
-            where_parts.append(f"{col} = ?")
-            params.append(val)
-    if where_parts:
-        cur = conn.execute(
-            "SELECT 1 FROM expenses WHERE " + " AND ".join(where_parts), params
-        )
-        if cur.fetchone():
-            counters["duplicates"] = counters.get("duplicates", 0) + 1
-            return
+    if proveedor_rut and not is_valid_rut(proveedor_rut) and not allow_invalid_rut:
+        counters["invalid_rut"] = counters.get("invalid_rut", 0) + 1
+        return None
+    return (
+        r.get("Fecha") or r.get("fecha"),
+        r.get("Categoria") or r.get("categoria") or r.get("Categoría"),
+        (
+            r.get("Descripcion")
+            or r.get("descripción")
+            or r.get("descripcion")
+            or r.get("Glosa")
+            or r.get("glosa")
+        ),
+        norm_amount(r.get("Monto") or r.get("monto") or r.get("Total")),
+        r.get("Moneda") or r.get("moneda") or "CLP",
+        proveedor_rut,
+        r.get("Proyecto") or r.get("proyecto"),
+        r.get("Fuente") or r.get("fuente") or default_source or "import",
+        r.get("Estado") or r.get("status") or default_status or "emitido",
+        r.get("Comprobante") or r.get("comprobante") or r.get("Nro comprobante"),
+    )
 
-    # Insert
-    insert_cols, insert_vals, insert_params = [], [], []
 
-    def add(col, val):
-        if col in cols:
-            insert_cols.append(col)
-            insert_vals.append("?")
-            insert_params.append(val)
-
-    for col, val in [
-        ("fecha", fecha),
-        ("categoria", categoria),
-        ("descripcion", descripcion),
-        ("monto", monto),
-        ("moneda", moneda),
-        ("proveedor_rut", proveedor_rut),
-        ("proyecto", proyecto),
-        ("fuente", fuente),
-        ("status", status),
-        ("comprobante", comprobante),
-    ]:
-        add(col, val)
-
-    sql = (
-        "INSERT INTO expenses (" + ", ".join(insert_cols) + ") VALUES (" + ", ".join(insert_vals) + ")"
+def import_rows(
+    conn: sqlite3.Connection,
+    rows,
+    default_source: str | None,
+    default_status: str | None,
+    *,
+    allow_invalid_rut: bool = False,
+    counters: dict | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+) -> dict:
+    """Carga por lotes vía bulk_load.bulk_insert_missing; actualiza y retorna `counters`."""
+    counters = {} if counters is None else counters
+    result = bulk_insert_missing(
+        conn,
+        "expenses",
+        COLUMNS,
+        (
+            row_values(r, default_source, default_status, allow_invalid_rut=allow_invalid_rut, counters=counters)
+            for r in rows
+        ),
+        match=match_predicate(conn),
+        stage_indexes=[("monto", "fecha"), ("comprobante",)],
+        chunk_size=chunk_size,
+        commit_every=commit_every,
+    )
+    counters["inserted"] = counters.get("inserted", 0) + result.inserted
+    counters["duplicates"] = counters.get("duplicates", 0) + result.rows - result.inserted
+    return counters
+
+
+def upsert_expense(
+    conn: sqlite3.Connection,
+    r: dict,
+    default_source: str | None,
+    default_status: str | None,
+    *,
+    allow_invalid_rut: bool,
+    counters: dict,
+) -> None:
+    """Compatibilidad fila a fila (sin commit); para archivos usar `import_rows`."""
+    import_rows(
+        conn, [r], default_source, default_status,
+        allow_invalid_rut=allow_invalid_rut, counters=counters, commit_every=0,
     )
-    conn.execute(sql, insert_params)
-    counters["inserted"] = counters.get("inserted", 0) + 1
 
 
 def main() -> int:
@@ -169,6 +191,8 @@ def main() -> int:
     ap.add_argument("--source", default="import")
     ap.add_argument("--status", default="emitido")
     ap.add_argument("--allow-invalid-rut", action="store_true", help="No rechazar RUT inválidos")
+    ap.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ap.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY, help="Chunks por commit (0 = uno al final)")
     args = ap.parse_args()
 
     db_path = os.path.abspath(args.db)
@@ -181,17 +205,16 @@ def main() -> int:
     conn = sqlite3.connect(db_path)
     try:
         ensure_table(conn)
-        counters: dict = {}
-        for r in rows:
-            upsert_expense(
+        with load_pragmas(conn):
+            counters = import_rows(
                 conn,
-                r,
+                rows,
                 args.source,
                 args.status,
                 allow_invalid_rut=args.allow_invalid_rut,
-                counters=counters,
+                chunk_size=args.chunk_size,
+                commit_every=args.commit_every,
             )
-        conn.commit()
         print(
             "Imported expenses:",
             counters.get("inserted", 0),
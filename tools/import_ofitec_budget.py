@@ -7,7 +7,11 @@ Características
 - Normaliza encabezados y realiza matching difuso simple (difflib)
 - Usa las plantillas JSON para pre-mapear columnas; si hay ambigüedad y no se
   pasa --assume-yes, solicita confirmación interactiva
-- Inserta datos en tablas SQLite (proyectos, presupuestos, capitulos, partidas)
+- Inserta datos en tablas SQLite (proyectos, presupuestos, capitulos, partidas);
+  las partidas van en un solo executemany y todo en una transacción
+- Guarda el mapping resuelto por layout (encabezados + plantilla) en
+  `budget_import_mappings`; re-importar el mismo formato no vuelve a hacer
+  matching ni a preguntar (`--no-mapping-cache` lo fuerza)
 
 Uso típico:
   python tools/import_ofitec_budget.py \
@@ -18,6 +22,7 @@ Uso típico:
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
 import sqlite3
@@ -31,7 +36,7 @@ if __package__ in (None, ""):
 
 from common_db import default_db_path
 from io_utils import load_rows
-from etl_common import norm_text, norm_colname, parse_number
+from etl_common import norm_colname, norm_texts, parse_numbers
 
 
 def ensure_schema(conn: sqlite3.Connection) -> None:
@@ -58,46 +63,74 @@ def load_templates(path: Path) -> dict:
         return json.load(f)
 
 
+TARGETS = ["codigo_partida", "descripcion", "unidad", "cantidad", "precio_unitario", "total"]
+
+
+class HeaderMatcher:
+    """`best_match` con normalización y SequenceMatcher reutilizados.
+
+    La normalización de encabezados la memoiza `norm_colname` (LRU de
+    etl_common) y cada candidato conserva su SequenceMatcher (el análisis de la secuencia b se hace una vez), así que
+    resolver un mapping cuesta O(targets × headers) comparaciones, no
+    normalizaciones.
+    """
+
+    def __init__(self) -> None:
+        self._matchers: dict[str, SequenceMatcher] = {}
+
+    def norm(self, name: str) -> str:
+        return norm_colname(name)
+
+    def best_match(self, header: str, candidates: list[str]) -> tuple[str | None, float]:
+        h = self.norm(header)
+        best, score = None, 0.0
+        for c in candidates:
+            nc = self.norm(c)
+            sm = self._matchers.get(nc)
+            if sm is None:
+                sm = self._matchers[nc] = SequenceMatcher(None, "", nc)
+            sm.set_seq1(h)
+            s = sm.ratio()
+            if s > score:
+                best, score = c, s
+        return best, score
+
+
 def best_match(header: str, candidates: list[str]) -> tuple[str | None, float]:
-    h = norm_colname(header)
-    best, score = None, 0.0
-    for c in candidates:
-        s = SequenceMatcher(None, h, norm_colname(c)).ratio()
-        if s > score:
-            best, score = c, s
-    return best, score
+    return HeaderMatcher().best_match(header, candidates)
 
 
 def resolve_mapping(headers: list[str], template_map: dict[str, str], suggestions: dict[str, list[dict]], assume_yes: bool) -> dict[str, str]:
     mapping: dict[str, str] = {}
+    matcher = HeaderMatcher()
     # Pre-map exacts
     for target, src in (template_map or {}).items():
         # Confirm presence or best match
         if src in headers:
             mapping[target] = src
         else:
-            best, score = best_match(src, headers)
+            best, score = matcher.best_match(src, headers)
             if best and score >= 0.6:
                 mapping[target] = best
     # Fill missing using suggestions candidates
-    for target in ["codigo_partida", "descripcion", "unidad", "cantidad", "precio_unitario", "total"]:
+    for target in TARGETS:
         if target in mapping:
             continue
         cand_headers = [x.get("excel_col_name", "") for x in (suggestions or {}).get(target, [])]
         # Expand with all headers as fallback
         if not cand_headers:
             cand_headers = headers
-        best, score = best_match(target, cand_headers)
+        best, score = matcher.best_match(target, cand_headers)
         if best and score >= 0.5:
             # best is a candidate header name; map to the actual header present (if needed)
             if best in headers:
                 mapping[target] = best
             else:
-                act, s2 = best_match(best, headers)
+                act, s2 = matcher.best_match(best, headers)
                 if act and s2 >= 0.5:
                     mapping[target] = act
     # Interactive confirm if still missing
-    missing = [t for t in ["codigo_partida","descripcion","unidad","cantidad","precio_unitario","total"] if t not in mapping]
+    missing = [t for t in TARGETS if t not in mapping]
     if missing and not assume_yes:
         print("Campos sin mapear:", missing)
         print("Encabezados disponibles:", headers)
@@ -108,22 +141,92 @@ def resolve_mapping(headers: list[str], template_map: dict[str, str], suggestion
     return mapping
 
 
-def insert_partidas(conn: sqlite3.Connection, presupuesto_id: int, rows: list[dict], mapping: dict[str, str]) -> int:
-    n = 0
-    for r in rows:
-        cp = norm_text(r.get(mapping.get("codigo_partida", "")))
-        desc = norm_text(r.get(mapping.get("descripcion", "")))
-        unidad = norm_text(r.get(mapping.get("unidad", "")))
-        cant = parse_number(r.get(mapping.get("cantidad", "")))
-        pu = parse_number(r.get(mapping.get("precio_unitario", "")))
-        total = r.get(mapping.get("total", ""))
-        total_val = parse_number(total) if total not in (None, "") else round(cant * pu, 2)
-        conn.execute(
-            "INSERT INTO partidas(capitulo_id, codigo_partida, descripcion, unidad, cantidad, precio_unitario, total) VALUES (NULL,?,?,?,?,?,?)",
-            (cp or None, cp, desc, unidad, cant, pu, total_val),
+def layout_key(headers: list[str], template: dict) -> str:
+    """Huella del layout: encabezados (en orden) + plantilla usada."""
+    payload = json.dumps(
+        {"headers": headers, "column_map": template.get("column_map", {}), "suggestions": template.get("suggestions", {})},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def ensure_mapping_cache(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS budget_import_mappings (
+          layout_key TEXT PRIMARY KEY,
+          mapping TEXT NOT NULL,
+          hits INTEGER NOT NULL DEFAULT 0,
+          created_at TEXT DEFAULT (datetime('now')),
+          last_used_at TEXT
         )
-        n += 1
-    conn.commit()
+        """
+    )
+
+
+def cached_mapping(
+    conn: sqlite3.Connection, headers: list[str], template: dict, assume_yes: bool
+) -> tuple[dict[str, str], bool]:
+    """Mapping del layout desde `budget_import_mappings` o resuelto y guardado.
+
+    Retorna (mapping, desde_cache). Las selecciones interactivas también se
+    guardan, así que el mismo libro no vuelve a preguntar.
+    """
+    ensure_mapping_cache(conn)
+    key = layout_key(headers, template)
+    row = conn.execute("SELECT mapping FROM budget_import_mappings WHERE layout_key=?", (key,)).fetchone()
+    if row:
+        mapping = json.loads(row[0])
+        if all(src in headers for src in mapping.values()):
+            conn.execute(
+                "UPDATE budget_import_mappings SET hits = hits + 1, last_used_at = datetime('now') WHERE layout_key=?",
+                (key,),
+            )
+            return mapping, True
+    mapping = resolve_mapping(headers, template.get("column_map", {}), template.get("suggestions", {}), assume_yes)
+    conn.execute(
+        "INSERT INTO budget_import_mappings(layout_key, mapping, last_used_at) VALUES (?, ?, datetime('now')) "
+        "ON CONFLICT(layout_key) DO UPDATE SET mapping=excluded.mapping, last_used_at=excluded.last_used_at",
+        (key, json.dumps(mapping, ensure_ascii=False, sort_keys=True)),
+    )
+    return mapping, False
+
+
+def partida_values(rows: list[dict], mapping: dict[str, str]):
+    """Tuplas (codigo_partida, descripcion, unidad, cantidad, precio_unitario, total).
+
+    Los montos se parsean por columna (`parse_numbers`): el separador decimal
+    se infiere una vez por columna.
+    """
+    cols = [mapping.get(t, "") for t in TARGETS]
+    cp_col, desc_col, unidad_col, cant_col, pu_col, total_col = cols
+    cants = parse_numbers([r.get(cant_col) for r in rows])
+    pus = parse_numbers([r.get(pu_col) for r in rows])
+    totals_raw = [r.get(total_col) for r in rows]
+    totals = parse_numbers(totals_raw)
+    # Textos repetidos (unidades, descripciones) se normalizan una vez
+    cps, descs, unidades = (norm_texts([r.get(c) for r in rows]) for c in (cp_col, desc_col, unidad_col))
+    for cp, desc, unidad, cant, pu, total, total_val in zip(
+        cps, descs, unidades, cants, pus, totals_raw, totals
+    ):
+        if total in (None, ""):
+            total_val = round(cant * pu, 2)
+        yield (cp or None, desc, unidad, cant, pu, total_val)
+
+
+def insert_partidas(
+    conn: sqlite3.Connection, presupuesto_id: int, rows: list[dict], mapping: dict[str, str], *, commit: bool = True
+) -> int:
+    """Inserta todas las partidas con un executemany (una transacción)."""
+    before = conn.total_changes
+    conn.executemany(
+        "INSERT INTO partidas(capitulo_id, codigo_partida, descripcion, unidad, cantidad, precio_unitario, total) VALUES (NULL,?,?,?,?,?,?)",
+        partida_values(rows, mapping),
+    )
+    n = conn.total_changes - before
+    if commit:
+        conn.commit()
     return n
 
 
@@ -135,6 +238,7 @@ def main() -> int:
     ap.add_argument("--assume-yes", action="store_true")
     ap.add_argument("--templates", default=str(Path(__file__).resolve().parents[1] / "ideas" / "ofitec_import_templates.json"))
     ap.add_argument("--db", default=default_db_path(prefer_root=False))
+    ap.add_argument("--no-mapping-cache", action="store_true", help="Resolver el mapping aunque el layout esté en caché")
     args = ap.parse_args()
 
     # Load data
@@ -155,16 +259,24 @@ def main() -> int:
         print("No se encontró plantilla adecuada.")
         return 2
 
-    mapping = resolve_mapping(headers, tpl.get("column_map", {}), tpl.get("suggestions", {}), args.assume_yes)
-    print("Mapping aplicado:", mapping)
-
     conn = sqlite3.connect(args.db)
     try:
+        if args.no_mapping_cache:
+            mapping, from_cache = resolve_mapping(headers, tpl.get("column_map", {}), tpl.get("suggestions", {}), args.assume_yes), False
+        else:
+            mapping, from_cache = cached_mapping(conn, headers, tpl, args.assume_yes)
+        print("Mapping aplicado:", mapping, "(caché)" if from_cache else "")
+
+        # Proyecto, presupuesto y partidas en una sola transacción
         proyecto_id = ensure_project(conn, args.project)
         presupuesto_id = create_presupuesto(conn, proyecto_id)
-        inserted = insert_partidas(conn, presupuesto_id, rows, mapping)
+        inserted = insert_partidas(conn, presupuesto_id, rows, mapping, commit=False)
+        conn.commit()
         print(f"Importadas {inserted} partidas al presupuesto {presupuesto_id} del proyecto '{args.project}'")
         return 0
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
@@ -3,11 +3,13 @@
 Importa liquidaciones de sueldo desde CSV a `payroll_slips`.
 
 Idempotencia: combinación (periodo, rut_trabajador, fecha_pago, bruto, liquido).
+Carga por lotes con `bulk_load.bulk_insert_missing` (staging TEMP + un INSERT
+... SELECT por chunk), commit cada `--commit-every` chunks.
 
 Uso:
   python tools/import_payroll.py --csv path/to/sueldos.{csv|xlsx} \
     --db data/chipax_data.db \
-    [--source RRHH]
+    [--source RRHH] [--chunk-size 5000] [--commit-every 1]
 """
 
 from __future__ import annotations
@@ -22,10 +24,26 @@ import sys
 if __package__ in (None, ""):
     _here = Path(__file__).resolve().parent
     sys.path.append(str(_here))
-from common_db import default_db_path\nfrom io_utils import load_rows
+from common_db import default_db_path
+from bulk_load import DEFAULT_CHUNK_SIZE, DEFAULT_COMMIT_EVERY, bulk_insert_missing, load_pragmas
+from io_utils import load_rows
 from rut_utils import normalize_rut, is_valid_rut
 
 
+COLUMNS = (
+    "periodo", "rut_trabajador", "nombre_trabajador", "cargo", "bruto",
+    "liquido", "descuentos", "fecha_pago", "fuente",
+)
+# Misma llave de existencia que el chequeo fila a fila previo; RUT_KEY es
+# la expresión indexada que usa la búsqueda
+RUT_KEY = "IFNULL(rut_trabajador,'')"
+MATCH = (
+    "t.periodo = s.periodo AND IFNULL(t.rut_trabajador,'') = IFNULL(s.rut_trabajador,'')"
+    " AND IFNULL(t.fecha_pago,'') = IFNULL(s.fecha_pago,'') AND IFNULL(t.bruto,0) = IFNULL(s.bruto,0)"
+    " AND IFNULL(t.liquido,0) = IFNULL(s.liquido,0)"
+)
+
+
 def ensure_table(conn: sqlite3.Connection) -> None:
     conn.execute(
         """
@@ -43,6 +61,10 @@ def ensure_table(conn: sqlite3.Connection) -> None:
         );
         """
     )
+    # Sostiene la búsqueda de duplicados (MATCH) de las cargas por lote
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_payroll_slips_periodo_rut ON payroll_slips(periodo, {RUT_KEY})"
+    )
 
 
 def norm_amount(v) -> float:
@@ -59,6 +81,54 @@ def norm_amount(v) -> float:
             return 0.0
 
 
+def row_values(
+    r: dict, source_default: str | None, *, allow_invalid_rut: bool, counters: dict
+) -> tuple | None:
+    """Fila CSV -> tupla ordenada como COLUMNS (None si se descarta por RUT)."""
+    rut_trabajador = normalize_rut(r.get("RUT_Trabajador") or r.get("rut_trabajador") or r.get("RUT"))
+    if rut_trabajador and not is_valid_rut(rut_trabajador) and not allow_invalid_rut:
+        counters["invalid_rut"] = counters.get("invalid_rut", 0) + 1
+        return None
+    return (
+        r.get("Periodo") or r.get("periodo"),
+        rut_trabajador,
+        r.get("Nombre") or r.get("nombre_trabajador"),
+        r.get("Cargo") or r.get("cargo"),
+        norm_amount(r.get("Bruto") or r.get("bruto")),
+        norm_amount(r.get("Liquido") or r.get("liquido") or r.get("líquido")),
+        norm_amount(r.get("Descuentos") or r.get("descuentos")),
+        r.get("FechaPago") or r.get("fecha_pago"),
+        r.get("Fuente") or r.get("fuente") or source_default or "import",
+    )
+
+
+def import_rows(
+    conn: sqlite3.Connection,
+    rows,
+    source_default: str | None,
+    *,
+    allow_invalid_rut: bool = False,
+    counters: dict | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+) -> dict:
+    """Carga por lotes vía bulk_load.bulk_insert_missing; actualiza y retorna `counters`."""
+    counters = {} if counters is None else counters
+    result = bulk_insert_missing(
+        conn,
+        "payroll_slips",
+        COLUMNS,
+        (row_values(r, source_default, allow_invalid_rut=allow_invalid_rut, counters=counters) for r in rows),
+        match=MATCH,
+        stage_indexes=[("periodo", RUT_KEY)],
+        chunk_size=chunk_size,
+        commit_every=commit_every,
+    )
+    counters["inserted"] = counters.get("inserted", 0) + result.inserted
+    counters["duplicates"] = counters.get("duplicates", 0) + result.rows - result.inserted
+    return counters
+
+
 def upsert_row(
     conn: sqlite3.Connection,
     r: dict,
@@ -67,58 +137,8 @@ def upsert_row(
     allow_invalid_rut: bool,
     counters: dict,
 ) -> None:
-    cols = {c[1] for c in conn.execute("PRAGMA table_info(payroll_slips)").fetchall()}
-    periodo = r.get("Periodo") or r.get("periodo")
-    rut_trabajador_raw = r.get("RUT_Trabajador") or r.get("rut_trabajador") or r.get("RUT")
-    rut_trabajador = normalize_rut(rut_trabajador_raw)
-    nombre_trabajador = r.get("Nombre") or r.get("nombre_trabajador")
-    cargo = r.get("Cargo") or r.get("cargo")
-    bruto = norm_amount(r.get("Bruto") or r.get("bruto"))
-    liquido = norm_amount(r.get("Liquido") or r.get("liquido") or r.get("líquido"))
-    descuentos = norm_amount(r.get("Descuentos") or r.get("descuentos"))
-    fecha_pago = r.get("FechaPago") or r.get("fecha_pago")
-    fuente = r.get("Fuente") or r.get("fuente") or source_default or "import"
-
-    if rut_trabajador and not is_valid_rut(rut_trabajador):
-        if not allow_invalid_rut:
-            counters["invalid_rut"] = counters.get("invalid_rut", 0) + 1
-            return
-
-    cur = conn.execute(
-        (
-            "SELECT 1 FROM payroll_slips WHERE periodo = ? AND IFNULL(rut_trabajador,'') = IFNULL(?, '')"
-            " AND IFNULL(fecha_pago,'') = IFNULL(?, '') AND IFNULL(bruto,0) = IFNULL(?, 0) AND IFNULL(liquido,0) = IFNULL(?, 0)"
-        ),
-        (periodo, rut_trabajador, fecha_pago, bruto, liquido),
-    )
-    if cur.fetchone():
-        counters["duplicates"] = counters.get("duplicates", 0) + 1
-        return
-
-    insert_cols, insert_vals, insert_params = [], [], []
-
-    def add(col, val):
-        if col in cols:
-            insert_cols.append(col)
-            insert_vals.append("?")
-            insert_params.append(val)
-
-    for col, val in [
-        ("periodo", periodo),
-        ("rut_trabajador", rut_trabajador),
-        ("nombre_trabajador", nombre_trabajador),
-        ("cargo", cargo),
-        ("bruto", bruto),
-        ("liquido", liquido),
-        ("descuentos", descuentos),
-        ("fecha_pago", fecha_pago),
-        ("fuente", fuente),
-    ]:
-        add(col, val)
-
-    sql = "INSERT INTO payroll_slips (" + ", ".join(insert_cols) + ") VALUES (" + ", ".join(insert_vals) + ")"
-    conn.execute(sql, insert_params)
-    counters["inserted"] = counters.get("inserted", 0) + 1
+    """Compatibilidad fila a fila (sin commit); para archivos usar `import_rows`."""
+    import_rows(conn, [r], source_default, allow_invalid_rut=allow_invalid_rut, counters=counters, commit_every=0)
 
 
 def main() -> int:
@@ -127,6 +147,8 @@ def main() -> int:
     ap.add_argument("--db", default=default_db_path(prefer_root=False))
     ap.add_argument("--source", default="import")
     ap.add_argument("--allow-invalid-rut", action="store_true")
+    ap.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ap.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY, help="Chunks por commit (0 = uno al final)")
     args = ap.parse_args()
 
     db_path = os.path.abspath(args.db)
@@ -139,10 +161,15 @@ def main() -> int:
     conn = sqlite3.connect(db_path)
     try:
         ensure_table(conn)
-        counters: dict = {}
-        for r in rows:
-            upsert_row(conn, r, args.source, allow_invalid_rut=args.allow_invalid_rut, counters=counters)
-        conn.commit()
+        with load_pragmas(conn):
+            counters = import_rows(
+                conn,
+                rows,
+                args.source,
+                allow_invalid_rut=args.allow_invalid_rut,
+                chunk_size=args.chunk_size,
+                commit_every=args.commit_every,
+            )
         print(
             "Imported payroll:",
             counters.get("inserted", 0),
@@ -22,7 +22,8 @@ import sys
 if __package__ in (None, ""):
     _here = Path(__file__).resolve().parent
     sys.path.append(str(_here))
-from common_db import default_db_path\nfrom io_utils import load_rows
+from common_db import default_db_path
+from io_utils import load_rows
 
 
 def ensure_table(conn: sqlite3.Connection) -> None:
@@ -14,7 +14,7 @@ from __future__ import annotations
 
 import argparse
 import csv
-from io_utils import load_rows
+from io_utils import iter_rows
 import hashlib
 import json
 import os
@@ -22,11 +22,13 @@ import re
 import sqlite3
 from pathlib import Path
 import sys
+from typing import Iterable
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
 from common_db import default_db_path
 from rut_utils import normalize_rut, is_valid_rut
 from numbering import ensure_sequence, next_number
+from period_cube import refresh as refresh_period_cube
 
 
 def ensure_tables(conn: sqlite3.Connection) -> None:
@@ -347,6 +349,73 @@ def insert_line_for_po(conn: sqlite3.Connection, po_id: int, row: dict) -> None:
     )
 
 
+def import_rows(
+    conn: sqlite3.Connection,
+    rows: Iterable[dict],
+    *,
+    source_file: str,
+    batch: str,
+    refresh_lines: bool = False,
+    update_header: bool = False,
+) -> dict[str, int]:
+    """Stagea y normaliza filas de OC; devuelve contadores (rows, pos)."""
+    # Staging + normalización (cabeceras + líneas) en una sola pasada
+    # sobre las filas; `rows` puede ser un iterador (streaming).
+    po_ids: dict[str, int] = {}
+    cleared: set[int] = set()
+    n_rows = 0
+    for idx, r in enumerate(rows):
+        n_rows += 1
+        h = hashlib.sha256(json.dumps(r, sort_keys=True).encode("utf-8")).hexdigest()
+        conn.execute(
+            "INSERT INTO zoho_po_raw (source_file, row_index, row_json, import_batch_id, hash) VALUES (?, ?, ?, ?, ?)",
+            (source_file, idx, json.dumps(r, ensure_ascii=False), batch, h),
+        )
+
+        key = r.get("Purchase Order ID") or f"{r.get('CF.RUT','')}-{r.get('Purchase Order Number','')}-{r.get('Purchase Order Date','')}"
+        po_id = po_ids.get(key)
+        if po_id is None:
+            po_id = upsert_po(conn, r, update_header=update_header)
+            po_ids[key] = po_id
+            if refresh_lines:
+                conn.execute("DELETE FROM purchase_lines_unified WHERE po_id = ?", (po_id,))
+                cleared.add(po_id)
+
+        insert_line_for_po(conn, po_id, r)
+
+        # Mapear proyecto analítico
+        proj_id = r.get("Project ID") or r.get("ProjectId")
+        proj_name = r.get("Project Name") or r.get("Proyecto")
+        if proj_id or proj_name:
+            slug = _slugify(proj_name)
+            analytic_code = str(proj_id) if proj_id else slug
+            try:
+                conn.execute(
+                    "INSERT OR IGNORE INTO projects_analytic_map (zoho_project_id, zoho_project_name, analytic_code, slug) VALUES (?, ?, ?, ?)",
+                    (str(proj_id) if proj_id else None, proj_name, analytic_code, slug),
+                )
+            except sqlite3.Error:
+                pass
+
+    conn.commit()
+    # Conciliar total cabecera si está vacío
+    for po_id in po_ids.values():
+        cur = conn.execute("SELECT SUM(COALESCE(line_total,0)) FROM purchase_lines_unified WHERE po_id = ?", (po_id,))
+        sum_lines = cur.fetchone()[0] or 0.0
+        conn.execute(
+            "UPDATE purchase_orders_unified SET total_amount = COALESCE(NULLIF(total_amount, 0), ?) WHERE rowid = ?",
+            (sum_lines, po_id),
+        )
+    conn.commit()
+    if po_ids:
+        since = conn.execute(
+            "SELECT MIN(po_date) FROM purchase_orders_unified WHERE rowid IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(po_ids.values())),),
+        ).fetchone()[0]
+        refresh_period_cube(conn, ["purchase_orders"], since=since)
+    return {"rows": n_rows, "pos": len(po_ids)}
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description=__doc__)
     repo_root = Path(__file__).resolve().parents[1]
@@ -367,56 +436,15 @@ def main() -> int:
     try:
         ensure_tables(conn)
 
-        rows = load_rows(args.csv)
-
-        # Staging
-        for idx, r in enumerate(rows):
-            h = hashlib.sha256(json.dumps(r, sort_keys=True).encode("utf-8")).hexdigest()
-            conn.execute(
-                "INSERT INTO zoho_po_raw (source_file, row_index, row_json, import_batch_id, hash) VALUES (?, ?, ?, ?, ?)",
-                (os.path.basename(args.csv), idx, json.dumps(r, ensure_ascii=False), args.batch, h),
-            )
-
-        # Normalización (cabeceras + líneas)
-        po_ids: dict[str, int] = {}
-        cleared: set[int] = set()
-        for idx, r in enumerate(rows):
-            key = r.get("Purchase Order ID") or f"{r.get('CF.RUT','')}-{r.get('Purchase Order Number','')}-{r.get('Purchase Order Date','')}"
-            po_id = po_ids.get(key)
-            if po_id is None:
-                po_id = upsert_po(conn, r, update_header=getattr(args, "update_header", False))
-                po_ids[key] = po_id
-                if getattr(args, "refresh_lines", False):
-                    conn.execute("DELETE FROM purchase_lines_unified WHERE po_id = ?", (po_id,))
-                    cleared.add(po_id)
-
-            insert_line_for_po(conn, po_id, r)
-
-            # Mapear proyecto analítico
-            proj_id = r.get("Project ID") or r.get("ProjectId")
-            proj_name = r.get("Project Name") or r.get("Proyecto")
-            if proj_id or proj_name:
-                slug = _slugify(proj_name)
-                analytic_code = str(proj_id) if proj_id else slug
-                try:
-                    conn.execute(
-                        "INSERT OR IGNORE INTO projects_analytic_map (zoho_project_id, zoho_project_name, analytic_code, slug) VALUES (?, ?, ?, ?)",
-                        (str(proj_id) if proj_id else None, proj_name, analytic_code, slug),
-                    )
-                except sqlite3.Error:
-                    pass
-
-        conn.commit()
-        # Conciliar total cabecera si está vacío
-        for po_id in po_ids.values():
-            cur = conn.execute("SELECT SUM(COALESCE(line_total,0)) FROM purchase_lines_unified WHERE po_id = ?", (po_id,))
-            sum_lines = cur.fetchone()[0] or 0.0
-            conn.execute(
-                "UPDATE purchase_orders_unified SET total_amount = COALESCE(NULLIF(total_amount, 0), ?) WHERE rowid = ?",
-                (sum_lines, po_id),
-            )
-        conn.commit()
-        print(f"Staged {len(rows)} filas, normalizadas {len(po_ids)} cabeceras y líneas insertadas. Totales conciliados cuando correspondía.")
+        counts = import_rows(
+            conn,
+            iter_rows(args.csv),
+            source_file=os.path.basename(args.csv),
+            batch=args.batch,
+            refresh_lines=getattr(args, "refresh_lines", False),
+            update_header=getattr(args, "update_header", False),
+        )
+        print(f"Staged {counts['rows']} filas, normalizadas {counts['pos']} cabeceras y líneas insertadas. Totales conciliados cuando correspondía.")
         return 0
     finally:
         conn.commit()
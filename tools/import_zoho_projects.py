@@ -14,11 +14,12 @@ import re
 import sqlite3
 from pathlib import Path
 import sys
+from typing import Iterable
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
 
-from io_utils import load_rows
+from io_utils import iter_rows
 from common_db import default_db_path
 
 
@@ -47,6 +48,36 @@ def slugify(name: str | None) -> str:
     return s
 
 
+def import_rows(conn: sqlite3.Connection, rows: Iterable[dict]) -> dict[str, int]:
+    """Upsert de proyectos por zoho_project_id; devuelve contadores."""
+    ins = upd = skip = 0
+    for r in rows:
+        pid = r.get("Project ID") or r.get("ProjectId") or r.get("ID") or ""
+        pname = r.get("Project Name") or r.get("Proyecto") or r.get("Name") or ""
+        if not pid and not pname:
+            skip += 1
+            continue
+        slug = slugify(pname)
+        cur = conn.execute("SELECT zoho_project_name FROM projects_analytic_map WHERE zoho_project_id = ?", (str(pid),))
+        row = cur.fetchone()
+        if row:
+            if pname and row[0] != pname:
+                conn.execute(
+                    "UPDATE projects_analytic_map SET zoho_project_name = ?, slug = ? WHERE zoho_project_id = ?",
+                    (pname, slug, str(pid)),
+                )
+                upd += 1
+            else:
+                skip += 1
+        else:
+            conn.execute(
+                "INSERT INTO projects_analytic_map (zoho_project_id, zoho_project_name, analytic_code, slug) VALUES (?, ?, ?, ?)",
+                (str(pid), pname, None, slug),
+            )
+            ins += 1
+    return {"inserted": ins, "updated": upd, "skipped": skip}
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description=__file__)
     ap.add_argument("--csv", required=True, help="Archivo CSV o XLSX de Proyectos")
@@ -59,38 +90,14 @@ def main() -> int:
         print("DB not found:", db_path)
         return 2
 
-    rows = load_rows(args.csv)
+    rows = iter_rows(args.csv)
 
     conn = sqlite3.connect(db_path)
     try:
         ensure_table(conn)
-        ins = upd = skip = 0
-        for r in rows:
-            pid = r.get("Project ID") or r.get("ProjectId") or r.get("ID") or ""
-            pname = r.get("Project Name") or r.get("Proyecto") or r.get("Name") or ""
-            if not pid and not pname:
-                skip += 1
-                continue
-            slug = slugify(pname)
-            cur = conn.execute("SELECT zoho_project_name FROM projects_analytic_map WHERE zoho_project_id = ?", (str(pid),))
-            row = cur.fetchone()
-            if row:
-                if pname and row[0] != pname:
-                    conn.execute(
-                        "UPDATE projects_analytic_map SET zoho_project_name = ?, slug = ? WHERE zoho_project_id = ?",
-                        (pname, slug, str(pid)),
-                    )
-                    upd += 1
-                else:
-                    skip += 1
-            else:
-                conn.execute(
-                    "INSERT INTO projects_analytic_map (zoho_project_id, zoho_project_name, analytic_code, slug) VALUES (?, ?, ?, ?)",
-                    (str(pid), pname, None, slug),
-                )
-                ins += 1
+        counts = import_rows(conn, rows)
         conn.commit()
-        print(f"Projects -> inserted: {ins}, updated: {upd}, skipped: {skip}")
+        print(f"Projects -> inserted: {counts['inserted']}, updated: {counts['updated']}, skipped: {counts['skipped']}")
         return 0
     finally:
         conn.close()
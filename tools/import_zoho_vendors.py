@@ -18,11 +18,12 @@ import os
 import sqlite3
 from pathlib import Path
 import sys
+from typing import Iterable
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
 
-from io_utils import load_rows
+from io_utils import iter_rows
 from rut_utils import normalize_rut
 from common_db import default_db_path
 
@@ -80,6 +81,36 @@ def extract_name(row: dict) -> str:
     return ""
 
 
+def import_rows(conn: sqlite3.Connection, rows: Iterable[dict], source: str) -> dict[str, int]:
+    """Upsert de proveedores por rut_clean; devuelve contadores."""
+    inserted = updated = skipped = 0
+    for r in rows:
+        rut = extract_rut(r)
+        name = extract_name(r)
+        if not rut or not name:
+            skipped += 1
+            continue
+        name_norm = norm_name(name)
+        cur = conn.execute("SELECT name_normalized FROM vendors_unified WHERE rut_clean = ?", (rut,))
+        row = cur.fetchone()
+        if row:
+            if row[0] != name_norm:
+                conn.execute(
+                    "UPDATE vendors_unified SET name_normalized = ?, zoho_vendor_name = ?, source_platform = ? WHERE rut_clean = ?",
+                    (name_norm, name, source, rut),
+                )
+                updated += 1
+            else:
+                skipped += 1
+        else:
+            conn.execute(
+                "INSERT INTO vendors_unified (rut_clean, name_normalized, source_platform, zoho_vendor_name) VALUES (?, ?, ?, ?)",
+                (rut, name_norm, source, name),
+            )
+            inserted += 1
+    return {"inserted": inserted, "updated": updated, "skipped": skipped}
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description=__file__)
     ap.add_argument("--csv", required=True, help="Archivo CSV o XLSX de Proveedores")
@@ -92,38 +123,14 @@ def main() -> int:
         print("DB not found:", db_path)
         return 2
 
-    rows = load_rows(args.csv)
+    rows = iter_rows(args.csv)
 
     conn = sqlite3.connect(db_path)
     try:
         ensure_table(conn)
-        inserted = updated = skipped = 0
-        for r in rows:
-            rut = extract_rut(r)
-            name = extract_name(r)
-            if not rut or not name:
-                skipped += 1
-                continue
-            name_norm = norm_name(name)
-            cur = conn.execute("SELECT name_normalized FROM vendors_unified WHERE rut_clean = ?", (rut,))
-            row = cur.fetchone()
-            if row:
-                if row[0] != name_norm:
-                    conn.execute(
-                        "UPDATE vendors_unified SET name_normalized = ?, zoho_vendor_name = ?, source_platform = ? WHERE rut_clean = ?",
-                        (name_norm, name, args.source, rut),
-                    )
-                    updated += 1
-                else:
-                    skipped += 1
-            else:
-                conn.execute(
-                    "INSERT INTO vendors_unified (rut_clean, name_normalized, source_platform, zoho_vendor_name) VALUES (?, ?, ?, ?)",
-                    (rut, name_norm, args.source, name),
-                )
-                inserted += 1
+        counts = import_rows(conn, rows, args.source)
         conn.commit()
-        print(f"Vendors -> inserted: {inserted}, updated: {updated}, skipped: {skipped}")
+        print(f"Vendors -> inserted: {counts['inserted']}, updated: {counts['updated']}, skipped: {counts['skipped']}")
         return 0
     finally:
         conn.close()
@@ -6,36 +6,32 @@ Goals
 - Accept .csv or .xlsx seamlessly
 - Preserve all columns and rows (no drops)
 - Represent values as strings by default to avoid implicit type coercion
+- Stream rows lazily (`iter_rows`) so large exports do not need to fit in RAM
 
 Notes
 - For .xlsx, this uses openpyxl if available. If not installed, raises
   an explicit error suggesting installation or exporting to CSV.
+- `iter_rows(path, columns=[...], types={...})` projects only the requested
+  columns and can parse numeric columns with `etl_common.parse_number`.
+  `load_rows` is a thin wrapper that materializes it into a list.
 """
 from __future__ import annotations
 
 import csv
 import os
-from typing import Iterable, List, Dict, Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Sequence
 
+from etl_common import parse_number
 
-def _read_csv(path: str) -> List[Dict[str, str]]:
-    # Try to sniff delimiter; default to comma, then semicolon
-    with open(path, "r", encoding="utf-8-sig", newline="") as fh:
-        sample = fh.read(4096)
-        fh.seek(0)
-        try:
-            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
-        except Exception:
-            # Heuristic: prefer semicolon if there are many
-            delim = ";" if sample.count(";") > sample.count(",") else ","
-            dialect = csv.excel
-            dialect.delimiter = delim  # type: ignore[attr-defined]
-        reader = csv.DictReader(fh, dialect=dialect)
-        rows: List[Dict[str, str]] = []
-        for r in reader:
-            # Ensure all values as strings (preserve empty as "")
-            rows.append({(k or "").strip(): ("" if v is None else str(v)) for k, v in r.items()})
-        return rows
+XLSX_EXTS = (".xlsx", ".xlsm", ".xltx", ".xltm")
+
+# Column converters accepted in `types`: a name or any callable(str) -> value
+_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "str": lambda v: v,
+    "text": lambda v: v,
+    "number": parse_number,
+    "float": parse_number,
+}
 
 
 def _stringify(value: Any) -> str:
@@ -48,7 +44,84 @@ def _stringify(value: Any) -> str:
     return str(value)
 
 
-def _read_xlsx(path: str, sheet: str | int | None = None) -> List[Dict[str, str]]:
+def _resolve_types(types: Mapping[str, Any] | None) -> Dict[str, Callable[[str], Any]]:
+    resolved: Dict[str, Callable[[str], Any]] = {}
+    for col, conv in (types or {}).items():
+        if callable(conv):
+            resolved[col] = conv
+        elif conv in _CONVERTERS:
+            resolved[col] = _CONVERTERS[conv]
+        else:
+            raise ValueError(f"Tipo de columna no soportado para '{col}': {conv!r}")
+    return resolved
+
+
+def _project(
+    headers: Sequence[str],
+    columns: Iterable[str] | None,
+) -> tuple[List[str], List[int | None]]:
+    """Return output keys and the source index for each (None when absent).
+
+    Duplicate headers keep the last occurrence, matching `csv.DictReader`.
+    """
+    index = {h: i for i, h in enumerate(headers)}
+    keys = list(index.keys()) if columns is None else list(columns)
+    return keys, [index.get(k) for k in keys]
+
+
+def _iter_records(
+    headers: Sequence[str],
+    records: Iterable[Sequence[Any]],
+    columns: Iterable[str] | None,
+    types: Mapping[str, Any] | None,
+) -> Iterator[Dict[str, Any]]:
+    keys, idxs = _project(headers, columns)
+    conv = _resolve_types(types)
+    plan = list(zip(keys, idxs, [conv.get(k) for k in keys]))
+    for rec in records:
+        if not rec:
+            continue  # línea vacía: csv.DictReader también la omite
+        n = len(rec)
+        item: Dict[str, Any] = {}
+        for key, i, fn in plan:
+            raw = rec[i] if i is not None and i < n else None
+            val = _stringify(raw)
+            item[key] = fn(val) if fn is not None else val
+        yield item
+
+
+def _sniff_dialect(sample: str) -> type[csv.Dialect]:
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except Exception:
+        # Heuristic: prefer semicolon if there are many
+        delim = ";" if sample.count(";") > sample.count(",") else ","
+        return type("_SniffedDialect", (csv.excel,), {"delimiter": delim})
+
+
+def _iter_csv(
+    path: str,
+    columns: Iterable[str] | None,
+    types: Mapping[str, Any] | None,
+) -> Iterator[Dict[str, Any]]:
+    # Try to sniff delimiter; default to comma, then semicolon
+    with open(path, "r", encoding="utf-8-sig", newline="") as fh:
+        sample = fh.read(4096)
+        fh.seek(0)
+        reader = csv.reader(fh, dialect=_sniff_dialect(sample))
+        try:
+            headers = [(h or "").strip() for h in next(reader)]
+        except StopIteration:
+            return
+        yield from _iter_records(headers, reader, columns, types)
+
+
+def _iter_xlsx(
+    path: str,
+    sheet: str | int | None,
+    columns: Iterable[str] | None,
+    types: Mapping[str, Any] | None,
+) -> Iterator[Dict[str, Any]]:
     try:
         from openpyxl import load_workbook  # type: ignore
     except Exception as e:  # pragma: no cover
@@ -59,36 +132,51 @@ def _read_xlsx(path: str, sheet: str | int | None = None) -> List[Dict[str, str]
         ) from e
 
     wb = load_workbook(path, data_only=True, read_only=True)
-    if isinstance(sheet, int):
-        ws = wb.worksheets[sheet]
-    elif isinstance(sheet, str):
-        ws = wb[sheet]
-    else:
-        ws = wb.worksheets[0]
-
-    rows_iter = ws.iter_rows(values_only=True)
     try:
-        headers_raw = next(rows_iter)
-    except StopIteration:
-        return []
-    headers = [(_stringify(h)).strip() if h is not None else f"col_{i+1}" for i, h in enumerate(headers_raw)]
-
-    rows: List[Dict[str, str]] = []
-    for row in rows_iter:
-        values = [_stringify(v) for v in row]
-        # Pad if needed
-        if len(values) < len(headers):
-            values += [""] * (len(headers) - len(values))
-        item = {headers[i]: values[i] for i in range(len(headers))}
-        rows.append(item)
-    return rows
-
-
-def load_rows(path: str, *, sheet: str | int | None = None) -> List[Dict[str, str]]:
+        if isinstance(sheet, int):
+            ws = wb.worksheets[sheet]
+        elif isinstance(sheet, str):
+            ws = wb[sheet]
+        else:
+            ws = wb.worksheets[0]
+
+        rows_iter = ws.iter_rows(values_only=True)
+        try:
+            headers_raw = next(rows_iter)
+        except StopIteration:
+            return
+        headers = [(_stringify(h)).strip() if h is not None else f"col_{i+1}" for i, h in enumerate(headers_raw)]
+        yield from _iter_records(headers, rows_iter, columns, types)
+    finally:
+        # read_only workbooks keep the file handle open until closed
+        wb.close()
+
+
+def iter_rows(
+    path: str,
+    *,
+    sheet: str | int | None = None,
+    columns: Iterable[str] | None = None,
+    types: Mapping[str, Any] | None = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield rows of a CSV/XLSX file one at a time.
+
+    - columns: only these keys are emitted (missing ones as ""); None keeps all.
+    - types: per-column converter, either "number"/"str" or a callable(str).
+    """
     ext = os.path.splitext(path)[1].lower()
     if ext == ".csv":
-        return _read_csv(path)
-    if ext in (".xlsx", ".xlsm", ".xltx", ".xltm"):
-        return _read_xlsx(path, sheet=sheet)
+        return _iter_csv(path, columns, types)
+    if ext in XLSX_EXTS:
+        return _iter_xlsx(path, sheet, columns, types)
     raise ValueError(f"Formato no soportado: {ext}. Usa CSV o XLSX.")
 
+
+def load_rows(
+    path: str,
+    *,
+    sheet: str | int | None = None,
+    columns: Iterable[str] | None = None,
+    types: Mapping[str, Any] | None = None,
+) -> List[Dict[str, Any]]:
+    return list(iter_rows(path, sheet=sheet, columns=columns, types=types))
@@ -5,11 +5,16 @@ Manage Ofitec PO numbering sequence.
 Usage:
   python tools/manage_po_numbering.py [--db ...] [--name po_number] \
       [--set-prefix PO-] [--set-padding 5] [--set-start 1] [--peek]
+
+Gap audit (numbers issued by the sequence but not present in TABLE.COLUMN):
+  python tools/manage_po_numbering.py --audit-gaps purchase_orders_unified.po_number
+  python tools/manage_po_numbering.py --name sales_note:2025 --audit-gaps sales_notes.note_number
 """
 
 from __future__ import annotations
 
 import argparse
+import json
 import os
 import sqlite3
 from pathlib import Path
@@ -18,7 +23,7 @@ import sys
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
 from common_db import default_db_path
-from numbering import ensure_sequence, peek_number
+from numbering import ensure_sequence, gap_report, number_pattern, peek_number, used_values
 
 
 def main() -> int:
@@ -29,6 +34,7 @@ def main() -> int:
     ap.add_argument("--set-padding", type=int)
     ap.add_argument("--set-start", type=int)
     ap.add_argument("--peek", action="store_true")
+    ap.add_argument("--audit-gaps", metavar="TABLE.COLUMN")
     args = ap.parse_args()
 
     db_path = os.path.abspath(args.db)
@@ -38,6 +44,12 @@ def main() -> int:
 
     conn = sqlite3.connect(db_path)
     try:
+        if args.audit_gaps:
+            table, _, column = args.audit_gaps.partition(".")
+            used = used_values(conn, table, column or args.name, number_pattern(conn, args.name))
+            report = gap_report(conn, args.name, used)
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+            return 1 if report["gaps"] or report["duplicates"] else 0
         ensure_sequence(
             conn,
             args.name,
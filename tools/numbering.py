@@ -5,18 +5,33 @@ Ofitec sequential numbering utilities (SQLite).
 Provides an atomic counter per sequence name with prefix and padding.
 
 Tables:
-- ofitec_sequences(name PRIMARY KEY, prefix TEXT, padding INT, next_value INT NOT NULL, enable_manual INT, updated_at TEXT)
+- ofitec_sequences(name PRIMARY KEY, prefix TEXT, padding INT, next_value INT NOT NULL, enable_manual INT, updated_at TEXT,
+  start_value INT): start_value is the first number the sequence issues (seeded by `start`)
+- ofitec_sequence_blocks(name, start_value, end_value, reserved_at, pid): log of
+  blocks reserved by `SequenceAllocator` (explains gaps left by restarts)
 
 Usage example:
     conn = sqlite3.connect(db)
     ensure_sequence(conn, 'po_number', prefix='PO-', padding=5, start=1)
     num = next_number(conn, 'po_number')  # => 'PO-00001'
+
+Block allocation (API writers): `allocator.next_number(conn, 'po_number')`
+reserves `block` numbers at a time with one `UPDATE ... RETURNING` committed on
+its own connection, then hands them out from memory. Reserved-but-unused
+numbers become gaps; audit them with `gap_report` / `manage_po_numbering.py
+--audit-gaps`. Year-scoped sequences are named `<base>:<YYYY>`
+(see `year_sequence`).
 """
 
 from __future__ import annotations
 
+import os
+import re
 import sqlite3
-from typing import Optional
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BLOCK = int(os.getenv("OFITEC_SEQ_BLOCK", "10"))
 
 
 def ensure_sequence(
@@ -36,16 +51,21 @@ def ensure_sequence(
           padding INTEGER DEFAULT 0,
           next_value INTEGER NOT NULL,
           enable_manual INTEGER DEFAULT 1,
-          updated_at TEXT DEFAULT (datetime('now'))
+          updated_at TEXT DEFAULT (datetime('now')),
+          start_value INTEGER
         );
         """
     )
-    cur = conn.execute("SELECT name FROM ofitec_sequences WHERE name = ?", (name,))
-    if cur.fetchone() is None:
+    if "start_value" not in {r[1] for r in conn.execute("PRAGMA table_info(ofitec_sequences)")}:
+        conn.execute("ALTER TABLE ofitec_sequences ADD COLUMN start_value INTEGER")
+    cur = conn.execute("SELECT next_value, start_value FROM ofitec_sequences WHERE name = ?", (name,))
+    row = cur.fetchone()
+    if row is None:
         nv = start if (start is not None and start > 0) else 1
         conn.execute(
-            "INSERT INTO ofitec_sequences(name, prefix, padding, next_value, enable_manual) VALUES(?,?,?,?,?)",
-            (name, prefix or "", int(padding or 0), int(nv), 1 if (enable_manual is None or enable_manual) else 0),
+            "INSERT INTO ofitec_sequences(name, prefix, padding, next_value, enable_manual, start_value) "
+            "VALUES(?,?,?,?,?,?)",
+            (name, prefix or "", int(padding or 0), int(nv), 1 if (enable_manual is None or enable_manual) else 0, int(nv)),
         )
     else:
         parts, params = [], []
@@ -55,6 +75,9 @@ def ensure_sequence(
             parts.append("padding = ?"); params.append(int(padding))
         if start is not None and start > 0:
             parts.append("next_value = ?"); params.append(int(start))
+            # Sin números emitidos todavía, el nuevo inicio es el primero de la serie
+            if int(row[0]) == int(row[1] if row[1] is not None else 1):
+                parts.append("start_value = ?"); params.append(int(start))
         if enable_manual is not None:
             parts.append("enable_manual = ?"); params.append(1 if enable_manual else 0)
         if parts:
@@ -70,22 +93,32 @@ def _format(prefix: str, padding: int, value: int) -> str:
     return f"{prefix or ''}{value}"
 
 
+def _reserve(conn: sqlite3.Connection, name: str, size: int) -> Optional[Tuple[int, str, int]]:
+    """Advance `next_value` by `size` in one statement; (first, prefix, padding)."""
+    try:
+        row = conn.execute(
+            "UPDATE ofitec_sequences SET next_value = next_value + ?, updated_at = datetime('now') "
+            "WHERE name = ? RETURNING next_value - ?, prefix, padding",
+            (size, name, size),
+        ).fetchone()
+    except sqlite3.OperationalError as e:
+        if "no such table" not in str(e):
+            raise
+        return None
+    if row is None:
+        return None
+    return int(row[0]), row[1] or "", int(row[2] or 0)
+
+
 def next_number(conn: sqlite3.Connection, name: str) -> str:
     """Atomically get the next formatted number for a sequence and increment it."""
-    cur = conn.execute("SELECT prefix, padding, next_value FROM ofitec_sequences WHERE name = ?", (name,))
-    row = cur.fetchone()
-    if row is None:
+    got = _reserve(conn, name, 1)
+    if got is None:
         # Initialize default sequence
         ensure_sequence(conn, name)
-        cur = conn.execute("SELECT prefix, padding, next_value FROM ofitec_sequences WHERE name = ?", (name,))
-        row = cur.fetchone()
-    prefix, padding, next_value = row[0] or "", int(row[1] or 0), int(row[2])
-    num = _format(prefix, padding, next_value)
-    conn.execute(
-        "UPDATE ofitec_sequences SET next_value = ?, updated_at = datetime('now') WHERE name = ?",
-        (next_value + 1, name),
-    )
-    return num
+        got = _reserve(conn, name, 1)
+    value, prefix, padding = got
+    return _format(prefix, padding, value)
 
 
 def peek_number(conn: sqlite3.Connection, name: str) -> str:
@@ -95,3 +128,207 @@ def peek_number(conn: sqlite3.Connection, name: str) -> str:
         return _format("", 0, 1)
     return _format(row[0] or "", int(row[1] or 0), int(row[2]))
 
+
+
+def year_sequence(base: str, year: int) -> str:
+    """Name of the year-scoped sequence, e.g. 'sales_note:2025'."""
+    return f"{base}:{int(year)}"
+
+
+def _db_file(conn: sqlite3.Connection) -> str:
+    for _, db_name, path in conn.execute("PRAGMA database_list"):
+        if db_name == "main":
+            return path or ""
+    return ""
+
+
+def _start_value(conn: sqlite3.Connection, start: Any) -> Optional[int]:
+    return start(conn) if callable(start) else start
+
+
+class SequenceAllocator:
+    """Per-process cache of number blocks reserved from `ofitec_sequences`.
+
+    A block is reserved on a separate connection (`BEGIN IMMEDIATE`, one
+    `UPDATE ... RETURNING`, commit), so the caller's write transaction never
+    holds the sequence row and a rollback cannot hand out the same numbers
+    twice. When the caller already has an open transaction, or the DB is
+    in-memory, the number is taken inside the caller's transaction instead
+    (one at a time, no cache).
+    """
+
+    def __init__(self, block: int = DEFAULT_BLOCK):
+        self.block = max(1, int(block))
+        self._lock = threading.Lock()
+        # (db_file, name) -> [next, end_exclusive, prefix, padding]
+        self._blocks: Dict[Tuple[str, str], List[Any]] = {}
+
+    def _reserve_block(
+        self,
+        db_file: str,
+        name: str,
+        defaults: Dict[str, Any],
+        start: Any,
+    ) -> List[Any]:
+        own = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        try:
+            own.execute("BEGIN IMMEDIATE")
+            try:
+                got = _reserve(own, name, self.block)
+                if got is None:
+                    ensure_sequence(own, name, start=_start_value(own, start), **defaults)
+                    got = _reserve(own, name, self.block)
+                value, prefix, padding = got
+                own.execute(
+                    "CREATE TABLE IF NOT EXISTS ofitec_sequence_blocks ("
+                    "name TEXT NOT NULL, start_value INTEGER NOT NULL, end_value INTEGER NOT NULL, "
+                    "reserved_at TEXT DEFAULT (datetime('now')), pid INTEGER)"
+                )
+                own.execute(
+                    "INSERT INTO ofitec_sequence_blocks(name, start_value, end_value, pid) VALUES(?,?,?,?)",
+                    (name, value, value + self.block - 1, os.getpid()),
+                )
+                own.execute("COMMIT")
+            except Exception:
+                own.execute("ROLLBACK")
+                raise
+        finally:
+            own.close()
+        return [value, value + self.block, prefix, padding]
+
+    def next_value(
+        self,
+        conn: sqlite3.Connection,
+        name: str,
+        *,
+        start: int | Callable[[sqlite3.Connection], int] | None = None,
+        **defaults: Any,
+    ) -> Tuple[int, str, int]:
+        """Next (value, prefix, padding).
+
+        `start` (an int or `start(conn)`) and `defaults` (prefix/padding) are
+        only used when the sequence does not exist yet.
+        """
+        db_file = _db_file(conn)
+        if not db_file or conn.in_transaction:
+            got = _reserve(conn, name, 1)
+            if got is None:
+                ensure_sequence(conn, name, start=_start_value(conn, start), **defaults)
+                got = _reserve(conn, name, 1)
+            return got
+        key = (os.path.abspath(db_file), name)
+        with self._lock:
+            blk = self._blocks.get(key)
+            if blk is None or blk[0] >= blk[1]:
+                blk = self._blocks[key] = self._reserve_block(db_file, name, defaults, start)
+            value = blk[0]
+            blk[0] += 1
+            return value, blk[2], blk[3]
+
+    def next_number(self, conn: sqlite3.Connection, name: str, **kw: Any) -> str:
+        value, prefix, padding = self.next_value(conn, name, **kw)
+        return _format(prefix, padding, value)
+
+    def peek_number(self, conn: sqlite3.Connection, name: str) -> Optional[str]:
+        """Next number this process would hand out, or None if it has no block."""
+        key = (os.path.abspath(_db_file(conn) or ":memory:"), name)
+        with self._lock:
+            blk = self._blocks.get(key)
+            if blk is None or blk[0] >= blk[1]:
+                return None
+            return _format(blk[2], blk[3], blk[0])
+
+    def reset(self) -> None:
+        """Drop cached blocks (tests, or after editing a sequence by hand)."""
+        with self._lock:
+            self._blocks.clear()
+
+
+allocator = SequenceAllocator()
+
+
+def used_values(conn: sqlite3.Connection, table: str, column: str, pattern: str) -> List[int]:
+    """Integer part (first regex group) of `table.column` values matching `pattern`."""
+    rx = re.compile(pattern)
+    out: List[int] = []
+    for (val,) in conn.execute(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL"):
+        m = rx.match(str(val))
+        if m:
+            out.append(int(m.group(1)))
+    return out
+
+
+def number_pattern(conn: sqlite3.Connection, name: str) -> str:
+    """Regex for the values issued by a sequence (year-scoped: 'NNN-YYYY')."""
+    m = re.match(r"^.+:(\d{4})$", name)
+    if m:
+        return rf"^(\d+)-{m.group(1)}$"
+    row = conn.execute("SELECT prefix FROM ofitec_sequences WHERE name = ?", (name,)).fetchone()
+    return rf"^{re.escape((row[0] if row else '') or '')}(\d+)$"
+
+
+def _ranges(values: Iterable[int]) -> List[Tuple[int, int]]:
+    out: List[Tuple[int, int]] = []
+    for v in sorted(values):
+        if out and v == out[-1][1] + 1:
+            out[-1] = (out[-1][0], v)
+        else:
+            out.append((v, v))
+    return out
+
+
+def _issued_min(conn: sqlite3.Connection, name: str, has_log: bool) -> int:
+    """First issued number: recorded start_value, else first reserved block, else 1."""
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(ofitec_sequences)")}
+    if "start_value" in cols:
+        row = conn.execute("SELECT start_value FROM ofitec_sequences WHERE name = ?", (name,)).fetchone()
+        if row and row[0]:
+            return int(row[0])
+    if has_log:
+        row = conn.execute(
+            "SELECT MIN(start_value) FROM ofitec_sequence_blocks WHERE name = ?", (name,)
+        ).fetchone()
+        if row and row[0]:
+            return int(row[0])
+    return 1
+
+
+def gap_report(conn: sqlite3.Connection, name: str, used: Iterable[int]) -> Dict[str, Any]:
+    """Compare issued numbers (issued_min .. next_value-1) with the ones actually used.
+
+    issued_min is the sequence's start value (`--set-start`), so numbers below
+    it are not gaps. gaps: unused ranges; duplicates: values used more than
+    once; out_of_range: used values the sequence never issued (manual numbers);
+    blocks: reservation log rows overlapping a gap.
+    """
+    row = conn.execute("SELECT next_value FROM ofitec_sequences WHERE name = ?", (name,)).fetchone()
+    issued_max = int(row[0]) - 1 if row else 0
+    has_log = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='ofitec_sequence_blocks'"
+    ).fetchone() is not None
+    issued_min = _issued_min(conn, name, has_log) if row else 1
+    used = list(used)
+    seen: Dict[int, int] = {}
+    for v in used:
+        seen[v] = seen.get(v, 0) + 1
+    gaps = _ranges(v for v in range(issued_min, issued_max + 1) if v not in seen)
+    blocks: List[Dict[str, Any]] = []
+    if gaps and has_log:
+        for start_value, end_value, reserved_at, pid in conn.execute(
+            "SELECT start_value, end_value, reserved_at, pid FROM ofitec_sequence_blocks "
+            "WHERE name = ? ORDER BY start_value",
+            (name,),
+        ):
+            if any(a <= end_value and start_value <= b for a, b in gaps):
+                blocks.append({"start": start_value, "end": end_value, "reserved_at": reserved_at, "pid": pid})
+    return {
+        "name": name,
+        "issued_min": issued_min,
+        "issued_max": issued_max,
+        "used": len(seen),
+        "gaps": gaps,
+        "missing": sum(b - a + 1 for a, b in gaps),
+        "duplicates": sorted(v for v, n in seen.items() if n > 1),
+        "out_of_range": sorted(v for v in seen if v > issued_max or v < issued_min),
+        "blocks": blocks,
+    }
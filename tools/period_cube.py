@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Cubo de totales por periodo (`fact_period_totals`).
+
+Precalcula montos por año / mes / semana ISO, categoría, proyecto y moneda
+para que los endpoints de CEO, flujo semanal y tesorería lean con consultas
+por rango sobre un índice, en vez de escanear las tablas fuente con
+`strftime` o agrupar filas en Python.
+
+    period_type  'year' ('2025') | 'month' ('2025-03') | 'week' ('2025-W09', ISO)
+    category     revenue | invoice | purchase | bank_net | plan:<categoria>
+
+Cada fuente (ver SOURCES) se registra en `fact_period_sources` al
+construirse; los lectores solo usan el cubo para fuentes registradas.
+
+Mantenimiento:
+- Importadores: `refresh(conn, [fuente], since=fecha_min)` recalcula solo los
+  periodos desde `since` (alineado al inicio de cada periodo).
+- Escrituras puntuales: `add_amount(...)` suma el delta si la fuente ya está
+  registrada.
+- CLI (recalcular todo o desde una fecha):
+    python tools/period_cube.py [--db data/chipax_data.db] [--source bank_movements] [--since 2025-01-01]
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent))
+
+from common_db import default_db_path
+
+PERIOD_TYPES = ("year", "month", "week")
+
+
+@dataclass(frozen=True)
+class CubeSource:
+    table: str
+    dates: Tuple[str, ...]
+    amount: str
+    category: str
+    project: Tuple[str, ...] = ()
+    currency: Tuple[str, ...] = ()
+
+
+SOURCES: Dict[str, CubeSource] = {
+    "revenue": CubeSource(
+        "v_facturas_venta", ("fecha",), "monto_total", "'revenue'",
+        currency=("moneda",),
+    ),
+    "sales_invoices": CubeSource(
+        "sales_invoices", ("invoice_date", "issue_date"),
+        "ABS(COALESCE(total_amount,0))", "'invoice'",
+        project=("project_id",), currency=("currency",),
+    ),
+    "purchase_orders": CubeSource(
+        "purchase_orders_unified", ("po_date",),
+        "-ABS(COALESCE(total_amount,0))", "'purchase'",
+        project=("zoho_project_id", "project_id"), currency=("currency",),
+    ),
+    "cashflow_planned": CubeSource(
+        "cashflow_planned", ("fecha",), "COALESCE(monto,0)",
+        "'plan:' || COALESCE(NULLIF(category,''),'other')",
+        project=("project_id",), currency=("moneda", "currency"),
+    ),
+    "bank_movements": CubeSource(
+        "bank_movements", ("fecha",),
+        "CASE WHEN LOWER(COALESCE(tipo,''))='credit' "
+        "THEN COALESCE(monto,0) ELSE -COALESCE(monto,0) END",
+        "'bank_net'", currency=("moneda",),
+    ),
+}
+
+
+def ensure_cube(conn: sqlite3.Connection) -> None:
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS fact_period_totals (
+          period_type TEXT NOT NULL,
+          period_key TEXT NOT NULL,
+          category TEXT NOT NULL,
+          project_id TEXT NOT NULL DEFAULT '',
+          currency TEXT NOT NULL DEFAULT 'CLP',
+          amount REAL NOT NULL DEFAULT 0,
+          rows INTEGER NOT NULL DEFAULT 0,
+          source TEXT NOT NULL,
+          PRIMARY KEY (period_type, category, period_key, project_id, currency)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_fact_period_source
+          ON fact_period_totals(source, period_type, period_key);
+        CREATE TABLE IF NOT EXISTS fact_period_sources (
+          source TEXT PRIMARY KEY,
+          refreshed_at TEXT,
+          source_rows INTEGER
+        );
+        """
+    )
+
+
+def _object_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cur = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table','view') AND name=?",
+        (name,),
+    )
+    return cur.fetchone() is not None
+
+
+def registered_sources(conn: sqlite3.Connection) -> set[str]:
+    if not _object_exists(conn, "fact_period_sources"):
+        return set()
+    return {r[0] for r in conn.execute("SELECT source FROM fact_period_sources")}
+
+
+def parse_day(value: Any) -> Optional[date]:
+    """Fecha ISO (con o sin hora) -> date; None si no es ISO."""
+    try:
+        return datetime.fromisoformat(str(value)[:10]).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def period_key(period_type: str, d: date) -> str:
+    if period_type == "year":
+        return f"{d.year:04d}"
+    if period_type == "month":
+        return f"{d.year:04d}-{d.month:02d}"
+    iso = d.isocalendar()
+    return f"{iso.year}-W{iso.week:02d}"
+
+
+def period_start(period_type: str, d: date) -> date:
+    if period_type == "year":
+        return date(d.year, 1, 1)
+    if period_type == "month":
+        return d.replace(day=1)
+    return d - timedelta(days=d.weekday())
+
+
+def _pick(cols: set[str], options: Sequence[str], default: str) -> str:
+    for c in options:
+        if c in cols:
+            return f"COALESCE(CAST({c} AS TEXT), {default})"
+    return default
+
+
+def _source_select(conn: sqlite3.Connection, spec: CubeSource) -> Optional[Tuple[str, str]]:
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({spec.table})")}
+    date_col = next((c for c in spec.dates if c in cols), None)
+    if date_col is None:
+        return None
+    project = _pick(cols, spec.project, "''")
+    currency = _pick(cols, spec.currency, "'CLP'")
+    sql = (
+        f"SELECT {date_col}, {spec.category}, {project}, {currency}, {spec.amount} "
+        f"FROM {spec.table} WHERE {date_col} IS NOT NULL"
+    )
+    return sql, date_col
+
+
+def refresh(
+    conn: sqlite3.Connection,
+    sources: Optional[Iterable[str]] = None,
+    *,
+    since: Any = None,
+) -> Dict[str, int]:
+    """Recalcula las fuentes indicadas (todas por defecto); hace commit.
+
+    Con `since` (y la fuente ya registrada) solo se reemplazan los periodos
+    que comienzan en o después del inicio del año/mes/semana que contiene
+    `since`. Devuelve filas leídas por fuente; fuentes cuya tabla no existe se
+    omiten.
+    """
+    ensure_cube(conn)
+    since_day = parse_day(since) if since else None
+    registered = registered_sources(conn)
+    out: Dict[str, int] = {}
+    for name in sources or SOURCES:
+        spec = SOURCES[name]
+        # Una fuente nueva siempre se construye completa
+        starts = (
+            {pt: period_start(pt, since_day) for pt in PERIOD_TYPES}
+            if since_day and name in registered else {}
+        )
+        if not _object_exists(conn, spec.table):
+            continue
+        select = _source_select(conn, spec)
+        if select is None:
+            continue
+        sql, date_col = select
+        params: List[Any] = []
+        if starts:
+            sql += f" AND {date_col} >= ?"
+            params.append(min(starts.values()).isoformat())
+
+        buckets: Dict[Tuple[str, str, str, str, str], List[float]] = {}
+        n = 0
+        for raw_date, category, project, currency, amount in conn.execute(sql, params):
+            d = parse_day(raw_date)
+            if d is None or amount is None:
+                continue
+            n += 1
+            for pt in PERIOD_TYPES:
+                if starts and d < starts[pt]:
+                    continue
+                acc = buckets.setdefault(
+                    (pt, period_key(pt, d), category, project or "", currency or "CLP"), [0.0, 0]
+                )
+                acc[0] += float(amount)
+                acc[1] += 1
+
+        if starts:
+            for pt in PERIOD_TYPES:
+                conn.execute(
+                    "DELETE FROM fact_period_totals WHERE source=? AND period_type=? AND period_key>=?",
+                    (name, pt, period_key(pt, starts[pt])),
+                )
+        else:
+            conn.execute("DELETE FROM fact_period_totals WHERE source=?", (name,))
+        conn.executemany(
+            "INSERT INTO fact_period_totals(period_type, period_key, category, project_id, currency, amount, rows, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(period_type, category, period_key, project_id, currency) DO UPDATE SET "
+            "amount = amount + excluded.amount, rows = rows + excluded.rows",
+            [(*key, round(a, 6), c, name) for key, (a, c) in buckets.items()],
+        )
+        conn.execute(
+            "INSERT INTO fact_period_sources(source, refreshed_at, source_rows) VALUES (?, datetime('now'), ?) "
+            "ON CONFLICT(source) DO UPDATE SET refreshed_at=excluded.refreshed_at, "
+            "source_rows=excluded.source_rows",
+            (name, n),
+        )
+        out[name] = n
+    conn.commit()
+    return out
+
+
+def add_amount(
+    conn: sqlite3.Connection,
+    source: str,
+    category: str,
+    when: Any,
+    amount: float,
+    *,
+    project_id: Any = None,
+    currency: Optional[str] = None,
+) -> bool:
+    """Suma un movimiento puntual al cubo si `source` ya está registrada.
+
+    No hace commit: se confirma junto con la escritura de la fila fuente.
+    """
+    d = parse_day(when)
+    if d is None or source not in registered_sources(conn):
+        return False
+    conn.executemany(
+        "INSERT INTO fact_period_totals(period_type, period_key, category, project_id, currency, amount, rows, source) "
+        "VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+        "ON CONFLICT(period_type, category, period_key, project_id, currency) DO UPDATE SET "
+        "amount = amount + excluded.amount, rows = rows + 1",
+        [
+            (pt, period_key(pt, d), category, "" if project_id is None else str(project_id),
+             currency or "CLP", float(amount or 0), source)
+            for pt in PERIOD_TYPES
+        ],
+    )
+    return True
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=default_db_path(prefer_root=False))
+    ap.add_argument("--source", action="append", choices=sorted(SOURCES))
+    ap.add_argument("--since", help="YYYY-MM-DD: recalcula solo periodos desde esa fecha")
+    args = ap.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        counts = refresh(conn, args.source, since=args.since)
+    finally:
+        conn.close()
+    for name, n in counts.items():
+        print(f"{name}: {n} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
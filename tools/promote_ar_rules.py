@@ -2,14 +2,20 @@
 """
 Promote frequent AR mapping patterns to ar_project_rules.
 
-Strategy (initial):
+Strategy:
 - Learn customer_name -> project_id pairs from confirmed assignments in
-    sales_invoices and/or recent ar_map_events payloads.
-- For names seen >= min_count with a single dominant project_id, create a rule
-        kind='customer_name_like' with pattern = the exact name,
-        confidence tuned by
-    frequency.
-- Dry-run option prints planned inserts.
+    sales_invoices (recomputed with one GROUP BY) and from the full
+    ar_map_events history, incrementally: events above the watermark stored in
+    ar_rule_candidates_meta are aggregated in SQL (json_extract) and added to
+    the running counts in ar_rule_candidates_stats.
+- Pairs whose combined count is >= min_count become rules
+        kind='customer_name_like' with pattern = the exact name, inserted in
+    one executemany with INSERT OR IGNORE against a unique index on
+    (kind, pattern, project_id). If existing duplicates prevent creating the
+    index, a NOT EXISTS guarded insert is used instead.
+- Dry-run runs the same statements and rolls them back (watermark included).
+- Prints throughput (events scanned / second) and promoted vs skipped counts.
+- --rebuild resets the accumulated counts and re-learns from event id 0.
 
 Usage:
     python tools/promote_ar_rules.py \
@@ -18,17 +24,40 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import sqlite3
+import time
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 import sys
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent))
 from common_db import default_db_path
 
+RULE_KIND = "customer_name_like"
+WATERMARK_KEY = "events_watermark"
+UNIQUE_INDEX = "ux_ar_project_rules_kind_pattern_project"
+
+# customer_name / project_id extracted like the previous Python loop:
+# project_id, then assignment.project_id, then rules[0].project_id
+_EVENT_PAIRS_SQL = """
+SELECT name, pid, COUNT(1) AS cnt, MAX(id) AS last_id
+FROM (
+    SELECT id,
+           TRIM(COALESCE(json_extract(payload, '$.invoice.customer_name'), '')) AS name,
+           COALESCE(
+               NULLIF(TRIM(COALESCE(json_extract(payload, '$.project_id'), '')), ''),
+               NULLIF(TRIM(COALESCE(json_extract(payload, '$.assignment.project_id'), '')), ''),
+               TRIM(COALESCE(json_extract(payload, '$.rules[0].project_id'), ''))
+           ) AS pid
+    FROM ar_map_events
+    WHERE id > :lo AND id <= :hi AND json_valid(payload)
+)
+WHERE name <> '' AND pid <> ''
+GROUP BY name, pid
+"""
+
 
 def ensure_tables(conn: sqlite3.Connection) -> None:
     conn.executescript(
@@ -47,97 +76,173 @@ def ensure_tables(conn: sqlite3.Connection) -> None:
           user_id TEXT,
           payload TEXT
         );
+        CREATE TABLE IF NOT EXISTS ar_rule_candidates_stats(
+          customer_name TEXT NOT NULL,
+          project_id TEXT NOT NULL,
+          event_count INTEGER NOT NULL DEFAULT 0,
+          last_event_id INTEGER,
+          updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (customer_name, project_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS ar_rule_candidates_meta(
+          key TEXT PRIMARY KEY,
+          value TEXT
+        );
         """
     )
 
 
-def learn_from_sales_invoices(
-    conn: sqlite3.Connection,
-) -> Dict[Tuple[str, str], int]:
-    cur = conn.cursor()
+def ensure_unique_index(conn: sqlite3.Connection) -> bool:
+    """Unique (kind, pattern, project_id); False if duplicates already exist."""
     try:
-        cur.execute(
-            (
-                "SELECT TRIM(COALESCE(customer_name,'')) AS name, "
-                "TRIM(COALESCE(project_id,'')) AS pid, COUNT(1) AS cnt "
-                "FROM sales_invoices WHERE "
-                "TRIM(COALESCE(customer_name,'')) <> '' "
-                "AND TRIM(COALESCE(project_id,'')) <> '' "
-                "GROUP BY name, pid"
-            )
+        conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_INDEX} "
+            "ON ar_project_rules(kind, pattern, project_id)"
         )
-        stats: Dict[Tuple[str, str], int] = {}
-        for name, pid, cnt in cur.fetchall():
-            stats[(str(name), str(pid))] = int(cnt or 0)
-        return stats
-    except sqlite3.Error:
-        return {}
+        return True
+    except sqlite3.IntegrityError:
+        return False
 
 
-def learn_from_events(conn: sqlite3.Connection) -> Dict[Tuple[str, str], int]:
-    cur = conn.cursor()
-    stats: Dict[Tuple[str, str], int] = {}
-    try:
-        cur.execute(
-            "SELECT payload FROM ar_map_events ORDER BY id DESC LIMIT 500"
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cur = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    )
+    return cur.fetchone() is not None
+
+
+def get_watermark(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT value FROM ar_rule_candidates_meta WHERE key=?",
+        (WATERMARK_KEY,),
+    ).fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def _set_watermark(conn: sqlite3.Connection, value: int) -> None:
+    conn.execute(
+        "INSERT INTO ar_rule_candidates_meta(key, value) VALUES(?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        (WATERMARK_KEY, str(value)),
+    )
+
+
+def reset_stats(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM ar_rule_candidates_stats")
+    _set_watermark(conn, 0)
+
+
+def accumulate_events(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Fold events above the watermark into ar_rule_candidates_stats (no commit)."""
+    lo = get_watermark(conn)
+    hi = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ar_map_events").fetchone()[0]
+    if hi < lo:
+        # Event table was recreated: counts no longer match, learn again
+        reset_stats(conn)
+        lo = 0
+    if hi == lo:
+        return {"events_scanned": 0, "watermark": hi, "pairs_touched": 0}
+    scanned = conn.execute(
+        "SELECT COUNT(1) FROM ar_map_events WHERE id > ? AND id <= ?", (lo, hi)
+    ).fetchone()[0]
+    cur = conn.execute(
+        "INSERT INTO ar_rule_candidates_stats(customer_name, project_id, event_count, last_event_id) "
+        f"SELECT name, pid, cnt, last_id FROM ({_EVENT_PAIRS_SQL}) WHERE 1 "
+        "ON CONFLICT(customer_name, project_id) DO UPDATE SET "
+        "event_count = event_count + excluded.event_count, "
+        "last_event_id = excluded.last_event_id, updated_at = CURRENT_TIMESTAMP",
+        {"lo": lo, "hi": hi},
+    )
+    _set_watermark(conn, hi)
+    return {"events_scanned": int(scanned), "watermark": hi, "pairs_touched": cur.rowcount}
+
+
+def candidate_pairs(conn: sqlite3.Connection, min_count: int) -> Tuple[int, List[Tuple[str, str, int]]]:
+    """(learned pair count, [(name, project_id, count)] with count >= min_count)."""
+    sources = ["SELECT customer_name AS name, project_id AS pid, event_count AS cnt FROM ar_rule_candidates_stats"]
+    if _table_exists(conn, "sales_invoices"):
+        sources.append(
+            "SELECT TRIM(COALESCE(customer_name,'')), TRIM(COALESCE(project_id,'')), COUNT(1) "
+            "FROM sales_invoices WHERE TRIM(COALESCE(customer_name,'')) <> '' "
+            "AND TRIM(COALESCE(project_id,'')) <> '' "
+            "GROUP BY 1, 2"
         )
-        rows = cur.fetchall()
-        for (payload,) in rows:
-            try:
-                obj = json.loads(payload or "{}")
-            except (json.JSONDecodeError, TypeError, ValueError):
-                continue
-            invoice = obj.get("invoice") or {}
-            name = str(invoice.get("customer_name") or "").strip()
-            pid = (
-                str(obj.get("project_id") or "").strip()
-                or str(
-                    (obj.get("assignment") or {}).get("project_id") or ""
-                ).strip()
-                or str(
-                    (obj.get("rules") or [{}])[0].get("project_id") or ""
-                ).strip()
-            )
-            if name and pid:
-                stats[(name, pid)] = stats.get((name, pid), 0) + 1
+    union = " UNION ALL ".join(sources)
+    try:
+        rows = conn.execute(
+            f"SELECT name, CAST(pid AS TEXT), SUM(cnt) FROM ({union}) GROUP BY name, CAST(pid AS TEXT)"
+        ).fetchall()
     except sqlite3.Error:
-        pass
-    return stats
+        # sales_invoices without customer_name/project_id: events only
+        rows = conn.execute(
+            f"SELECT name, CAST(pid AS TEXT), SUM(cnt) FROM ({sources[0]}) GROUP BY name, CAST(pid AS TEXT)"
+        ).fetchall()
+    eligible = [(str(n), str(p), int(c or 0)) for n, p, c in rows if int(c or 0) >= min_count]
+    return len(rows), eligible
 
 
 def upsert_rules(
     conn: sqlite3.Connection,
-    pairs: Dict[Tuple[str, str], int],
-    min_count: int,
-    dry_run: bool,
+    pairs: List[Tuple[str, str, int]],
     created_by: str,
+    unique_index: bool,
 ) -> int:
-    total = 0
-    for (name, pid), cnt in pairs.items():
-        if cnt < min_count:
-            continue
-        # Avoid duplicate patterns for same project
-        cur = conn.execute(
-            (
-                "SELECT 1 FROM ar_project_rules WHERE "
-                "kind='customer_name_like' AND pattern=? AND project_id=?"
-            ),
-            (name, str(pid)),
+    """Insert missing rules in one executemany (no commit); returns rows inserted."""
+    params = [(RULE_KIND, name, pid, created_by) for name, pid, _ in pairs]
+    before = conn.total_changes
+    if unique_index:
+        conn.executemany(
+            "INSERT OR IGNORE INTO ar_project_rules(kind, pattern, project_id, created_by) VALUES(?,?,?,?)",
+            params,
         )
-        if cur.fetchone():
-            continue
-        total += 1
-        if not dry_run:
-            conn.execute(
-                (
-                    "INSERT INTO ar_project_rules("
-                    "kind, pattern, project_id, created_by) VALUES(?,?,?,?)"
-                ),
-                ("customer_name_like", name, str(pid), created_by),
-            )
-    if not dry_run:
-        conn.commit()
-    return total
+    else:
+        conn.executemany(
+            "INSERT INTO ar_project_rules(kind, pattern, project_id, created_by) "
+            "SELECT ?1, ?2, ?3, ?4 WHERE NOT EXISTS ("
+            "SELECT 1 FROM ar_project_rules WHERE kind=?1 AND pattern=?2 AND project_id=?3)",
+            params,
+        )
+    return conn.total_changes - before
+
+
+def promote(
+    conn: sqlite3.Connection,
+    *,
+    min_count: int = 3,
+    dry_run: bool = False,
+    created_by: str = "batch",
+    rebuild: bool = False,
+) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    ensure_tables(conn)
+    unique_index = ensure_unique_index(conn)
+    conn.commit()
+    try:
+        if rebuild:
+            reset_stats(conn)
+        learned = accumulate_events(conn)
+        learned_pairs, eligible = candidate_pairs(conn, min_count)
+        promoted = upsert_rules(conn, eligible, created_by, unique_index)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    elapsed = time.perf_counter() - t0
+    return {
+        "learned_pairs": learned_pairs,
+        "eligible_pairs": len(eligible),
+        "promoted_rules": promoted,
+        "skipped_rules": len(eligible) - promoted,
+        "events_scanned": learned["events_scanned"],
+        "events_watermark": learned["watermark"],
+        "elapsed_s": round(elapsed, 4),
+        "events_per_s": round(learned["events_scanned"] / elapsed, 1) if elapsed > 0 else None,
+        "unique_index": unique_index,
+        "dry_run": dry_run,
+    }
 
 
 def main() -> int:
@@ -148,29 +253,23 @@ def main() -> int:
     ap.add_argument("--min-count", type=int, default=3)
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument("--created-by", default="batch")
+    ap.add_argument(
+        "--rebuild", action="store_true",
+        help="Reset accumulated event counts and re-learn from the first event",
+    )
     args = ap.parse_args()
 
     db_path = os.path.abspath(args.db)
     conn = sqlite3.connect(db_path)
     try:
-        ensure_tables(conn)
-        s1 = learn_from_sales_invoices(conn)
-        s2 = learn_from_events(conn)
-        # Merge counts
-        all_pairs: Dict[Tuple[str, str], int] = {}
-        for k, v in s1.items():
-            all_pairs[k] = all_pairs.get(k, 0) + v
-        for k, v in s2.items():
-            all_pairs[k] = all_pairs.get(k, 0) + v
-        promoted = upsert_rules(
-            conn, all_pairs, args.min_count, args.dry_run, args.created_by
-        )
         print(
-            {
-                "learned_pairs": len(all_pairs),
-                "promoted_rules": promoted,
-                "dry_run": args.dry_run,
-            }
+            promote(
+                conn,
+                min_count=args.min_count,
+                dry_run=args.dry_run,
+                created_by=args.created_by,
+                rebuild=args.rebuild,
+            )
         )
     finally:
         conn.close()
@@ -221,9 +221,13 @@ CREATE TABLE IF NOT EXISTS bank_movements (
   saldo REAL,
   referencia TEXT,
   fuente TEXT,
-  external_id TEXT
+  external_id TEXT,
+  -- mantenidos por backend/bank_recon_state.py desde recon_links
+  reconciled_amount REAL NOT NULL DEFAULT 0,
+  reconciled_state TEXT NOT NULL DEFAULT 'pendiente'
 );
 CREATE UNIQUE INDEX IF NOT EXISTS ux_bank_external ON bank_movements(external_id);
+CREATE INDEX IF NOT EXISTS ix_bank_recon_state ON bank_movements(reconciled_state, fecha);
 
 CREATE TABLE IF NOT EXISTS cashflow_planned (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -262,6 +266,7 @@ CREATE TABLE IF NOT EXISTS projects_analytic_map (
 DROP VIEW IF EXISTS v_facturas_compra;
 CREATE VIEW v_facturas_compra AS
 SELECT
+  id,
   invoice_number AS documento_numero,
   invoice_date   AS fecha,
   vendor_rut     AS proveedor_rut,
@@ -275,6 +280,7 @@ FROM ap_invoices;
 DROP VIEW IF EXISTS v_facturas_venta;
 CREATE VIEW v_facturas_venta AS
 SELECT
+  id,
   invoice_number AS documento_numero,
   invoice_date AS fecha,
   customer_rut AS cliente_rut,
@@ -289,6 +295,7 @@ WHERE 1=1;
 DROP VIEW IF EXISTS v_gastos;
 CREATE VIEW v_gastos AS
 SELECT
+  id,
   CAST(id AS TEXT) AS gasto_id,
   fecha,
   categoria,
@@ -302,17 +309,17 @@ FROM expenses;
 
 DROP VIEW IF EXISTS v_impuestos;
 CREATE VIEW v_impuestos AS
-SELECT periodo, tipo, monto_debito, monto_credito, neto, estado, fecha_presentacion, fuente
+SELECT id, periodo, tipo, monto_debito, monto_credito, neto, estado, fecha_presentacion, fuente
 FROM taxes;
 
 DROP VIEW IF EXISTS v_previred;
 CREATE VIEW v_previred AS
-SELECT periodo, rut_trabajador, nombre_trabajador, rut_empresa, monto_total, estado, fecha_pago, fuente
+SELECT id, periodo, rut_trabajador, nombre_trabajador, rut_empresa, monto_total, estado, fecha_pago, fuente
 FROM previred_contributions;
 
 DROP VIEW IF EXISTS v_sueldos;
 CREATE VIEW v_sueldos AS
-SELECT periodo, rut_trabajador, nombre_trabajador, cargo, bruto, liquido, descuentos, fecha_pago, fuente
+SELECT id, periodo, rut_trabajador, nombre_trabajador, cargo, bruto, liquido, descuentos, fecha_pago, fuente
 FROM payroll_slips;
 
 DROP VIEW IF EXISTS v_cartola_bancaria;